@@ -22,10 +22,17 @@ import traceback
 from data_processor import DataProcessor
 from database import DatabaseManager
 from file_reader import read_file_robust, display_file_error, read_file_from_path
+from memory_profiling import profile_stage
+import ingestion
+from ingestion import IngestionPipeline, detect_data_source
+from ingestion_jobs import IngestionJobQueue, FINISHED_STATUSES, SUCCEEDED
+import rerun_profiler
+import data_export
+from report_cache import ReportCache, REPORT_FORMATS, filter_signature
 from file_scanner import FileScanner
-from config import AUTO_SCAN_FOLDERS, FILE_TRACKING_PATH, ENTERPRISE_PRICING, RECURSIVE_SCAN_FOLDERS
-from export_utils import generate_excel_export, generate_pdf_report_html
-from cost_calculator import EnterpriseCostCalculator
+from config import (AUTO_SCAN_FOLDERS, FILE_TRACKING_PATH, ENTERPRISE_PRICING, RECURSIVE_SCAN_FOLDERS,
+                    SCAN_STAT_WORKERS, SCAN_LISTING_MAX_AGE, INGESTION_WORKERS, REPORT_CACHE_SIZE,
+                    PREBUILD_REPORTS)
 
 # Constants
 WEEKLY_CHART_DATE_FORMAT = '%m/%d/%Y'  # Format for displaying week dates in weekly trend charts
@@ -48,7 +55,8 @@ st.set_page_config(
 def init_app():
     db = DatabaseManager()
     processor = DataProcessor(db)
-    scanner = FileScanner(FILE_TRACKING_PATH, recursive_folders=RECURSIVE_SCAN_FOLDERS)
+    scanner = FileScanner(FILE_TRACKING_PATH, recursive_folders=RECURSIVE_SCAN_FOLDERS,
+                          stat_workers=SCAN_STAT_WORKERS, max_listing_age=SCAN_LISTING_MAX_AGE)
     
     # Auto-load employee file if it exists
     auto_load_employee_file(db)
@@ -195,6 +203,30 @@ def auto_load_employee_file(db_manager):
 
 db, processor, scanner = init_app()
 
+@st.cache_resource
+def init_report_cache():
+    """Executive report cache shared by all sessions (see report_cache.py)."""
+    return ReportCache(capacity=REPORT_CACHE_SIZE)
+
+report_cache = init_report_cache()
+
+def prebuild_reports(jobs):
+    """Ingestion queue callback (once its jobs are done): rebuild the reports prepared for recent filter selections."""
+    report_cache.prebuild_views(db, load_dashboard_data)
+
+@st.cache_resource
+def init_job_queue():
+    """Background ingestion queue shared by all sessions (see ingestion_jobs.py)."""
+    return IngestionJobQueue(IngestionPipeline(db, processor, scanner), workers=INGESTION_WORKERS,
+                             on_success=prebuild_reports if PREBUILD_REPORTS else None)
+
+job_queue = init_job_queue()
+# init_app.clear() (Refresh Dashboard, Clear & Reset) recreates db, processor and scanner;
+# the queue switches to them once its pending jobs are done (until then, on a later rerun)
+if job_queue.pipeline.db is not db:
+    job_queue.replace_pipeline(IngestionPipeline(db, processor, scanner),
+                               on_success=prebuild_reports if PREBUILD_REPORTS else None)
+
 # Department mapping storage file
 DEPT_MAPPING_FILE = "department_mappings.json"
 
@@ -1037,481 +1069,13 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-def detect_data_source(df):
-    """Detect which AI tool the data is from based on column structure."""
-    columns = df.columns.tolist()
-    
-    # OpenAI ChatGPT detection
-    if 'gpt_messages' in columns or 'tool_messages' in columns:
-        return 'ChatGPT'
-    
-    # BlueFlame AI detection - updated for all formats
-    # Check for month columns in both formats:
-    # - Mon-YY format (e.g., 'Sep-24', 'Oct-25')
-    # - YY-Mon format (e.g., '25-Apr', '25-Sep')
-    month_abbrevs = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 
-                     'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
-    
-    has_month_cols = any(
-        col for col in columns 
-        if len(col.split('-')) == 2 and (
-            col.split('-')[0] in month_abbrevs or  # Mon-YY format
-            col.split('-')[1] in month_abbrevs     # YY-Mon format
-        )
-    )
-    
-    if ('Metric' in columns and any(col.startswith('MoM Var') for col in columns)) or \
-       ('Total Messages' in df.values if not df.empty else False) or \
-       ('User ID' in columns and has_month_cols) or \
-       ('Table' in columns and has_month_cols):
-        return 'BlueFlame AI'
-    
-    # Default or ask user
-    return 'Unknown'
-
-def is_weekly_file(filename):
-    """
-    Detect if a file is a weekly report based on filename.
-    Weekly files contain 'weekly' and a date (YYYY-MM-DD format).
-    
-    Args:
-        filename: Name of the file
-        
-    Returns:
-        bool: True if file is detected as weekly report
-    """
-    filename_lower = filename.lower()
-    # Check if filename contains 'weekly' and a date pattern
-    import re
-    has_weekly = 'weekly' in filename_lower
-    has_date = re.search(r'\d{4}-\d{2}-\d{2}', filename) is not None
-    return has_weekly and has_date
-
-def determine_record_month(period_start, period_end, first_active, last_active):
-    """
-    Determine which month a record should be assigned to based on actual usage dates.
-    For weekly files that span two months, assign to the month with more activity days.
-    
-    Args:
-        period_start: Period start date (datetime)
-        period_end: Period end date (datetime)
-        first_active: First day active in period (datetime or None)
-        last_active: Last day active in period (datetime or None)
-        
-    Returns:
-        datetime: The date to use for the record (first day of the assigned month)
-    """
-    # If we have actual activity dates, use them to determine the month
-    if pd.notna(first_active) and pd.notna(last_active):
-        first_active = pd.to_datetime(first_active, errors='coerce')
-        last_active = pd.to_datetime(last_active, errors='coerce')
-        
-        if pd.notna(first_active) and pd.notna(last_active):
-            # Calculate midpoint of actual activity
-            midpoint = first_active + (last_active - first_active) / 2
-            # Return first day of the month containing the midpoint
-            return pd.Timestamp(year=midpoint.year, month=midpoint.month, day=1)
-    
-    # If no activity dates, use period dates
-    if pd.notna(period_start) and pd.notna(period_end):
-        period_start = pd.to_datetime(period_start, errors='coerce')
-        period_end = pd.to_datetime(period_end, errors='coerce')
-        
-        if pd.notna(period_start) and pd.notna(period_end):
-            # Check if period spans two months
-            if period_start.month != period_end.month:
-                # Calculate number of days in each month
-                days_in_start_month = (pd.Timestamp(year=period_start.year, 
-                                                    month=period_start.month, 
-                                                    day=1) + pd.DateOffset(months=1) - pd.Timedelta(days=1)).day - period_start.day + 1
-                days_in_end_month = period_end.day
-                
-                # Assign to month with more days
-                if days_in_start_month >= days_in_end_month:
-                    return pd.Timestamp(year=period_start.year, month=period_start.month, day=1)
-                else:
-                    return pd.Timestamp(year=period_end.year, month=period_end.month, day=1)
-            else:
-                # Same month, use period start
-                return pd.Timestamp(year=period_start.year, month=period_start.month, day=1)
-    
-    # Fallback to period_start or current date
-    if pd.notna(period_start):
-        period_start = pd.to_datetime(period_start, errors='coerce')
-        if pd.notna(period_start):
-            return pd.Timestamp(year=period_start.year, month=period_start.month, day=1)
-    
-    # Last resort: current date
-    now = datetime.now()
-    return pd.Timestamp(year=now.year, month=now.month, day=1)
-
 def normalize_openai_data(df, filename):
-    """Normalize OpenAI CSV export to standard schema with enterprise license costs."""
-    normalized_records = []
-    
-    # Get enterprise pricing
-    cost_calc = EnterpriseCostCalculator()
-    pricing_info = cost_calc.get_pricing_info('ChatGPT')
-    monthly_license_cost = pricing_info['license_cost_per_user_monthly']
-    
-    for _, row in df.iterrows():
-        # Get user email and name
-        user_email = row.get('email', '')
-        user_name = row.get('name', '')
-        
-        # Look up employee by email to get authoritative department
-        employee = None
-        try:
-            if user_email:
-                employee = db.get_employee_by_email(user_email)
-            
-            # If no match by email, try matching by name
-            if not employee and user_name:
-                # Try to parse name into first and last
-                name_parts = user_name.strip().split()
-                if len(name_parts) >= 2:
-                    first_name = name_parts[0]
-                    last_name = ' '.join(name_parts[1:])  # Handle multi-part last names
-                    employee = db.get_employee_by_name(first_name, last_name)
-        except AttributeError:
-            # Handle cache error - database object missing methods
-            employee = None
-        
-        if employee:
-            # Use employee data as source of truth
-            dept = employee['department'] if employee['department'] else 'Unknown'
-            user_name = f"{employee['first_name']} {employee['last_name']}".strip()
-            if not user_name:
-                user_name = row.get('name', '')
-        else:
-            # User not in employee roster - flag as unidentified
-            # Parse department - OpenAI exports it as a JSON array string
-            dept = 'Unknown'
-            user_name = row.get('name', '')
-        
-        # Get period dates with robust error handling
-        period_start = pd.to_datetime(row.get('period_start', row.get('first_day_active_in_period', datetime.now())), errors='coerce')
-        period_end = pd.to_datetime(row.get('period_end', row.get('last_day_active_in_period', datetime.now())), errors='coerce')
-        first_active = row.get('first_day_active_in_period')
-        last_active = row.get('last_day_active_in_period')
-        
-        # Fallback to current date if parsing fails
-        if pd.isna(period_start):
-            period_start = datetime.now()
-        if pd.isna(period_end):
-            period_end = datetime.now()
-        
-        # Determine the correct month for this record
-        # For weekly files spanning two months, this ensures data goes to the right month
-        is_weekly = is_weekly_file(filename)
-        if is_weekly:
-            record_date = determine_record_month(period_start, period_end, first_active, last_active)
-        else:
-            # For monthly files, use period_start as before
-            record_date = period_start
-        
-        # ChatGPT messages - cost is enterprise license per user per month
-        if row.get('messages', 0) > 0:
-            normalized_records.append({
-                'user_id': row.get('public_id', row.get('email', '')),
-                'user_name': user_name,
-                'email': user_email,
-                'department': dept,
-                'date': record_date,
-                'feature_used': 'ChatGPT Messages',
-                'usage_count': row.get('messages', 0),
-                'cost_usd': monthly_license_cost,  # Enterprise license cost per user per month
-                'tool_source': 'ChatGPT',
-                'file_source': filename
-            })
-        
-        # GPT-specific messages - included in license, cost is 0
-        if row.get('gpt_messages', 0) > 0:
-            normalized_records.append({
-                'user_id': row.get('public_id', row.get('email', '')),
-                'user_name': user_name,
-                'email': user_email,
-                'department': dept,
-                'date': record_date,
-                'feature_used': 'GPT Messages',
-                'usage_count': row.get('gpt_messages', 0),
-                'cost_usd': 0,  # Included in base license
-                'tool_source': 'ChatGPT',
-                'file_source': filename
-            })
-        
-        # Tool messages - included in license, cost is 0
-        if row.get('tool_messages', 0) > 0:
-            normalized_records.append({
-                'user_id': row.get('public_id', row.get('email', '')),
-                'user_name': user_name,
-                'email': user_email,
-                'department': dept,
-                'date': record_date,
-                'feature_used': 'Tool Messages',
-                'usage_count': row.get('tool_messages', 0),
-                'cost_usd': 0,  # Included in base license
-                'tool_source': 'ChatGPT',
-                'file_source': filename
-            })
-        
-        # Project messages - included in license, cost is 0
-        if row.get('project_messages', 0) > 0:
-            normalized_records.append({
-                'user_id': row.get('public_id', row.get('email', '')),
-                'user_name': user_name,
-                'email': user_email,
-                'department': dept,
-                'date': record_date,
-                'feature_used': 'Project Messages',
-                'usage_count': row.get('project_messages', 0),
-                'cost_usd': 0,  # Included in base license
-                'tool_source': 'ChatGPT',
-                'file_source': filename
-            })
-    
-    return pd.DataFrame(normalized_records)
+    """Normalize OpenAI CSV export to standard schema (see ingestion.normalize_openai_data)."""
+    return ingestion.normalize_openai_data(df, filename, db)
 
 def normalize_blueflame_data(df, filename):
-    """Normalize BlueFlame AI data to standard schema with enterprise license costs."""
-    normalized_records = []
-    
-    # Get enterprise pricing for BlueFlame AI
-    cost_calc = EnterpriseCostCalculator()
-    pricing_info = cost_calc.get_pricing_info('BlueFlame AI')
-    monthly_license_cost = pricing_info['license_cost_per_user_monthly']
-    
-    # Check if this is the combined format with 'Table' column
-    if 'Table' in df.columns:
-        # Split the dataframe by table type
-        monthly_trends = df[df['Table'] == 'Overall Monthly Trends']
-        user_data = df[(df['Table'] == 'Top 20 Users Total') | 
-                      (df['Table'] == 'Top 10 Increasing Users') | 
-                      (df['Table'] == 'Top 10 Decreasing Users') |
-                      (df['Table'] == 'All Users Total') |
-                      (df['Table'] == 'All Increasing Users') |
-                      (df['Table'] == 'All Decreasing Users')]
-        
-        # Note: We skip processing monthly trends/aggregate metrics in favor of real user data
-        # The user data from Top 20/Top 10 tables provides the actual usage information
-        
-        # Process user data (from Top 20 Users, Top 10 Increasing, etc.)
-        if not user_data.empty:
-            # Get month columns (excluding MoM variance columns and non-month columns)
-            month_cols = [col for col in user_data.columns if col not in ['Table', 'Rank', 'Metric', 'User ID'] 
-                         and not col.startswith('MoM Var')]
-            
-            # Deduplicate user data - same user may appear in multiple tables (e.g., Top 20 AND Top 10 Increasing)
-            # Keep first occurrence for each user
-            user_data_deduped = user_data.drop_duplicates(subset=['User ID'], keep='first')
-            
-            # Process each user
-            for _, row in user_data_deduped.iterrows():
-                user_email = row['User ID']
-                if pd.isna(user_email) or not user_email:
-                    continue
-                
-                # Look up employee by email to get authoritative department
-                employee = None
-                try:
-                    employee = db.get_employee_by_email(user_email) if user_email else None
-                    
-                    # If no match by email, try to extract name from email and match
-                    if not employee and user_email:
-                        # Try to parse name from email (e.g., john.doe@company.com -> John Doe)
-                        email_name = user_email.split('@')[0].replace('.', ' ').strip()
-                        name_parts = email_name.split()
-                        if len(name_parts) >= 2:
-                            first_name = name_parts[0]
-                            last_name = ' '.join(name_parts[1:])
-                            employee = db.get_employee_by_name(first_name, last_name)
-                except AttributeError:
-                    # Handle cache error - database object missing methods
-                    employee = None
-                
-                if employee:
-                    # Use employee data as source of truth
-                    dept = employee['department'] if employee['department'] else 'Unknown'
-                    user_name = f"{employee['first_name']} {employee['last_name']}".strip()
-                    if not user_name:
-                        user_name = user_email.split('@')[0].replace('.', ' ').title()
-                else:
-                    # User not in employee roster - flag as unidentified
-                    dept = 'Unknown'
-                    user_name = user_email.split('@')[0].replace('.', ' ').title()
-                
-                # Process each month for this user
-                for month_col in month_cols:
-                    try:
-                        # Parse month to a datetime (format like '25-Sep' or 'Sep-25')
-                        month_date = None
-                        for fmt in ['%y-%b', '%b-%y', '%Y-%b', '%b-%Y']:
-                            try:
-                                month_date = pd.to_datetime(month_col, format=fmt, errors='coerce')
-                                if not pd.isna(month_date):
-                                    break
-                            except:
-                                continue
-                        
-                        if pd.isna(month_date):
-                            continue
-                        
-                        # Get message count for this month
-                        message_count = row[month_col]
-                        
-                        # Handle dash placeholders and formatting
-                        if isinstance(message_count, str):
-                            if message_count in ['–', '-', '—', 'N/A', '']:
-                                continue
-                            message_count = int(message_count.replace(',', ''))
-                        
-                        # Skip months with no meaningful data
-                        if pd.isna(message_count) or message_count == 0:
-                            continue
-                        
-                        # Create user record for this month with enterprise license cost
-                        normalized_records.append({
-                            'user_id': user_email,
-                            'user_name': user_name,
-                            'email': user_email,
-                            'department': dept,
-                            'date': month_date,
-                            'feature_used': 'BlueFlame Messages',
-                            'usage_count': int(message_count),
-                            'cost_usd': monthly_license_cost,  # Enterprise license cost per user per month
-                            'tool_source': 'BlueFlame AI',
-                            'file_source': filename
-                        })
-                    except Exception as e:
-                        print(f"Error processing month {month_col} for user {user_email}: {str(e)}")
-    
-    # Check if this is the summary report format with 'Metric' column (but no Table column)
-    elif 'Metric' in df.columns and 'User ID' not in df.columns:
-        # This format only has aggregate metrics, no individual user data
-        # Skip processing as we prefer real user data from other formats
-        print("Skipping aggregate-only format without user data")
-    
-    # If we have the wide-format file with User ID column (new format without 'Table' column)
-    elif 'User ID' in df.columns:
-        # Get month columns (excluding MoM variance columns, Rank, Metric, and User ID)
-        month_cols = [col for col in df.columns if col not in ['User ID', 'Rank', 'Metric'] 
-                     and not col.startswith('MoM Var')]
-        
-        # Process each user record
-        for _, row in df.iterrows():
-            user_email = row['User ID']
-            if pd.isna(user_email) or not user_email:
-                continue
-            
-            # Look up employee by email to get authoritative department
-            employee = None
-            try:
-                employee = db.get_employee_by_email(user_email) if user_email else None
-                
-                # If no match by email, try to extract name from email and match
-                if not employee and user_email:
-                    # Try to parse name from email (e.g., john.doe@company.com -> John Doe)
-                    email_name = user_email.split('@')[0].replace('.', ' ').strip()
-                    name_parts = email_name.split()
-                    if len(name_parts) >= 2:
-                        first_name = name_parts[0]
-                        last_name = ' '.join(name_parts[1:])
-                        employee = db.get_employee_by_name(first_name, last_name)
-            except AttributeError:
-                # Handle cache error - database object missing methods
-                employee = None
-            
-            if employee:
-                # Use employee data as source of truth
-                dept = employee['department'] if employee['department'] else 'Unknown'
-                user_name = f"{employee['first_name']} {employee['last_name']}".strip()
-                if not user_name:
-                    user_name = user_email.split('@')[0].replace('.', ' ').title()
-            else:
-                # User not in employee roster - flag as unidentified
-                dept = 'Unknown'
-                user_name = user_email.split('@')[0].replace('.', ' ').title()
-            
-            # Process each month for this user
-            for month_col in month_cols:
-                try:
-                    # Parse month to a datetime (format like '25-Sep' or 'Sep-25')
-                    month_date = None
-                    for fmt in ['%y-%b', '%b-%y', '%Y-%b', '%b-%Y']:
-                        try:
-                            month_date = pd.to_datetime(month_col, format=fmt, errors='coerce')
-                            if not pd.isna(month_date):
-                                break
-                        except:
-                            continue
-                    
-                    if pd.isna(month_date):
-                        continue
-                    
-                    # Get message count for this month
-                    message_count = row[month_col]
-                    
-                    # Handle dash placeholders and formatting
-                    if isinstance(message_count, str):
-                        if message_count in ['–', '-', '—', 'N/A', '']:
-                            continue
-                        message_count = int(message_count.replace(',', ''))
-                    
-                    # Skip months with no meaningful data
-                    if pd.isna(message_count) or message_count == 0:
-                        continue
-                    
-                    # Create user record for this month with enterprise license cost
-                    normalized_records.append({
-                        'user_id': user_email,
-                        'user_name': user_name,
-                        'email': user_email,
-                        'department': dept,
-                        'date': month_date,
-                        'feature_used': 'BlueFlame Messages',
-                        'usage_count': int(message_count),
-                        'cost_usd': monthly_license_cost,  # Enterprise license cost per user per month
-                        'tool_source': 'BlueFlame AI',
-                        'file_source': filename
-                    })
-                
-                except Exception as e:
-                    print(f"Error processing month {month_col} for user {user_email}: {str(e)}")
-    
-    # Other formats (possibly old BlueFlame format or future formats)
-    else:
-        # Process each user record using best effort detection
-        for idx, row in df.iterrows():
-            user = row.get('User', row.get('Email', f'blueflame-user-{idx}'))
-            email = row.get('Email', f'{user.lower().replace(" ", ".")}@company.com')
-            messages = row.get('Messages', row.get('Usage', 0))
-            date_col = next((col for col in df.columns if 'Date' in col or 'Month' in col), None)
-            
-            if date_col:
-                try:
-                    date = pd.to_datetime(row[date_col], errors='coerce')
-                    if pd.isna(date):
-                        date = datetime.now()
-                except:
-                    date = datetime.now()
-            else:
-                date = datetime.now()
-            
-            if messages > 0:
-                normalized_records.append({
-                    'user_id': email,
-                    'user_name': user,
-                    'email': email,
-                    'department': row.get('Department', 'BlueFlame Users'),
-                    'date': date,
-                    'feature_used': 'BlueFlame Messages',
-                    'usage_count': messages,
-                    'cost_usd': monthly_license_cost,  # Enterprise license cost per user per month
-                    'tool_source': 'BlueFlame AI',
-                    'file_source': filename
-                })
-    
-    return pd.DataFrame(normalized_records)
+    """Normalize BlueFlame AI data to standard schema (see ingestion.normalize_blueflame_data)."""
+    return ingestion.normalize_blueflame_data(df, filename, db)
 
 def display_department_mapper():
     """Display department mapping interface with improved user deduplication and pagination."""
@@ -1529,9 +1093,9 @@ def display_department_mapper():
     # Load existing mappings
     mappings = load_department_mappings()
     
-    # Get all unique users from database
-    all_data = db.get_all_data()
-    if all_data.empty:
+    # Get all unique users from database (distinct in SQL, not every usage row)
+    all_users = db.get_usage_users()
+    if all_users.empty:
         st.info("No data available. Upload data first to use department mapping.")
         return
     
@@ -1644,7 +1208,7 @@ def display_department_mapper():
     
     # Deduplicate users by email only, using smart department selection
     # This prevents users who appear in both OpenAI and BlueFlame from showing as duplicates
-    users_df = all_data.groupby('email').agg({
+    users_df = all_users.groupby('email').agg({
         'user_name': 'first',
         'department': lambda x: _select_primary_department(x),
         'tool_source': lambda x: ', '.join(sorted(x.unique()))
@@ -1670,7 +1234,7 @@ def display_department_mapper():
     
     # Search filter
     with col2:
-        search = st.text_input("🔍 Search by name or email", "")
+        search = st.text_input("🔍 Search by name, email, or department", "")
     
     # Initialize pagination state if not exists
     if 'dept_mapper_page' not in st.session_state:
@@ -1679,12 +1243,13 @@ def display_department_mapper():
     # Users per page
     users_per_page = 20
     
-    # Apply search filter if provided
+    # Apply search filter if provided (prefix/token search, best matches first)
     if search:
-        users_df = users_df[
-            users_df['user_name'].str.contains(search, case=False, na=False) | 
-            users_df['email'].str.contains(search, case=False, na=False)
-        ]
+        ranked_emails = db.get_search_index('users').search(search)
+        listed = set(users_df['email'])
+        users_df = users_df.set_index('email').reindex(
+            [email for email in ranked_emails if email in listed]
+        ).reset_index()
         # Reset pagination when searching
         st.session_state.dept_mapper_page = 0
     
@@ -1829,73 +1394,115 @@ def display_department_mapper():
     if mappings:
         st.info(f"📊 {len(mappings)} custom department mappings active")
 
-def process_auto_file(file_info, tool_type='Auto-Detect'):
+def submit_ingestion_jobs(file_infos, tool_type='Auto-Detect'):
+    """Queue auto-scanned files for background ingestion and track them in this session."""
+    job_ids = st.session_state.setdefault('ingestion_jobs', [])
+    for file_info in file_infos:
+        job_id = job_queue.submit_file(file_info, tool_type)
+        if job_id not in job_ids:
+            job_ids.append(job_id)
+
+def display_ingestion_jobs(in_fragment=False):
     """
-    Process a file from auto-scan folders.
+    Show status and progress of this session's ingestion jobs.
     
     Args:
-        file_info: Dictionary with file information from FileScanner
-        tool_type: Type of AI tool (Auto-Detect, OpenAI ChatGPT, etc.)
-        
-    Returns:
-        tuple: (success: bool, message: str, records_count: int)
+        in_fragment: True when run as an auto-refreshing fragment; the whole app is
+            then rerun once a job succeeds so the dashboard shows the new data
     """
-    try:
-        file_path = file_info['path']
-        
-        # Read file from filesystem
-        df, read_error = read_file_from_path(file_path)
-        
-        if read_error:
-            return False, f"Error reading file: {read_error}", 0
-        
-        if df is None or df.empty:
-            return False, "File contains no data", 0
-        
-        # Detect data source
-        if tool_type == 'Auto-Detect':
-            detected_tool = detect_data_source(df)
-        else:
-            detected_tool = tool_type.replace('OpenAI ', '')
-        
-        # Normalize data based on detected tool
-        if 'ChatGPT' in detected_tool:
-            normalized_df = normalize_openai_data(df, file_info['filename'])
-        elif 'BlueFlame' in detected_tool:
-            normalized_df = normalize_blueflame_data(df, file_info['filename'])
-        else:
-            return False, f"Unknown data format: {detected_tool}", 0
-        
-        # Process the normalized data
-        if not normalized_df.empty:
-            success, message = processor.process_monthly_data(normalized_df, file_info['filename'])
-            
-            if success:
-                # Mark file as processed
-                scanner.mark_processed(
-                    file_path, 
-                    success=True, 
-                    records_count=len(normalized_df)
-                )
-                return True, f"Successfully processed {len(normalized_df)} records", len(normalized_df)
-            else:
-                scanner.mark_processed(
-                    file_path, 
-                    success=False, 
-                    error=message
-                )
-                return False, message, 0
+    jobs = job_queue.list_jobs(st.session_state.get('ingestion_jobs', []))
+    if not jobs:
+        return
+    
+    st.subheader("📋 Ingestion Jobs")
+    for job in jobs:
+        if job['status'] not in FINISHED_STATUSES:
+            st.progress(job['progress'], text=f"{job['filename']}: {job['stage']}...")
+            counts = [f"{job[field]:,} {label}" for field, label in
+                      (('rows_read', 'read'), ('rows_normalized', 'normalized'), ('rows_superseded', 'superseded'))
+                      if job[field] is not None]
+            if counts:
+                st.caption(" | ".join(counts))
+        elif job['status'] == SUCCEEDED:
+            superseded = f", {job['rows_superseded']:,} superseded" if job['rows_superseded'] else ""
+            st.success(f"✅ {job['filename']}: {job['records']:,} records{superseded}")
+            if job['duplicate_sets']:
+                st.warning(f"⚠️ {job['duplicate_sets']} sets of duplicate records detected after this upload")
         else:
-            return False, "No valid data found after normalization", 0
+            st.error(f"❌ {job['filename']}: {job['message']}")
+    
+    # Rerun the app once for every job that finished since the last run
+    seen = st.session_state.setdefault('ingestion_jobs_seen', set())
+    finished = {job['job_id']: job for job in jobs if job['status'] in FINISHED_STATUSES}
+    newly_finished = [job for job_id, job in finished.items() if job_id not in seen]
+    seen.update(finished)
+    
+    active = len(jobs) - len(finished)
+    if not active:
+        if st.button("🧹 Clear Finished Jobs", use_container_width=True):
+            st.session_state['ingestion_jobs'] = []
+            st.rerun()
+    elif not in_fragment:
+        if st.button("🔄 Refresh Job Status", use_container_width=True):
+            st.rerun()
+    
+    if in_fragment and any(job['status'] == SUCCEEDED for job in newly_finished):
+        st.rerun()
+
+def display_ingestion_jobs_panel():
+    """Show this session's ingestion jobs, refreshing every 2 seconds while any is running."""
+    jobs = job_queue.list_jobs(st.session_state.get('ingestion_jobs', []))
+    if hasattr(st, 'fragment') and any(job['status'] not in FINISHED_STATUSES for job in jobs):
+        st.fragment(run_every=2)(display_ingestion_jobs)(in_fragment=True)
+    else:
+        display_ingestion_jobs()
+
+def display_report_exports(data, data_version, filters):
+    """
+    Show the executive report downloads for the current view.
     
-    except Exception as e:
-        error_msg = f"Error processing file: {str(e)}"
-        scanner.mark_processed(
-            file_info['path'], 
-            success=False, 
-            error=error_msg
-        )
-        return False, error_msg, 0
+    A report is built when its "Prepare" button is clicked and then served from
+    report_cache until the data or the filters change. The cache remembers the
+    prepared formats of each filter selection: they are rebuilt in the background
+    once the ingestion queue has finished its jobs, or when the selection is
+    shown again with newer data (PREBUILD_REPORTS).
+    
+    Args:
+        data: Filtered DataFrame shown on the dashboard
+        data_version: Data version read before data was loaded
+        filters: Keyword arguments of load_dashboard_data that produced data
+    """
+    signature = filter_signature(**filters)
+    prepared = report_cache.remembered_formats(signature)
+    
+    for fmt, spec in REPORT_FORMATS.items():
+        key = ReportCache.key(db, data_version, signature, fmt)
+        content = report_cache.get(key)
+        if content is None and PREBUILD_REPORTS and fmt in prepared:
+            report_cache.prebuild(key, data.copy())
+        
+        if content is None:
+            if st.button(f"Prepare {spec['label']}", key=f"prepare_report_{fmt}", use_container_width=True,
+                         help=spec['help']):
+                report_cache.remember_view(signature, filters, fmt)
+                with st.spinner(f"Building {spec['label']}..."):
+                    try:
+                        content = report_cache.build(key, data)
+                    except Exception as e:
+                        st.error(f"Export error: {str(e)}")
+            elif report_cache.is_building(key):
+                st.caption(f"{spec['label']} is being prepared in the background")
+        
+        if content is not None:
+            st.download_button(
+                label=spec['label'],
+                data=content,
+                file_name=f"ai_usage_report_{datetime.now().strftime('%Y%m%d_%H%M')}.{spec['extension']}",
+                mime=spec['mime'],
+                key=f"download_report_{fmt}",
+                use_container_width=True,
+                help=spec['help']
+            )
 
 def calculate_power_users(data, threshold_percentile=95):
     """Identify power users based on usage patterns."""
@@ -2017,100 +1624,78 @@ def get_user_message_breakdown(data, email, exclude_tool_messages=False):
     
     return breakdown
 
-def get_all_users_with_stats(data, search_query=None, page=1, per_page=20, exclude_tool_messages=True, sort_by="Total Messages (High to Low)"):
+def get_user_directory_filters(date_range, min_date, max_date, selected_depts, selected_tool, freq, exclude_partial):
     """
-    Get all users with their usage statistics, with optional search and pagination.
+    Translate the sidebar filters into DatabaseManager.query_user_stats() filter arguments.
+    
+    Filters that match the full dataset are dropped so the query can use the
+    precomputed user rollup. Partial period exclusion becomes an end date cutoff.
     
     Args:
-        data: DataFrame with usage data
-        search_query: Optional search string to filter by name, email, or department
-        page: Page number (1-indexed)
-        per_page: Number of results per page
-        exclude_tool_messages: If True, excludes Tool Messages from totals
-        sort_by: Sort order - "Total Messages (High to Low)", "Total Messages (Low to High)", 
-                "Name (A-Z)", or "Department (A-Z)"
-        
+        date_range: Value of the sidebar date_input
+        min_date: First date available in the database
+        max_date: Last date available in the database
+        selected_depts: Selected departments (empty for all)
+        selected_tool: Selected tool ('All Tools' for all)
+        freq: Analysis frequency label
+        exclude_partial: Whether the current in-progress period is excluded
+    
     Returns:
-        Dictionary with:
-        - 'users': DataFrame with paginated user statistics
-        - 'total_count': Total number of users matching filters
-        - 'total_pages': Total number of pages
-        - 'current_page': Current page number
+        dict: Keyword arguments for query_user_stats()
     """
-    if data.empty:
-        return {
-            'users': pd.DataFrame(),
-            'total_count': 0,
-            'total_pages': 0,
-            'current_page': page
-        }
+    start_date, end_date = (date_range if len(date_range) == 2 else (min_date, max_date))
     
-    # Group by email to get unique users
-    user_stats = data.groupby('email').agg({
-        'user_name': 'first',
-        'department': 'first',
-        'usage_count': 'sum',
-        'tool_source': lambda x: ', '.join(sorted(x.unique()))
-    }).reset_index()
-    
-    # Calculate message breakdowns for each user
-    user_stats['openai_messages'] = 0
-    user_stats['blueflame_messages'] = 0
-    user_stats['tool_messages'] = 0
-    
-    # Calculate message breakdowns for each user more efficiently
-    user_stats['openai_messages'] = 0
-    user_stats['blueflame_messages'] = 0
-    user_stats['tool_messages'] = 0
+    if exclude_partial:
+        today = pd.Timestamp.today().normalize()
+        if freq.startswith("Weekly"):
+            period_start = today - pd.to_timedelta(today.weekday(), 'D')
+        else:
+            period_start = today.to_period('M').start_time
+        cutoff = (period_start - pd.Timedelta(days=1)).date()
+        if end_date is not None and end_date > cutoff:
+            end_date = cutoff
+    
+    filters = {}
+    if (start_date, end_date) != (min_date, max_date):
+        filters['start_date'] = start_date
+        filters['end_date'] = end_date
+    if selected_depts:
+        filters['departments'] = selected_depts
+    if selected_tool != 'All Tools':
+        filters['tools'] = [selected_tool]
+    return filters
+
+def get_user_breakdown_from_stats(row, exclude_tool_messages=True):
+    """
+    Build a get_user_message_breakdown()-style dictionary from a query_user_stats() row.
     
-    # Use apply instead of iterrows for better performance
-    def calculate_breakdown(row):
-        breakdown = get_user_message_breakdown(data, row['email'], exclude_tool_messages=exclude_tool_messages)
-        return pd.Series({
-            'openai_messages': breakdown['totals']['openai_total_excl_tools'],
-            'blueflame_messages': breakdown['totals']['blueflame_total'],
-            'tool_messages': breakdown['openai']['Tool Messages'],
-            'total_messages': breakdown['totals']['grand_total']
-        })
+    Args:
+        row: One row of the 'users' DataFrame returned by query_user_stats()
+        exclude_tool_messages: If True, excludes Tool Messages from the grand total
     
-    # Apply breakdown calculation efficiently
-    breakdown_cols = user_stats.apply(calculate_breakdown, axis=1)
-    user_stats[['openai_messages', 'blueflame_messages', 'tool_messages', 'total_messages']] = breakdown_cols
-    
-    # Apply search filter if provided
-    if search_query and search_query.strip():
-        query_lower = search_query.lower().strip()
-        mask = (
-            user_stats['user_name'].str.lower().str.contains(query_lower, na=False) |
-            user_stats['email'].str.lower().str.contains(query_lower, na=False) |
-            user_stats['department'].str.lower().str.contains(query_lower, na=False)
-        )
-        user_stats = user_stats[mask]
-    
-    # Apply sorting based on sort_by parameter
-    if sort_by == "Total Messages (High to Low)":
-        user_stats = user_stats.sort_values('total_messages', ascending=False)
-    elif sort_by == "Total Messages (Low to High)":
-        user_stats = user_stats.sort_values('total_messages', ascending=True)
-    elif sort_by == "Name (A-Z)":
-        user_stats = user_stats.sort_values('user_name', ascending=True)
-    elif sort_by == "Department (A-Z)":
-        user_stats = user_stats.sort_values('department', ascending=True)
-    
-    # Calculate pagination
-    total_count = len(user_stats)
-    total_pages = (total_count + per_page - 1) // per_page if total_count > 0 else 0
-    
-    # Apply pagination
-    start_idx = (page - 1) * per_page
-    end_idx = start_idx + per_page
-    paginated_users = user_stats.iloc[start_idx:end_idx]
+    Returns:
+        Dictionary with breakdown by tool source and totals
+    """
+    openai_total_excl_tools = int(row['openai_messages'])
+    tool_messages = int(row['tool_messages'])
+    blueflame_total = int(row['blueflame_messages'])
     
     return {
-        'users': paginated_users,
-        'total_count': total_count,
-        'total_pages': total_pages,
-        'current_page': page
+        'openai': {
+            'ChatGPT Messages': int(row['chatgpt_messages']),
+            'GPT Messages': int(row['gpt_messages']),
+            'Tool Messages': tool_messages,
+            'Project Messages': int(row['project_messages'])
+        },
+        'blueflame': {
+            'BlueFlame Messages': blueflame_total
+        },
+        'totals': {
+            'openai_total': openai_total_excl_tools + tool_messages,
+            'blueflame_total': blueflame_total,
+            'grand_total': openai_total_excl_tools + blueflame_total + (0 if exclude_tool_messages else tool_messages),
+            'openai_total_excl_tools': openai_total_excl_tools
+        }
     }
 
 def get_department_message_breakdown(data, department):
@@ -2537,6 +2122,180 @@ def calculate_weekly_trends(data):
     
     return weekly
 
+def apply_frequency_normalization(data, freq, exclude_partial):
+    """
+    Normalize usage records to the selected reporting frequency.
+    
+    Monthly view prorates weekly OpenAI records by day into calendar months;
+    weekly view spreads monthly BlueFlame records evenly across ISO weeks.
+    Adds a 'period_start' column used by the trend charts.
+    
+    Args:
+        data: DataFrame of usage records
+        freq: Frequency label from the sidebar ("Monthly (default)" or "Weekly ...")
+        exclude_partial: If True, drops the current (incomplete) month or week
+    
+    Returns:
+        DataFrame normalized to the selected frequency
+    """
+    if not data.empty:
+        # Ensure date column is datetime
+        data['date'] = pd.to_datetime(data['date'], errors='coerce')
+        
+        if freq.startswith("Weekly"):
+            # Weekly view: normalize periods to ISO week starts
+            # For OpenAI data (already weekly), keep as-is
+            # For Blueflame data (monthly), allocate to weeks
+            
+            weekly_records = []
+            for _, row in data.iterrows():
+                if row['tool_source'] == 'BlueFlame AI':
+                    # Allocate monthly data to weeks (even-by-day allocation)
+                    month_start = pd.Timestamp(year=row['date'].year, month=row['date'].month, day=1)
+                    month_end = month_start + pd.DateOffset(months=1) - pd.Timedelta(days=1)
+                    
+                    # Get all ISO week starts within this month (use set for performance)
+                    current = month_start
+                    weeks_in_month = set()
+                    while current <= month_end:
+                        week_start = current - pd.to_timedelta(current.weekday(), 'D')
+                        weeks_in_month.add(week_start)
+                        current += pd.Timedelta(days=7)
+                    
+                    # Convert back to sorted list for iteration
+                    weeks_in_month = sorted(weeks_in_month)
+                    
+                    # Allocate usage evenly across weeks
+                    if weeks_in_month:
+                        usage_per_week = row['usage_count'] / len(weeks_in_month)
+                        cost_per_week = row['cost_usd'] / len(weeks_in_month)
+                        
+                        for week_start in weeks_in_month:
+                            weekly_row = row.copy()
+                            weekly_row['period_start'] = week_start
+                            weekly_row['usage_count'] = usage_per_week
+                            weekly_row['cost_usd'] = cost_per_week
+                            weekly_records.append(weekly_row)
+                else:
+                    # OpenAI data - already weekly, just ensure period_start is set to week start
+                    week_start = row['date'] - pd.to_timedelta(row['date'].weekday(), 'D')
+                    weekly_row = row.copy()
+                    weekly_row['period_start'] = week_start
+                    weekly_records.append(weekly_row)
+            
+            if weekly_records:
+                data = pd.DataFrame(weekly_records)
+                # Exclude partial current week if requested
+                if exclude_partial:
+                    today = pd.Timestamp.today().normalize()
+                    current_week_start = today - pd.to_timedelta(today.weekday(), 'D')
+                    data = data[data['period_start'] < current_week_start]
+        else:
+            # Monthly view: normalize periods to month starts
+            # For Blueflame data (already monthly), keep as-is
+            # For OpenAI data (weekly), prorate by day into calendar months
+            
+            monthly_records = []
+            for _, row in data.iterrows():
+                if row['tool_source'] in ['ChatGPT', 'OpenAI']:
+                    # OpenAI weekly data - prorate into calendar months
+                    # Get period_start, falling back to date column
+                    period_start = pd.to_datetime(row.get('period_start', row['date']), errors='coerce')
+                    if pd.isna(period_start):
+                        period_start = row['date']
+                    
+                    # Estimate period_end as 6 days after period_start (7 day week)
+                    period_end = period_start + pd.Timedelta(days=6)
+                    
+                    # Check if period spans multiple months
+                    if period_start.month != period_end.month:
+                        # Split across months
+                        # Calculate days in each month
+                        month1_end = pd.Timestamp(year=period_start.year, month=period_start.month, day=1) + pd.DateOffset(months=1) - pd.Timedelta(days=1)
+                        days_in_month1 = (month1_end - period_start).days + 1
+                        days_in_month2 = (period_end - month1_end).days
+                        total_days = days_in_month1 + days_in_month2
+                        
+                        # Month 1 portion
+                        month1_row = row.copy()
+                        month1_row['period_start'] = pd.Timestamp(year=period_start.year, month=period_start.month, day=1)
+                        month1_row['usage_count'] = row['usage_count'] * (days_in_month1 / total_days)
+                        month1_row['cost_usd'] = row['cost_usd'] * (days_in_month1 / total_days)
+                        monthly_records.append(month1_row)
+                        
+                        # Month 2 portion
+                        month2_row = row.copy()
+                        month2_row['period_start'] = pd.Timestamp(year=period_end.year, month=period_end.month, day=1)
+                        month2_row['usage_count'] = row['usage_count'] * (days_in_month2 / total_days)
+                        month2_row['cost_usd'] = row['cost_usd'] * (days_in_month2 / total_days)
+                        monthly_records.append(month2_row)
+                    else:
+                        # Entire period in same month
+                        monthly_row = row.copy()
+                        monthly_row['period_start'] = pd.Timestamp(year=period_start.year, month=period_start.month, day=1)
+                        monthly_records.append(monthly_row)
+                else:
+                    # Blueflame data - already monthly
+                    monthly_row = row.copy()
+                    monthly_row['period_start'] = pd.Timestamp(year=row['date'].year, month=row['date'].month, day=1)
+                    monthly_records.append(monthly_row)
+            
+            if monthly_records:
+                data = pd.DataFrame(monthly_records)
+                # Exclude partial current month if requested
+                if exclude_partial:
+                    today = pd.Timestamp.today().normalize()
+                    current_month_start = today.to_period('M').start_time
+                    data = data[data['period_start'] < current_month_start]
+    
+    return data
+
+def load_dashboard_data(date_range, departments, tool, freq, exclude_partial, dept_mappings):
+    """
+    Load the usage data for a filter selection and prepare it for the dashboard.
+    
+    Used by main() and, on a background thread, by the report prebuild after an
+    ingestion job, so a prebuilt report holds the same rows as the dashboard.
+    
+    Args:
+        date_range: Sidebar date range (start and end dates; anything else loads all dates)
+        departments: Selected departments (empty for all)
+        tool: Selected tool, or 'All Tools'
+        freq: Reporting frequency label
+        exclude_partial: Drop the current incomplete period
+        dept_mappings: Manual department mappings (email -> department)
+    
+    Returns:
+        DataFrame normalized to the selected frequency
+    """
+    with rerun_profiler.section('data load'):
+        if len(date_range) == 2:
+            start_date, end_date = date_range
+            data = db.get_filtered_data(
+                start_date=start_date,
+                end_date=end_date,
+                departments=departments if departments else None
+            )
+        else:
+            data = db.get_all_data()
+    
+    with rerun_profiler.section('department resolution'):
+        # Apply employee departments FIRST (authoritative source for employees)
+        # This ensures the employee master file drives all employee department tagging
+        data = apply_employee_departments(data)
+        
+        # Apply manual department mappings for non-employees (secondary/override)
+        data = apply_department_mappings(data, dept_mappings)
+    
+    # Apply tool filter
+    if tool != 'All Tools' and not data.empty:
+        data = data[data['tool_source'] == tool]
+    
+    # Apply frequency normalization and partial period filtering
+    with rerun_profiler.section('proration'):
+        data = apply_frequency_normalization(data, freq, exclude_partial)
+    return data
+
 def main():
     # Main header - professional title without emoji
     col1, col2 = st.columns([4, 1])
@@ -2582,7 +2341,7 @@ def main():
     ])
     
     # Sidebar
-    with st.sidebar:
+    with st.sidebar, rerun_profiler.section('sidebar'):
         st.header("🔧 Controls")
         
         # Enhanced file upload section
@@ -2722,152 +2481,37 @@ def main():
                                 
                 except Exception as e:
                     st.warning(f"Could not analyze file for superseding preview: {str(e)}")
-                    st.session_state['requires_confirmation'] = False
-            
-            # Process button with confirmation check
-            button_disabled = False
-            button_label = "🚀 Process Upload"
-            
-            if st.session_state.get('requires_confirmation', False):
-                if not st.session_state.get('upload_confirmed', False):
-                    button_label = "⚠️ Confirm and Process Upload"
-            
-            if st.button(button_label, type="primary", use_container_width=True):
-                # Check if confirmation is required
-                if st.session_state.get('requires_confirmation', False):
-                    if not st.session_state.get('upload_confirmed', False):
-                        # First click - set confirmation flag
-                        st.session_state['upload_confirmed'] = True
-                        st.warning("⚠️ Click 'Confirm and Process Upload' again to confirm data replacement")
-                        st.rerun()
-                        return
-                
-                # Reset confirmation flags
-                st.session_state['upload_confirmed'] = False
-                st.session_state['requires_confirmation'] = False
-                
-                # Initialize progress tracking
-                progress_bar = st.progress(0)
-                status_text = st.empty()
-                
-                try:
-                    # Step 1: Reading file
-                    status_text.text("📖 Reading file...")
-                    progress_bar.progress(20)
-                    
-                    df, read_error = read_file_robust(uploaded_file)
-                    
-                    if read_error:
-                        progress_bar.empty()
-                        status_text.empty()
-                        display_file_error(read_error)
-                        return
-                    
-                    if df is None or df.empty:
-                        progress_bar.empty()
-                        status_text.empty()
-                        st.error("❌ The uploaded file contains no data")
-                        return
-                    
-                    # Step 2: Detecting data source
-                    status_text.text("🔍 Detecting data source...")
-                    progress_bar.progress(40)
-                    
-                    if tool_type == 'Auto-Detect':
-                        detected_tool = detect_data_source(df)
-                        st.info(f"📡 Detected: **{detected_tool}**")
-                    else:
-                        detected_tool = tool_type.replace('OpenAI ', '')
-                    
-                    # Step 3: Normalizing data
-                    status_text.text("⚙️ Normalizing data structure...")
-                    progress_bar.progress(60)
-                    
-                    if 'ChatGPT' in detected_tool:
-                        normalized_df = normalize_openai_data(df, uploaded_file.name)
-                    elif 'BlueFlame' in detected_tool:
-                        normalized_df = normalize_blueflame_data(df, uploaded_file.name)
-                    else:
-                        progress_bar.empty()
-                        status_text.empty()
-                        st.error("❌ Unknown data format. Please select the correct tool.")
-                        return
-                    
-                    # Step 4: Storing in database
-                    status_text.text("💾 Storing in database...")
-                    progress_bar.progress(80)
-                    
-                    if not normalized_df.empty:
-                        success = processor.process_monthly_data(normalized_df, uploaded_file.name)
-                        
-                        progress_bar.progress(90)
-                        
-                        # Step 5: Validate - check for duplicates
-                        status_text.text("✅ Validating data...")
-                        duplicates_df = db.detect_duplicates()
-                        
-                        progress_bar.progress(100)
-                        
-                        if success:
-                            status_text.empty()
-                            progress_bar.empty()
-                            
-                            # Success message with details
-                            st.success(f"""
-                            ✅ **Upload Complete!**
-                            - Processed **{len(normalized_df)}** records
-                            - Source: **{detected_tool}**
-                            - File: {uploaded_file.name}
-                            """)
-                            
-                            # Show summary metrics
-                            col1, col2 = st.columns(2)
-                            with col1:
-                                user_count = normalized_df['email'].dropna().str.lower().nunique() if 'email' in normalized_df.columns else normalized_df['user_id'].nunique()
-                                st.metric("Users Found", user_count)
-                            with col2:
-                                st.metric("Total Usage", f"{normalized_df['usage_count'].sum():,}")
-                            
-                            # Show duplicate warning if any found
-                            if not duplicates_df.empty:
-                                st.warning(f"""
-                                ⚠️ **Duplicate Records Detected**
-                                
-                                Found {len(duplicates_df)} sets of duplicate records. 
-                                This may indicate an issue with the upload.
-                                """)
-                                with st.expander("View Duplicate Details"):
-                                    st.dataframe(duplicates_df)
-                            else:
-                                st.success("✅ No duplicate records detected")
-                            
-                            st.balloons()
-                            st.rerun()
-                        else:
-                            progress_bar.empty()
-                            status_text.empty()
-                            st.error("❌ Error storing data in database")
-                    else:
-                        progress_bar.empty()
-                        status_text.empty()
-                        st.error("❌ No data could be extracted from file")
-                        st.info("💡 Please verify your file format matches the selected tool type")
-                        
-                except Exception as e:
-                    progress_bar.empty()
-                    status_text.empty()
-                    st.error(f"❌ **Error processing file:** {str(e)}")
-                    
-                    # Provide helpful error context
-                    with st.expander("🔧 Troubleshooting Tips"):
-                        st.markdown("""
-                        **Common issues:**
-                        - Ensure your CSV/Excel file is not corrupted
-                        - Check that column names match the expected format
-                        - Verify the file contains the required data fields
-                        - Try selecting the tool type manually instead of Auto-Detect
-                        """)
-                    st.exception(e)
+                    st.session_state['requires_confirmation'] = False
+            
+            # Process button with confirmation check
+            button_disabled = False
+            button_label = "🚀 Process Upload"
+            
+            if st.session_state.get('requires_confirmation', False):
+                if not st.session_state.get('upload_confirmed', False):
+                    button_label = "⚠️ Confirm and Process Upload"
+            
+            if st.button(button_label, type="primary", use_container_width=True):
+                # Check if confirmation is required
+                if st.session_state.get('requires_confirmation', False):
+                    if not st.session_state.get('upload_confirmed', False):
+                        # First click - set confirmation flag
+                        st.session_state['upload_confirmed'] = True
+                        st.warning("⚠️ Click 'Confirm and Process Upload' again to confirm data replacement")
+                        st.rerun()
+                        return
+                
+                # Reset confirmation flags
+                st.session_state['upload_confirmed'] = False
+                st.session_state['requires_confirmation'] = False
+                
+                # Ingest in the background; progress is shown under Ingestion Jobs
+                job_id = job_queue.submit_upload(uploaded_file.name, uploaded_file.getvalue(), tool_type)
+                st.session_state.setdefault('ingestion_jobs', []).append(job_id)
+                st.info(f"⏳ **{uploaded_file.name}** queued for processing")
+        
+        # Status of uploads and files queued by this session
+        display_ingestion_jobs_panel()
         
         st.divider()
         
@@ -2881,6 +2525,7 @@ def main():
             # Show summary stats
             new_files = [f for f in detected_files if f['status'] in ['new', 'modified']]
             processed_files = [f for f in detected_files if f['status'] == 'processed']
+            duplicate_files = [f for f in detected_files if f['status'] == 'duplicate']
             
             col1, col2 = st.columns(2)
             with col1:
@@ -2892,6 +2537,7 @@ def main():
             col_btn1, col_btn2 = st.columns(2)
             with col_btn1:
                 if st.button("🔄 Refresh Files", use_container_width=True):
+                    scanner.clear_directory_cache()
                     st.rerun()
             
             with col_btn2:
@@ -2915,6 +2561,7 @@ def main():
             
             # Show new/unprocessed files
             if new_files:
+                active_jobs = job_queue.active_paths()
                 with st.expander(f"🆕 New Files ({len(new_files)})", expanded=True):
                     for file_info in new_files:
                         st.markdown(f"""
@@ -2922,62 +2569,31 @@ def main():
                         📁 Folder: {file_info['folder']} | 📊 {file_info['size_mb']} MB
                         """)
                         
-                        # Process button for individual file
-                        if st.button(f"▶️ Process", key=f"process_{file_info['path']}", use_container_width=True):
-                            with st.spinner(f"Processing {file_info['filename']}..."):
-                                success, message, records = process_auto_file(file_info, tool_type)
-                                
-                                if success:
-                                    st.success(f"✅ {message}")
-                                    st.rerun()
-                                else:
-                                    st.error(f"❌ {message}")
+                        # Process button for individual file (queued in the background)
+                        if file_info['path'] in active_jobs:
+                            st.caption(f"⏳ {active_jobs[file_info['path']]['status'].title()}...")
+                        elif st.button(f"▶️ Process", key=f"process_{file_info['path']}", use_container_width=True):
+                            submit_ingestion_jobs([file_info], tool_type)
+                            st.rerun()
                         
                         st.divider()
                 
                 # Batch process button for all new files
-                if len(new_files) > 1:
-                    if st.button(f"⚡ Process All {len(new_files)} New Files", type="primary", use_container_width=True):
-                        progress_bar = st.progress(0)
-                        status_text = st.empty()
-                        
-                        processed_count = 0
-                        total_records = 0
-                        errors = []
-                        
-                        for i, file_info in enumerate(new_files):
-                            status_text.text(f"Processing {file_info['filename']}...")
-                            progress_bar.progress((i + 1) / len(new_files))
-                            
-                            success, message, records = process_auto_file(file_info, tool_type)
-                            
-                            if success:
-                                processed_count += 1
-                                total_records += records
-                            else:
-                                errors.append(f"{file_info['filename']}: {message}")
-                        
-                        progress_bar.empty()
-                        status_text.empty()
-                        
-                        if processed_count > 0:
-                            st.success(f"""
-                            ✅ **Batch Processing Complete!**
-                            - Processed: {processed_count}/{len(new_files)} files
-                            - Total Records: {total_records:,}
-                            """)
-                            
-                            if errors:
-                                with st.expander(f"⚠️ {len(errors)} Errors"):
-                                    for error in errors:
-                                        st.error(error)
-                            
-                            st.balloons()
-                            st.rerun()
-                        else:
-                            st.error("❌ Failed to process any files")
-                            for error in errors:
-                                st.error(error)
+                pending_files = [f for f in new_files if f['path'] not in active_jobs]
+                if len(pending_files) > 1:
+                    if st.button(f"⚡ Process All {len(pending_files)} New Files", type="primary", use_container_width=True):
+                        submit_ingestion_jobs(pending_files, tool_type)
+                        st.rerun()
+            
+            # Show files whose content was already processed under another name or folder
+            if duplicate_files:
+                with st.expander(f"♻️ Duplicate Files ({len(duplicate_files)})"):
+                    st.caption("Identical content has already been processed from another path, so these files are skipped.")
+                    for file_info in duplicate_files:
+                        st.markdown(f"""
+                        **{file_info['filename']}**  
+                        📁 {file_info['folder']} | 📊 {file_info['size_mb']} MB | ♻️ Same content as `{file_info['duplicate_of']}`
+                        """)
             
             # Show processed files
             if processed_files:
@@ -3126,9 +2742,8 @@ def main():
             </div>
             """, unsafe_allow_html=True)
             
-            all_data = db.get_all_data()
-            if not all_data.empty and 'tool_source' in all_data.columns:
-                available_tools = list(all_data['tool_source'].unique())
+            available_tools = db.get_unique_tools()
+            if available_tools:
                 
                 # Create toggle buttons for providers
                 st.write("**Select Data Provider:**")
@@ -3144,10 +2759,10 @@ def main():
                 
                 # Show provider-specific stats
                 if selected_tool != 'All Tools':
-                    tool_data = all_data[all_data['tool_source'] == selected_tool]
-                    # Count unique emails to avoid over-counting users with multiple records
-                    unique_users = tool_data['email'].dropna().str.lower().nunique() if 'email' in tool_data.columns else tool_data['user_id'].nunique()
-                    st.info(f"📈 {selected_tool}: {unique_users} users, {len(tool_data):,} records")
+                    # Unique emails, to avoid over-counting users with multiple records
+                    tool_summary = db.get_usage_summary(tools=[selected_tool])
+                    st.info(f"📈 {selected_tool}: {tool_summary['total_users']} users, "
+                            f"{tool_summary['total_records']:,} records")
             else:
                 selected_tool = 'All Tools'
             
@@ -3190,139 +2805,17 @@ def main():
     # Load department mappings
     dept_mappings = load_department_mappings()
     
-    # Get filtered data with loading indicator
-    with st.spinner("📊 Loading data..."):
-        if len(date_range) == 2:
-            start_date, end_date = date_range
-            data = db.get_filtered_data(
-                start_date=start_date,
-                end_date=end_date,
-                departments=selected_depts if selected_depts else None
-            )
-        else:
-            data = db.get_all_data()
-    
-    # Apply employee departments FIRST (authoritative source for employees)
-    # This ensures the employee master file drives all employee department tagging
-    data = apply_employee_departments(data)
+    # The filters behind the dashboard data (also the key of its cached reports)
+    filters = dict(date_range=date_range, departments=selected_depts, tool=selected_tool,
+                   freq=freq, exclude_partial=exclude_partial, dept_mappings=dept_mappings)
+    # Read before the data, so reports are never cached under a newer version than their rows
+    data_version = db.get_data_version()
     
-    # Apply manual department mappings for non-employees (secondary/override)
-    data = apply_department_mappings(data, dept_mappings)
-    
-    # Apply tool filter
-    if selected_tool != 'All Tools' and not data.empty:
-        data = data[data['tool_source'] == selected_tool]
-    
-    # Apply frequency normalization and partial period filtering
-    if not data.empty:
-        # Ensure date column is datetime
-        data['date'] = pd.to_datetime(data['date'], errors='coerce')
-        
-        if freq.startswith("Weekly"):
-            # Weekly view: normalize periods to ISO week starts
-            # For OpenAI data (already weekly), keep as-is
-            # For Blueflame data (monthly), allocate to weeks
-            
-            weekly_records = []
-            for _, row in data.iterrows():
-                if row['tool_source'] == 'BlueFlame AI':
-                    # Allocate monthly data to weeks (even-by-day allocation)
-                    month_start = pd.Timestamp(year=row['date'].year, month=row['date'].month, day=1)
-                    month_end = month_start + pd.DateOffset(months=1) - pd.Timedelta(days=1)
-                    
-                    # Get all ISO week starts within this month (use set for performance)
-                    current = month_start
-                    weeks_in_month = set()
-                    while current <= month_end:
-                        week_start = current - pd.to_timedelta(current.weekday(), 'D')
-                        weeks_in_month.add(week_start)
-                        current += pd.Timedelta(days=7)
-                    
-                    # Convert back to sorted list for iteration
-                    weeks_in_month = sorted(weeks_in_month)
-                    
-                    # Allocate usage evenly across weeks
-                    if weeks_in_month:
-                        usage_per_week = row['usage_count'] / len(weeks_in_month)
-                        cost_per_week = row['cost_usd'] / len(weeks_in_month)
-                        
-                        for week_start in weeks_in_month:
-                            weekly_row = row.copy()
-                            weekly_row['period_start'] = week_start
-                            weekly_row['usage_count'] = usage_per_week
-                            weekly_row['cost_usd'] = cost_per_week
-                            weekly_records.append(weekly_row)
-                else:
-                    # OpenAI data - already weekly, just ensure period_start is set to week start
-                    week_start = row['date'] - pd.to_timedelta(row['date'].weekday(), 'D')
-                    weekly_row = row.copy()
-                    weekly_row['period_start'] = week_start
-                    weekly_records.append(weekly_row)
-            
-            if weekly_records:
-                data = pd.DataFrame(weekly_records)
-                # Exclude partial current week if requested
-                if exclude_partial:
-                    today = pd.Timestamp.today().normalize()
-                    current_week_start = today - pd.to_timedelta(today.weekday(), 'D')
-                    data = data[data['period_start'] < current_week_start]
-        else:
-            # Monthly view: normalize periods to month starts
-            # For Blueflame data (already monthly), keep as-is
-            # For OpenAI data (weekly), prorate by day into calendar months
-            
-            monthly_records = []
-            for _, row in data.iterrows():
-                if row['tool_source'] in ['ChatGPT', 'OpenAI']:
-                    # OpenAI weekly data - prorate into calendar months
-                    # Get period_start, falling back to date column
-                    period_start = pd.to_datetime(row.get('period_start', row['date']), errors='coerce')
-                    if pd.isna(period_start):
-                        period_start = row['date']
-                    
-                    # Estimate period_end as 6 days after period_start (7 day week)
-                    period_end = period_start + pd.Timedelta(days=6)
-                    
-                    # Check if period spans multiple months
-                    if period_start.month != period_end.month:
-                        # Split across months
-                        # Calculate days in each month
-                        month1_end = pd.Timestamp(year=period_start.year, month=period_start.month, day=1) + pd.DateOffset(months=1) - pd.Timedelta(days=1)
-                        days_in_month1 = (month1_end - period_start).days + 1
-                        days_in_month2 = (period_end - month1_end).days
-                        total_days = days_in_month1 + days_in_month2
-                        
-                        # Month 1 portion
-                        month1_row = row.copy()
-                        month1_row['period_start'] = pd.Timestamp(year=period_start.year, month=period_start.month, day=1)
-                        month1_row['usage_count'] = row['usage_count'] * (days_in_month1 / total_days)
-                        month1_row['cost_usd'] = row['cost_usd'] * (days_in_month1 / total_days)
-                        monthly_records.append(month1_row)
-                        
-                        # Month 2 portion
-                        month2_row = row.copy()
-                        month2_row['period_start'] = pd.Timestamp(year=period_end.year, month=period_end.month, day=1)
-                        month2_row['usage_count'] = row['usage_count'] * (days_in_month2 / total_days)
-                        month2_row['cost_usd'] = row['cost_usd'] * (days_in_month2 / total_days)
-                        monthly_records.append(month2_row)
-                    else:
-                        # Entire period in same month
-                        monthly_row = row.copy()
-                        monthly_row['period_start'] = pd.Timestamp(year=period_start.year, month=period_start.month, day=1)
-                        monthly_records.append(monthly_row)
-                else:
-                    # Blueflame data - already monthly
-                    monthly_row = row.copy()
-                    monthly_row['period_start'] = pd.Timestamp(year=row['date'].year, month=row['date'].month, day=1)
-                    monthly_records.append(monthly_row)
-            
-            if monthly_records:
-                data = pd.DataFrame(monthly_records)
-                # Exclude partial current month if requested
-                if exclude_partial:
-                    today = pd.Timestamp.today().normalize()
-                    current_month_start = today.to_period('M').start_time
-                    data = data[data['period_start'] < current_month_start]
+    # Load and prepare the dashboard data (profiled when MEMORY_PROFILE is set)
+    with profile_stage('data_prep', tool=selected_tool, frequency=freq) as prep, rerun_profiler.section('data prep'):
+        with st.spinner("📊 Loading data..."):
+            data = load_dashboard_data(**filters)
+        prep['rows'] = len(data)
     
     if data.empty:
         # Enhanced empty state for no filtered data
@@ -3349,7 +2842,7 @@ def main():
         return
     
     # TAB 1: Executive Overview
-    with tab1:
+    with tab1, rerun_profiler.section('tab: Executive Overview'):
         # Clean header without emoji, with compact export menu
         col1, col2 = st.columns([4, 1])
         with col1:
@@ -3358,33 +2851,8 @@ def main():
         with col2:
             # Compact export menu in dropdown
             with st.expander("📥 Export", expanded=False):
-                # PDF Export (HTML version)
-                try:
-                    html_content = generate_pdf_report_html(data, "AI Usage Executive Report")
-                    st.download_button(
-                        label="PDF Report",
-                        data=html_content,
-                        file_name=f"ai_usage_report_{datetime.now().strftime('%Y%m%d_%H%M')}.html",
-                        mime="text/html",
-                        use_container_width=True,
-                        help="Download as HTML (print to PDF from browser)"
-                    )
-                except Exception as e:
-                    st.error(f"Export error: {str(e)}")
-                
-                # Excel Export with pivot tables
-                try:
-                    excel_file = generate_excel_export(data, include_pivots=True)
-                    st.download_button(
-                        label="Excel Report",
-                        data=excel_file,
-                        file_name=f"ai_usage_report_{datetime.now().strftime('%Y%m%d_%H%M')}.xlsx",
-                        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                        use_container_width=True,
-                        help="Excel with pivot tables and summaries"
-                    )
-                except Exception as e:
-                    st.error(f"Export error: {str(e)}")
+                # Reports are built on request and cached for this data and filter selection
+                display_report_exports(data, data_version, filters)
         
         st.divider()
         
@@ -4546,7 +4014,7 @@ def main():
         st.divider()
     
     # TAB 2: Tool Comparison
-    with tab2:
+    with tab2, rerun_profiler.section('tab: Tool Comparison'):
         display_tool_comparison(data)
     
     # ============================================================================
@@ -5159,7 +4627,7 @@ def main():
     #                 st.info("Install openpyxl to enable Excel export: pip install openpyxl")
     # 
     # TAB 3: User Directory with Top N Leaderboard
-    with tab3:
+    with tab3, rerun_profiler.section('tab: User Directory'):
         st.header("👥 User Directory")
         
         # Help text
@@ -5359,7 +4827,8 @@ def main():
                         "Total Messages (High to Low)",
                         "Total Messages (Low to High)",
                         "Name (A-Z)",
-                        "Department (A-Z)"
+                        "Department (A-Z)",
+                        "Best Match"
                     ],
                     key="user_directory_sort"
                 )
@@ -5380,20 +4849,36 @@ def main():
                 st.write("")  # Spacing
                 st.write("")  # Spacing
             
-            # Get all users with stats (excluding Tool Messages from totals)
-            user_results = get_all_users_with_stats(
-                data, 
-                search_query=search_query, 
+            # Aggregation, search, sort and pagination all run in SQL (excluding Tool Messages from totals)
+            directory_filters = get_user_directory_filters(
+                date_range, min_date, max_date, selected_depts, selected_tool, freq, exclude_partial
+            )
+            
+            # Reset to the first page whenever the query itself changes
+            query_signature = (search_query, sort_by, per_page, repr(directory_filters))
+            if st.session_state.get('user_directory_query') != query_signature:
+                st.session_state.user_directory_query = query_signature
+                st.session_state.user_directory_page = 1
+                st.session_state.user_directory_cursors = {}
+            
+            # Cursors of already-visited pages allow keyset pagination for Next
+            directory_cursors = st.session_state.get('user_directory_cursors', {})
+            user_results = db.query_user_stats(
+                search=search_query,
+                sort_by=sort_by,
                 page=st.session_state.user_directory_page,
                 per_page=per_page,
                 exclude_tool_messages=True,
-                sort_by=sort_by
+                cursor=directory_cursors.get(st.session_state.user_directory_page - 1),
+                **directory_filters
             )
             
             users_df = user_results['users']
             total_count = user_results['total_count']
             total_pages = user_results['total_pages']
             current_page = user_results['current_page']
+            directory_cursors[current_page] = user_results['next_cursor']
+            st.session_state.user_directory_cursors = directory_cursors
             
             if not users_df.empty:
                 # Display results summary
@@ -5404,8 +4889,8 @@ def main():
                 
                 # Display user cards with detailed breakdowns
                 for idx, row in users_df.iterrows():
-                    # Get detailed message breakdown for this user
-                    breakdown = get_user_message_breakdown(data, row['email'], exclude_tool_messages=True)
+                    # Detailed message breakdown comes with the page query
+                    breakdown = get_user_breakdown_from_stats(row, exclude_tool_messages=True)
                     
                     # Create a card-like container for each user
                     st.markdown(f"""
@@ -5422,7 +4907,9 @@ def main():
                         st.write(f"**{display_name}**")
                         display_email = row['email'] if pd.notna(row['email']) and row['email'] else 'No email'
                         st.caption(display_email)
-                        display_dept = row['department'] if pd.notna(row['department']) and row['department'] else 'Unknown'
+                        # Manual department mappings still override the stored department
+                        display_dept = dept_mappings.get(row['email'], row['department'])
+                        display_dept = display_dept if pd.notna(display_dept) and display_dept else 'Unknown'
                         st.caption(f"🏢 {display_dept}")
                     
                     with col2:
@@ -5495,7 +4982,7 @@ def main():
                 """, unsafe_allow_html=True)
     
     # TAB 4: Message Type Analytics
-    with tab4:
+    with tab4, rerun_profiler.section('tab: Message Type Analytics'):
         st.header("📈 Message Type Analytics")
         
         st.markdown("""
@@ -6309,11 +5796,11 @@ def main():
     #             """, unsafe_allow_html=True)
     # 
     # TAB 5: Department Mapper
-    with tab5:
+    with tab5, rerun_profiler.section('tab: Department Mapper'):
         display_department_mapper()
     
     # TAB 6: Database Management
-    with tab6:
+    with tab6, rerun_profiler.section('tab: Database Management'):
         st.header("🔧 Database Management")
         
         st.markdown("""
@@ -6384,15 +5871,15 @@ def main():
                 st.caption("⚠️ Deleting an employee will remove them from the roster and optionally remove their usage data from all analytics.")
                 
                 # Add search filter for employees
-                search_emp = st.text_input("🔍 Search employees by name or email", "", key="employee_search")
+                search_emp = st.text_input("🔍 Search employees by name, email, or department", "", key="employee_search")
                 
-                # Filter employees if search is active
+                # Filter employees if search is active (prefix/token search, best matches first)
                 if search_emp:
-                    employees_filtered = employees_df[
-                        employees_df['first_name'].str.contains(search_emp, case=False, na=False) |
-                        employees_df['last_name'].str.contains(search_emp, case=False, na=False) |
-                        employees_df['email'].str.contains(search_emp, case=False, na=False)
-                    ]
+                    ranked_ids = db.get_search_index('employees').search(search_emp)
+                    listed = set(employees_df['employee_id'])
+                    employees_filtered = employees_df.set_index('employee_id').reindex(
+                        [emp_id for emp_id in ranked_ids if emp_id in listed]
+                    ).reset_index()
                 else:
                     employees_filtered = employees_df
                 
@@ -6462,7 +5949,7 @@ def main():
                                     if success:
                                         st.success(f"✅ {message}")
                                         st.session_state[confirm_key] = False
-                                        st.cache_resource.clear()  # Clear cache to refresh metrics
+                                        init_app.clear()  # Reopen the database and scanner to refresh metrics
                                         st.rerun()
                                     else:
                                         st.error(f"❌ {message}")
@@ -6551,7 +6038,7 @@ def main():
                         success, message = force_reload_employee_file()
                         if success:
                             st.success(message)
-                            st.cache_resource.clear()  # Clear cache
+                            init_app.clear()  # Reopen the database and scanner
                             st.rerun()
                         else:
                             st.error(message)
@@ -6612,6 +6099,39 @@ def main():
         
         st.divider()
         
+        # Uploads as ingestion batches, with rollback
+        st.markdown('<div class="section-header"><h3>↩️ Ingestion Batches</h3></div>', unsafe_allow_html=True)
+        st.markdown("""
+        <div class="help-tooltip">
+            💡 Every upload is stored as a batch. Rolling back a batch removes its records and restores the records it superseded
+        </div>
+        """, unsafe_allow_html=True)
+        display_ingestion_batches()
+        
+        st.divider()
+        
+        # Per-file ingestion stage timings
+        st.markdown('<div class="section-header"><h3>⏱️ Ingestion Timeline</h3></div>', unsafe_allow_html=True)
+        st.markdown("""
+        <div class="help-tooltip">
+            💡 Time spent in each stage (read, encoding detection, parsing, source detection, normalization, superseding, insert, commit) for every ingested file
+        </div>
+        """, unsafe_allow_html=True)
+        display_ingestion_timeline()
+        
+        st.divider()
+        
+        # Slowest statements issued by DatabaseManager/DataProcessor
+        st.markdown('<div class="section-header"><h3>🐢 Slow Queries</h3></div>', unsafe_allow_html=True)
+        st.markdown("""
+        <div class="help-tooltip">
+            💡 The slowest SQL statements since the app started, with the method that issued them. Plans marked as a full scan read every row of a table and may need an index
+        </div>
+        """, unsafe_allow_html=True)
+        display_slow_queries()
+        
+        st.divider()
+        
         # Database actions with better UX
         st.markdown('<div class="section-header"><h3>⚙️ Database Actions</h3></div>', unsafe_allow_html=True)
         
@@ -6619,24 +6139,40 @@ def main():
         
         with col1:
             st.write("**Export Data**")
-            all_data = db.get_all_data()
-            if not all_data.empty:
-                csv = all_data.to_csv(index=False)
-                st.download_button(
-                    "📥 Download CSV",
-                    csv,
-                    f"ai_usage_export_{datetime.now().strftime('%Y%m%d')}.csv",
-                    "text/csv",
-                    use_container_width=True,
-                    help="Download all data as CSV for external analysis"
+            if db_info['total_stats']['total_records'] > 0:
+                export_format = st.selectbox(
+                    "Export format",
+                    data_export.available_formats(),
+                    format_func=lambda fmt: data_export.EXPORT_FORMATS[fmt]['label'],
+                    key="export_format",
+                    label_visibility="collapsed"
                 )
+                # The file is written only when asked for, then reused until the data changes
+                export_file = data_export.get_cached_export(db, export_format)
+                if export_file is None and st.button("📦 Prepare Export", use_container_width=True,
+                                                      help="Write all data to a file for download"):
+                    with st.spinner("Writing export..."):
+                        try:
+                            export_file = data_export.build_export(db, export_format)
+                        except Exception as e:
+                            st.error(f"Export failed: {e}")
+                if export_file is not None:
+                    with open(export_file, 'rb') as f:
+                        st.download_button(
+                            f"📥 Download {data_export.EXPORT_FORMATS[export_format]['label']}",
+                            f,
+                            data_export.download_name(export_format),
+                            data_export.EXPORT_FORMATS[export_format]['mime'],
+                            use_container_width=True,
+                            help="Download all data for external analysis"
+                        )
             else:
                 st.button("📥 Download CSV", disabled=True, use_container_width=True)
         
         with col2:
             st.write("**Refresh Data**")
             if st.button("🔄 Refresh Dashboard", type="secondary", use_container_width=True):
-                st.cache_resource.clear()
+                init_app.clear()
                 st.success("Cache cleared!")
                 st.rerun()
         
@@ -6663,7 +6199,7 @@ def main():
                         
                         if success:
                             st.success(message)
-                            st.cache_resource.clear()
+                            init_app.clear()
                             st.rerun()
                         else:
                             st.warning(message)
@@ -6690,45 +6226,28 @@ def main():
             """)
 
 def get_database_info():
-    """Get database information."""
-    all_data = db.get_all_data()
+    """Get database information (aggregated in SQL by get_usage_summary)."""
+    summary = db.get_usage_summary()
     
-    if all_data.empty:
+    if summary['total_records'] == 0:
         return {
             'total_stats': {'total_records': 0, 'total_users': 0, 'total_days': 0, 'total_cost': 0.0},
             'upload_history': [],
             'date_coverage': pd.DataFrame()
         }
     
-    total_cost = all_data['cost_usd'].sum() if 'cost_usd' in all_data.columns else 0.0
-    
-    # Calculate total days with robust date handling
-    try:
-        valid_dates = pd.to_datetime(all_data['date'], errors='coerce').dropna()
-        if len(valid_dates) > 0:
-            total_days = (valid_dates.max() - valid_dates.min()).days + 1
-        else:
-            total_days = 0
-    except Exception:
-        total_days = 0
-    
+    min_date, max_date = summary['min_date'], summary['max_date']
     total_stats = {
-        'total_records': len(all_data),
-        # Count unique emails to avoid over-counting users with multiple records
-        'total_users': all_data['email'].dropna().str.lower().nunique() if 'email' in all_data.columns else all_data['user_id'].nunique(),
-        'total_days': total_days,
-        'total_cost': float(total_cost)
+        'total_records': summary['total_records'],
+        'total_users': summary['total_users'],
+        'total_days': (max_date - min_date).days + 1 if min_date is not None else 0,
+        'total_cost': summary['total_cost']
     }
     
-    upload_history = []
-    if 'file_source' in all_data.columns:
-        for filename in all_data['file_source'].unique():
-            file_data = all_data[all_data['file_source'] == filename]
-            upload_history.append({
-                'filename': filename,
-                'date_range': f"{file_data['date'].min()} to {file_data['date'].max()}",
-                'records': len(file_data)
-            })
+    upload_history = [
+        {'filename': filename, 'date_range': f"{first} to {last}", 'records': int(records)}
+        for filename, first, last, records in summary['files']
+    ]
     
     return {
         'total_stats': total_stats,
@@ -6736,5 +6255,192 @@ def get_database_info():
         'date_coverage': pd.DataFrame()
     }
 
+def display_ingestion_timeline():
+    """Show recorded ingestion runs and a per-stage timeline for a selected file."""
+    runs = db.get_ingestion_runs(limit=500)
+    
+    if runs.empty:
+        st.info("No ingestion runs recorded yet. Stage timings are captured for every upload and auto-processed file.")
+        return
+    
+    # Latest run per file (runs are ordered newest first)
+    latest = runs.drop_duplicates('filename').copy()
+    latest['Runs'] = latest['filename'].map(runs['filename'].value_counts())
+    latest['Slowest Stage'] = latest['spans'].apply(
+        lambda spans: max(spans, key=lambda entry: entry['duration_ms'])['stage'] if spans else ''
+    )
+    summary = pd.DataFrame({
+        'File': latest['filename'],
+        'Tool': latest['tool_source'],
+        'Status': latest['status'],
+        'Rows': latest['rows'],
+        'Size (MB)': (latest['file_bytes'].fillna(0) / (1024 * 1024)).round(2),
+        'Total (s)': (latest['total_ms'] / 1000).round(2),
+        'Slowest Stage': latest['Slowest Stage'],
+        'Runs': latest['Runs'],
+        'Last Run': latest['started_at']
+    }).sort_values('Total (s)', ascending=False)
+    st.dataframe(summary, use_container_width=True, hide_index=True)
+    
+    selected_file = st.selectbox("Inspect file", summary['File'].tolist(), key="ingestion_timeline_file")
+    file_runs = runs[runs['filename'] == selected_file].reset_index(drop=True)
+    run_labels = [
+        f"{row['started_at']} · {row['total_ms'] / 1000:.2f}s · {row['status']} · {(row['content_hash'] or '')[:8]}"
+        for _, row in file_runs.iterrows()
+    ]
+    run_index = st.selectbox("Run", range(len(file_runs)), format_func=lambda i: run_labels[i],
+                             key="ingestion_timeline_run")
+    run = file_runs.iloc[run_index]
+    spans = pd.DataFrame(run['spans'])
+    
+    if spans.empty:
+        st.info("This run recorded no stages.")
+        return
+    
+    spans['label'] = spans.apply(
+        lambda row: ' · '.join(
+            part for part in [
+                f"{row['duration_ms']:.0f} ms",
+                f"{int(row['rows']):,} rows" if pd.notna(row.get('rows')) else '',
+                f"{row['bytes'] / (1024 * 1024):.1f} MB" if pd.notna(row.get('bytes')) else ''
+            ] if part
+        ),
+        axis=1
+    )
+    
+    # Gantt-style bars: each stage starts at its offset from the beginning of the run
+    fig = go.Figure(go.Bar(
+        y=spans['stage'],
+        x=spans['duration_ms'],
+        base=spans['start_ms'],
+        orientation='h',
+        text=spans['label'],
+        textposition='auto',
+        marker_color=['#e74c3c' if entry.get('error') else '#3498db' for entry in run['spans']],
+        hovertemplate='%{y}<br>start %{base:.0f} ms<br>%{text}<extra></extra>'
+    ))
+    fig.update_layout(
+        height=max(250, 45 * len(spans)),
+        xaxis_title="Milliseconds since start of run",
+        yaxis=dict(autorange='reversed'),
+        margin=dict(l=10, r=10, t=30, b=10),
+        title=f"{selected_file} — {run['total_ms'] / 1000:.2f}s total"
+    )
+    st.plotly_chart(fig, use_container_width=True)
+    
+    if run['message']:
+        st.caption(run['message'])
+    
+    # Stage durations across runs of this file (e.g. a re-upload that got slower)
+    if len(file_runs) > 1:
+        history = pd.DataFrame([
+            {'Run': row['started_at'], 'Stage': entry['stage'], 'ms': entry['duration_ms']}
+            for _, row in file_runs.iterrows() for entry in row['spans']
+        ])
+        pivot = history.pivot_table(index='Stage', columns='Run', values='ms', aggfunc='sum').round(1)
+        with st.expander(f"Stage durations across {len(file_runs)} runs (ms)"):
+            st.dataframe(pivot, use_container_width=True)
+
+def display_ingestion_batches():
+    """Show recent ingestion batches and roll one back."""
+    batches = db.get_ingestion_batches(limit=100)
+    
+    if batches.empty:
+        st.info("No ingestion batches recorded yet.")
+        return
+    
+    table = pd.DataFrame({
+        'Batch': batches['batch_id'],
+        'File': batches['filename'],
+        'Tool': batches['tool_source'],
+        'Inserted': batches['rows_inserted'],
+        'Superseded': batches['rows_superseded'],
+        'Status': batches['status'].str.replace('_', ' '),
+        'Loaded': batches['created_at']
+    })
+    st.dataframe(table, use_container_width=True, hide_index=True)
+    
+    active = batches[batches['status'] == 'active']
+    if active.empty:
+        return
+    
+    labels = {row['batch_id']: f"#{row['batch_id']} · {row['filename']} · {row['created_at']}"
+              for _, row in active.iterrows()}
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        batch_id = st.selectbox("Batch", list(labels), format_func=labels.get, key="rollback_batch_id")
+    with col2:
+        st.write("")
+        if st.button("↩️ Roll Back", use_container_width=True, key="rollback_batch"):
+            if st.session_state.get('confirm_rollback') == batch_id:
+                success, message = db.rollback_batch(int(batch_id))
+                st.session_state.confirm_rollback = None
+                if success:
+                    st.success(f"✅ {message}")
+                    st.rerun()
+                else:
+                    st.error(f"❌ {message}")
+            else:
+                st.session_state.confirm_rollback = batch_id
+    
+    if st.session_state.get('confirm_rollback') == batch_id:
+        st.warning(f"⚠️ Click Roll Back again to undo {labels[batch_id]}")
+
+def display_slow_queries():
+    """Show the slowest SQL statements recorded since startup, with their query plans."""
+    settings = db.get_slow_query_settings()
+    
+    col1, col2, col3 = st.columns([2, 2, 1])
+    with col1:
+        threshold = st.number_input(
+            "Capture query plans above (ms)",
+            min_value=-1.0,
+            value=float(settings['explain_threshold_ms']) if settings['explain_threshold_ms'] is not None else -1.0,
+            step=10.0,
+            help="EXPLAIN QUERY PLAN is captured for logged statements slower than this; -1 turns capture off",
+            key="slow_query_explain_ms"
+        )
+    with col2:
+        capacity = st.number_input(
+            "Statements kept",
+            min_value=1,
+            value=int(settings['capacity']),
+            step=10,
+            key="slow_query_capacity"
+        )
+    with col3:
+        st.write("")
+        if st.button("🧹 Clear", use_container_width=True, key="slow_query_clear"):
+            db.clear_slow_queries()
+    
+    current_threshold = settings['explain_threshold_ms'] if settings['explain_threshold_ms'] is not None else -1.0
+    if threshold != current_threshold or capacity != settings['capacity']:
+        db.configure_slow_query_log(capacity=capacity, explain_threshold_ms=threshold)
+    
+    slow = db.get_slow_queries()
+    if slow.empty:
+        st.info("No statements recorded yet.")
+        return
+    
+    st.caption(f"Slowest {len(slow)} of {db.get_slow_query_settings()['statements_seen']:,} statements since startup")
+    table = pd.DataFrame({
+        'ms': slow['duration_ms'],
+        'Rows': slow['rows'],
+        'Caller': slow['caller'],
+        'Full Scan': slow['full_scan'].map({True: '⚠️ yes', False: 'no'}).fillna(''),
+        'SQL': slow['sql'].str.split().str.join(' ').str.slice(0, 120),
+        'At': slow['recorded_at']
+    })
+    st.dataframe(table, use_container_width=True, hide_index=True)
+    
+    with_plans = slow[slow['plan'].notna()]
+    if not with_plans.empty:
+        with st.expander(f"Query plans ({len(with_plans)})"):
+            for _, row in with_plans.iterrows():
+                st.markdown(f"**{row['caller'] or 'unknown caller'}** · {row['duration_ms']:.1f} ms")
+                st.code(' '.join(row['sql'].split()) + '\n\n' + '\n'.join(row['plan']), language='sql')
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    # Opt-in rerun profiling (?profile=1 or RERUN_PROFILE=1); a no-op otherwise
+    with rerun_profiler.profile_rerun():
+        main()
\ No newline at end of file
@@ -0,0 +1,198 @@
+"""
+Startup import-time benchmark for app.py
+
+Streamlit re-executes app.py on every rerun, so module-level imports are paid
+once per process (cold start) and then looked up in sys.modules on each rerun.
+This script measures both without starting Streamlit or touching the database:
+it extracts the top-level import statements of app.py and times them.
+
+- Cold start: each run is a fresh interpreter started with `-X importtime`;
+  the slowest modules (by cumulative time) are reported from the last run.
+- Rerun: the import block is executed repeatedly in one warm interpreter.
+
+Usage:
+    python benchmarks/import_time.py
+    python benchmarks/import_time.py --runs 5 --top 30 --json import_time.json
+    python benchmarks/import_time.py --max-cold-ms 2500   # exit 1 if slower
+"""
+
+import argparse
+import ast
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+APP_PATH = os.path.join(REPO_ROOT, 'app.py')
+
+
+def get_import_block(path=APP_PATH):
+    """
+    Extract the module-level import statements of a Python file.
+    
+    Args:
+        path: Path to the Python source file
+    
+    Returns:
+        str: Source code containing only the top-level imports
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        tree = ast.parse(f.read(), filename=path)
+    
+    imports = [node for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom))]
+    return '\n'.join(ast.unparse(node) for node in imports)
+
+
+def parse_importtime(stderr):
+    """
+    Parse `-X importtime` output.
+    
+    Args:
+        stderr: Text written to stderr by the interpreter
+    
+    Returns:
+        List of dicts with module, self_us and cumulative_us
+    """
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        # "import time:       123 |        456 |   package.module"
+        try:
+            self_us, cumulative_us, module = line.split(':', 1)[1].split('|', 2)
+            entries.append({
+                'module': module[1:].rstrip(),
+                'self_us': int(self_us),
+                'cumulative_us': int(cumulative_us)
+            })
+        except ValueError:
+            continue
+    return entries
+
+
+def measure_cold_start(import_block, runs=3):
+    """
+    Time the import block in fresh interpreters.
+    
+    Args:
+        import_block: Source code to execute
+        runs: Number of interpreter launches
+    
+    Returns:
+        tuple: (list of wall times in ms, importtime entries of the last run)
+    """
+    timings = []
+    entries = []
+    code = f"import time\n_start = time.perf_counter()\n{import_block}\nprint((time.perf_counter() - _start) * 1000)"
+    
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', code],
+            cwd=REPO_ROOT, capture_output=True, text=True
+        )
+        if result.returncode != 0:
+            raise RuntimeError(f"Import block failed:\n{result.stderr[-2000:]}")
+        timings.append(float(result.stdout.strip().splitlines()[-1]))
+        entries = parse_importtime(result.stderr)
+    
+    return timings, entries
+
+
+def measure_rerun(import_block, runs=50):
+    """
+    Time the import block when every module is already loaded (Streamlit rerun).
+    
+    Args:
+        import_block: Source code to execute
+        runs: Number of repetitions
+    
+    Returns:
+        list: Wall times in ms
+    """
+    sys.path.insert(0, REPO_ROOT)
+    compiled = compile(import_block, APP_PATH, 'exec')
+    exec(compiled, {})  # Warm up sys.modules
+    
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        exec(compiled, {})
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def top_level_packages(entries):
+    """
+    Cumulative time of each package imported directly by the measured code.
+    
+    Args:
+        entries: Parsed importtime entries
+    
+    Returns:
+        List of (package, cumulative_us) sorted slowest first
+    """
+    totals = {}
+    for entry in entries:
+        # Nested imports are indented; a package's own line carries its full cumulative time
+        name = entry['module']
+        if name.startswith(' ' * 3) or '.' in name:
+            continue
+        totals[name.strip()] = entry['cumulative_us']
+    return sorted(totals.items(), key=lambda item: item[1], reverse=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure app.py cold-start and rerun import time")
+    parser.add_argument('--runs', type=int, default=3, help="Cold-start interpreter launches (default: 3)")
+    parser.add_argument('--rerun-runs', type=int, default=50, help="Warm repetitions (default: 50)")
+    parser.add_argument('--top', type=int, default=20, help="Slowest modules to list (default: 20)")
+    parser.add_argument('--json', dest='json_path', help="Write results to this JSON file")
+    parser.add_argument('--max-cold-ms', type=float, help="Fail if the median cold start exceeds this")
+    args = parser.parse_args()
+    
+    import_block = get_import_block()
+    cold_ms, entries = measure_cold_start(import_block, runs=args.runs)
+    rerun_ms = measure_rerun(import_block, runs=args.rerun_runs)
+    
+    cold_median = statistics.median(cold_ms)
+    rerun_median = statistics.median(rerun_ms)
+    slowest = sorted(entries, key=lambda e: e['cumulative_us'], reverse=True)[:args.top]
+    packages = top_level_packages(entries)
+    
+    print(f"app.py imports: {len(import_block.splitlines())} statements")
+    print(f"Cold start: median {cold_median:.1f} ms over {len(cold_ms)} run(s) "
+          f"(min {min(cold_ms):.1f}, max {max(cold_ms):.1f})")
+    print(f"Rerun:      median {rerun_median * 1000:.1f} us over {len(rerun_ms)} run(s)")
+    
+    print("\nCumulative time by top-level package:")
+    for package, cumulative_us in packages[:args.top]:
+        print(f"  {cumulative_us / 1000:9.1f} ms  {package}")
+    
+    print(f"\nSlowest {len(slowest)} modules (-X importtime, cumulative):")
+    for entry in slowest:
+        print(f"  {entry['cumulative_us'] / 1000:9.1f} ms  (self {entry['self_us'] / 1000:6.1f} ms)  {entry['module'].strip()}")
+    
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump({
+                'timestamp': datetime.now().isoformat(),
+                'python': sys.version.split()[0],
+                'cold_start_ms': cold_ms,
+                'cold_start_median_ms': cold_median,
+                'rerun_median_ms': rerun_median,
+                'packages_ms': {package: cumulative_us / 1000 for package, cumulative_us in packages},
+                'slowest_modules': slowest
+            }, f, indent=2)
+        print(f"\nResults written to {args.json_path}")
+    
+    if args.max_cold_ms is not None and cold_median > args.max_cold_ms:
+        print(f"\nFAIL: median cold start {cold_median:.1f} ms exceeds budget {args.max_cold_ms:.1f} ms")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,167 @@
+"""
+Memory profile of the ingestion and dashboard data-prep stages
+
+Runs each input file through the same stages as an upload - read_file_robust,
+source detection and normalization, process_monthly_data - followed by the
+dashboard data preparation, with memory_profiling.MemoryProfiler around every
+stage. Peak traced memory, RSS and the top allocation sites are printed and
+written to JSON.
+
+Usage:
+    python benchmarks/memory_profile.py fixtures/scale
+    python benchmarks/memory_profile.py report.csv --json memory.json --top 15
+    python benchmarks/memory_profile.py benchmarks/.fixtures/medium-seed42 --frequency Weekly
+
+Directories are searched recursively for CSV/Excel exports; an Employee
+Headcount file found there is loaded first. The database is a temporary copy
+unless --db is given.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, REPO_ROOT)
+sys.path.insert(0, BENCH_DIR)
+
+from memory_profiling import MemoryProfiler, format_bytes  # noqa: E402
+from perf_suite import NamedBytesIO, quiet, load_headcount, import_app  # noqa: E402
+
+SUPPORTED_EXTENSIONS = ('.csv', '.xlsx', '.xls')
+
+
+def collect_files(paths):
+    """
+    Expand files and directories into (usage files, headcount files).
+    
+    Args:
+        paths: File or directory paths
+    
+    Returns:
+        tuple: (sorted usage file paths, sorted headcount file paths)
+    """
+    found = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                found.extend(os.path.join(root, name) for name in names if name.lower().endswith(SUPPORTED_EXTENSIONS))
+        else:
+            found.append(path)
+    
+    headcount = sorted(path for path in found if os.path.basename(path).startswith('Employee Headcount'))
+    usage = sorted(path for path in found if path not in headcount)
+    return usage, headcount
+
+
+def profile_file(app, profiler, path):
+    """Run one file through read, normalize and ingest stages."""
+    filename = os.path.basename(path)
+    with open(path, 'rb') as f:
+        uploaded = NamedBytesIO(f.read(), filename)
+    
+    with profiler.stage('read_file', file=filename, file_bytes=os.path.getsize(path)):
+        df, error = app.read_file_robust(uploaded)
+    if error or df is None or df.empty:
+        print(f"Skipping {filename}: {error or 'no data'}")
+        return
+    
+    detected_tool = app.detect_data_source(df)
+    with profiler.stage('normalize', file=filename, tool=detected_tool, input_rows=len(df)):
+        if 'ChatGPT' in detected_tool:
+            normalized = app.normalize_openai_data(df, filename)
+        elif 'BlueFlame' in detected_tool:
+            normalized = app.normalize_blueflame_data(df, filename)
+        else:
+            normalized = None
+    if normalized is None or normalized.empty:
+        print(f"Skipping {filename}: unrecognized format ({detected_tool})")
+        return
+    
+    del df
+    with profiler.stage('process_monthly_data', file=filename, rows=len(normalized)):
+        with quiet():
+            app.processor.process_monthly_data(normalized, filename)
+
+
+def profile_data_prep(app, profiler, frequency):
+    """Load all data and apply the dashboard's department and frequency preparation."""
+    with profiler.stage('data_prep', frequency=frequency) as context:
+        data = app.db.get_all_data()
+        data = app.apply_employee_departments(data)
+        data = app.apply_department_mappings(data, app.load_department_mappings())
+        data = app.apply_frequency_normalization(data, frequency, False)
+        context['rows'] = len(data)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Profile memory of ingestion and data-prep stages")
+    parser.add_argument('paths', nargs='+', help="Export files or directories of exports")
+    parser.add_argument('--db', help="Database to ingest into (default: a temporary database)")
+    parser.add_argument('--json', dest='json_path', default='memory_profile.json',
+                        help="Output JSON file (default: memory_profile.json)")
+    parser.add_argument('--top', type=int, default=10, help="Allocation sites per stage (default: 10)")
+    parser.add_argument('--frequency', default='Monthly (default)',
+                        choices=['Monthly (default)', 'Weekly', 'Daily'], help="Data-prep frequency")
+    args = parser.parse_args()
+    
+    usage_files, headcount_files = collect_files(args.paths)
+    if not usage_files:
+        print("No export files found")
+        return 1
+    
+    from database import DatabaseManager
+    from data_processor import DataProcessor
+    
+    work_dir = tempfile.mkdtemp(prefix='memory-profile-')
+    try:
+        db_path = os.path.join(work_dir, 'openai_metrics.db')
+        if args.db:
+            shutil.copyfile(args.db, db_path)
+        with quiet():
+            db = DatabaseManager(db_path)
+            if headcount_files:
+                load_headcount(db, headcount_files[-1])
+        app = import_app(work_dir)
+        app.db = db
+        app.processor = DataProcessor(db)
+        
+        profiler = MemoryProfiler(top_n=args.top)
+        for path in usage_files:
+            profile_file(app, profiler, path)
+        profile_data_prep(app, profiler, args.frequency)
+        
+        if args.db:
+            shutil.copyfile(db_path, args.db)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    
+    summary = profiler.summary()
+    print(f"\nPeak memory by stage ({len(usage_files)} file(s)):")
+    for entry in summary:
+        print(f"  {entry['stage']:<22} traced peak {format_bytes(entry['traced_peak_bytes']):>10}  "
+              f"RSS peak {format_bytes(entry['rss_peak_bytes']):>10}  ({entry['calls']} call(s))")
+    
+    worst = max(profiler.records, key=lambda record: record['traced_peak_bytes'])
+    print(f"\nTop allocation sites of the largest stage ({worst['stage']} {worst.get('file', '')}):")
+    for site in worst['top_allocations']:
+        print(f"  {format_bytes(site['size_diff_bytes']):>10}  {site['site']}  {site['code'][:60]}")
+    
+    with open(args.json_path, 'w') as f:
+        json.dump({
+            'timestamp': datetime.now().isoformat(),
+            'files': usage_files,
+            'summary': summary,
+            'stages': profiler.records
+        }, f, indent=2, default=str)
+    print(f"\nResults written to {args.json_path}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,466 @@
+"""
+End-to-end performance benchmarks with regression budgets
+
+Times the dashboard's hot paths against generated fixtures (see
+generate_sample_data.py) of several sizes, appends the results to a JSON
+history, and compares the latest run with an earlier one.
+
+Usage:
+    python benchmarks/perf_suite.py run                      # small + medium
+    python benchmarks/perf_suite.py run --sizes large --repeat 1
+    python benchmarks/perf_suite.py run --only normalize_openai_data,get_top_n_users
+    python benchmarks/perf_suite.py compare                  # latest vs previous run
+    python benchmarks/perf_suite.py compare --baseline best  # latest vs fastest recorded
+    python benchmarks/perf_suite.py list
+
+`compare` exits with status 1 when a benchmark's median time grows beyond its
+budget in benchmarks/budgets.json, so it can gate CI.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import pandas as pd
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, REPO_ROOT)
+
+from generate_sample_data import write_scale_fixtures  # noqa: E402
+
+FIXTURE_DIR = os.path.join(BENCH_DIR, '.fixtures')
+DEFAULT_HISTORY = os.path.join(BENCH_DIR, 'history.json')
+DEFAULT_BUDGETS = os.path.join(BENCH_DIR, 'budgets.json')
+
+# Fixture sizes: users x months of OpenAI monthly reports plus BlueFlame exports
+SIZES = {
+    'small': {'users': 500, 'months': 3},
+    'medium': {'users': 2000, 'months': 12},
+    'large': {'users': 10000, 'months': 24},
+}
+
+
+class NamedBytesIO(io.BytesIO):
+    """In-memory stand-in for a Streamlit UploadedFile."""
+    
+    def __init__(self, data, name):
+        super().__init__(data)
+        self.name = name
+
+
+@contextlib.contextmanager
+def quiet():
+    """Silence the print-based progress output of the code under test."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+def get_fixtures(size, seed):
+    """
+    Generate (or reuse) fixture files for a size.
+    
+    Args:
+        size: Key of SIZES
+        seed: Generator seed
+    
+    Returns:
+        str: Fixture directory
+    """
+    spec = SIZES[size]
+    path = os.path.join(FIXTURE_DIR, f"{size}-seed{seed}")
+    marker = os.path.join(path, '.complete')
+    if not os.path.exists(marker):
+        shutil.rmtree(path, ignore_errors=True)
+        print(f"Generating {size} fixtures ({spec['users']} users x {spec['months']} months)...")
+        write_scale_fixtures(path, n_users=spec['users'], months=spec['months'], seed=seed)
+        with open(marker, 'w') as f:
+            f.write(datetime.now().isoformat())
+    return path
+
+
+def list_files(folder):
+    """Sorted CSV paths in a folder."""
+    return sorted(os.path.join(folder, name) for name in os.listdir(folder) if name.endswith('.csv'))
+
+
+def load_headcount(db, path):
+    """Load an Employee Headcount export (as written by generate_sample_data.py) into a database."""
+    employees = pd.read_csv(path)
+    db.load_employees(pd.DataFrame({
+        'first_name': employees['First Name'],
+        'last_name': employees['Last Name'],
+        'email': employees['Email'],
+        'title': employees['Title'],
+        'department': employees['Function'],
+        'status': employees['Status']
+    }))
+
+
+def import_app(work_dir):
+    """
+    Import app.py without starting Streamlit.
+    
+    app.py runs init_app() at import against openai_metrics.db in the working
+    directory; when that database already has employees, the repository's
+    employee auto-load is skipped.
+    
+    Args:
+        work_dir: Directory holding the openai_metrics.db to open
+    
+    Returns:
+        module: The imported app module
+    """
+    previous_cwd = os.getcwd()
+    os.chdir(work_dir)
+    try:
+        with quiet():
+            import app
+    finally:
+        os.chdir(previous_cwd)
+    return app
+
+
+class BenchmarkContext:
+    """Database and inputs shared by the benchmarks of one fixture size."""
+    
+    def __init__(self, size, seed):
+        self.size = size
+        self.fixture_dir = get_fixtures(size, seed)
+        self.work_dir = tempfile.mkdtemp(prefix=f"bench-{size}-")
+        self.app = None
+    
+    def setup(self):
+        """Create a database from the fixtures using the real ingestion path."""
+        from database import DatabaseManager
+        from data_processor import DataProcessor
+        
+        with quiet():
+            db = DatabaseManager(os.path.join(self.work_dir, 'openai_metrics.db'))
+            headcount = [name for name in os.listdir(self.fixture_dir) if name.startswith('Employee Headcount')][0]
+            load_headcount(db, os.path.join(self.fixture_dir, headcount))
+        app = import_app(self.work_dir)
+        
+        app.db = db
+        app.processor = DataProcessor(db)
+        self.app = app
+        self.db = db
+        self.processor = app.processor
+        
+        self.monthly_files = list_files(os.path.join(self.fixture_dir, 'OpenAI User Data', 'Monthly OpenAI User Data'))
+        blueflame_files = list_files(os.path.join(self.fixture_dir, 'BlueFlame User Data'))
+        self.blueflame_combined = [path for path in blueflame_files if 'combined' in path][-1]
+        self.blueflame_wide = [path for path in blueflame_files if 'wide' in path][-1]
+        
+        print(f"Loading {len(self.monthly_files)} monthly reports into the benchmark database...")
+        with quiet():
+            for path in self.monthly_files:
+                report = pd.read_csv(path)
+                normalized = app.normalize_openai_data(report, os.path.basename(path))
+                self.processor.process_monthly_data(normalized, os.path.basename(path))
+            wide = pd.read_csv(self.blueflame_wide)
+            normalized = app.normalize_blueflame_data(wide, os.path.basename(self.blueflame_wide))
+            self.processor.process_monthly_data(normalized, os.path.basename(self.blueflame_wide))
+        
+        self.last_report_path = self.monthly_files[-1]
+        self.last_report = pd.read_csv(self.last_report_path)
+        with quiet():
+            self.last_normalized = app.normalize_openai_data(self.last_report, os.path.basename(self.last_report_path))
+        self.blueflame_df = pd.read_csv(self.blueflame_combined)
+        self.data = db.get_all_data()
+        with quiet():
+            self.monthly_data = app.apply_frequency_normalization(self.data.copy(), "Monthly (default)", False)
+        
+        # User Directory queries: the first page also builds the user rollup and search index,
+        # so the benchmarks time the per-rerun queries; the search is a first-name prefix
+        self.user_stats_cursor = db.query_user_stats(page=1, per_page=20)['next_cursor']
+        self.user_search = str(self.data['user_name'].dropna().iloc[0]).split()[0][:3]
+        db.query_user_stats(search=self.user_search)
+        
+        # Auto-scan tracking with every fixture file processed, as after a backlog import
+        from file_scanner import FileScanner
+        self.scan_folders = [os.path.join(self.fixture_dir, 'OpenAI User Data'),
+                             os.path.join(self.fixture_dir, 'BlueFlame User Data')]
+        self.scanner = FileScanner(os.path.join(self.work_dir, 'file_tracking.db'),
+                                   recursive_folders=self.scan_folders[:1])
+        for file_info in self.scanner.scan_folders(self.scan_folders):
+            self.scanner.mark_processed(file_info['path'], records_count=1, content_hash=file_info['content_hash'])
+    
+    def cleanup(self):
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+
+def _read_file_robust(ctx):
+    from file_reader import read_file_robust
+    with open(ctx.last_report_path, 'rb') as f:
+        uploaded = NamedBytesIO(f.read(), os.path.basename(ctx.last_report_path))
+    df, error = read_file_robust(uploaded)
+    return len(df)
+
+
+def _normalize_openai(ctx):
+    return len(ctx.app.normalize_openai_data(ctx.last_report, os.path.basename(ctx.last_report_path)))
+
+
+def _normalize_blueflame(ctx):
+    return len(ctx.app.normalize_blueflame_data(ctx.blueflame_df, os.path.basename(ctx.blueflame_combined)))
+
+
+def _process_monthly_data(ctx):
+    # Re-uploading the latest month supersedes its rows and inserts them again
+    success, message = ctx.processor.process_monthly_data(ctx.last_normalized.copy(), os.path.basename(ctx.last_report_path))
+    if not success:
+        raise RuntimeError(message)
+    return len(ctx.last_normalized)
+
+
+def _get_filtered_data(ctx):
+    return len(ctx.db.get_filtered_data(start_date='2000-01-01', end_date='2100-12-31'))
+
+
+def _proration_monthly(ctx):
+    return len(ctx.app.apply_frequency_normalization(ctx.data.copy(), "Monthly (default)", False))
+
+
+def _proration_weekly(ctx):
+    return len(ctx.app.apply_frequency_normalization(ctx.data.copy(), "Weekly", False))
+
+
+def _query_user_stats(ctx):
+    return len(ctx.db.query_user_stats(page=1, per_page=20)['users'])
+
+
+def _query_user_stats_search(ctx):
+    return len(ctx.db.query_user_stats(search=ctx.user_search, page=1, per_page=20)['users'])
+
+
+def _query_user_stats_cursor(ctx):
+    # Page 2 with the keyset cursor returned for page 1
+    return len(ctx.db.query_user_stats(page=2, per_page=20, cursor=ctx.user_stats_cursor)['users'])
+
+
+def _get_top_n_users(ctx):
+    return len(ctx.app.get_top_n_users(ctx.monthly_data, n=10))
+
+
+def _roi(ctx):
+    from roi_utils import calculate_roi_per_user, calculate_roi_per_department, calculate_composite_roi
+    calculate_roi_per_user(ctx.data)
+    calculate_roi_per_department(ctx.data)
+    calculate_composite_roi(ctx.data)
+    return len(ctx.data)
+
+
+def _scan_folders_warm(ctx):
+    return len(ctx.scanner.scan_folders(ctx.scan_folders))
+
+
+def _generate_excel_export(ctx):
+    from export_utils import generate_excel_export
+    generate_excel_export(ctx.data, include_pivots=True)
+    return len(ctx.data)
+
+
+# name -> (function, sizes it runs on or None for all, default repeat)
+BENCHMARKS = {
+    'read_file_robust': (_read_file_robust, None, 5),
+    'normalize_openai_data': (_normalize_openai, None, 3),
+    'normalize_blueflame_data': (_normalize_blueflame, None, 3),
+    'process_monthly_data': (_process_monthly_data, None, 3),
+    'get_filtered_data': (_get_filtered_data, None, 5),
+    'proration_monthly': (_proration_monthly, None, 3),
+    'proration_weekly': (_proration_weekly, None, 3),
+    'query_user_stats': (_query_user_stats, None, 5),
+    'query_user_stats_search': (_query_user_stats_search, None, 5),
+    'query_user_stats_cursor': (_query_user_stats_cursor, None, 5),
+    'get_top_n_users': (_get_top_n_users, None, 5),
+    'roi_functions': (_roi, None, 3),
+    'scan_folders_warm': (_scan_folders_warm, None, 5),
+    # openpyxl writes ~1M rows for the large fixture, beyond what a benchmark run should take
+    'generate_excel_export': (_generate_excel_export, ['small', 'medium'], 1),
+}
+
+
+def time_benchmark(func, ctx, repeat):
+    """
+    Run a benchmark repeatedly.
+    
+    Returns:
+        dict: median_ms, min_ms, max_ms, runs, rows
+    """
+    timings = []
+    rows = 0
+    for _ in range(repeat):
+        with quiet():
+            start = time.perf_counter()
+            rows = func(ctx)
+            timings.append((time.perf_counter() - start) * 1000)
+    return {
+        'median_ms': round(statistics.median(timings), 3),
+        'min_ms': round(min(timings), 3),
+        'max_ms': round(max(timings), 3),
+        'runs': len(timings),
+        'rows': int(rows or 0)
+    }
+
+
+def git_commit():
+    """Short hash of HEAD, or None outside a git checkout."""
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def load_history(path):
+    if not os.path.exists(path):
+        return []
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def save_history(path, history):
+    with open(path, 'w') as f:
+        json.dump(history, f, indent=2)
+
+
+def load_budgets(path):
+    """Budget config: default_pct, min_delta_ms and per-benchmark pct overrides."""
+    budgets = {'default_pct': 20, 'min_delta_ms': 5, 'benchmarks': {}}
+    if os.path.exists(path):
+        with open(path, 'r') as f:
+            budgets.update(json.load(f))
+    return budgets
+
+
+def run(args):
+    sizes = [size.strip() for size in args.sizes.split(',') if size.strip()]
+    only = set(name.strip() for name in args.only.split(',')) if args.only else None
+    unknown = [size for size in sizes if size not in SIZES] + sorted((only or set()) - set(BENCHMARKS))
+    if unknown:
+        print(f"Unknown size or benchmark: {', '.join(unknown)}")
+        return 2
+    
+    record = {
+        'timestamp': datetime.now().isoformat(),
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'seed': args.seed,
+        'results': {}
+    }
+    
+    for size in sizes:
+        ctx = BenchmarkContext(size, args.seed)
+        try:
+            ctx.setup()
+            results = {}
+            print(f"\n[{size}] {len(ctx.data):,} usage rows")
+            for name, (func, bench_sizes, default_repeat) in BENCHMARKS.items():
+                if only and name not in only:
+                    continue
+                if bench_sizes and size not in bench_sizes:
+                    continue
+                result = time_benchmark(func, ctx, args.repeat or default_repeat)
+                results[name] = result
+                print(f"  {name:<28} {result['median_ms']:>11.1f} ms  (min {result['min_ms']:.1f}, "
+                      f"{result['runs']} run(s), {result['rows']:,} rows)")
+            record['results'][size] = results
+        finally:
+            ctx.cleanup()
+    
+    history = load_history(args.history)
+    history.append(record)
+    save_history(args.history, history)
+    print(f"\nAppended run to {args.history} ({len(history)} run(s) recorded)")
+    
+    if args.compare:
+        return compare(args)
+    return 0
+
+
+def compare(args):
+    history = load_history(args.history)
+    if len(history) < 2:
+        print("Need at least two runs in the history to compare")
+        return 0
+    
+    budgets = load_budgets(args.budgets)
+    latest = history[-1]
+    earlier = history[:-1]
+    regressions = []
+    
+    print(f"Latest run: {latest['timestamp']} ({latest.get('commit') or 'no commit'})")
+    print(f"Baseline:   {'previous run' if args.baseline == 'previous' else 'best recorded median'}\n")
+    print(f"  {'size':<7} {'benchmark':<28} {'baseline ms':>12} {'latest ms':>11} {'change':>8}  budget")
+    
+    for size, results in latest['results'].items():
+        for name, result in results.items():
+            baselines = [run_record['results'][size][name]['median_ms'] for run_record in earlier
+                         if name in run_record.get('results', {}).get(size, {})]
+            if not baselines:
+                continue
+            baseline = baselines[-1] if args.baseline == 'previous' else min(baselines)
+            current = result['median_ms']
+            change_pct = (current - baseline) / baseline * 100 if baseline else 0.0
+            budget_pct = budgets['benchmarks'].get(name, budgets['default_pct'])
+            
+            # Tiny absolute differences are timer noise, not regressions
+            regressed = change_pct > budget_pct and (current - baseline) > budgets['min_delta_ms']
+            if regressed:
+                regressions.append((size, name, change_pct, budget_pct))
+            print(f"  {size:<7} {name:<28} {baseline:>12.1f} {current:>11.1f} {change_pct:>+7.1f}%  "
+                  f"{budget_pct}%{'  REGRESSION' if regressed else ''}")
+    
+    if regressions:
+        print(f"\nFAIL: {len(regressions)} benchmark(s) exceeded their budget")
+        return 1
+    print("\nOK: all benchmarks within budget")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Dashboard performance benchmarks")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    
+    run_parser = subparsers.add_parser('run', help="Run benchmarks and append results to the history")
+    run_parser.add_argument('--sizes', default='small,medium', help=f"Comma-separated sizes: {', '.join(SIZES)} (default: small,medium)")
+    run_parser.add_argument('--only', help="Comma-separated benchmark names")
+    run_parser.add_argument('--repeat', type=int, help="Override the repeat count of every benchmark")
+    run_parser.add_argument('--seed', type=int, default=42, help="Fixture seed (default: 42)")
+    run_parser.add_argument('--compare', action='store_true', help="Compare with the history after running")
+    
+    compare_parser = subparsers.add_parser('compare', help="Compare the latest run with a baseline")
+    compare_parser.add_argument('--baseline', choices=['previous', 'best'], default='previous',
+                                help="Baseline run (default: previous)")
+    
+    for sub in (run_parser, compare_parser):
+        sub.add_argument('--history', default=DEFAULT_HISTORY, help="JSON history file")
+        sub.add_argument('--budgets', default=DEFAULT_BUDGETS, help="JSON budgets file")
+    run_parser.set_defaults(baseline='previous')
+    
+    subparsers.add_parser('list', help="List benchmarks and sizes")
+    
+    args = parser.parse_args()
+    if args.command == 'list':
+        for name, (_, bench_sizes, repeat) in BENCHMARKS.items():
+            print(f"{name:<28} sizes: {', '.join(bench_sizes or SIZES)}  repeat: {repeat}")
+        return 0
+    if args.command == 'run':
+        return run(args)
+    return compare(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -23,7 +23,34 @@ RECURSIVE_SCAN_FOLDERS = [
 ]
 
 # File tracking settings
-FILE_TRACKING_PATH = "file_tracking.json"
+FILE_TRACKING_PATH = "file_tracking.db"
+
+# Threads used to stat large scan folders (helps on network drives; 0 = serial)
+SCAN_STAT_WORKERS = 8
+
+# Seconds a cached folder listing is reused while the folder's mtime is unchanged
+# (in-place edits of existing files are picked up after this, or on "Refresh Files")
+SCAN_LISTING_MAX_AGE = 300
+
+# Background threads that ingest uploads and auto-scanned files for all sessions
+INGESTION_WORKERS = 2
+
+# Executive reports (HTML and Excel) kept in memory for all sessions, keyed by data
+# version and filter selection. With PREBUILD_REPORTS, the formats prepared for the last
+# REPORT_CACHE_SIZE filter selections are rebuilt in the background once the ingestion queue
+# has finished its jobs (and when a selection is shown again after any other data change).
+REPORT_CACHE_SIZE = 8
+PREBUILD_REPORTS = True
+
+# How a stored row merges with an existing row for the same user, day, feature and
+# tool: 'replace' keeps the incoming values, 'sum' adds the incoming usage_count to
+# the stored one (other columns take the incoming values). Tools not listed use
+# DEFAULT_UPSERT_POLICY.
+UPSERT_POLICIES = {
+    'ChatGPT': 'replace',
+    'BlueFlame AI': 'replace',
+}
+DEFAULT_UPSERT_POLICY = 'replace'
 
 # Provider configurations
 PROVIDERS = {
@@ -0,0 +1,189 @@
+"""
+Streaming Export of the Usage Dataset
+
+Writes every usage_metrics row to a file as CSV, gzip-compressed CSV or
+Parquet, with the public columns (DatabaseManager.PUBLIC_COLUMNS, as the CLI
+export; internal keys are left out). Rows are read from SQLite in chunks
+(DatabaseManager.iter_filtered_data) and appended to the file one chunk at a
+time, so memory use does not grow with the size of the table.
+
+Exports are written to a folder per database in the system temp directory and
+named after the data version. An export is therefore built once per version of
+the data (on request, not on every dashboard rerun) and served from the file
+until the next upload or delete; files of older versions are removed when a
+newer one is written. The version and the rows are read in one transaction,
+so an upload committed during a build neither waits for it nor ends up in a
+file named after the previous version.
+
+Parquet needs pyarrow. Without it only the CSV formats are offered.
+"""
+
+import gzip
+import hashlib
+import os
+import tempfile
+import threading
+from datetime import datetime
+
+from export_utils import write_csv_chunks
+
+# format -> label, file extension and MIME type
+EXPORT_FORMATS = {
+    'csv': {'label': 'CSV', 'extension': 'csv', 'mime': 'text/csv'},
+    'csv.gz': {'label': 'CSV (gzip)', 'extension': 'csv.gz', 'mime': 'application/gzip'},
+    'parquet': {'label': 'Parquet', 'extension': 'parquet', 'mime': 'application/vnd.apache.parquet'},
+}
+
+EXPORT_ROOT = os.path.join(tempfile.gettempdir(), 'ai_usage_exports')
+
+# One export is built at a time; other sessions asking for the same file wait and reuse it
+_build_lock = threading.Lock()
+
+
+def parquet_available():
+    """Return True when pyarrow is installed."""
+    try:
+        import pyarrow.parquet  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def available_formats():
+    """Formats that can be written in this environment, in display order."""
+    return [fmt for fmt in EXPORT_FORMATS if fmt != 'parquet' or parquet_available()]
+
+
+def export_directory(db):
+    """
+    Folder holding the exports of one database.
+    
+    The name is derived from the database path and file identity, so a database
+    that is deleted and recreated (restarting its data version) does not reuse
+    the old exports.
+    """
+    path = os.path.abspath(db.db_path)
+    try:
+        identity = f"{path}:{os.stat(path).st_ino}"
+    except OSError:
+        identity = path
+    return os.path.join(EXPORT_ROOT, hashlib.sha1(identity.encode('utf-8')).hexdigest()[:16])
+
+
+def export_path(db, fmt, data_version):
+    """Path of the export of a data version in a format."""
+    return os.path.join(export_directory(db), f"usage_v{data_version}.{EXPORT_FORMATS[fmt]['extension']}")
+
+
+def download_name(fmt):
+    """File name offered to the browser, e.g. ai_usage_export_20250301.csv.gz."""
+    return f"ai_usage_export_{datetime.now().strftime('%Y%m%d')}.{EXPORT_FORMATS[fmt]['extension']}"
+
+
+def get_cached_export(db, fmt):
+    """
+    Return the export of the current data version if it has been built.
+    
+    Args:
+        db: DatabaseManager
+        fmt: Key of EXPORT_FORMATS
+    
+    Returns:
+        str: Path of the file, or None if it has to be built first
+    """
+    path = export_path(db, fmt, db.get_data_version())
+    return path if os.path.exists(path) else None
+
+
+def build_export(db, fmt, chunksize=None):
+    """
+    Return the export of the current data version, writing it if needed.
+    
+    The file is written under a temporary name and renamed when complete, so a
+    reader never sees a partial export.
+    
+    Args:
+        db: DatabaseManager
+        fmt: Key of EXPORT_FORMATS
+        chunksize: Rows read per chunk (defaults to DatabaseManager.READ_CHUNK_SIZE)
+    
+    Returns:
+        str: Path of the export file
+    
+    Raises:
+        ValueError: If the format is unknown or not available
+        Exception: If reading the data or writing the file fails
+    """
+    if fmt not in available_formats():
+        raise ValueError(f"Export format not available: {fmt}")
+    
+    with _build_lock:
+        # The version and the rows are read in one transaction, so the file holds
+        # exactly the data of the version it is named after. The database uses
+        # write-ahead logging, so uploads keep committing while the export is read.
+        conn = db.connect()
+        try:
+            conn.execute("BEGIN")
+            version = db.get_data_version(conn)
+            path = export_path(db, fmt, version)
+            if os.path.exists(path):
+                return path
+            
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            temp_path = f"{path}.{os.getpid()}.tmp"
+            chunks = db.iter_filtered_data(chunksize=chunksize, columns=db.PUBLIC_COLUMNS, conn=conn)
+            try:
+                if fmt == 'parquet':
+                    _write_parquet(db, chunks, temp_path)
+                elif fmt == 'csv.gz':
+                    # Level 6 is about twice as fast as gzip's default 9 for a few percent more size
+                    with gzip.open(temp_path, 'wt', compresslevel=6, newline='', encoding='utf-8') as f:
+                        write_csv_chunks(chunks, f)
+                else:
+                    write_csv_chunks(chunks, temp_path)
+                os.replace(temp_path, path)
+            except Exception:
+                chunks.close()
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+                raise
+        finally:
+            conn.rollback()
+            conn.close()
+        
+        _remove_other_versions(db, fmt, keep=path)
+        return path
+
+
+def _parquet_schema(db):
+    """Arrow schema of the exported columns (DatabaseManager.PUBLIC_COLUMNS); other columns are text."""
+    import pyarrow as pa
+    
+    types = {'id': pa.int64(), 'usage_count': pa.int64(), 'cost_usd': pa.float64()}
+    return pa.schema([(name, types.get(name, pa.string())) for name in db.PUBLIC_COLUMNS])
+
+
+def _write_parquet(db, chunks, path):
+    """Write chunks to a Parquet file, one row group per chunk."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    
+    # A fixed schema, since a chunk's inferred types depend on its values
+    # (an INTEGER column with a NULL reads as float, an all-NULL column as null)
+    schema = _parquet_schema(db)
+    with pq.ParquetWriter(path, schema) as writer:
+        for chunk in chunks:
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+
+
+def _remove_other_versions(db, fmt, keep):
+    """Delete the exports of other data versions in a format."""
+    directory = export_directory(db)
+    suffix = f".{EXPORT_FORMATS[fmt]['extension']}"
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        if name.startswith('usage_v') and name.endswith(suffix) and path != keep:
+            try:
+                os.remove(path)
+            except OSError as e:
+                print(f"Error removing old export {path}: {e}")
@@ -7,18 +7,51 @@ Processes and normalizes AI usage data from multiple sources:
 - Other AI tools (extensible)
 """
 import pandas as pd
-import sqlite3
+import numpy as np
 from datetime import datetime
 import re
 import json
 from cost_calculator import EnterpriseCostCalculator
+from ingestion_timing import span
+from config import UPSERT_POLICIES, DEFAULT_UPSERT_POLICY
+from database import to_month_key
+
+# usage_metrics columns written by process_monthly_data, in insert order
+# (DatabaseManager.upsert_rows stores them in fact_usage and its dimensions)
+USAGE_INSERT_COLUMNS = ['user_id', 'user_name', 'email', 'department', 'date',
+                        'feature_used', 'usage_count', 'cost_usd', 'tool_source',
+                        'file_source', 'last_day_active', 'first_day_active_in_period',
+                        'last_day_active_in_period', 'created_at']
+
+
+def _timestamp_text(series):
+    """Format a datetime column the way sqlite3 adapts datetime objects (isoformat with a space)."""
+    # Usage dates repeat (one per month), so format each distinct value once
+    codes, uniques = pd.factorize(series)
+    labels = np.array([ts.isoformat(' ') for ts in uniques] + [None], dtype=object)
+    # Missing values have code -1, which selects the trailing None
+    return labels[codes].tolist()
+
+
+def _day_text(series):
+    """
+    Normalize a date column to 'YYYY-MM-DD' text (the day part of the natural key).
+    
+    Values that cannot be parsed as dates are kept as they are.
+    """
+    codes, uniques = pd.factorize(series)
+    parsed = pd.to_datetime(pd.Series(uniques, dtype=object), errors='coerce', format='mixed')
+    labels = [value.strftime('%Y-%m-%d') if not pd.isna(value) else original
+              for original, value in zip(uniques, parsed)]
+    return np.array(labels + [None], dtype=object)[codes].tolist()
+
 
 class DataProcessor:
     def __init__(self, db_manager):
         self.db = db_manager
         self.cost_calculator = EnterpriseCostCalculator()
     
-    def process_monthly_data(self, df, filename):
+    def process_monthly_data(self, df, filename, timer=None):
         """
         Process uploaded AI tool data.
         
@@ -29,6 +62,7 @@ class DataProcessor:
         Args:
             df: DataFrame with usage data
             filename: Source filename for tracking
+            timer: Optional IngestionTimer that receives superseding/insert/commit spans
             
         Returns:
             tuple: (success: bool, message: str)
@@ -72,6 +106,8 @@ class DataProcessor:
             # UNIVERSAL DATA SUPERSEDING FOR BOTH BlueFlame AND OpenAI
             # This ensures that each new upload fully replaces data for covered months and users
             # Prevents duplicate/inflated message counts from re-uploads
+            supersede_months = []
+            supersede_users = []
             if tool_source in ['BlueFlame AI', 'ChatGPT'] and 'date' in processed_df.columns:
                 # Extract unique months and users from the new data
                 processed_df['date'] = pd.to_datetime(processed_df['date'], errors='coerce')
@@ -85,60 +121,60 @@ class DataProcessor:
                     print(f"{tool_source} data contains {len(unique_users)} unique user(s)")
                     print("Superseding existing data for these months and users...")
                     
-                    conn = sqlite3.connect(self.db.db_path)
-                    cursor = conn.cursor()
-                    
-                    # Delete existing data for each (month, user) combination covered in the new upload
-                    deleted_total = 0
-                    for month_period in unique_months:
-                        # Convert period to date range for this month
-                        # month_start: first day of the month
-                        # month_end: first day of next month (exclusive upper bound)
-                        month_start = month_period.to_timestamp()
-                        month_end = (month_period + 1).to_timestamp()
-                        
-                        for user_id in unique_users:
-                            # Delete records for this specific (tool, month, user) combination
-                            cursor.execute("""
-                                DELETE FROM usage_metrics 
-                                WHERE tool_source = ? 
-                                AND date >= ? AND date < ?
-                                AND user_id = ?
-                            """, (tool_source, month_start.strftime('%Y-%m-%d'), month_end.strftime('%Y-%m-%d'), user_id))
-                            
-                            deleted_count = cursor.rowcount
-                            if deleted_count > 0:
-                                deleted_total += deleted_count
-                                print(f"  Deleted {deleted_count} existing record(s) for {month_period}, user {user_id}")
-                    
-                    conn.commit()
-                    conn.close()
+                    # Every (month, user) combination covered in the new upload is replaced
+                    # (months as yyyymm keys, matching usage_metrics.month_key)
+                    supersede_months = [to_month_key(month_period) for month_period in unique_months]
+                    supersede_users = np.asarray(unique_users, dtype=object)
+            
+            # The upload is one ingestion batch: superseding (which moves the replaced
+            # rows to usage_metrics_history, see DatabaseManager.rollback_batch) and the
+            # insert share one transaction, so a failure part-way (or a crash) leaves
+            # the previous data in place
+            conn = self.db.connect_bulk()
+            try:
+                batch_id = self.db.begin_batch(conn, filename, tool_source)
+                columns, rows = self._usage_rows(processed_df, batch_id)
+                
+                deleted_total = None
+                if len(supersede_months) > 0 and len(supersede_users) > 0:
+                    with span(timer, 'superseding', rows=len(processed_df)) as supersede_span:
+                        deleted_total = self.db.supersede_rows(conn, batch_id, tool_source,
+                                                               supersede_months, supersede_users)
+                        supersede_span['deleted'] = deleted_total
                     
                     if deleted_total > 0:
                         print(f"Total records superseded: {deleted_total}")
                     else:
                         print("No existing records found to supersede (first upload for these months/users)")
+                
+                # Rows for a user, day, feature and tool that is already stored
+                # (including twice in this upload) are merged per the tool's policy.
+                # Superseding has already moved every stored row they could match;
+                # otherwise the rows being overwritten are archived for rollback.
+                with span(timer, 'insert', rows=len(rows)):
+                    archived = self.db.upsert_rows(conn, columns, rows,
+                                                   UPSERT_POLICIES.get(tool_source, DEFAULT_UPSERT_POLICY),
+                                                   archive_batch_id=None if deleted_total is not None else batch_id)
+                    stored = conn.execute(
+                        "SELECT COUNT(*) FROM fact_usage WHERE batch_id = ?", (batch_id,)
+                    ).fetchone()[0]
+                if stored < len(rows):
+                    print(f"Merged {len(rows) - stored} record(s) with the same user, date, feature and tool")
+                if archived:
+                    print(f"Replaced {archived} stored record(s) with the same user, date, feature and tool")
+                
+                with span(timer, 'commit', rows=len(rows)):
+                    # Superseded rows: moved by supersede_rows, or overwritten (and archived) by the upsert
+                    self.db.finish_batch(conn, batch_id, stored, (deleted_total or 0) + archived)
+                    self.db.bump_data_version(conn)
+                    conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                conn.close()
             
-            # Insert into database
-            conn = sqlite3.connect(self.db.db_path)
-            
-            # Ensure we only insert columns that exist in the database
-            db_columns = ['user_id', 'user_name', 'email', 'department', 'date', 
-                         'feature_used', 'usage_count', 'cost_usd', 'tool_source', 
-                         'file_source', 'last_day_active', 'first_day_active_in_period',
-                         'last_day_active_in_period', 'created_at']
-            
-            # Select only columns that exist in both dataframe and database schema
-            cols_to_insert = [col for col in db_columns if col in processed_df.columns]
-            df_to_insert = processed_df[cols_to_insert]
-            
-            # Add created_at if not present
-            if 'created_at' not in df_to_insert.columns:
-                df_to_insert['created_at'] = datetime.now().isoformat()
-            
-            df_to_insert.to_sql('usage_metrics', conn, if_exists='append', index=False)
-            conn.close()
-            
+            print(f"Stored {stored} records as ingestion batch {batch_id}")
             return True, f"Successfully processed {len(processed_df)} records from {tool_source} ({filename})"
             
         except Exception as e:
@@ -147,6 +183,45 @@ class DataProcessor:
             traceback.print_exc()
             return False, f"Error processing data: {str(e)}"
     
+    def _usage_rows(self, df, batch_id):
+        """
+        Build the column list and row tuples to insert into usage_metrics.
+        
+        Values are stored as DataFrame.to_sql stored them: datetime columns as
+        'YYYY-MM-DD HH:MM:SS' text (with microseconds when present) and missing
+        values as NULL. The date column is stored as the day, 'YYYY-MM-DD'.
+        
+        Args:
+            df: Processed usage records
+            batch_id: Ingestion batch stored on every row
+        
+        Returns:
+            tuple: (columns: list, rows: list of tuples)
+        """
+        # Only insert columns that exist in both the DataFrame and the database schema
+        columns = [col for col in USAGE_INSERT_COLUMNS if col in df.columns]
+        values = []
+        for col in columns:
+            series = df[col]
+            if col == 'date':
+                values.append(_day_text(series))
+            elif pd.api.types.is_datetime64_any_dtype(series):
+                values.append(_timestamp_text(series))
+            elif series.isna().any():
+                values.append(series.astype(object).where(series.notna(), None).tolist())
+            else:
+                values.append(series.tolist())
+        
+        # Add created_at if not present
+        if 'created_at' not in columns:
+            columns.append('created_at')
+            values.append([datetime.now().isoformat()] * len(df))
+        
+        columns.append('batch_id')
+        values.append([batch_id] * len(df))
+        
+        return columns, list(zip(*values))
+    
     def clean_openai_data(self, df, filename):
         """
         Clean and normalize OpenAI usage data format.
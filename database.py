@@ -6,203 +6,185 @@ Handles database operations for OpenAI ChatGPT, BlueFlame AI, and other AI tool
 import pandas as pd
 import sqlite3
 import os
-from datetime import datetime
+import json
+from datetime import datetime, date, timedelta
+from migrations import migrate, LATEST_VERSION
+from search_index import SearchIndex
+import query_monitor
+
+# Durability of bulk write transactions (ingests, rollbacks). NORMAL skips the
+# fsync of the rollback journal's header; a power loss mid-commit can lose that
+# transaction, but the commit is still atomic for application crashes.
+BULK_SYNCHRONOUS = 'NORMAL'
+
+# Page cache (KiB) for bulk writes; superseding and inserting 100k rows touches
+# more index pages than SQLite's 2 MB default keeps in memory
+BULK_CACHE_KIB = 65536
+
+# fact_usage.day_key counts days since this date (see migrations._migration_6_date_keys)
+DAY_KEY_EPOCH = date(1970, 1, 1)
+
+
+def to_day_key(value):
+    """
+    Convert a date-like value to a day_key.
+    
+    Args:
+        value: date, datetime, pandas Timestamp or date string
+    
+    Returns:
+        int: Days since 1970-01-01 (the time of day is ignored)
+    
+    Raises:
+        ValueError: If the value is not a date
+    """
+    timestamp = pd.Timestamp(value)
+    if pd.isna(timestamp):
+        raise ValueError(f"Not a date: {value!r}")
+    return (timestamp.date() - DAY_KEY_EPOCH).days
+
+
+def to_month_key(value):
+    """
+    Convert a date-like value or month period ('2025-03', pd.Period) to a month_key.
+    
+    Returns:
+        int: yyyymm, e.g. 202503
+    
+    Raises:
+        ValueError: If the value is not a date or month
+    """
+    if isinstance(value, pd.Period):
+        return value.year * 100 + value.month
+    timestamp = pd.Timestamp(value)
+    if pd.isna(timestamp):
+        raise ValueError(f"Not a date: {value!r}")
+    return timestamp.year * 100 + timestamp.month
+
+
+def from_day_key(day_key):
+    """Convert a day_key back to a date."""
+    return DAY_KEY_EPOCH + timedelta(days=int(day_key))
+
 
 class DatabaseManager:
     def __init__(self, db_path="openai_metrics.db"):
         self.db_path = db_path
+        self._search_indexes = {}
         self.init_database()
     
     def init_database(self):
-        """Initialize the database with required tables."""
+        """
+        Initialize the database schema.
+        
+        Applies any pending numbered migrations (see migrations.py). On an up-to-date
+        database this is a single PRAGMA user_version check. The database is then
+        switched to write-ahead logging (stored in the file, so this is a no-op after
+        the first startup): a long read such as a chunked export keeps reading its
+        snapshot while ingests commit, instead of making them wait for a lock.
+        """
         try:
-            conn = sqlite3.connect(self.db_path)
-            
-            # Create main usage metrics table with new columns for multi-tool support
-            conn.execute("""
-                CREATE TABLE IF NOT EXISTS usage_metrics (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    user_id TEXT NOT NULL,
-                    user_name TEXT,
-                    email TEXT,
-                    department TEXT,
-                    date TEXT NOT NULL,
-                    feature_used TEXT,
-                    usage_count INTEGER,
-                    cost_usd REAL,
-                    tool_source TEXT DEFAULT 'ChatGPT',
-                    file_source TEXT,
-                    last_day_active TEXT,
-                    first_day_active_in_period TEXT,
-                    last_day_active_in_period TEXT,
-                    created_at TEXT DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
-            
-            # Create employees table for master employee list
-            conn.execute("""
-                CREATE TABLE IF NOT EXISTS employees (
-                    employee_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    first_name TEXT,
-                    last_name TEXT,
-                    email TEXT UNIQUE,
-                    title TEXT,
-                    department TEXT,
-                    status TEXT,
-                    created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-                    updated_at TEXT DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
-            
-            conn.commit()
-            
-            # Check if we need to migrate existing data (add email and tool_source columns)
-            # This MUST happen BEFORE creating indexes on these columns
+            applied = migrate(self.db_path)
+            if applied:
+                print(f"Database migrated to schema version {LATEST_VERSION} ({applied} step(s) applied)")
+            # Cannot be changed inside a transaction, so not part of a migration step
+            conn = sqlite3.connect(self.db_path, timeout=30)
             try:
-                cursor = conn.execute("PRAGMA table_info(usage_metrics)")
-                columns = [row[1] for row in cursor.fetchall()]
-                print(f"Current columns in database: {columns}")
-            except Exception as e:
-                print(f"Error checking table columns: {e}")
+                conn.execute("PRAGMA journal_mode = WAL")
+            finally:
                 conn.close()
-                raise
-            
-            # Migrate email column if needed
-            if 'email' not in columns:
-                try:
-                    print("Migrating database: Adding 'email' column...")
-                    conn.execute("ALTER TABLE usage_metrics ADD COLUMN email TEXT")
-                    # Copy user_id to email for existing records (assuming user_id is email)
-                    conn.execute("UPDATE usage_metrics SET email = user_id WHERE email IS NULL")
-                    conn.commit()
-                except Exception as e:
-                    print(f"Error adding email column: {e}")
-                    conn.close()
-                    raise
-            
-            # Migrate tool_source column if needed
-            if 'tool_source' not in columns:
-                try:
-                    print("Migrating database: Adding 'tool_source' column...")
-                    conn.execute("ALTER TABLE usage_metrics ADD COLUMN tool_source TEXT DEFAULT 'ChatGPT'")
-                    # Set all existing records to ChatGPT
-                    conn.execute("UPDATE usage_metrics SET tool_source = 'ChatGPT' WHERE tool_source IS NULL")
-                    conn.commit()
-                except Exception as e:
-                    print(f"Error adding tool_source column: {e}")
-                    conn.close()
-                    raise
-            
-            # Migrate activity date columns if needed
-            cursor = conn.execute("PRAGMA table_info(usage_metrics)")
-            columns = [row[1] for row in cursor.fetchall()]
-            
-            if 'last_day_active' not in columns:
-                try:
-                    print("Migrating database: Adding 'last_day_active' column...")
-                    conn.execute("ALTER TABLE usage_metrics ADD COLUMN last_day_active TEXT")
-                    conn.commit()
-                except Exception as e:
-                    print(f"Error adding last_day_active column: {e}")
-                    conn.close()
-                    raise
-            
-            if 'first_day_active_in_period' not in columns:
-                try:
-                    print("Migrating database: Adding 'first_day_active_in_period' column...")
-                    conn.execute("ALTER TABLE usage_metrics ADD COLUMN first_day_active_in_period TEXT")
-                    conn.commit()
-                except Exception as e:
-                    print(f"Error adding first_day_active_in_period column: {e}")
-                    conn.close()
-                    raise
-            
-            if 'last_day_active_in_period' not in columns:
-                try:
-                    print("Migrating database: Adding 'last_day_active_in_period' column...")
-                    conn.execute("ALTER TABLE usage_metrics ADD COLUMN last_day_active_in_period TEXT")
-                    conn.commit()
-                except Exception as e:
-                    print(f"Error adding last_day_active_in_period column: {e}")
-                    conn.close()
-                    raise
-            
-            # Verify all required columns exist before creating indexes
-            try:
-                cursor = conn.execute("PRAGMA table_info(usage_metrics)")
-                final_columns = [row[1] for row in cursor.fetchall()]
-                print(f"Final columns after migration: {final_columns}")
-                
-                required_columns = ['user_id', 'email', 'tool_source', 'date']
-                missing_columns = [col for col in required_columns if col not in final_columns]
-                
-                if missing_columns:
-                    error_msg = f"Required columns missing after migration: {missing_columns}"
-                    print(f"ERROR: {error_msg}")
-                    conn.close()
-                    raise RuntimeError(error_msg)
-            except RuntimeError:
-                raise
-            except Exception as e:
-                print(f"Error verifying columns: {e}")
-                conn.close()
-                raise
-            
-            # Create indexes for faster queries - ONLY AFTER verifying columns exist
-            try:
-                print("Creating database indexes...")
-                
-                conn.execute("""
-                    CREATE INDEX IF NOT EXISTS idx_user_date 
-                    ON usage_metrics(user_id, date)
-                """)
-                
-                conn.execute("""
-                    CREATE INDEX IF NOT EXISTS idx_tool_source 
-                    ON usage_metrics(tool_source)
-                """)
-                
-                conn.execute("""
-                    CREATE INDEX IF NOT EXISTS idx_date 
-                    ON usage_metrics(date)
-                """)
-                
-                # Create indexes for employees table
-                conn.execute("""
-                    CREATE INDEX IF NOT EXISTS idx_employee_email 
-                    ON employees(email)
-                """)
-                
-                conn.execute("""
-                    CREATE INDEX IF NOT EXISTS idx_employee_department 
-                    ON employees(department)
-                """)
-                
-                conn.commit()
-                print("Database indexes created successfully")
-            except Exception as e:
-                print(f"Error creating indexes: {e}")
-                conn.close()
-                raise
-            
-            conn.close()
-            print("Database initialized successfully")
-            
         except Exception as e:
             print(f"FATAL ERROR during database initialization: {e}")
             raise
     
+    def connect(self):
+        """
+        Open a connection to the database.
+        
+        Statements run on it are timed, attributed to the calling method and
+        reported to query_monitor observers (e.g. the rerun profiler) and to the
+        slow query log. Writers wait up to 30 seconds for a lock held by another
+        process (e.g. the watch-folder daemon) instead of failing after 5.
+        
+        Returns:
+            sqlite3.Connection
+        """
+        return query_monitor.connect(self.db_path, timeout=30)
+    
+    def connect_bulk(self):
+        """
+        Open a connection for a large write transaction (ingest or rollback).
+        
+        Returns:
+            sqlite3.Connection with BULK_SYNCHRONOUS and a BULK_CACHE_KIB page cache
+        """
+        conn = self.connect()
+        conn.execute(f"PRAGMA synchronous = {BULK_SYNCHRONOUS}")
+        conn.execute(f"PRAGMA cache_size = -{BULK_CACHE_KIB}")
+        return conn
+    
+    def get_data_version(self, conn=None):
+        """
+        Get the current data version.
+        
+        The version is a counter bumped by every write to usage_metrics or employees,
+        so derived structures (rollups, search indexes, caches) can tell when they are stale.
+        
+        Args:
+            conn: Optional open connection; when given the version is read in its
+                  transaction (e.g. the read snapshot of an export)
+        
+        Returns:
+            int: Current data version (0 if unavailable)
+        """
+        own_conn = conn is None
+        try:
+            if own_conn:
+                conn = self.connect()
+            row = conn.execute("SELECT value FROM db_meta WHERE key = 'data_version'").fetchone()
+            return int(row[0]) if row else 0
+        except Exception as e:
+            print(f"Error getting data version: {e}")
+            return 0
+        finally:
+            if own_conn and conn is not None:
+                conn.close()
+    
+    def bump_data_version(self, conn=None):
+        """
+        Increment the data version after a write.
+        
+        Args:
+            conn: Optional open connection; when given the bump joins its transaction
+                  and the caller is responsible for committing
+        """
+        own_conn = conn is None
+        try:
+            if own_conn:
+                conn = self.connect()
+            conn.execute("""
+                UPDATE db_meta SET value = CAST(value AS INTEGER) + 1
+                WHERE key = 'data_version'
+            """)
+            if own_conn:
+                conn.commit()
+        except Exception as e:
+            print(f"Error bumping data version: {e}")
+        finally:
+            if own_conn and conn is not None:
+                conn.close()
+    
     def get_available_months(self):
-        """Get available months from data."""
+        """Get the distinct dates in the data, as date objects in ascending order."""
         try:
-            conn = sqlite3.connect(self.db_path)
-            df = pd.read_sql_query("SELECT DISTINCT date FROM usage_metrics ORDER BY date", conn)
+            conn = self.connect()
+            # Rows with an unparseable date have no day_key and are skipped
+            cursor = conn.execute(
+                "SELECT DISTINCT day_key FROM fact_usage WHERE day_key IS NOT NULL ORDER BY day_key"
+            )
+            dates = [from_day_key(row[0]) for row in cursor.fetchall()]
             conn.close()
-            if not df.empty:
-                # Use errors='coerce' to handle invalid dates gracefully
-                dates = pd.to_datetime(df['date'], errors='coerce').dropna().dt.date.tolist()
-                return dates
-            return []
+            return dates
         except Exception as e:
             print(f"Error getting months: {e}")
             return []
@@ -214,24 +196,19 @@ class DatabaseManager:
         For monthly data, this returns the full coverage including end of month.
         """
         try:
-            conn = sqlite3.connect(self.db_path)
-            df = pd.read_sql_query("SELECT MIN(date) as min_date, MAX(date) as max_date FROM usage_metrics", conn)
+            conn = self.connect()
+            # Both ends of the day_key index; rows with an unparseable date have no key.
+            # (MIN and MAX in one SELECT would scan the table; as subqueries each is one seek)
+            min_key, max_key = conn.execute(
+                "SELECT (SELECT MIN(day_key) FROM fact_usage), (SELECT MAX(day_key) FROM fact_usage)"
+            ).fetchone()
             conn.close()
             
-            if df.empty or pd.isna(df['min_date'].iloc[0]):
-                return None, None
-            
-            # Use errors='coerce' to handle invalid dates gracefully
-            min_date = pd.to_datetime(df['min_date'].iloc[0], errors='coerce')
-            max_date = pd.to_datetime(df['max_date'].iloc[0], errors='coerce')
-            
-            # Check if dates are valid
-            if pd.isna(min_date) or pd.isna(max_date):
-                print(f"Warning: Invalid dates in database - min: {df['min_date'].iloc[0]}, max: {df['max_date'].iloc[0]}")
+            if min_key is None:
                 return None, None
             
-            min_date = min_date.date()
-            max_date = max_date.date()
+            min_date = from_day_key(min_key)
+            max_date = from_day_key(max_key)
             
             # For monthly data, extend max_date to end of month
             # This allows users to select any date within the month
@@ -245,8 +222,14 @@ class DatabaseManager:
     def get_unique_users(self):
         """Get unique users."""
         try:
-            conn = sqlite3.connect(self.db_path)
-            df = pd.read_sql_query("SELECT DISTINCT user_name FROM usage_metrics WHERE user_name IS NOT NULL ORDER BY user_name", conn)
+            conn = self.connect()
+            # One index seek per dimension row rather than a pass over fact_usage
+            df = pd.read_sql_query("""
+                SELECT DISTINCT user_name FROM dim_user u
+                WHERE user_name IS NOT NULL
+                AND EXISTS (SELECT 1 FROM fact_usage f WHERE f.user_key = u.user_key)
+                ORDER BY user_name
+            """, conn)
             conn.close()
             return df['user_name'].tolist() if not df.empty else []
         except Exception as e:
@@ -256,8 +239,12 @@ class DatabaseManager:
     def get_unique_departments(self):
         """Get unique departments."""
         try:
-            conn = sqlite3.connect(self.db_path)
-            df = pd.read_sql_query("SELECT DISTINCT department FROM usage_metrics WHERE department IS NOT NULL ORDER BY department", conn)
+            conn = self.connect()
+            df = pd.read_sql_query("""
+                SELECT department FROM dim_department d
+                WHERE EXISTS (SELECT 1 FROM fact_usage f WHERE f.department_key = d.department_key)
+                ORDER BY department
+            """, conn)
             conn.close()
             return df['department'].tolist() if not df.empty else []
         except Exception as e:
@@ -267,8 +254,12 @@ class DatabaseManager:
     def get_unique_tools(self):
         """Get unique AI tools in the database."""
         try:
-            conn = sqlite3.connect(self.db_path)
-            df = pd.read_sql_query("SELECT DISTINCT tool_source FROM usage_metrics WHERE tool_source IS NOT NULL ORDER BY tool_source", conn)
+            conn = self.connect()
+            df = pd.read_sql_query("""
+                SELECT tool_source FROM dim_tool t
+                WHERE EXISTS (SELECT 1 FROM fact_usage f WHERE f.tool_key = t.tool_key)
+                ORDER BY tool_source
+            """, conn)
             conn.close()
             return df['tool_source'].tolist() if not df.empty else []
         except Exception as e:
@@ -278,7 +269,7 @@ class DatabaseManager:
     def get_all_data(self):
         """Get all data."""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = self.connect()
             df = pd.read_sql_query("SELECT * FROM usage_metrics ORDER BY date DESC", conn)
             conn.close()
             return df
@@ -286,36 +277,75 @@ class DatabaseManager:
             print(f"Error getting all data: {e}")
             return pd.DataFrame()
     
+    def _filtered_query(self, start_date=None, end_date=None, users=None, departments=None, tools=None,
+                        columns=None):
+        """
+        Build the usage_metrics query behind get_filtered_data and iter_filtered_data.
+        
+        Args:
+            start_date, end_date, users, departments, tools: As for get_filtered_data
+            columns: Optional list of usage_metrics columns to select (default all)
+        
+        Returns:
+            tuple: (sql, params)
+        
+        Raises:
+            ValueError: If a date bound is not a date
+        """
+        # Filters are applied to fact_usage's keys, so each one can use an index
+        # (filtering the view's text columns joins every row first)
+        conditions = []
+        params = []
+        
+        # Date bounds are integer range scans on day_key; the month_key bounds let
+        # a tool filter range-scan idx_usage_tool_month_user instead
+        if start_date:
+            conditions.append("day_key >= ? AND month_key >= ?")
+            params.extend([to_day_key(start_date), to_month_key(start_date)])
+        if end_date:
+            conditions.append("day_key <= ? AND month_key <= ?")
+            params.extend([to_day_key(end_date), to_month_key(end_date)])
+        
+        if users:
+            placeholders = ','.join(['?' for _ in users])
+            conditions.append(f"user_key IN (SELECT user_key FROM dim_user WHERE user_name IN ({placeholders}))")
+            params.extend(users)
+        
+        if departments:
+            placeholders = ','.join(['?' for _ in departments])
+            conditions.append(
+                f"department_key IN (SELECT department_key FROM dim_department WHERE department IN ({placeholders}))"
+            )
+            params.extend(departments)
+        
+        if tools:
+            placeholders = ','.join(['?' for _ in tools])
+            conditions.append(f"tool_key IN (SELECT tool_key FROM dim_tool WHERE tool_source IN ({placeholders}))")
+            params.extend(tools)
+        
+        query = f"SELECT {', '.join(columns) if columns else '*'} FROM usage_metrics"
+        if conditions:
+            query += f" WHERE id IN (SELECT id FROM fact_usage WHERE {' AND '.join(conditions)})"
+        query += " ORDER BY date DESC"
+        return query, params
+    
     def get_filtered_data(self, start_date=None, end_date=None, users=None, departments=None, tools=None):
-        """Get filtered data with support for multiple filter criteria."""
+        """
+        Get filtered data with support for multiple filter criteria.
+        
+        Args:
+            start_date: Optional inclusive start (date, datetime, Timestamp or date string)
+            end_date: Optional inclusive end; the whole end day is included
+            users: Optional user_name values
+            departments: Optional departments
+            tools: Optional tool_source values
+        
+        Returns:
+            DataFrame: Matching rows, newest first
+        """
         try:
-            conn = sqlite3.connect(self.db_path)
-            
-            # Build query dynamically based on filters
-            query = "SELECT * FROM usage_metrics WHERE 1=1"
-            params = []
-            
-            if start_date and end_date:
-                query += " AND date BETWEEN ? AND ?"
-                params.extend([str(start_date), str(end_date)])
-            
-            if users:
-                placeholders = ','.join(['?' for _ in users])
-                query += f" AND user_name IN ({placeholders})"
-                params.extend(users)
-            
-            if departments:
-                placeholders = ','.join(['?' for _ in departments])
-                query += f" AND department IN ({placeholders})"
-                params.extend(departments)
-            
-            if tools:
-                placeholders = ','.join(['?' for _ in tools])
-                query += f" AND tool_source IN ({placeholders})"
-                params.extend(tools)
-            
-            query += " ORDER BY date DESC"
-            
+            conn = self.connect()
+            query, params = self._filtered_query(start_date, end_date, users, departments, tools)
             df = pd.read_sql_query(query, conn, params=params)
             conn.close()
             return df
@@ -323,19 +353,69 @@ class DatabaseManager:
             print(f"Error getting filtered data: {e}")
             return pd.DataFrame()
     
+    # Rows per DataFrame yielded by iter_filtered_data
+    READ_CHUNK_SIZE = 50000
+    
+    # usage_metrics columns offered in exports (batch_id, day_key and month_key are internal)
+    PUBLIC_COLUMNS = ['id', 'user_id', 'user_name', 'email', 'department', 'date', 'feature_used',
+                      'usage_count', 'cost_usd', 'tool_source', 'file_source', 'last_day_active',
+                      'first_day_active_in_period', 'last_day_active_in_period', 'created_at']
+    
+    def iter_filtered_data(self, start_date=None, end_date=None, users=None, departments=None, tools=None,
+                           chunksize=None, columns=None, conn=None):
+        """
+        Yield the rows of get_filtered_data as DataFrames of at most chunksize rows.
+        
+        Rows are fetched from the cursor one chunk at a time, so callers that only
+        aggregate or write out the rows hold a single chunk in memory whatever the
+        size of the table. With no filters this is every row (as get_all_data).
+        The connection stays open until the generator is exhausted or closed; the
+        database uses write-ahead logging, so writers are not blocked meanwhile and
+        the rows all come from the snapshot the read started on.
+        
+        Args:
+            start_date, end_date, users, departments, tools: As for get_filtered_data
+            chunksize: Rows per chunk (defaults to READ_CHUNK_SIZE)
+            columns: Optional list of columns to read, e.g. PUBLIC_COLUMNS (default all)
+            conn: Optional open connection to read on (in its transaction); it is
+                  left open for the caller
+        
+        Yields:
+            DataFrame: The next rows, newest first. A query without matches yields
+            one empty DataFrame that still has the columns.
+        
+        Raises:
+            Exception: Read errors are printed and re-raised, so a failed read is
+            not mistaken for the end of the data
+        """
+        own_conn = conn is None
+        try:
+            query, params = self._filtered_query(start_date, end_date, users, departments, tools, columns)
+            if own_conn:
+                conn = self.connect()
+            for chunk in pd.read_sql_query(query, conn, params=params, chunksize=chunksize or self.READ_CHUNK_SIZE):
+                yield chunk
+        except Exception as e:
+            print(f"Error reading filtered data: {e}")
+            raise
+        finally:
+            if own_conn and conn is not None:
+                conn.close()
+    
     def get_tool_comparison_data(self):
         """Get aggregated data for tool comparison."""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = self.connect()
             query = """
                 SELECT 
-                    tool_source,
-                    COUNT(DISTINCT user_id) as unique_users,
-                    SUM(usage_count) as total_usage,
-                    SUM(cost_usd) as total_cost,
-                    AVG(usage_count) as avg_usage_per_record
-                FROM usage_metrics
-                GROUP BY tool_source
+                    t.tool_source,
+                    COUNT(DISTINCT f.user_key) as unique_users,
+                    SUM(f.usage_count) as total_usage,
+                    SUM(f.cost_usd) as total_cost,
+                    AVG(f.usage_count) as avg_usage_per_record
+                FROM fact_usage f
+                LEFT JOIN dim_tool t ON t.tool_key = f.tool_key
+                GROUP BY f.tool_key
                 ORDER BY total_usage DESC
             """
             df = pd.read_sql_query(query, conn)
@@ -348,17 +428,19 @@ class DatabaseManager:
     def get_user_tool_overlap(self):
         """Get users who use multiple tools."""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = self.connect()
             query = """
                 SELECT 
-                    user_id,
-                    user_name,
-                    email,
-                    COUNT(DISTINCT tool_source) as tool_count,
-                    GROUP_CONCAT(DISTINCT tool_source) as tools_used
-                FROM usage_metrics
-                GROUP BY user_id, user_name, email
-                HAVING COUNT(DISTINCT tool_source) > 1
+                    u.user_id,
+                    u.user_name,
+                    u.email,
+                    COUNT(DISTINCT f.tool_key) as tool_count,
+                    GROUP_CONCAT(DISTINCT t.tool_source) as tools_used
+                FROM fact_usage f
+                JOIN dim_user u ON u.user_key = f.user_key
+                LEFT JOIN dim_tool t ON t.tool_key = f.tool_key
+                GROUP BY f.user_key
+                HAVING COUNT(DISTINCT f.tool_key) > 1
                 ORDER BY tool_count DESC
             """
             df = pd.read_sql_query(query, conn)
@@ -371,8 +453,10 @@ class DatabaseManager:
     def delete_all_data(self):
         """Delete all data from database."""
         try:
-            conn = sqlite3.connect(self.db_path)
-            conn.execute("DELETE FROM usage_metrics")
+            conn = self.connect()
+            conn.execute("DELETE FROM fact_usage")
+            self._forget_batches(conn, "1 = 1")
+            self.bump_data_version(conn)
             conn.commit()
             conn.close()
             print("All data deleted successfully")
@@ -384,15 +468,22 @@ class DatabaseManager:
     def delete_by_file(self, file_source):
         """Delete data from a specific file."""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            # Check how many records will be deleted
-            cursor.execute("SELECT COUNT(*) FROM usage_metrics WHERE file_source = ?", (file_source,))
-            count = cursor.fetchone()[0]
+            conn = self.connect()
+            
+            # Rows are found through their batches (idx_usage_batch); rows written
+            # without a batch are matched on file_source among the NULL batch_ids
+            count = conn.execute("""
+                DELETE FROM fact_usage
+                WHERE batch_id IN (SELECT batch_id FROM ingestion_batches WHERE filename = ?)
+            """, (file_source,)).rowcount
+            count += conn.execute("""
+                DELETE FROM fact_usage
+                WHERE batch_id IS NULL AND file_key = (SELECT file_key FROM dim_file WHERE file_source = ?)
+            """, (file_source,)).rowcount
             
             if count > 0:
-                conn.execute("DELETE FROM usage_metrics WHERE file_source = ?", (file_source,))
+                self._forget_batches(conn, "filename = ?", (file_source,))
+                self.bump_data_version(conn)
                 conn.commit()
                 print(f"Deleted {count} records from {file_source}")
             else:
@@ -407,15 +498,18 @@ class DatabaseManager:
     def delete_by_tool(self, tool_source):
         """Delete all data from a specific tool."""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = self.connect()
             cursor = conn.cursor()
             
             # Check how many records will be deleted
-            cursor.execute("SELECT COUNT(*) FROM usage_metrics WHERE tool_source = ?", (tool_source,))
+            tool_key = "(SELECT tool_key FROM dim_tool WHERE tool_source = ?)"
+            cursor.execute(f"SELECT COUNT(*) FROM fact_usage WHERE tool_key = {tool_key}", (tool_source,))
             count = cursor.fetchone()[0]
             
             if count > 0:
-                conn.execute("DELETE FROM usage_metrics WHERE tool_source = ?", (tool_source,))
+                conn.execute(f"DELETE FROM fact_usage WHERE tool_key = {tool_key}", (tool_source,))
+                self._forget_batches(conn, "tool_source = ?", (tool_source,))
+                self.bump_data_version(conn)
                 conn.commit()
                 print(f"Deleted {count} records from {tool_source}")
             else:
@@ -430,7 +524,7 @@ class DatabaseManager:
     def get_database_stats(self):
         """Get comprehensive database statistics."""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = self.connect()
             
             stats = {
                 'total_records': 0,
@@ -444,38 +538,46 @@ class DatabaseManager:
             }
             
             # Total records
-            cursor = conn.execute("SELECT COUNT(*) FROM usage_metrics")
+            cursor = conn.execute("SELECT COUNT(*) FROM fact_usage")
             stats['total_records'] = cursor.fetchone()[0]
             
-            # Unique users
-            cursor = conn.execute("SELECT COUNT(DISTINCT user_id) FROM usage_metrics")
-            stats['unique_users'] = cursor.fetchone()[0]
-            
-            # Unique departments
-            cursor = conn.execute("SELECT COUNT(DISTINCT department) FROM usage_metrics")
-            stats['unique_departments'] = cursor.fetchone()[0]
-            
-            # Unique tools
-            cursor = conn.execute("SELECT COUNT(DISTINCT tool_source) FROM usage_metrics")
-            stats['unique_tools'] = cursor.fetchone()[0]
+            # Unique users, departments and tools are the dimension rows that have usage
+            # (an index seek per dimension row, not a DISTINCT over fact_usage)
+            for stat, table, key in [('unique_users', 'dim_user', 'user_key'),
+                                     ('unique_departments', 'dim_department', 'department_key'),
+                                     ('unique_tools', 'dim_tool', 'tool_key')]:
+                cursor = conn.execute(
+                    f"SELECT COUNT(*) FROM {table} d WHERE EXISTS (SELECT 1 FROM fact_usage f WHERE f.{key} = d.{key})"
+                )
+                stats[stat] = cursor.fetchone()[0]
             
             # Total cost
-            cursor = conn.execute("SELECT SUM(cost_usd) FROM usage_metrics")
+            cursor = conn.execute("SELECT SUM(cost_usd) FROM fact_usage")
             total_cost = cursor.fetchone()[0]
             stats['total_cost'] = float(total_cost) if total_cost else 0.0
             
-            # Date range
-            cursor = conn.execute("SELECT MIN(date), MAX(date) FROM usage_metrics")
-            min_date, max_date = cursor.fetchone()
-            if min_date and max_date:
-                stats['date_range'] = f"{min_date} to {max_date}"
+            # Date range, from both ends of the day_key index
+            cursor = conn.execute(
+                "SELECT (SELECT MIN(day_key) FROM fact_usage), (SELECT MAX(day_key) FROM fact_usage)"
+            )
+            min_key, max_key = cursor.fetchone()
+            if min_key is not None:
+                stats['date_range'] = f"{from_day_key(min_key)} to {from_day_key(max_key)}"
             
             # Records by tool
-            cursor = conn.execute("SELECT tool_source, COUNT(*) FROM usage_metrics GROUP BY tool_source")
+            cursor = conn.execute("""
+                SELECT t.tool_source, c.records
+                FROM (SELECT tool_key, COUNT(*) AS records FROM fact_usage GROUP BY tool_key) c
+                LEFT JOIN dim_tool t ON t.tool_key = c.tool_key
+            """)
             stats['records_by_tool'] = {row[0]: row[1] for row in cursor.fetchall()}
             
             # Records by file
-            cursor = conn.execute("SELECT file_source, COUNT(*) FROM usage_metrics GROUP BY file_source")
+            cursor = conn.execute("""
+                SELECT fi.file_source, c.records
+                FROM (SELECT file_key, COUNT(*) AS records FROM fact_usage GROUP BY file_key) c
+                LEFT JOIN dim_file fi ON fi.file_key = c.file_key
+            """)
             stats['records_by_file'] = {row[0]: row[1] for row in cursor.fetchall()}
             
             conn.close()
@@ -485,6 +587,79 @@ class DatabaseManager:
             print(f"Error getting database stats: {e}")
             return None
     
+    def get_usage_users(self):
+        """
+        Get the distinct (email, user_name, department, tool_source) combinations in the usage data.
+        
+        Returns:
+            DataFrame: One row per combination (empty if unavailable)
+        """
+        try:
+            conn = self.connect()
+            # The distinct keys are found on fact_usage; only those are joined to their names
+            df = pd.read_sql_query("""
+                SELECT DISTINCT u.email, u.user_name, d.department, t.tool_source
+                FROM (SELECT DISTINCT user_key, department_key, tool_key FROM fact_usage) f
+                JOIN dim_user u ON u.user_key = f.user_key
+                LEFT JOIN dim_department d ON d.department_key = f.department_key
+                LEFT JOIN dim_tool t ON t.tool_key = f.tool_key
+            """, conn)
+            conn.close()
+            return df
+        except Exception as e:
+            print(f"Error getting usage users: {e}")
+            return pd.DataFrame(columns=['email', 'user_name', 'department', 'tool_source'])
+    
+    def get_usage_summary(self, tools=None):
+        """
+        Get totals of the usage data, aggregated in SQL.
+        
+        Args:
+            tools: Optional tool_source values to restrict the totals to
+        
+        Returns:
+            dict: total_records, total_cost, total_users (distinct lower-cased emails),
+            min_date and max_date (dates, None without data) and files: a list of
+            (file_source, first date, last date, records), most recent data first
+        """
+        summary = {'total_records': 0, 'total_cost': 0.0, 'total_users': 0,
+                   'min_date': None, 'max_date': None, 'files': []}
+        condition, params = "", []
+        if tools:
+            placeholders = ','.join('?' for _ in tools)
+            condition = f"WHERE tool_key IN (SELECT tool_key FROM dim_tool WHERE tool_source IN ({placeholders}))"
+            params = list(tools)
+        try:
+            conn = self.connect()
+            records, cost, min_key, max_key = conn.execute(
+                f"SELECT COUNT(*), SUM(cost_usd), MIN(day_key), MAX(day_key) FROM fact_usage {condition}", params
+            ).fetchone()
+            summary['total_records'] = records
+            summary['total_cost'] = float(cost) if cost else 0.0
+            if min_key is not None:
+                summary['min_date'] = from_day_key(min_key)
+                summary['max_date'] = from_day_key(max_key)
+            
+            # Count unique emails to avoid over-counting users with multiple records
+            summary['total_users'] = conn.execute(f"""
+                SELECT COUNT(DISTINCT lower(email)) FROM dim_user
+                WHERE user_key IN (SELECT user_key FROM fact_usage {condition})
+            """, params).fetchone()[0]
+            
+            summary['files'] = conn.execute(f"""
+                SELECT fi.file_source, c.first_date, c.last_date, c.records
+                FROM (
+                    SELECT file_key, MIN(date) AS first_date, MAX(date) AS last_date, COUNT(*) AS records
+                    FROM fact_usage {condition} GROUP BY file_key
+                ) c
+                JOIN dim_file fi ON fi.file_key = c.file_key
+                ORDER BY c.last_date DESC, fi.file_source
+            """, params).fetchall()
+            conn.close()
+        except Exception as e:
+            print(f"Error getting usage summary: {e}")
+        return summary
+    
     def get_superseding_preview(self, tool_source, months, users):
         """
         Get preview of records that will be superseded (deleted) for given months and users.
@@ -498,27 +673,21 @@ class DatabaseManager:
             dict: Summary of records that will be affected
         """
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = self.connect()
             cursor = conn.cursor()
             
             # Build query to count affected records
-            month_conditions = []
-            params = [tool_source]
-            
+            month_keys = []
             for month_str in months:
-                # Parse month string to period
+                # Parse month string to a yyyymm key
                 try:
-                    month_period = pd.Period(month_str, 'M')
-                    month_start = month_period.to_timestamp().strftime('%Y-%m-%d')
-                    month_end = (month_period + 1).to_timestamp().strftime('%Y-%m-%d')
-                    month_conditions.append(f"(date >= ? AND date < ?)")
-                    params.extend([month_start, month_end])
+                    month_keys.append(to_month_key(pd.Period(month_str, 'M')))
                 except (ValueError, pd.errors.ParserError) as e:
                     # Skip invalid month formats
                     print(f"Warning: Could not parse month {month_str}: {e}")
                     continue
             
-            if not month_conditions:
+            if not month_keys:
                 conn.close()
                 return {'total_records': 0, 'affected_users': 0, 'months': []}
             
@@ -529,17 +698,17 @@ class DatabaseManager:
             
             # Build user condition with safe parameterized query
             user_placeholders = ','.join(['?' for _ in users])
-            params.extend(users)
+            params = [tool_source] + month_keys + list(users)
             
             query = f"""
                 SELECT 
                     COUNT(*) as total_records,
-                    COUNT(DISTINCT user_id) as affected_users,
+                    COUNT(DISTINCT user_key) as affected_users,
                     COUNT(DISTINCT date) as affected_dates
-                FROM usage_metrics
-                WHERE tool_source = ?
-                AND ({' OR '.join(month_conditions)})
-                AND user_id IN ({user_placeholders})
+                FROM fact_usage
+                WHERE tool_key = (SELECT tool_key FROM dim_tool WHERE tool_source = ?)
+                AND month_key IN ({','.join(['?' for _ in month_keys])})
+                AND user_key IN (SELECT user_key FROM dim_user WHERE user_id IN ({user_placeholders}))
             """
             
             cursor.execute(query, params)
@@ -562,11 +731,23 @@ class DatabaseManager:
         """
         Detect duplicate records based on (user_id, date, feature_used, tool_source).
         
+        The unique idx_usage_natural_key index rules duplicates out, so with it in
+        place this is a schema lookup; the GROUP BY over the table only runs on a
+        database without it.
+        
         Returns:
             DataFrame with duplicate record information
         """
+        columns = ['user_id', 'date', 'feature_used', 'tool_source', 'duplicate_count', 'total_usage', 'record_ids']
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = self.connect()
+            unique_key = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'idx_usage_natural_key'"
+            ).fetchone()
+            if unique_key:
+                conn.close()
+                return pd.DataFrame(columns=columns)
+            
             query = """
                 SELECT 
                     user_id,
@@ -588,6 +769,717 @@ class DatabaseManager:
             print(f"Error detecting duplicates: {e}")
             return pd.DataFrame()
     
+    # Per-user aggregation shared by the rollup rebuild and filtered User Directory queries.
+    # user_name/department are bare columns, so SQLite takes them from the row holding
+    # MAX(date) (the user's most recent record). Employee roster departments win over
+    # the department recorded at upload time.
+    _USER_STATS_SQL = """
+        WITH agg AS (
+            SELECT
+                email,
+                user_name,
+                department,
+                MAX(date) AS last_date,
+                GROUP_CONCAT(DISTINCT tool_source) AS tool_source,
+                SUM(CASE WHEN feature_used = 'ChatGPT Messages' THEN usage_count ELSE 0 END) AS chatgpt_messages,
+                SUM(CASE WHEN feature_used = 'GPT Messages' THEN usage_count ELSE 0 END) AS gpt_messages,
+                SUM(CASE WHEN feature_used = 'Project Messages' THEN usage_count ELSE 0 END) AS project_messages,
+                SUM(CASE WHEN feature_used = 'Tool Messages' THEN usage_count ELSE 0 END) AS tool_messages,
+                SUM(CASE WHEN feature_used = 'BlueFlame Messages' THEN usage_count ELSE 0 END) AS blueflame_messages
+            FROM usage_metrics
+            WHERE email IS NOT NULL AND email != '' {filters}
+            GROUP BY email
+        )
+        SELECT
+            agg.email,
+            COALESCE(agg.user_name, '') AS user_name,
+            COALESCE(NULLIF(e.department, ''), agg.department, 'Unknown') AS department,
+            agg.tool_source,
+            agg.chatgpt_messages,
+            agg.gpt_messages,
+            agg.project_messages,
+            agg.tool_messages,
+            agg.chatgpt_messages + agg.gpt_messages + agg.project_messages AS openai_messages,
+            agg.blueflame_messages,
+            agg.chatgpt_messages + agg.gpt_messages + agg.project_messages + agg.blueflame_messages AS total_messages_excl_tools,
+            agg.chatgpt_messages + agg.gpt_messages + agg.project_messages + agg.blueflame_messages + agg.tool_messages AS total_messages_all
+        FROM agg
+        LEFT JOIN employees e ON e.email = LOWER(agg.email)
+    """
+    
+    _USER_STATS_COLUMNS = [
+        'email', 'user_name', 'department', 'tool_source', 'chatgpt_messages', 'gpt_messages',
+        'project_messages', 'tool_messages', 'openai_messages', 'blueflame_messages',
+        'total_messages_excl_tools', 'total_messages_all'
+    ]
+    
+    def refresh_user_rollup(self, force=False):
+        """
+        Rebuild the per-user rollup table if it is older than the current data version.
+        
+        Args:
+            force: Rebuild even if the rollup is up to date
+        
+        Returns:
+            bool: True if the rollup was rebuilt
+        """
+        try:
+            conn = self.connect()
+            meta = dict(conn.execute(
+                "SELECT key, value FROM db_meta WHERE key IN ('data_version', 'user_rollup_version')"
+            ).fetchall())
+            data_version = meta.get('data_version', '0')
+            
+            if not force and meta.get('user_rollup_version') == data_version:
+                conn.close()
+                return False
+            
+            columns = ', '.join(self._USER_STATS_COLUMNS)
+            with conn:
+                conn.execute("DELETE FROM user_rollup")
+                conn.execute(
+                    f"INSERT INTO user_rollup ({columns}) " + self._USER_STATS_SQL.format(filters='')
+                )
+                conn.execute(
+                    "INSERT OR REPLACE INTO db_meta (key, value) VALUES ('user_rollup_version', ?)",
+                    (data_version,)
+                )
+            conn.close()
+            return True
+        except Exception as e:
+            print(f"Error refreshing user rollup: {e}")
+            return False
+    
+    def get_search_index(self, kind='users'):
+        """
+        Get the in-process search index for users or employees, built once per data version.
+        
+        Args:
+            kind: 'users' (ids are usage emails, as in user_rollup) or
+                  'employees' (ids are employee_id values)
+        
+        Returns:
+            SearchIndex over names, emails and departments
+        """
+        data_version = self.get_data_version()
+        cached = self._search_indexes.get(kind)
+        if cached is not None and cached[0] == data_version:
+            return cached[1]
+        
+        try:
+            if kind == 'users':
+                self.refresh_user_rollup()
+                query = "SELECT email, user_name, email, department FROM user_rollup ORDER BY user_name, email"
+            elif kind == 'employees':
+                query = """
+                    SELECT employee_id, TRIM(COALESCE(first_name, '') || ' ' || COALESCE(last_name, '')),
+                           email, department
+                    FROM employees ORDER BY last_name, first_name
+                """
+            else:
+                raise ValueError(f"Unknown search index: {kind}")
+            
+            conn = self.connect()
+            rows = conn.execute(query).fetchall()
+            conn.close()
+            
+            index = SearchIndex(
+                (record_id, {'name': name, 'email': email, 'department': department})
+                for record_id, name, email, department in rows
+            )
+        except ValueError:
+            raise
+        except Exception as e:
+            print(f"Error building {kind} search index: {e}")
+            return SearchIndex([])
+        
+        self._search_indexes[kind] = (data_version, index)
+        return index
+    
+    def query_user_stats(self, search=None, sort_by="Total Messages (High to Low)", page=1, per_page=20,
+                         exclude_tool_messages=True, start_date=None, end_date=None, tools=None,
+                         departments=None, cursor=None):
+        """
+        Get one page of per-user usage statistics with search, sorting and pagination done in SQL.
+        
+        Without date/tool/department filters the query runs against the indexed user_rollup
+        table; with filters the per-user aggregation is computed on the fly for that slice.
+        
+        Args:
+            search: Optional query; every token must prefix-match a token of the user's
+                   name, email or department (see get_search_index)
+            sort_by: "Total Messages (High to Low)", "Total Messages (Low to High)",
+                    "Name (A-Z)", "Department (A-Z)", or "Best Match" (search rank;
+                    falls back to the default order without a search)
+            page: Page number (1-indexed)
+            per_page: Number of results per page
+            exclude_tool_messages: If True, excludes Tool Messages from total_messages
+            start_date: Optional inclusive start date filter
+            end_date: Optional inclusive end date filter
+            tools: Optional list of tool_source values
+            departments: Optional list of departments, matched against the department shown
+                        for the user (the employee roster's, else the one recorded in usage_metrics)
+            cursor: Optional next_cursor returned for page - 1; enables keyset pagination
+                   instead of OFFSET
+        
+        Returns:
+            Dictionary with:
+            - 'users': DataFrame with the requested page of user statistics
+            - 'total_count': Total number of users matching filters
+            - 'total_pages': Total number of pages
+            - 'current_page': Current page number
+            - 'next_cursor': Cursor to pass when requesting page + 1 (None on the last page)
+        """
+        empty_result = {
+            'users': pd.DataFrame(),
+            'total_count': 0,
+            'total_pages': 0,
+            'current_page': page,
+            'next_cursor': None
+        }
+        
+        try:
+            page = max(1, int(page))
+            per_page = max(1, int(per_page))
+            total_col = 'total_messages_excl_tools' if exclude_tool_messages else 'total_messages_all'
+            
+            # Sort key column and direction for each sort option
+            sort_options = {
+                "Total Messages (High to Low)": (total_col, 'DESC'),
+                "Total Messages (Low to High)": (total_col, 'ASC'),
+                "Name (A-Z)": ('user_name', 'ASC'),
+                "Department (A-Z)": ('department', 'ASC'),
+            }
+            has_search = bool(search and search.strip())
+            if sort_by == "Best Match" and has_search:
+                sort_col, direction = ('search_rank', 'ASC')
+            else:
+                sort_col, direction = sort_options.get(sort_by, sort_options["Total Messages (High to Low)"])
+            
+            filters = ""
+            filter_params = []
+            if start_date and end_date:
+                filters += " AND day_key BETWEEN ? AND ?"
+                filter_params.extend([to_day_key(start_date), to_day_key(end_date)])
+            if tools:
+                filters += f" AND tool_source IN ({','.join(['?' for _ in tools])})"
+                filter_params.extend(tools)
+            
+            if filters:
+                source = f"({self._USER_STATS_SQL.format(filters=filters)}) AS stats"
+            else:
+                self.refresh_user_rollup()
+                source = "user_rollup AS stats"
+            
+            # Departments filter the displayed (roster) department, so it is applied after the join
+            if departments:
+                source = (f"(SELECT * FROM {source}"
+                          f" WHERE department IN ({','.join(['?' for _ in departments])})) AS stats")
+                filter_params.extend(departments)
+            
+            # Search runs against the in-process index; its ranked ids are joined in as a temp table
+            search_ids = None
+            if has_search:
+                search_ids = self.get_search_index('users').search(search)
+                if not search_ids:
+                    return empty_result
+            
+            conn = self.connect()
+            if search_ids is not None:
+                conn.execute("CREATE TEMP TABLE search_hits (email TEXT PRIMARY KEY, search_rank INTEGER)")
+                conn.executemany("INSERT INTO search_hits VALUES (?, ?)", zip(search_ids, range(len(search_ids))))
+                source = (f"(SELECT stats.*, hits.search_rank FROM {source}"
+                          f" JOIN temp.search_hits AS hits ON hits.email = stats.email) AS stats")
+            
+            total_count = conn.execute(f"SELECT COUNT(*) FROM {source}", filter_params).fetchone()[0]
+            total_pages = (total_count + per_page - 1) // per_page if total_count > 0 else 0
+            
+            # Keyset pagination: continue after the last row of the previous page.
+            # email breaks ties in the same direction, so (sort_col, email) is a single index range.
+            page_params = []
+            if cursor is not None:
+                comparison = '<' if direction == 'DESC' else '>'
+                keyset = f"({sort_col}, email) {comparison} (?, ?)"
+                where = f" WHERE {keyset}"
+                page_params = [cursor[0], cursor[1]]
+                limit = " LIMIT ?"
+                limit_params = [per_page]
+            else:
+                where = ""
+                limit = " LIMIT ? OFFSET ?"
+                limit_params = [per_page, (page - 1) * per_page]
+            
+            query = (
+                f"SELECT * FROM {source}{where}"
+                f" ORDER BY {sort_col} {direction}, email {direction}{limit}"
+            )
+            users = pd.read_sql_query(query, conn, params=filter_params + page_params + limit_params)
+            conn.close()
+            
+            if users.empty:
+                empty_result.update({'total_count': total_count, 'total_pages': total_pages, 'current_page': page})
+                return empty_result
+            
+            users['total_messages'] = users[total_col]
+            
+            next_cursor = None
+            if page < total_pages:
+                last_row = users.iloc[-1]
+                next_cursor = (last_row[sort_col].item() if hasattr(last_row[sort_col], 'item') else last_row[sort_col],
+                               last_row['email'])
+            
+            return {
+                'users': users,
+                'total_count': total_count,
+                'total_pages': total_pages,
+                'current_page': page,
+                'next_cursor': next_cursor
+            }
+        
+        except Exception as e:
+            print(f"Error querying user stats: {e}")
+            return empty_result
+    
+    def record_ingestion_run(self, filename, content_hash, spans, status, rows=0, file_bytes=None,
+                             tool_source=None, total_ms=None, message=None, started_at=None):
+        """
+        Store the timing spans of one file ingestion.
+        
+        Args:
+            filename: Name of the ingested file
+            content_hash: SHA-256 of the file content (identifies re-uploads of the same export)
+            spans: List of span dicts from IngestionTimer (stage, start_ms, duration_ms, rows, bytes)
+            status: 'success' or 'error'
+            rows: Records written to usage_metrics
+            file_bytes: File size in bytes
+            tool_source: Detected tool (ChatGPT, BlueFlame AI)
+            total_ms: Wall time of the whole run
+            message: Result or error message
+            started_at: ISO timestamp of the start of the run
+        
+        Returns:
+            int: id of the new ingestion_runs row, or None on error
+        """
+        try:
+            conn = self.connect()
+            cursor = conn.execute("""
+                INSERT INTO ingestion_runs (filename, content_hash, file_bytes, tool_source, status,
+                                            rows, total_ms, spans, message, started_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP))
+            """, (filename, content_hash, file_bytes, tool_source, status, rows, total_ms,
+                  json.dumps(spans), message, started_at))
+            run_id = cursor.lastrowid
+            conn.commit()
+            conn.close()
+            return run_id
+        except Exception as e:
+            print(f"Error recording ingestion run: {e}")
+            return None
+    
+    def get_ingestion_runs(self, filename=None, limit=200):
+        """
+        Get recorded ingestion runs, newest first.
+        
+        Args:
+            filename: Optional file name to restrict to
+            limit: Maximum number of runs
+        
+        Returns:
+            DataFrame with one row per run; the spans column holds the parsed span list
+        """
+        try:
+            conn = self.connect()
+            query = "SELECT * FROM ingestion_runs"
+            params = []
+            if filename:
+                query += " WHERE filename = ?"
+                params.append(filename)
+            query += " ORDER BY started_at DESC, id DESC LIMIT ?"
+            params.append(limit)
+            df = pd.read_sql_query(query, conn, params=params)
+            conn.close()
+            df['spans'] = df['spans'].apply(lambda value: json.loads(value) if value else [])
+            return df
+        except Exception as e:
+            print(f"Error getting ingestion runs: {e}")
+            return pd.DataFrame()
+    
+    # Columns copied between fact_usage and usage_metrics_history
+    _HISTORY_COLUMNS = """id, batch_id, user_key, department_key, date, feature_key, usage_count,
+        cost_usd, tool_key, file_key, last_day_active, first_day_active_in_period,
+        last_day_active_in_period, created_at"""
+    
+    # usage_metrics column -> (dimension table, fact_usage key column); user_id,
+    # user_name and email share dim_user (see _user_keys)
+    DIMENSIONS = {
+        'department': ('dim_department', 'department_key'),
+        'feature_used': ('dim_feature', 'feature_key'),
+        'tool_source': ('dim_tool', 'tool_key'),
+        'file_source': ('dim_file', 'file_key'),
+    }
+    
+    def begin_batch(self, conn, filename, tool_source):
+        """
+        Register an ingestion batch in the caller's transaction.
+        
+        Args:
+            conn: Open connection; the caller commits (or rolls back) the batch with its rows
+            filename: Name of the ingested file
+            tool_source: Tool the rows belong to
+        
+        Returns:
+            int: batch_id to store on the inserted rows
+        """
+        cursor = conn.execute(
+            "INSERT INTO ingestion_batches (filename, tool_source) VALUES (?, ?)", (filename, tool_source)
+        )
+        return cursor.lastrowid
+    
+    def supersede_rows(self, conn, batch_id, tool_source, months, users):
+        """
+        Move the rows a batch replaces to usage_metrics_history, in the caller's transaction.
+        
+        Args:
+            conn: Open connection of the batch's transaction
+            batch_id: Batch doing the superseding
+            tool_source: Tool whose rows are replaced
+            months: month_key (yyyymm) values covered by the batch
+            users: user_id values covered by the batch
+        
+        Returns:
+            int: Number of rows superseded
+        """
+        # One set-based statement per month against a temp table of the users
+        # (much cheaper than a statement per month and user)
+        conn.execute("CREATE TEMP TABLE IF NOT EXISTS superseded_users (user_id TEXT PRIMARY KEY)")
+        conn.execute("DELETE FROM superseded_users")
+        conn.executemany("INSERT OR IGNORE INTO superseded_users (user_id) VALUES (?)",
+                         [(user_id,) for user_id in users])
+        
+        # (tool_key, month_key, user_key) is idx_usage_tool_month_user
+        scope = """
+            FROM fact_usage
+            WHERE tool_key = (SELECT tool_key FROM dim_tool WHERE tool_source = ?) AND month_key = ?
+            AND user_key IN (SELECT u.user_key FROM superseded_users s JOIN dim_user u ON u.user_id = s.user_id)
+        """
+        params = [(tool_source, int(month_key)) for month_key in months]
+        conn.executemany(f"""
+            INSERT INTO usage_metrics_history (superseded_by, {self._HISTORY_COLUMNS})
+            SELECT {int(batch_id)}, {self._HISTORY_COLUMNS} {scope}
+        """, params)
+        return conn.executemany(f"DELETE {scope}", params).rowcount
+    
+    # Natural key of a usage row in fact_usage (see idx_usage_natural_key)
+    NATURAL_KEY = ('user_key', 'date', 'feature_key', 'tool_key')
+    
+    def _user_keys(self, conn, user_ids, user_names, emails):
+        """
+        Add or update the dim_user rows of the given users and return their keys.
+        
+        A user's name and email are those of their last row (missing values keep
+        the stored ones).
+        
+        Returns:
+            list: user_key per value of user_ids
+        """
+        latest = {}
+        for user_id, user_name, email in zip(user_ids, user_names, emails):
+            latest[user_id] = (user_id, user_name, email)
+        
+        # Only new users and changed names/emails are written (re-uploads mostly have neither)
+        stored = {row[0]: row[1:] for row in conn.execute("SELECT user_id, user_name, email FROM dim_user")}
+        changed = []
+        for user_id, user_name, email in latest.values():
+            current = stored.get(str(user_id))
+            if (current is None
+                    or (user_name is not None and str(user_name) != current[0])
+                    or (email is not None and str(email) != current[1])):
+                changed.append((user_id, user_name, email))
+        if changed:
+            conn.executemany("""
+                INSERT INTO dim_user (user_id, user_name, email) VALUES (?, ?, ?)
+                ON CONFLICT(user_id) DO UPDATE SET
+                    user_name = COALESCE(excluded.user_name, dim_user.user_name),
+                    email = COALESCE(excluded.email, dim_user.email)
+            """, changed)
+        lookup = dict(conn.execute("SELECT user_id, user_key FROM dim_user").fetchall())
+        return [lookup.get(str(user_id)) for user_id in user_ids]
+    
+    def _dimension_keys(self, conn, column, values):
+        """
+        Add any new values of a single-value dimension and return their keys.
+        
+        Args:
+            conn: Open connection
+            column: usage_metrics column of the dimension (a key of DIMENSIONS)
+            values: Column values; None stays None
+        
+        Returns:
+            list: Key per value
+        """
+        table, key = self.DIMENSIONS[column]
+        conn.executemany(f"INSERT OR IGNORE INTO {table} ({column}) VALUES (?)",
+                         [(value,) for value in set(values) if value is not None])
+        # Values are stored as TEXT, so look them up by their text
+        lookup = dict(conn.execute(f"SELECT {column}, {key} FROM {table}").fetchall())
+        return [None if value is None else lookup.get(str(value)) for value in values]
+    
+    def _fact_rows(self, conn, columns, rows):
+        """
+        Translate usage_metrics rows to fact_usage rows, adding new dimension values.
+        
+        Args:
+            conn: Open connection
+            columns: usage_metrics columns of the rows (user_id is required)
+            rows: Row tuples in column order
+        
+        Returns:
+            tuple: (fact_usage columns: list, rows: list of tuples)
+        """
+        values = dict(zip(columns, zip(*rows))) if rows else {column: () for column in columns}
+        missing = [None] * len(rows)
+        # tool_source keeps the 'ChatGPT' default it had as a column
+        if 'tool_source' not in values:
+            values['tool_source'] = ['ChatGPT'] * len(rows)
+        
+        fact_columns = ['user_key']
+        fact_values = [self._user_keys(conn, values['user_id'], values.get('user_name', missing),
+                                       values.get('email', missing))]
+        for column, column_values in values.items():
+            if column in ('user_id', 'user_name', 'email'):
+                continue
+            if column in self.DIMENSIONS:
+                fact_columns.append(self.DIMENSIONS[column][1])
+                fact_values.append(self._dimension_keys(conn, column, column_values))
+            elif column == 'created_at':
+                # Stored as Unix seconds; each distinct timestamp is converted once, by SQLite
+                # the same way the usage_metrics view's insert trigger converts it
+                seconds = {
+                    text: conn.execute("SELECT CAST(strftime('%s', ?) AS INTEGER)", (text,)).fetchone()[0]
+                    for text in set(column_values)
+                }
+                fact_columns.append(column)
+                fact_values.append([seconds[text] for text in column_values])
+            else:
+                fact_columns.append(column)
+                fact_values.append(column_values)
+        return fact_columns, list(zip(*fact_values))
+    
+    def upsert_rows(self, conn, columns, rows, policy='replace', archive_batch_id=None):
+        """
+        Insert usage rows, merging rows whose natural key is already stored, in the caller's transaction.
+        
+        Args:
+            conn: Open connection of the batch's transaction
+            columns: usage_metrics columns of the rows (must include user_id, date,
+                feature_used and tool_source); dimension values are translated to keys
+            rows: Row tuples in column order
+            policy: 'replace' (incoming values win) or 'sum' (usage_count is added up)
+            archive_batch_id: When given, stored rows about to be overwritten are first
+                copied to usage_metrics_history as superseded by this batch, so rolling
+                it back restores them. Not needed after supersede_rows has already moved
+                every row the keys can match.
+        
+        Returns:
+            int: Number of stored rows archived to usage_metrics_history (0 without archive_batch_id)
+        """
+        if policy not in ('replace', 'sum'):
+            raise ValueError(f"Unknown upsert policy: {policy}")
+        
+        columns, rows = self._fact_rows(conn, columns, rows)
+        
+        if archive_batch_id is not None:
+            key_positions = [columns.index(col) for col in self.NATURAL_KEY]
+            conn.execute(f"""
+                CREATE TEMP TABLE IF NOT EXISTS incoming_keys AS
+                SELECT {', '.join(self.NATURAL_KEY)} FROM fact_usage WHERE 0
+            """)
+            conn.execute("DELETE FROM incoming_keys")
+            conn.executemany("INSERT INTO incoming_keys VALUES (?, ?, ?, ?)",
+                             [tuple(row[i] for i in key_positions) for row in rows])
+            archived = conn.execute(f"""
+                INSERT INTO usage_metrics_history (superseded_by, {self._HISTORY_COLUMNS})
+                SELECT {int(archive_batch_id)}, {self._HISTORY_COLUMNS} FROM fact_usage
+                WHERE id IN (
+                    SELECT u.id FROM incoming_keys k
+                    JOIN fact_usage u ON {' AND '.join(f'u.{col} = k.{col}' for col in self.NATURAL_KEY)}
+                )
+            """).rowcount
+        else:
+            archived = 0
+        
+        updates = [f"{col} = excluded.{col}" for col in columns if col not in self.NATURAL_KEY]
+        if policy == 'sum':
+            updates = [
+                "usage_count = COALESCE(fact_usage.usage_count, 0) + COALESCE(excluded.usage_count, 0)"
+                if update.startswith('usage_count ') else update
+                for update in updates
+            ]
+        conn.executemany(
+            f"INSERT INTO fact_usage ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)}) "
+            f"ON CONFLICT({', '.join(self.NATURAL_KEY)}) DO UPDATE SET {', '.join(updates)}",
+            rows
+        )
+        return archived
+    
+    def finish_batch(self, conn, batch_id, rows_inserted, rows_superseded):
+        """Record a batch's row counts in the caller's transaction."""
+        conn.execute(
+            "UPDATE ingestion_batches SET rows_inserted = ?, rows_superseded = ? WHERE batch_id = ?",
+            (rows_inserted, rows_superseded, batch_id)
+        )
+    
+    def rollback_batch(self, batch_id):
+        """
+        Undo an ingestion batch: delete its rows and restore the rows it superseded.
+        
+        A batch whose own rows were later superseded by another batch cannot be
+        rolled back until that batch is (otherwise both versions would be live).
+        
+        Args:
+            batch_id: Batch to roll back
+        
+        Returns:
+            tuple: (success: bool, message: str)
+        """
+        try:
+            conn = self.connect_bulk()
+            try:
+                # Take the write lock before checking, so no ingest can slip in between
+                conn.execute("BEGIN IMMEDIATE")
+                batch = conn.execute(
+                    "SELECT filename, status FROM ingestion_batches WHERE batch_id = ?", (batch_id,)
+                ).fetchone()
+                if batch is None:
+                    conn.rollback()
+                    return False, f"Batch {batch_id} not found"
+                filename, status = batch
+                if status != 'active':
+                    conn.rollback()
+                    return False, f"Batch {batch_id} ({filename}) is {status.replace('_', ' ')}"
+                
+                later = conn.execute(
+                    "SELECT superseded_by FROM usage_metrics_history WHERE batch_id = ? LIMIT 1", (batch_id,)
+                ).fetchone()
+                if later:
+                    conn.rollback()
+                    return False, (f"Rows of batch {batch_id} ({filename}) were superseded by batch {later[0]}; "
+                                   f"roll back batch {later[0]} first")
+                
+                removed = conn.execute("DELETE FROM fact_usage WHERE batch_id = ?", (batch_id,)).rowcount
+                restored = conn.execute(f"""
+                    INSERT INTO fact_usage ({self._HISTORY_COLUMNS})
+                    SELECT {self._HISTORY_COLUMNS} FROM usage_metrics_history WHERE superseded_by = ?
+                """, (batch_id,)).rowcount
+                conn.execute("DELETE FROM usage_metrics_history WHERE superseded_by = ?", (batch_id,))
+                conn.execute("""
+                    UPDATE ingestion_batches SET status = 'rolled_back', rolled_back_at = ?
+                    WHERE batch_id = ?
+                """, (datetime.now().isoformat(), batch_id))
+                self.bump_data_version(conn)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                conn.close()
+            
+            message = f"Rolled back batch {batch_id} ({filename}): removed {removed} records, restored {restored}"
+            print(message)
+            return True, message
+        except Exception as e:
+            print(f"Error rolling back batch: {e}")
+            return False, f"Error rolling back batch: {str(e)}"
+    
+    def get_ingestion_batches(self, limit=200):
+        """
+        Get ingestion batches, newest first.
+        
+        Args:
+            limit: Maximum number of batches
+        
+        Returns:
+            DataFrame with batch_id, filename, tool_source, rows_inserted,
+            rows_superseded, status, created_at and rolled_back_at
+        """
+        try:
+            conn = self.connect()
+            df = pd.read_sql_query(
+                "SELECT * FROM ingestion_batches ORDER BY batch_id DESC LIMIT ?", conn, params=(limit,)
+            )
+            conn.close()
+            return df
+        except Exception as e:
+            print(f"Error getting ingestion batches: {e}")
+            return pd.DataFrame()
+    
+    def _forget_batches(self, conn, where, params=()):
+        """Mark the matching active batches as deleted and drop their superseded-row history."""
+        batch_ids = f"SELECT batch_id FROM ingestion_batches WHERE status = 'active' AND {where}"
+        conn.execute(f"""
+            DELETE FROM usage_metrics_history
+            WHERE superseded_by IN ({batch_ids}) OR batch_id IN ({batch_ids})
+        """, tuple(params) * 2)
+        conn.execute(f"UPDATE ingestion_batches SET status = 'deleted' WHERE batch_id IN ({batch_ids})", params)
+    
+    def get_slow_queries(self, limit=None):
+        """
+        Get the slowest statements recorded by the slow query log, slowest first.
+        
+        The log is process-wide: it covers statements from every DatabaseManager
+        and DataProcessor connection since the app started (or the log was cleared).
+        
+        Args:
+            limit: Optional maximum number of statements
+        
+        Returns:
+            DataFrame with duration_ms, rows, caller, sql, plan (list of EXPLAIN QUERY PLAN
+            lines or None), full_scan and recorded_at columns
+        """
+        columns = ['duration_ms', 'rows', 'caller', 'sql', 'plan', 'full_scan', 'recorded_at']
+        try:
+            entries = query_monitor.slow_query_log.entries()
+            if limit:
+                entries = entries[:limit]
+            df = pd.DataFrame(entries, columns=['duration_ms', 'rows', 'caller', 'sql', 'plan', 'recorded_at'])
+            # SQLite reports index-bounded lookups as SEARCH; SCAN visits every row
+            df['full_scan'] = df['plan'].apply(
+                lambda plan: any(line.startswith('SCAN') for line in plan) if plan else None
+            )
+            return df[columns]
+        except Exception as e:
+            print(f"Error getting slow queries: {e}")
+            return pd.DataFrame(columns=columns)
+    
+    def get_slow_query_settings(self):
+        """
+        Get the slow query log configuration.
+        
+        Returns:
+            dict: capacity, explain_threshold_ms (None when plan capture is off), statements_seen
+        """
+        log = query_monitor.slow_query_log
+        return {
+            'capacity': log.capacity,
+            'explain_threshold_ms': log.explain_threshold_ms,
+            'statements_seen': log.statements_seen
+        }
+    
+    def configure_slow_query_log(self, capacity=None, explain_threshold_ms=None):
+        """
+        Change the slow query log size and query plan threshold.
+        
+        Args:
+            capacity: Number of slowest statements kept
+            explain_threshold_ms: Capture EXPLAIN QUERY PLAN for logged statements slower than
+                this; pass a negative value to turn plan capture off
+        """
+        query_monitor.slow_query_log.configure(capacity=capacity, explain_threshold_ms=explain_threshold_ms)
+    
+    def clear_slow_queries(self):
+        """Clear the slow query log."""
+        query_monitor.slow_query_log.clear()
+    
     def load_employees(self, df):
         """
         Load or update employee records from a DataFrame.
@@ -600,7 +1492,7 @@ class DatabaseManager:
             tuple: (success: bool, message: str, count: int)
         """
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = self.connect()
             cursor = conn.cursor()
             
             inserted = 0
@@ -703,6 +1595,7 @@ class DatabaseManager:
                     ))
                     inserted += 1
             
+            self.bump_data_version(conn)
             conn.commit()
             conn.close()
             
@@ -737,7 +1630,7 @@ class DatabaseManager:
             if not email_stripped:
                 return None
                 
-            conn = sqlite3.connect(self.db_path)
+            conn = self.connect()
             cursor = conn.execute(
                 "SELECT employee_id, first_name, last_name, email, title, department, status FROM employees WHERE LOWER(email) = ?",
                 (email_stripped.lower(),)
@@ -784,7 +1677,7 @@ class DatabaseManager:
             if not first_name_stripped or not last_name_stripped:
                 return None
                 
-            conn = sqlite3.connect(self.db_path)
+            conn = self.connect()
             cursor = conn.execute(
                 "SELECT employee_id, first_name, last_name, email, title, department, status FROM employees WHERE LOWER(first_name) = ? AND LOWER(last_name) = ?",
                 (first_name_stripped.lower(), last_name_stripped.lower())
@@ -811,7 +1704,7 @@ class DatabaseManager:
     def get_all_employees(self):
         """Get all employee records."""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = self.connect()
             df = pd.read_sql_query(
                 "SELECT employee_id, first_name, last_name, email, title, department, status FROM employees ORDER BY last_name, first_name",
                 conn
@@ -825,7 +1718,7 @@ class DatabaseManager:
     def get_employee_departments(self):
         """Get unique departments from employee table."""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = self.connect()
             df = pd.read_sql_query(
                 "SELECT DISTINCT department FROM employees WHERE department IS NOT NULL AND department != '' ORDER BY department",
                 conn
@@ -845,7 +1738,7 @@ class DatabaseManager:
             DataFrame with unidentified users and their usage stats
         """
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = self.connect()
             query = """
                 SELECT 
                     um.email,
@@ -881,7 +1774,7 @@ class DatabaseManager:
     def get_employee_count(self):
         """Get count of employees in the database."""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = self.connect()
             cursor = conn.execute("SELECT COUNT(*) FROM employees")
             count = cursor.fetchone()[0]
             conn.close()
@@ -907,7 +1800,7 @@ class DatabaseManager:
             else:
                 employee_id = int(employee_id)
             
-            conn = sqlite3.connect(self.db_path)
+            conn = self.connect()
             cursor = conn.cursor()
             
             # First check if employee exists
@@ -922,6 +1815,7 @@ class DatabaseManager:
             
             # Delete the employee
             cursor.execute("DELETE FROM employees WHERE employee_id = ?", (employee_id,))
+            self.bump_data_version(conn)
             conn.commit()
             conn.close()
             
@@ -941,6 +1835,8 @@ class DatabaseManager:
         """
         Delete all usage metrics for a specific employee email.
         This removes the employee's data from analytics while keeping the employee record.
+        Their superseded rows are deleted too, so rolling back a later batch does not
+        restore them.
         
         Args:
             email: The employee email to delete usage for
@@ -952,19 +1848,21 @@ class DatabaseManager:
             if not email:
                 return False, "No email provided", 0
             
-            conn = sqlite3.connect(self.db_path)
+            conn = self.connect()
             cursor = conn.cursor()
             
-            # Count records to be deleted
-            cursor.execute("SELECT COUNT(*) FROM usage_metrics WHERE LOWER(email) = ?", (email.lower(),))
-            count = cursor.fetchone()[0]
+            # Delete usage records and their superseded-row history in one transaction
+            user_keys = "(SELECT user_key FROM dim_user WHERE LOWER(email) = ?)"
+            count = cursor.execute(f"DELETE FROM fact_usage WHERE user_key IN {user_keys}",
+                                   (email.lower(),)).rowcount
+            history = cursor.execute(f"DELETE FROM usage_metrics_history WHERE user_key IN {user_keys}",
+                                     (email.lower(),)).rowcount
             
-            if count == 0:
+            if count == 0 and history == 0:
                 conn.close()
                 return True, "No usage data found for this email", 0
             
-            # Delete usage records
-            cursor.execute("DELETE FROM usage_metrics WHERE LOWER(email) = ?", (email.lower(),))
+            self.bump_data_version(conn)
             conn.commit()
             conn.close()
             
@@ -994,7 +1892,7 @@ class DatabaseManager:
             else:
                 employee_id = int(employee_id)
             
-            conn = sqlite3.connect(self.db_path)
+            conn = self.connect()
             cursor = conn.cursor()
             
             # Get employee info first
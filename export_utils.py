@@ -6,8 +6,6 @@ Provides PDF and Excel export functionality with executive-ready formatting.
 import pandas as pd
 from datetime import datetime
 from io import BytesIO
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
 
 def generate_excel_export(data, include_pivots=True):
     """
@@ -301,3 +299,26 @@ def generate_pdf_report_html(data, report_title="AI Usage Analytics Report"):
     """
     
     return html
+
+def write_csv_chunks(chunks, output):
+    """
+    Write DataFrame chunks to one CSV file, holding only one chunk in memory.
+    
+    Args:
+        chunks: Iterable of DataFrames with the same columns, e.g. DatabaseManager.iter_filtered_data()
+        output: File path or open text file
+    
+    Returns:
+        int: Number of data rows written
+    """
+    if isinstance(output, str):
+        with open(output, 'w', newline='', encoding='utf-8') as f:
+            return write_csv_chunks(chunks, f)
+    
+    rows = 0
+    header = True
+    for chunk in chunks:
+        chunk.to_csv(output, index=False, header=header)
+        header = False
+        rows += len(chunk)
+    return rows
@@ -6,9 +6,9 @@ and error handling specifically designed for Streamlit file uploads.
 import pandas as pd
 import io
 import os
-import chardet
 from typing import Tuple, Optional
-import streamlit as st
+
+from ingestion_timing import span
 
 
 def detect_encoding(file_content: bytes) -> str:
@@ -21,6 +21,9 @@ def detect_encoding(file_content: bytes) -> str:
     Returns:
         Detected encoding string (e.g., 'utf-8', 'iso-8859-1')
     """
+    # Imported lazily: chardet is only needed when a file is actually read
+    import chardet
+    
     result = chardet.detect(file_content)
     encoding = result.get('encoding', 'utf-8')
     confidence = result.get('confidence', 0)
@@ -32,50 +35,18 @@ def detect_encoding(file_content: bytes) -> str:
     return encoding
 
 
-def read_csv_robust(uploaded_file, nrows: Optional[int] = None) -> Tuple[Optional[pd.DataFrame], Optional[str]]:
+def parse_csv_content(file_content: bytes, detected_encoding: str, nrows: Optional[int] = None) -> Tuple[Optional[pd.DataFrame], Optional[str]]:
     """
-    Robustly read a CSV file with automatic encoding detection and error handling.
-    
-    This function handles common issues with CSV uploads in Streamlit:
-    - Multiple encoding attempts (UTF-8, UTF-16, ISO-8859-1, CP1252)
-    - File pointer reset after reading
-    - Various CSV delimiters and quoting styles
-    - Malformed CSV structure
+    Parse raw CSV bytes, trying the detected encoding first and common delimiters.
     
     Args:
-        uploaded_file: Streamlit UploadedFile object
+        file_content: Raw bytes content of the file
+        detected_encoding: Encoding returned by detect_encoding
         nrows: Optional number of rows to read (for preview)
         
     Returns:
         Tuple of (DataFrame or None, error_message or None)
     """
-    if uploaded_file is None:
-        return None, "No file uploaded"
-    
-    # Reset file pointer to beginning
-    try:
-        uploaded_file.seek(0)
-    except:
-        pass
-    
-    # Read file content as bytes
-    try:
-        file_content = uploaded_file.getvalue()
-    except Exception as e:
-        return None, f"Cannot read file content: {str(e)}"
-    
-    # Validate file size (max 200MB)
-    file_size_mb = len(file_content) / (1024 * 1024)
-    if file_size_mb > 200:
-        return None, f"File too large: {file_size_mb:.2f} MB (max 200 MB)"
-    
-    # Check if file is empty
-    if len(file_content) == 0:
-        return None, "File is empty"
-    
-    # Try to detect encoding
-    detected_encoding = detect_encoding(file_content)
-    
     # List of encodings to try in order
     encodings = [detected_encoding, 'utf-8', 'utf-16', 'iso-8859-1', 'cp1252', 'latin1']
     # Remove duplicates while preserving order
@@ -110,11 +81,6 @@ def read_csv_robust(uploaded_file, nrows: Optional[int] = None) -> Tuple[Optiona
                     
                     # Validate that we got a non-empty dataframe with columns
                     if df is not None and not df.empty and len(df.columns) > 1:
-                        # Reset file pointer for next read
-                        try:
-                            uploaded_file.seek(0)
-                        except:
-                            pass
                         return df, None
                     
                 except Exception as e:
@@ -133,13 +99,75 @@ def read_csv_robust(uploaded_file, nrows: Optional[int] = None) -> Tuple[Optiona
     return None, error_msg
 
 
-def read_excel_robust(uploaded_file, nrows: Optional[int] = None) -> Tuple[Optional[pd.DataFrame], Optional[str]]:
+def read_csv_robust(uploaded_file, nrows: Optional[int] = None, timer=None) -> Tuple[Optional[pd.DataFrame], Optional[str]]:
+    """
+    Robustly read a CSV file with automatic encoding detection and error handling.
+    
+    This function handles common issues with CSV uploads in Streamlit:
+    - Multiple encoding attempts (UTF-8, UTF-16, ISO-8859-1, CP1252)
+    - File pointer reset after reading
+    - Various CSV delimiters and quoting styles
+    - Malformed CSV structure
+    
+    Args:
+        uploaded_file: Streamlit UploadedFile object
+        nrows: Optional number of rows to read (for preview)
+        timer: Optional IngestionTimer that receives per-stage spans
+    
+    Returns:
+        Tuple of (DataFrame or None, error_message or None)
+    """
+    if uploaded_file is None:
+        return None, "No file uploaded"
+    
+    # Reset file pointer to beginning
+    try:
+        uploaded_file.seek(0)
+    except:
+        pass
+    
+    # Read file content as bytes
+    try:
+        with span(timer, 'read') as read_span:
+            file_content = uploaded_file.getvalue()
+            read_span['bytes'] = len(file_content)
+    except Exception as e:
+        return None, f"Cannot read file content: {str(e)}"
+    
+    # Validate file size (max 200MB)
+    file_size_mb = len(file_content) / (1024 * 1024)
+    if file_size_mb > 200:
+        return None, f"File too large: {file_size_mb:.2f} MB (max 200 MB)"
+    
+    # Check if file is empty
+    if len(file_content) == 0:
+        return None, "File is empty"
+    
+    # Try to detect encoding
+    with span(timer, 'encoding', num_bytes=len(file_content)):
+        detected_encoding = detect_encoding(file_content)
+    
+    with span(timer, 'parse', num_bytes=len(file_content)) as parse_span:
+        df, error = parse_csv_content(file_content, detected_encoding, nrows)
+        parse_span['rows'] = len(df) if df is not None else 0
+    
+    if df is not None:
+        # Reset file pointer for next read
+        try:
+            uploaded_file.seek(0)
+        except:
+            pass
+    return df, error
+
+
+def read_excel_robust(uploaded_file, nrows: Optional[int] = None, timer=None) -> Tuple[Optional[pd.DataFrame], Optional[str]]:
     """
     Robustly read an Excel file with error handling.
     
     Args:
         uploaded_file: Streamlit UploadedFile object
         nrows: Optional number of rows to read (for preview)
+        timer: Optional IngestionTimer that receives per-stage spans
         
     Returns:
         Tuple of (DataFrame or None, error_message or None)
@@ -155,7 +183,9 @@ def read_excel_robust(uploaded_file, nrows: Optional[int] = None) -> Tuple[Optio
     
     try:
         # Read file content
-        file_content = uploaded_file.getvalue()
+        with span(timer, 'read') as read_span:
+            file_content = uploaded_file.getvalue()
+            read_span['bytes'] = len(file_content)
         
         # Validate file size (max 200MB)
         file_size_mb = len(file_content) / (1024 * 1024)
@@ -170,10 +200,12 @@ def read_excel_robust(uploaded_file, nrows: Optional[int] = None) -> Tuple[Optio
         bytes_buffer = io.BytesIO(file_content)
         
         # Try to read Excel file
-        if nrows is not None:
-            df = pd.read_excel(bytes_buffer, nrows=nrows)
-        else:
-            df = pd.read_excel(bytes_buffer)
+        with span(timer, 'parse', num_bytes=len(file_content)) as parse_span:
+            if nrows is not None:
+                df = pd.read_excel(bytes_buffer, nrows=nrows)
+            else:
+                df = pd.read_excel(bytes_buffer)
+            parse_span['rows'] = len(df)
         
         # Reset file pointer for next read
         try:
@@ -188,13 +220,14 @@ def read_excel_robust(uploaded_file, nrows: Optional[int] = None) -> Tuple[Optio
         return None, error_msg
 
 
-def read_file_robust(uploaded_file, nrows: Optional[int] = None) -> Tuple[Optional[pd.DataFrame], Optional[str]]:
+def read_file_robust(uploaded_file, nrows: Optional[int] = None, timer=None) -> Tuple[Optional[pd.DataFrame], Optional[str]]:
     """
     Automatically detect file type and read robustly.
     
     Args:
         uploaded_file: Streamlit UploadedFile object
         nrows: Optional number of rows to read (for preview)
+        timer: Optional IngestionTimer that receives per-stage spans
         
     Returns:
         Tuple of (DataFrame or None, error_message or None)
@@ -205,14 +238,14 @@ def read_file_robust(uploaded_file, nrows: Optional[int] = None) -> Tuple[Option
     filename = uploaded_file.name.lower()
     
     if filename.endswith('.csv'):
-        return read_csv_robust(uploaded_file, nrows)
+        return read_csv_robust(uploaded_file, nrows, timer)
     elif filename.endswith('.xlsx') or filename.endswith('.xls'):
-        return read_excel_robust(uploaded_file, nrows)
+        return read_excel_robust(uploaded_file, nrows, timer)
     else:
         return None, f"Unsupported file format: {filename}"
 
 
-def read_file_from_path(file_path: str, nrows: Optional[int] = None) -> Tuple[Optional[pd.DataFrame], Optional[str]]:
+def read_file_from_path(file_path: str, nrows: Optional[int] = None, timer=None) -> Tuple[Optional[pd.DataFrame], Optional[str]]:
     """
     Read a CSV or Excel file directly from a filesystem path.
     
@@ -222,6 +255,7 @@ def read_file_from_path(file_path: str, nrows: Optional[int] = None) -> Tuple[Op
     Args:
         file_path: Path to the file on the filesystem
         nrows: Optional number of rows to read (for preview)
+        timer: Optional IngestionTimer that receives per-stage spans
         
     Returns:
         Tuple of (DataFrame or None, error_message or None)
@@ -234,8 +268,10 @@ def read_file_from_path(file_path: str, nrows: Optional[int] = None) -> Tuple[Op
     try:
         if filename.endswith('.csv'):
             # Read CSV with encoding detection
-            with open(file_path, 'rb') as f:
-                file_content = f.read()
+            with span(timer, 'read') as read_span:
+                with open(file_path, 'rb') as f:
+                    file_content = f.read()
+                read_span['bytes'] = len(file_content)
             
             # Validate file size (max 200MB)
             file_size_mb = len(file_content) / (1024 * 1024)
@@ -247,56 +283,22 @@ def read_file_from_path(file_path: str, nrows: Optional[int] = None) -> Tuple[Op
                 return None, "File is empty"
             
             # Detect encoding
-            detected_encoding = detect_encoding(file_content)
+            with span(timer, 'encoding', num_bytes=len(file_content)):
+                detected_encoding = detect_encoding(file_content)
             
-            # List of encodings to try
-            encodings = [detected_encoding, 'utf-8', 'utf-16', 'iso-8859-1', 'cp1252', 'latin1']
-            encodings = list(dict.fromkeys(encodings))
-            
-            # List of delimiters to try
-            delimiters = [',', ';', '\t', '|']
-            
-            last_error = None
-            
-            # Try each encoding and delimiter combination
-            for encoding in encodings:
-                try:
-                    text_content = file_content.decode(encoding)
-                    
-                    for delimiter in delimiters:
-                        try:
-                            string_buffer = io.StringIO(text_content)
-                            df = pd.read_csv(
-                                string_buffer,
-                                encoding=encoding,
-                                delimiter=delimiter,
-                                nrows=nrows,
-                                on_bad_lines='skip',
-                                encoding_errors='replace'
-                            )
-                            
-                            if df is not None and not df.empty and len(df.columns) > 1:
-                                return df, None
-                        
-                        except Exception as e:
-                            last_error = str(e)
-                            continue
-                
-                except UnicodeDecodeError as e:
-                    last_error = f"Encoding error with {encoding}: {str(e)}"
-                    continue
-                except Exception as e:
-                    last_error = f"Error with {encoding}: {str(e)}"
-                    continue
-            
-            return None, f"Cannot parse CSV file. Last error: {last_error}"
+            with span(timer, 'parse', num_bytes=len(file_content)) as parse_span:
+                df, error = parse_csv_content(file_content, detected_encoding, nrows)
+                parse_span['rows'] = len(df) if df is not None else 0
+            return df, error
         
         elif filename.endswith('.xlsx') or filename.endswith('.xls'):
             # Read Excel file
-            if nrows is not None:
-                df = pd.read_excel(file_path, nrows=nrows)
-            else:
-                df = pd.read_excel(file_path)
+            with span(timer, 'parse', num_bytes=os.path.getsize(file_path)) as parse_span:
+                if nrows is not None:
+                    df = pd.read_excel(file_path, nrows=nrows)
+                else:
+                    df = pd.read_excel(file_path)
+                parse_span['rows'] = len(df)
             
             return df, None
         
@@ -314,6 +316,9 @@ def display_file_error(error_msg: str):
     Args:
         error_msg: The error message to display
     """
+    # Imported here so the readers can be used without Streamlit (see ingestion.py)
+    import streamlit as st
+    
     st.error(f"❌ **Error reading file:** {error_msg}")
     
     with st.expander("🔧 Troubleshooting Tips"):
@@ -3,48 +3,75 @@ File Scanner for Automatic CSV Detection
 
 Scans predefined folders for CSV files and tracks processing status
 to enable automatic file loading without manual uploads.
+
+Status is based on a SHA-256 of the file content, so touching or copying a
+file does not force a re-ingest, and identical content under another name or
+folder is reported as a duplicate instead of being ingested twice. Hashing is
+skipped when a tracked file's size and mtime are unchanged.
+
+Tracking entries are kept in a SQLite store (see file_tracking_store.py).
+
+Directories are listed with os.scandir and each listing (including the file
+sizes and mtimes) is cached together with the directory's own mtime. A later
+scan only stats the directory: if its mtime is unchanged, the cached listing
+is reused without touching the files. Adding, removing or renaming a file
+changes the directory mtime; an in-place edit of an existing file does not,
+so cached listings also expire after max_listing_age seconds and can be
+dropped with clear_directory_cache() (the "Refresh Files" button does this).
+Large directories can be stat'ed on a thread pool, which helps on network
+drives where each stat is a round trip.
 """
 
 import os
-import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from typing import List, Dict, Tuple, Optional
-import pandas as pd
+
+from ingestion_timing import hash_file
+from file_tracking_store import FileTrackingStore
+
+# Extensions picked up by the scanner
+SCAN_EXTENSIONS = ('.csv', '.xlsx', '.xls')
+
+# Directories with at least this many matching files are stat'ed in parallel (when stat_workers > 0)
+PARALLEL_STAT_THRESHOLD = 64
 
 
 class FileScanner:
     """Scans folders for CSV/Excel files and tracks their processing status."""
     
-    def __init__(self, tracking_file: str = "file_tracking.json", recursive_folders: List[str] = None):
+    def __init__(self, tracking_file: str = "file_tracking.db", recursive_folders: List[str] = None,
+                 stat_workers: int = 0, max_listing_age: float = 300):
         """
         Initialize the file scanner.
         
         Args:
-            tracking_file: Path to JSON file that tracks processed files
+            tracking_file: Path to the SQLite tracking store. A .json path (the
+                previous tracking format) uses a .db store next to it; an existing
+                JSON tracking file is imported into the store once.
             recursive_folders: List of folder paths that should be scanned recursively
+            stat_workers: Threads used to stat large directories (0 = stat serially)
+            max_listing_age: Seconds a cached directory listing is trusted while the
+                directory mtime is unchanged (0 disables the listing cache)
         """
-        self.tracking_file = tracking_file
-        self.processed_files = self._load_tracking()
+        base, ext = os.path.splitext(tracking_file)
+        self.tracking_file = base + '.db' if ext.lower() == '.json' else tracking_file
+        self.legacy_tracking_file = base + '.json'
+        self.store = FileTrackingStore(self.tracking_file, legacy_json_path=self.legacy_tracking_file)
         self.recursive_folders = recursive_folders or []
+        self.stat_workers = stat_workers
+        self.max_listing_age = max_listing_age
+        self._listings = {}
+        self._listings_lock = threading.Lock()
+        self._hashes = {}
+        self._local = threading.local()
     
-    def _load_tracking(self) -> Dict:
-        """Load the file tracking database from JSON."""
-        if os.path.exists(self.tracking_file):
-            try:
-                with open(self.tracking_file, 'r') as f:
-                    return json.load(f)
-            except Exception as e:
-                print(f"Error loading tracking file: {e}")
-                return {}
-        return {}
-    
-    def _save_tracking(self):
-        """Save the file tracking database to JSON."""
-        try:
-            with open(self.tracking_file, 'w') as f:
-                json.dump(self.processed_files, f, indent=2)
-        except Exception as e:
-            print(f"Error saving tracking file: {e}")
+    @property
+    def processed_files(self) -> Dict[str, Dict]:
+        """All tracking entries keyed by absolute path (reads the whole store)."""
+        return self.store.all()
     
     def scan_folders(self, folder_paths: List[str]) -> List[Dict]:
         """
@@ -60,29 +87,62 @@ class FileScanner:
                 - filename: File name
                 - folder: Parent folder name (or subfolder path for recursive scans)
                 - size_mb: File size in MB
+                - size_bytes: File size in bytes
                 - modified: Last modified timestamp
-                - status: 'new', 'processed', or 'error'
+                - status: 'new', 'modified', 'processed', 'duplicate', or 'error'
                 - last_processed: Timestamp of last processing (if applicable)
+                - content_hash: SHA-256 of the file content
+                - duplicate_of: Path of the processed file with identical content (duplicates only)
         """
         files = []
         
-        for folder_path in folder_paths:
-            if not os.path.exists(folder_path):
-                print(f"Warning: Folder not found: {folder_path}")
-                continue
-            
-            # Check if this folder should be scanned recursively
-            should_scan_recursively = any(
-                os.path.abspath(folder_path) == os.path.abspath(rec_folder) 
-                for rec_folder in self.recursive_folders
-            )
+        # The tracking entries of the scanned folders are read up front in one query each, and
+        # fingerprint updates are collected and written in one short transaction at the end, so
+        # no write lock is held while files are hashed (workers can mark files processed meanwhile)
+        existing_folders = [path for path in folder_paths if os.path.exists(path)]
+        self._local.entries = self.store.entries_under(existing_folders)
+        self._local.fingerprints = []
+        try:
+            for folder_path in folder_paths:
+                if not os.path.exists(folder_path):
+                    print(f"Warning: Folder not found: {folder_path}")
+                    continue
+                
+                # Check if this folder should be scanned recursively
+                should_scan_recursively = any(
+                    os.path.abspath(folder_path) == os.path.abspath(rec_folder) 
+                    for rec_folder in self.recursive_folders
+                )
+                
+                if should_scan_recursively:
+                    # Recursive scan for OpenAI User Data structure
+                    files.extend(self._scan_folder_recursive(folder_path))
+                else:
+                    # Flat scan for BlueFlame and other data
+                    files.extend(self._scan_folder_flat(folder_path))
             
-            if should_scan_recursively:
-                # Recursive scan for OpenAI User Data structure
-                files.extend(self._scan_folder_recursive(folder_path))
-            else:
-                # Flat scan for BlueFlame and other data
-                files.extend(self._scan_folder_flat(folder_path))
+            fingerprints = self._local.fingerprints
+        finally:
+            self._local.entries = None
+            self._local.fingerprints = None
+        
+        if fingerprints:
+            try:
+                with self.store.batch():
+                    for fingerprint in fingerprints:
+                        self.store.update_fingerprint(*fingerprint)
+            except Exception as e:
+                print(f"Error saving file fingerprints: {e}")
+        
+        # Identical new content at several paths is only offered once
+        first_seen = {}
+        for file_info in files:
+            if file_info['status'] not in ('new', 'modified') or not file_info.get('content_hash'):
+                continue
+            original = first_seen.setdefault(file_info['content_hash'], file_info['path'])
+            if original != file_info['path']:
+                file_info['status'] = 'duplicate'
+                file_info['duplicate_of'] = self._get_file_key(original)
         
         return files
     
@@ -99,19 +159,12 @@ class FileScanner:
         files = []
         
         try:
-            # Get all CSV and Excel files in the folder
-            for filename in os.listdir(folder_path):
-                if filename.endswith(('.csv', '.xlsx', '.xls')):
-                    file_path = os.path.join(folder_path, filename)
-                    
-                    # Skip if it's a directory
-                    if os.path.isdir(file_path):
-                        continue
-                    
-                    # Get file info
-                    file_info = self._get_file_info(file_path, os.path.basename(folder_path))
-                    if file_info:
-                        files.append(file_info)
+            folder_display = os.path.basename(folder_path)
+            listing = self._list_directory(folder_path)
+            for file_path, file_stat in listing['files']:
+                file_info = self._get_file_info(file_path, folder_display, file_stat)
+                if file_info:
+                    files.append(file_info)
         
         except Exception as e:
             print(f"Error scanning folder {folder_path}: {e}")
@@ -131,57 +184,120 @@ class FileScanner:
         files = []
         
         try:
-            for root, dirs, filenames in os.walk(folder_path):
-                for filename in filenames:
-                    if filename.endswith(('.csv', '.xlsx', '.xls')):
-                        file_path = os.path.join(root, filename)
-                        
-                        # Get relative path from base folder for better display
-                        rel_path = os.path.relpath(root, folder_path)
-                        if rel_path == '.':
-                            folder_display = os.path.basename(folder_path)
-                        else:
-                            folder_display = f"{os.path.basename(folder_path)}/{rel_path}"
-                        
-                        # Get file info
-                        file_info = self._get_file_info(file_path, folder_display)
-                        if file_info:
-                            files.append(file_info)
+            # Depth-first, parents before children (the order os.walk used)
+            pending = [folder_path]
+            while pending:
+                root = pending.pop()
+                listing = self._list_directory(root)
+                
+                # Get relative path from base folder for better display
+                rel_path = os.path.relpath(root, folder_path)
+                if rel_path == '.':
+                    folder_display = os.path.basename(folder_path)
+                else:
+                    folder_display = f"{os.path.basename(folder_path)}/{rel_path}"
+                
+                for file_path, file_stat in listing['files']:
+                    file_info = self._get_file_info(file_path, folder_display, file_stat)
+                    if file_info:
+                        files.append(file_info)
+                
+                pending.extend(reversed(listing['subdirs']))
         
         except Exception as e:
             print(f"Error recursively scanning folder {folder_path}: {e}")
         
         return files
     
-    def _get_file_info(self, file_path: str, folder_display: str) -> Optional[Dict]:
+    def _list_directory(self, dir_path: str) -> Dict:
+        """
+        List the scannable files (with their stat results) and subdirectories of a directory.
+        
+        The listing is reused while the directory's mtime is unchanged and it is
+        younger than max_listing_age; otherwise the directory is read with
+        os.scandir and the DirEntry stat results are kept.
+        
+        Args:
+            dir_path: Directory to list
+        
+        Returns:
+            Dict with files (list of (path, stat result or None on error)) and subdirs (list of paths)
+        """
+        dir_mtime = os.stat(dir_path).st_mtime_ns
+        cache_key = os.path.abspath(dir_path)
+        
+        if self.max_listing_age > 0:
+            with self._listings_lock:
+                cached = self._listings.get(cache_key)
+            if (cached is not None and cached['dir_mtime'] == dir_mtime
+                    and time.monotonic() - cached['listed_at'] < self.max_listing_age):
+                return cached
+        
+        entries = []
+        subdirs = []
+        with os.scandir(dir_path) as it:
+            for entry in it:
+                if entry.name.endswith(SCAN_EXTENSIONS) and entry.is_file():
+                    entries.append(entry)
+                elif entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry.path)
+        
+        listing = {
+            'dir_mtime': dir_mtime,
+            'listed_at': time.monotonic(),
+            'files': list(zip([entry.path for entry in entries], self._stat_entries(entries))),
+            'subdirs': subdirs
+        }
+        if self.max_listing_age > 0:
+            with self._listings_lock:
+                self._listings[cache_key] = listing
+        return listing
+    
+    def _stat_entries(self, entries: List[os.DirEntry]) -> List:
+        """Stat directory entries (in parallel for large directories); None for entries that fail."""
+        def stat(entry):
+            try:
+                return entry.stat()
+            except OSError:
+                return None
+        
+        if self.stat_workers > 0 and len(entries) >= PARALLEL_STAT_THRESHOLD:
+            with ThreadPoolExecutor(max_workers=self.stat_workers) as pool:
+                return list(pool.map(stat, entries))
+        return [stat(entry) for entry in entries]
+    
+    def clear_directory_cache(self):
+        """Forget cached directory listings so the next scan stats every file."""
+        with self._listings_lock:
+            self._listings = {}
+    
+    def _get_file_info(self, file_path: str, folder_display: str, file_stat=None) -> Optional[Dict]:
         """
         Get file information for a single file.
         
         Args:
             file_path: Full path to the file
             folder_display: Display name for the folder
+            file_stat: stat result from the directory listing (the file is stat'ed if None)
             
         Returns:
             File information dictionary or None if error
         """
         try:
-            file_stat = os.stat(file_path)
+            if file_stat is None:
+                file_stat = os.stat(file_path)
             size_mb = file_stat.st_size / (1024 * 1024)
             modified = datetime.fromtimestamp(file_stat.st_mtime)
             
             # Check processing status
             file_key = self._get_file_key(file_path)
-            
-            if file_key in self.processed_files:
-                file_info = self.processed_files[file_key]
-                # Check if file was modified since last processing
-                if file_info.get('modified') == modified.isoformat():
-                    status = 'processed'
-                else:
-                    status = 'modified'
-                last_processed = file_info.get('processed_at', 'Unknown')
+            entry = self._get_entry(file_key)
+            status, content_hash, duplicate_of = self._resolve_status(file_key, entry, file_path, file_stat)
+            if entry is not None:
+                last_processed = entry.get('processed_at') or 'Unknown'
+            elif duplicate_of:
+                last_processed = (self.store.get(duplicate_of) or {}).get('processed_at') or 'Unknown'
             else:
-                status = 'new'
                 last_processed = None
             
             return {
@@ -189,9 +305,12 @@ class FileScanner:
                 'filename': os.path.basename(file_path),
                 'folder': folder_display,
                 'size_mb': round(size_mb, 2),
+                'size_bytes': file_stat.st_size,
                 'modified': modified.isoformat(),
                 'status': status,
-                'last_processed': last_processed
+                'last_processed': last_processed,
+                'content_hash': content_hash,
+                'duplicate_of': duplicate_of
             }
         
         except Exception as e:
@@ -201,18 +320,110 @@ class FileScanner:
                 'filename': os.path.basename(file_path),
                 'folder': folder_display,
                 'size_mb': 0,
+                'size_bytes': 0,
                 'modified': None,
                 'status': 'error',
                 'last_processed': None,
                 'error': str(e)
             }
     
+    def _resolve_status(self, file_key: str, entry: Optional[Dict], file_path: str,
+                        file_stat) -> Tuple[str, Optional[str], Optional[str]]:
+        """
+        Decide a file's status from its content hash.
+        
+        A tracked file whose size and mtime match the tracking entry is not
+        re-hashed. Otherwise the file is hashed in chunks: unchanged content
+        (e.g. after a touch) stays 'processed' and the entry's size/mtime are
+        refreshed; content already processed under another path is a
+        'duplicate'.
+        
+        Args:
+            file_key: Tracking key of the file
+            entry: Tracking entry of the file, or None if untracked
+            file_path: Path to the file
+            file_stat: os.stat result for the file
+        
+        Returns:
+            tuple: (status, content_hash, duplicate_of)
+        """
+        if entry is not None and entry.get('content_hash'):
+            # Cheap precheck: same size and mtime means same content
+            if entry.get('size') == file_stat.st_size and entry.get('mtime') == file_stat.st_mtime:
+                return 'processed', entry['content_hash'], None
+        elif entry is not None:
+            # Entry written before content hashing; trust a matching mtime once
+            # and backfill the hash so later scans can use it
+            if entry.get('modified') == datetime.fromtimestamp(file_stat.st_mtime).isoformat():
+                content_hash = self._hash(file_path, file_stat)
+                self._update_fingerprint(file_key, content_hash, file_stat)
+                return 'processed', content_hash, None
+        
+        content_hash = self._hash(file_path, file_stat)
+        
+        if entry is not None and entry.get('content_hash') == content_hash:
+            self._update_fingerprint(file_key, content_hash, file_stat)
+            return 'processed', content_hash, None
+        
+        original = self._find_processed_by_hash(content_hash)
+        if original is not None and original != file_key:
+            return 'duplicate', content_hash, original
+        
+        return ('modified' if entry is not None else 'new'), content_hash, None
+    
+    def _find_processed_by_hash(self, content_hash: str) -> Optional[str]:
+        """Processed file with the given content, including hashes backfilled earlier in the current scan."""
+        original = self.store.find_processed_by_hash(content_hash)
+        if original is None:
+            for file_key, pending_hash, *_ in getattr(self._local, 'fingerprints', None) or []:
+                entry = self._get_entry(file_key)
+                if pending_hash == content_hash and entry is not None and entry.get('success'):
+                    return file_key
+        return original
+    
+    def _get_entry(self, file_key: str) -> Optional[Dict]:
+        """Tracking entry of a file, from the entries prefetched by the current scan if any."""
+        entries = getattr(self._local, 'entries', None)
+        if entries is not None:
+            return entries.get(file_key)
+        return self.store.get(file_key)
+    
+    def _hash(self, file_path: str, file_stat) -> str:
+        """
+        Hash a file's content, remembering the result for its current size and mtime.
+        
+        New files that are not processed yet would otherwise be hashed again on every scan.
+        """
+        key = os.path.abspath(file_path)
+        fingerprint = (file_stat.st_size, file_stat.st_mtime)
+        cached = self._hashes.get(key)
+        if cached is not None and cached[0] == fingerprint:
+            return cached[1]
+        content_hash = hash_file(file_path)
+        self._hashes[key] = (fingerprint, content_hash)
+        return content_hash
+    
+    def _update_fingerprint(self, file_key: str, content_hash: str, file_stat):
+        """Record the hash, size and mtime of unchanged content (at the end of the current scan, if any)."""
+        fingerprint = (
+            file_key,
+            content_hash,
+            file_stat.st_size,
+            file_stat.st_mtime,
+            datetime.fromtimestamp(file_stat.st_mtime).isoformat()
+        )
+        pending = getattr(self._local, 'fingerprints', None)
+        if pending is not None:
+            pending.append(fingerprint)
+        else:
+            self.store.update_fingerprint(*fingerprint)
+    
     def _get_file_key(self, file_path: str) -> str:
         """Generate a unique key for a file based on its absolute path."""
         return os.path.abspath(file_path)
     
     def mark_processed(self, file_path: str, success: bool = True, 
-                      records_count: int = 0, error: str = None):
+                      records_count: int = 0, error: str = None, content_hash: str = None):
         """
         Mark a file as processed in the tracking database.
         
@@ -221,23 +432,27 @@ class FileScanner:
             success: Whether processing was successful
             records_count: Number of records processed
             error: Error message if processing failed
+            content_hash: SHA-256 of the processed content, if already computed
         """
         file_key = self._get_file_key(file_path)
         
         try:
             file_stat = os.stat(file_path)
             modified = datetime.fromtimestamp(file_stat.st_mtime)
+            if content_hash is None:
+                content_hash = hash_file(file_path)
             
-            self.processed_files[file_key] = {
+            self.store.upsert(file_key, {
                 'filename': os.path.basename(file_path),
                 'processed_at': datetime.now().isoformat(),
                 'modified': modified.isoformat(),
+                'size': file_stat.st_size,
+                'mtime': file_stat.st_mtime,
+                'content_hash': content_hash,
                 'success': success,
                 'records_count': records_count,
                 'error': error
-            }
-            
-            self._save_tracking()
+            })
         
         except Exception as e:
             print(f"Error marking file as processed: {e}")
@@ -263,9 +478,7 @@ class FileScanner:
             file_path: Path to the file to reset
         """
         file_key = self._get_file_key(file_path)
-        if file_key in self.processed_files:
-            del self.processed_files[file_key]
-            self._save_tracking()
+        self.store.delete(file_key)
     
     def reset_all_files_status(self, folder_paths: List[str] = None):
         """
@@ -278,39 +491,27 @@ class FileScanner:
         """
         if folder_paths is None:
             # Reset all files
-            self.processed_files = {}
-            self._save_tracking()
+            self.store.clear()
             print("All file tracking has been reset")
         else:
             # Reset only files in specified folders
-            files_to_reset = []
-            for file_key in list(self.processed_files.keys()):
-                # Check if file is in any of the specified folders
-                if any(file_key.startswith(os.path.abspath(folder)) for folder in folder_paths):
-                    files_to_reset.append(file_key)
-            
-            for file_key in files_to_reset:
-                del self.processed_files[file_key]
-            
-            self._save_tracking()
-            print(f"Reset {len(files_to_reset)} files from specified folders")
+            removed = self.store.delete_under(folder_paths)
+            print(f"Reset {removed} files from specified folders")
     
     def reset_all_tracking(self):
         """
-        Completely clear all file tracking by removing the tracking file.
-        This is more aggressive than reset_all_files_status as it deletes the file.
+        Completely clear all file tracking.
+        This is more aggressive than reset_all_files_status as it also deletes
+        any JSON tracking file left from the previous tracking format.
         """
-        self.processed_files = {}
-        if os.path.exists(self.tracking_file):
+        self.store.clear()
+        if os.path.exists(self.legacy_tracking_file):
             try:
-                os.remove(self.tracking_file)
-                print(f"Removed tracking file: {self.tracking_file}")
+                os.remove(self.legacy_tracking_file)
+                print(f"Removed tracking file: {self.legacy_tracking_file}")
             except Exception as e:
                 print(f"Error removing tracking file: {e}")
-        else:
-            # Just save empty tracking
-            self._save_tracking()
-            print("Tracking reset (file didn't exist)")
+        print("All file tracking has been cleared")
     
     def get_file_stats(self) -> Dict:
         """
@@ -319,13 +520,4 @@ class FileScanner:
         Returns:
             Dictionary with processing statistics
         """
-        successful = sum(1 for f in self.processed_files.values() if f.get('success', False))
-        failed = sum(1 for f in self.processed_files.values() if not f.get('success', True))
-        total_records = sum(f.get('records_count', 0) for f in self.processed_files.values())
-        
-        return {
-            'total_tracked': len(self.processed_files),
-            'successful': successful,
-            'failed': failed,
-            'total_records_processed': total_records
-        }
+        return self.store.stats()
@@ -0,0 +1,288 @@
+"""
+SQLite Store for Auto-Scan File Tracking
+
+Replaces file_tracking.json, which was parsed in full at startup and rewritten
+in full after every processed file (and could be clobbered by two Streamlit
+sessions saving at once). Each tracked file is a row keyed by its absolute
+path, with an index on the content hash for duplicate detection. Lookups and
+updates touch single rows; batch() runs a group of updates (e.g. the fingerprints
+refreshed by a folder scan) in one connection and one transaction.
+
+An existing JSON tracking file is imported the first time the store is
+opened and renamed to <name>.json.imported.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+# Columns of a tracking entry, in table order (file_key is the primary key)
+ENTRY_FIELDS = ['filename', 'processed_at', 'modified', 'size', 'mtime', 'content_hash',
+                'success', 'records_count', 'error']
+
+_INSERT_SQL = (f"{{verb}} INTO file_tracking (file_key, {', '.join(ENTRY_FIELDS)}) "
+               f"VALUES (?, {', '.join('?' for _ in ENTRY_FIELDS)})")
+
+
+def _entry_values(file_key: str, entry: Dict) -> List:
+    """Parameters for _INSERT_SQL from a tracking entry dict."""
+    values = [file_key] + [entry.get(field) for field in ENTRY_FIELDS]
+    values[1 + ENTRY_FIELDS.index('success')] = 1 if entry.get('success') else 0
+    values[1 + ENTRY_FIELDS.index('records_count')] = entry.get('records_count') or 0
+    return values
+
+
+class FileTrackingStore:
+    """Tracking entries for auto-scanned files, stored in a SQLite database."""
+    
+    def __init__(self, db_path: str, legacy_json_path: Optional[str] = None):
+        """
+        Open (and if needed create) the tracking store.
+        
+        Args:
+            db_path: Path to the SQLite database file
+            legacy_json_path: JSON tracking file to import on first use, if it exists
+        """
+        self.db_path = db_path
+        self._local = threading.local()
+        self._init_schema()
+        if legacy_json_path and os.path.exists(legacy_json_path):
+            self.import_json(legacy_json_path)
+    
+    def _init_schema(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS file_tracking (
+                file_key TEXT PRIMARY KEY,
+                filename TEXT,
+                processed_at TEXT,
+                modified TEXT,
+                size INTEGER,
+                mtime REAL,
+                content_hash TEXT,
+                success INTEGER NOT NULL DEFAULT 0,
+                records_count INTEGER NOT NULL DEFAULT 0,
+                error TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_file_tracking_hash ON file_tracking(content_hash, success);
+        """)
+        conn.close()
+    
+    @contextmanager
+    def _connection(self):
+        """Yield the batch connection of this thread, or a new connection committed on exit."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            yield conn
+            return
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            yield conn
+            conn.commit()
+        finally:
+            conn.close()
+    
+    @contextmanager
+    def batch(self):
+        """
+        Run all store operations of the enclosed block (on this thread) in one transaction.
+        
+        Nested batches join the outer one.
+        """
+        if getattr(self._local, 'conn', None) is not None:
+            yield
+            return
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        self._local.conn = conn
+        try:
+            yield
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            self._local.conn = None
+            conn.close()
+    
+    @staticmethod
+    def _row_to_entry(row) -> Dict:
+        entry = dict(zip(ENTRY_FIELDS, row))
+        entry['success'] = bool(entry['success'])
+        return entry
+    
+    def get(self, file_key: str) -> Optional[Dict]:
+        """
+        Get the tracking entry of one file.
+        
+        Args:
+            file_key: Absolute path of the file
+        
+        Returns:
+            Entry dict, or None if the file is not tracked
+        """
+        with self._connection() as conn:
+            row = conn.execute(
+                f"SELECT {', '.join(ENTRY_FIELDS)} FROM file_tracking WHERE file_key = ?", (file_key,)
+            ).fetchone()
+        return self._row_to_entry(row) if row else None
+    
+    def find_processed_by_hash(self, content_hash: str) -> Optional[str]:
+        """
+        Find a successfully processed file with the given content.
+        
+        Args:
+            content_hash: SHA-256 of the file content
+        
+        Returns:
+            str: file_key of the first such file, or None
+        """
+        with self._connection() as conn:
+            row = conn.execute(
+                "SELECT file_key FROM file_tracking WHERE content_hash = ? AND success = 1 ORDER BY processed_at LIMIT 1",
+                (content_hash,)
+            ).fetchone()
+        return row[0] if row else None
+    
+    def upsert(self, file_key: str, entry: Dict):
+        """
+        Insert or replace the tracking entry of one file.
+        
+        Args:
+            file_key: Absolute path of the file
+            entry: Dict with any of ENTRY_FIELDS
+        """
+        with self._connection() as conn:
+            conn.execute(_INSERT_SQL.format(verb='INSERT OR REPLACE'), _entry_values(file_key, entry))
+    
+    def update_fingerprint(self, file_key: str, content_hash: str, size: int, mtime: float, modified: str):
+        """Record the current hash, size and mtime of a tracked file whose content is unchanged."""
+        with self._connection() as conn:
+            conn.execute(
+                "UPDATE file_tracking SET content_hash = ?, size = ?, mtime = ?, modified = ? WHERE file_key = ?",
+                (content_hash, size, mtime, modified, file_key)
+            )
+    
+    def delete(self, file_key: str) -> int:
+        """Stop tracking one file. Returns the number of entries removed."""
+        with self._connection() as conn:
+            return conn.execute("DELETE FROM file_tracking WHERE file_key = ?", (file_key,)).rowcount
+    
+    def entries_under(self, folder_paths: List[str]) -> Dict[str, Dict]:
+        """
+        Get the tracking entries of all files below the given folders.
+        
+        One range query on the primary key per folder, so a scan can resolve
+        thousands of files without a lookup each.
+        
+        Args:
+            folder_paths: Folder paths (made absolute)
+        
+        Returns:
+            Dict of entries keyed by file_key
+        """
+        entries = {}
+        with self._connection() as conn:
+            for folder in folder_paths:
+                prefix = os.path.abspath(folder)
+                rows = conn.execute(
+                    f"SELECT file_key, {', '.join(ENTRY_FIELDS)} FROM file_tracking "
+                    "WHERE file_key >= ? AND file_key < ?",
+                    (prefix, prefix + '\U0010ffff')
+                ).fetchall()
+                entries.update((row[0], self._row_to_entry(row[1:])) for row in rows)
+        return entries
+    
+    def delete_under(self, folder_paths: List[str]) -> int:
+        """
+        Stop tracking all files whose path starts with one of the given folders.
+        
+        Args:
+            folder_paths: Folder paths (made absolute)
+        
+        Returns:
+            int: Number of entries removed
+        """
+        removed = 0
+        with self._connection() as conn:
+            for folder in folder_paths:
+                prefix = os.path.abspath(folder)
+                # Range on the primary key instead of LIKE, which would treat % and _ in paths as wildcards
+                removed += conn.execute(
+                    "DELETE FROM file_tracking WHERE file_key >= ? AND file_key < ?",
+                    (prefix, prefix + '\U0010ffff')
+                ).rowcount
+        return removed
+    
+    def clear(self):
+        """Stop tracking all files."""
+        with self._connection() as conn:
+            conn.execute("DELETE FROM file_tracking")
+    
+    def all(self) -> Dict[str, Dict]:
+        """Return every tracking entry keyed by file_key."""
+        with self._connection() as conn:
+            rows = conn.execute(f"SELECT file_key, {', '.join(ENTRY_FIELDS)} FROM file_tracking").fetchall()
+        return {row[0]: self._row_to_entry(row[1:]) for row in rows}
+    
+    def stats(self) -> Dict:
+        """
+        Count tracked files by outcome.
+        
+        Returns:
+            Dictionary with total_tracked, successful, failed, total_records_processed
+        """
+        with self._connection() as conn:
+            total, successful, records = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(success), 0), COALESCE(SUM(records_count), 0) FROM file_tracking"
+            ).fetchone()
+        return {
+            'total_tracked': total,
+            'successful': successful,
+            'failed': total - successful,
+            'total_records_processed': records
+        }
+    
+    def import_json(self, json_path: str) -> int:
+        """
+        Import a JSON tracking file (the format used before this store) and rename it.
+        
+        Entries already in the store are kept. After a successful import the JSON
+        file is renamed to <name>.imported so it is only imported once; a file that
+        cannot be read or parsed is left in place (and retried on the next start).
+        
+        Args:
+            json_path: Path to the JSON tracking file
+        
+        Returns:
+            int: Number of entries imported
+        """
+        try:
+            with open(json_path, 'r') as f:
+                tracking = json.load(f)
+        except Exception as e:
+            print(f"Error loading tracking file {json_path}, leaving it in place: {e}")
+            return 0
+        if not isinstance(tracking, dict):
+            print(f"Error loading tracking file {json_path}, leaving it in place: not a JSON object")
+            return 0
+        
+        imported = 0
+        with self.batch(), self._connection() as conn:
+            for file_key, entry in tracking.items():
+                if not isinstance(entry, dict):
+                    continue
+                imported += conn.execute(
+                    _INSERT_SQL.format(verb='INSERT OR IGNORE'), _entry_values(file_key, entry)
+                ).rowcount
+        
+        try:
+            os.replace(json_path, json_path + '.imported')
+        except OSError as e:
+            print(f"Error renaming imported tracking file: {e}")
+        
+        if imported:
+            print(f"Imported {imported} tracked files from {json_path}")
+        return imported
@@ -1,8 +1,25 @@
 """
 Generate sample data for testing the dashboard
+
+Two modes:
+- Quick sample (default): 10 hard-coded users over 3 months loaded straight
+  into the dashboard database.
+- Scale fixtures (--output-dir): realistic export files for benchmarks -
+  OpenAI monthly/weekly user reports with the real column set, BlueFlame
+  combined and wide exports, and an employee headcount CSV. Users, months,
+  department skew and power-user distribution are configurable and the
+  output is fully determined by --seed.
+
+Usage:
+    python generate_sample_data.py
+    python generate_sample_data.py --output-dir fixtures/scale --users 10000 --months 24
+    python generate_sample_data.py --output-dir fixtures/small --users 200 --months 3 --cadence both
 """
 import pandas as pd
+import numpy as np
 from datetime import datetime, timedelta
+import argparse
+import os
 import random
 
 # Set random seed for reproducibility
@@ -123,7 +140,8 @@ def generate_blueflame_sample():
     
     return pd.DataFrame(records)
 
-if __name__ == "__main__":
+def load_sample_database():
+    """Load the quick 10-user sample into the dashboard database."""
     # Generate and combine data
     openai_data = generate_openai_sample()
     blueflame_data = generate_blueflame_sample()
@@ -132,8 +150,6 @@ if __name__ == "__main__":
     print(f"Generated {len(blueflame_data)} BlueFlame records")
     
     # Save to database
-    import sys
-    sys.path.insert(0, '/home/runner/work/OpenAI-usage-metrics/OpenAI-usage-metrics')
     from database import DatabaseManager
     
     db = DatabaseManager()
@@ -141,13 +157,503 @@ if __name__ == "__main__":
     # Insert data
     combined_data = pd.concat([openai_data, blueflame_data], ignore_index=True)
     
-    # Use database insert
+    # Replace any existing data (usage_metrics is a view over fact_usage, so
+    # it is emptied and appended to rather than dropped and recreated)
     import sqlite3
+    db.delete_all_data()
     conn = sqlite3.connect(db.db_path)
-    combined_data.to_sql('usage_metrics', conn, if_exists='replace', index=False)
+    combined_data.to_sql('usage_metrics', conn, if_exists='append', index=False)
     conn.close()
     
     print(f"\n✅ Successfully inserted {len(combined_data)} records into database")
     print(f"📊 Unique users: {combined_data['email'].nunique()}")
     print(f"📅 Date range: {combined_data['date'].min()} to {combined_data['date'].max()}")
     print(f"💰 Total cost: ${combined_data['cost_usd'].sum():.2f}")
+
+# ---------------------------------------------------------------------------
+# Scale fixtures for benchmarks
+# ---------------------------------------------------------------------------
+
+FIRST_NAMES = [
+    'James', 'Mary', 'Robert', 'Patricia', 'John', 'Jennifer', 'Michael', 'Linda', 'David', 'Elizabeth',
+    'William', 'Barbara', 'Richard', 'Susan', 'Joseph', 'Jessica', 'Thomas', 'Sarah', 'Charles', 'Karen',
+    'Christopher', 'Lisa', 'Daniel', 'Nancy', 'Matthew', 'Betty', 'Anthony', 'Sandra', 'Mark', 'Margaret',
+    'Steven', 'Ashley', 'Paul', 'Emily', 'Andrew', 'Donna', 'Joshua', 'Michelle', 'Kenneth', 'Carol',
+    'Kevin', 'Amanda', 'Brian', 'Melissa', 'George', 'Deborah', 'Timothy', 'Stephanie', 'Ronald', 'Rebecca',
+    'Jason', 'Laura', 'Edward', 'Helen', 'Jeffrey', 'Sharon', 'Ryan', 'Cynthia', 'Jacob', 'Kathleen',
+    'Wei', 'Priya', 'Hiroshi', 'Fatima', 'Mateo', 'Sofia', 'Arjun', 'Mei', 'Luca', 'Amara'
+]
+
+LAST_NAMES = [
+    'Smith', 'Johnson', 'Williams', 'Brown', 'Jones', 'Garcia', 'Miller', 'Davis', 'Rodriguez', 'Martinez',
+    'Hernandez', 'Lopez', 'Gonzalez', 'Wilson', 'Anderson', 'Thomas', 'Taylor', 'Moore', 'Jackson', 'Martin',
+    'Lee', 'Perez', 'Thompson', 'White', 'Harris', 'Sanchez', 'Clark', 'Ramirez', 'Lewis', 'Robinson',
+    'Walker', 'Young', 'Allen', 'King', 'Wright', 'Scott', 'Torres', 'Nguyen', 'Hill', 'Flores',
+    'Green', 'Adams', 'Nelson', 'Baker', 'Hall', 'Rivera', 'Campbell', 'Mitchell', 'Carter', 'Roberts',
+    'Gomez', 'Phillips', 'Evans', 'Turner', 'Diaz', 'Parker', 'Cruz', 'Edwards', 'Collins', 'Reyes',
+    'Stewart', 'Morris', 'Morales', 'Murphy', 'Cook', 'Rogers', 'Gutierrez', 'Ortiz', 'Morgan', 'Cooper',
+    'Peterson', 'Bailey', 'Reed', 'Kelly', 'Howard', 'Ramos', 'Kim', 'Cox', 'Ward', 'Richardson',
+    'Patel', 'Chen', 'Wang', 'Singh', 'Tanaka', 'Rossi', 'Muller', 'Okafor', 'Ivanova', 'Silva'
+]
+
+# Headcount "Function" values, most common first (department skew ranks them in this order)
+DEPARTMENTS = [
+    'Administrative', 'Portfolio & Fund Ops', 'Real Estate Credit', 'Finance', 'Capital Formation',
+    'Legal', 'Client Services', 'Corporate Credit - Origination', 'Executive', 'Technology',
+    'Research', 'Corporate Credit - Asset Based', 'Structured Credit', 'Operations', 'Human Capital',
+    'Private Wealth', 'Investments', 'Product Development'
+]
+
+TITLES = ['Senior Associate', 'Associate', 'Director', 'Managing Director', 'Senior Director', 'Partner', 'Vice Chair', 'Consultant']
+TITLE_WEIGHTS = [0.22, 0.21, 0.19, 0.14, 0.10, 0.08, 0.03, 0.03]
+
+OFFICES = ['ECMS', 'EBS', 'ECM UK', 'Zinnia', 'ECM Singapore']
+OFFICE_WEIGHTS = [0.58, 0.26, 0.08, 0.05, 0.03]
+
+OPENAI_ROLES = ['team_member', 'director', 'account-owner']
+OPENAI_ROLE_WEIGHTS = [0.85, 0.14, 0.01]
+
+# Column set of the OpenAI Enterprise user report (monthly and weekly cadence)
+OPENAI_COLUMNS = [
+    'cadence', 'period_start', 'period_end', 'account_id', 'public_id', 'name', 'email', 'role',
+    'user_role', 'department', 'groups', 'user_status', 'created_or_invited_date', 'is_active',
+    'first_day_active_in_period', 'last_day_active_in_period', 'messages', 'messages_rank',
+    'model_to_messages', 'gpt_messages', 'gpts_messaged', 'gpt_to_messages', 'tool_messages',
+    'tools_messaged', 'tool_to_messages', 'project_messages', 'projects_messaged',
+    'project_to_messages', 'projects_created', 'last_day_active'
+]
+
+MODEL_NAMES = ['gpt-5', 'gpt-4o', 'o3']
+MODEL_SHARES = [0.82, 0.12, 0.06]
+TOOL_NAMES = ['Search', 'Retrieval', 'Data Analysis', 'Image Gen', 'Canvas', 'Tasks']
+TOOL_SHARES = [0.45, 0.35, 0.08, 0.05, 0.05, 0.02]
+
+BLUEFLAME_DASHES = '–'
+
+
+def _random_ids(rng, count, prefix, length=24, alphabet='abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789'):
+    """Generate count random identifiers like 'user-n3ZEAUstA7a8JlDMmhJbinc5'."""
+    chars = np.array(list(alphabet))
+    picks = chars[rng.integers(0, len(chars), size=(count, length))]
+    return [prefix + ''.join(row) for row in picks]
+
+
+def _format_counts(names, counts, empty=''):
+    """
+    Format rows of per-name counts like the export's dict columns: "{'Search': 39, 'Retrieval': 8}".
+    
+    Args:
+        names: Column labels for the counts matrix
+        counts: 2-D array of counts (one row per user)
+        empty: Value used for rows without any counts
+    
+    Returns:
+        List of strings, one per row
+    """
+    formatted = []
+    for row in counts:
+        parts = [f"'{name}': {count}" for name, count in zip(names, row) if count]
+        formatted.append('{' + ', '.join(parts) + '}' if parts else empty)
+    return formatted
+
+
+def month_periods(start_month, months):
+    """
+    Calendar-month reporting periods.
+    
+    Args:
+        start_month: First month as 'YYYY-MM'
+        months: Number of months
+    
+    Returns:
+        List of (period_start, period_end) Timestamps
+    """
+    first = pd.Period(start_month, freq='M')
+    return [((first + i).start_time.normalize(), (first + i).end_time.normalize()) for i in range(months)]
+
+
+def week_periods(start_month, months):
+    """
+    Consecutive 7-day reporting periods covering the same range as month_periods.
+    
+    Args:
+        start_month: First month as 'YYYY-MM'
+        months: Number of months
+    
+    Returns:
+        List of (period_start, period_end) Timestamps
+    """
+    range_start, _ = month_periods(start_month, 1)[0]
+    _, range_end = month_periods(start_month, months)[-1]
+    starts = pd.date_range(range_start, range_end, freq='7D')
+    return [(start, start + pd.Timedelta(days=6)) for start in starts]
+
+
+def generate_users(n_users=10000, seed=42, start_month='2024-01', months=24, dept_skew=1.0,
+                   power_user_share=0.05, power_user_multiplier=4.0, activity_sigma=1.0,
+                   blueflame_share=0.3, roster_share=0.95, initial_share=0.6, domain='company.com'):
+    """
+    Generate a synthetic user population.
+    
+    Args:
+        n_users: Number of users
+        seed: Seed for the random generator (same seed -> same users)
+        start_month: First reporting month as 'YYYY-MM'
+        months: Number of reporting months (users are onboarded across this range)
+        dept_skew: Zipf exponent for department sizes (0 = uniform, higher = more skewed)
+        power_user_share: Fraction of users whose activity is multiplied by power_user_multiplier
+        power_user_multiplier: Activity multiplier for power users
+        activity_sigma: Sigma of the lognormal per-user activity weight (heavier tail when larger)
+        blueflame_share: Fraction of users who also use BlueFlame AI
+        roster_share: Fraction of users present in the employee headcount file
+        initial_share: Fraction of users already onboarded before the first month
+        domain: Email domain
+    
+    Returns:
+        DataFrame with one row per user
+    """
+    rng = np.random.default_rng(seed)
+    
+    first_names = rng.choice(FIRST_NAMES, size=n_users)
+    last_names = rng.choice(LAST_NAMES, size=n_users)
+    users = pd.DataFrame({'first_name': first_names, 'last_name': last_names})
+    users['name'] = users['first_name'] + ' ' + users['last_name']
+    
+    # Duplicate names get a numeric suffix in the email, as corporate directories do
+    base_emails = (users['first_name'] + '.' + users['last_name']).str.lower()
+    duplicate_number = users.groupby(base_emails).cumcount()
+    suffix = np.where(duplicate_number > 0, (duplicate_number + 1).astype(str), '')
+    users['email'] = base_emails + suffix + '@' + domain
+    users['public_id'] = _random_ids(rng, n_users, 'user-')
+    
+    dept_weights = 1.0 / np.arange(1, len(DEPARTMENTS) + 1) ** dept_skew
+    users['department'] = rng.choice(DEPARTMENTS, size=n_users, p=dept_weights / dept_weights.sum())
+    users['title'] = rng.choice(TITLES, size=n_users, p=TITLE_WEIGHTS)
+    users['office'] = rng.choice(OFFICES, size=n_users, p=OFFICE_WEIGHTS)
+    users['openai_role'] = rng.choice(OPENAI_ROLES, size=n_users, p=OPENAI_ROLE_WEIGHTS)
+    
+    # Heavy-tailed activity with an explicit power-user segment on top
+    weights = rng.lognormal(mean=0.0, sigma=activity_sigma, size=n_users)
+    power_cutoff = np.quantile(weights, 1 - power_user_share) if power_user_share > 0 else np.inf
+    users['is_power_user'] = weights >= power_cutoff
+    users['activity_weight'] = np.where(users['is_power_user'], weights * power_user_multiplier, weights)
+    users['active_prob'] = np.where(users['is_power_user'], 0.98, np.clip(rng.beta(4, 2, size=n_users), 0.05, 0.97))
+    users['has_projects'] = rng.random(n_users) < np.where(users['is_power_user'], 0.8, 0.3)
+    users['uses_gpts'] = rng.random(n_users) < np.where(users['is_power_user'], 0.7, 0.35)
+    users['uses_blueflame'] = rng.random(n_users) < np.where(users['is_power_user'], min(1.0, blueflame_share * 2), blueflame_share)
+    users['in_roster'] = rng.random(n_users) < roster_share
+    
+    # Onboarding: initial_share existed before the range, the rest join uniformly across it
+    periods = month_periods(start_month, months)
+    range_start, range_end = periods[0][0], periods[-1][1]
+    span_days = (range_end - range_start).days
+    onboarded_late = rng.random(n_users) >= initial_share
+    offsets = np.where(onboarded_late, rng.integers(0, span_days + 1, size=n_users), -rng.integers(1, 181, size=n_users))
+    users['created_date'] = range_start + pd.to_timedelta(offsets, unit='D')
+    
+    return users
+
+
+def generate_openai_period(users, period_start, period_end, cadence, rng, progress=0.0,
+                           base_monthly_messages=60, growth=0.5, account_id='8692590815c34cfca1333ff09b53ee58'):
+    """
+    Generate one OpenAI user report (all users onboarded by period_end).
+    
+    Args:
+        users: DataFrame from generate_users
+        period_start: First day of the reporting period
+        period_end: Last day of the reporting period
+        cadence: 'Monthly' or 'Weekly'
+        rng: numpy Generator
+        progress: Position of this period in the full range (0-1), drives adoption growth
+        base_monthly_messages: Expected monthly messages of a user with activity weight 1
+        growth: Relative usage growth from the first to the last period
+        account_id: Workspace account id written to every row
+    
+    Returns:
+        DataFrame with OPENAI_COLUMNS
+    """
+    users = users[users['created_date'] <= period_end]
+    n = len(users)
+    days = (period_end - period_start).days + 1
+    
+    active = rng.random(n) < users['active_prob'].to_numpy()
+    expected = base_monthly_messages * users['activity_weight'].to_numpy() * (days / 30.44) * (1 + growth * progress)
+    messages = np.where(active, np.maximum(1, rng.poisson(expected)), 0)
+    
+    model_counts = rng.multinomial(messages, MODEL_SHARES)
+    gpt_messages = np.where(users['uses_gpts'].to_numpy(), rng.binomial(messages, 0.1), 0)
+    tool_messages = np.where(active, rng.poisson(messages * 0.7), 0)
+    tool_counts = rng.multinomial(tool_messages, TOOL_SHARES)
+    project_messages = np.where(users['has_projects'].to_numpy(), rng.binomial(messages, 0.15), 0)
+    
+    gpt_ids = _random_ids(rng, 6, 'g-', length=9)
+    gpt_counts = rng.multinomial(gpt_messages, [0.4, 0.25, 0.15, 0.1, 0.06, 0.04])
+    project_ids = _random_ids(rng, 4, 'g-p-', length=32, alphabet='0123456789abcdef')
+    project_counts = rng.multinomial(project_messages, [0.45, 0.3, 0.15, 0.1])
+    
+    # Activity window inside the period for active users
+    first_offset = rng.integers(0, days, size=n)
+    last_offset = first_offset + (rng.random(n) * (days - first_offset)).astype(int)
+    first_active = (period_start + pd.to_timedelta(first_offset, unit='D')).strftime('%Y-%m-%d')
+    last_active = (period_start + pd.to_timedelta(last_offset, unit='D')).strftime('%Y-%m-%d')
+    first_active = np.where(active, first_active, '')
+    last_active = np.where(active, last_active, '')
+    
+    report = pd.DataFrame({
+        'cadence': cadence,
+        'period_start': period_start.strftime('%Y-%m-%d'),
+        'period_end': period_end.strftime('%Y-%m-%d'),
+        'account_id': account_id,
+        'public_id': users['public_id'].to_numpy(),
+        'name': users['name'].to_numpy(),
+        'email': users['email'].to_numpy(),
+        'role': users['openai_role'].to_numpy(),
+        'user_role': 'standard-user',
+        'department': ['["' + dept.split(' ')[0].lower() + '"]' for dept in users['department']],
+        'groups': "{'6806684c27e88190b4cb45225dded629': 'SG-Chatgpt-Users'}",
+        'user_status': 'enabled',
+        'created_or_invited_date': users['created_date'].dt.strftime('%Y-%m-%d').to_numpy(),
+        'is_active': active.astype(int),
+        'first_day_active_in_period': first_active,
+        'last_day_active_in_period': last_active,
+        'messages': messages,
+        'messages_rank': pd.Series(messages).rank(method='min', ascending=False).astype(int).to_numpy(),
+        'model_to_messages': _format_counts(MODEL_NAMES, model_counts, empty='{}'),
+        'gpt_messages': gpt_messages,
+        'gpts_messaged': (gpt_counts > 0).sum(axis=1),
+        'gpt_to_messages': _format_counts(gpt_ids, gpt_counts),
+        'tool_messages': tool_messages,
+        'tools_messaged': (tool_counts > 0).sum(axis=1),
+        'tool_to_messages': _format_counts(TOOL_NAMES, tool_counts),
+        'project_messages': project_messages,
+        'projects_messaged': (project_counts > 0).sum(axis=1),
+        'project_to_messages': _format_counts(project_ids, project_counts),
+        'projects_created': np.where(users['has_projects'].to_numpy() & active, rng.integers(0, 3, size=n), 0),
+        'last_day_active': last_active
+    })
+    return report[OPENAI_COLUMNS]
+
+
+def generate_blueflame_counts(users, periods, rng, base_monthly_messages=80, growth=0.5):
+    """
+    Monthly BlueFlame message counts for BlueFlame users.
+    
+    Args:
+        users: DataFrame from generate_users
+        periods: List of monthly (period_start, period_end) tuples
+        rng: numpy Generator
+        base_monthly_messages: Expected monthly messages of a user with activity weight 1
+        growth: Relative usage growth from the first to the last month
+    
+    Returns:
+        DataFrame indexed by email with one integer column per month (0 = no usage)
+    """
+    bf_users = users[users['uses_blueflame']]
+    counts = {}
+    for i, (period_start, period_end) in enumerate(periods):
+        onboarded = (bf_users['created_date'] <= period_end).to_numpy()
+        active = onboarded & (rng.random(len(bf_users)) < bf_users['active_prob'].to_numpy() * 0.8)
+        progress = i / max(1, len(periods) - 1)
+        expected = base_monthly_messages * bf_users['activity_weight'].to_numpy() * (1 + growth * progress)
+        counts[period_start] = np.where(active, np.maximum(1, rng.poisson(expected)), 0)
+    return pd.DataFrame(counts, index=bf_users['email'].to_numpy())
+
+
+def _blueflame_value(count):
+    """Format a count the way BlueFlame exports do (dash for no usage)."""
+    return BLUEFLAME_DASHES if count == 0 else int(count)
+
+
+def blueflame_combined_export(counts):
+    """
+    Build a BlueFlame combined export (Table/Metric/User ID, Mon-YY and MoM Var columns).
+    
+    Args:
+        counts: Slice of generate_blueflame_counts output (columns = months in the report)
+    
+    Returns:
+        DataFrame in the combined format
+    """
+    months = list(counts.columns)
+    month_labels = [month.strftime('%b-%y') for month in months]
+    counts = counts[(counts > 0).any(axis=1)]
+    
+    def mom_values(values):
+        variances = [BLUEFLAME_DASHES]
+        for previous, current in zip(values[:-1], values[1:]):
+            variances.append(f"{round((current - previous) / previous * 100)}%" if previous else BLUEFLAME_DASHES)
+        return variances
+    
+    rows = []
+    totals = counts.sum(axis=0).tolist()
+    maus = (counts > 0).sum(axis=0).tolist()
+    for metric, values in [('Total Messages', totals), ('Monthly Active Users (MAUs)', maus)]:
+        row = {'Table': 'Overall Monthly Trends', 'Metric': metric, 'User ID': ''}
+        row.update(dict(zip(month_labels, values)))
+        row.update(dict(zip([f"MoM Var {label}" for label in month_labels], mom_values(values))))
+        rows.append(row)
+    
+    for email, values in zip(counts.index, counts.to_numpy()):
+        row = {'Table': 'All Users Total', 'Metric': '', 'User ID': email}
+        row.update({label: _blueflame_value(value) for label, value in zip(month_labels, values)})
+        row.update(dict(zip([f"MoM Var {label}" for label in month_labels], mom_values(values.tolist()))))
+        rows.append(row)
+    
+    columns = ['Table', 'Metric', 'User ID'] + month_labels + [f"MoM Var {label}" for label in month_labels]
+    return pd.DataFrame(rows, columns=columns)
+
+
+def blueflame_wide_export(counts):
+    """
+    Build a BlueFlame wide export (Rank, User ID, Metric, YY-Mon columns, Total).
+    
+    Args:
+        counts: Output of generate_blueflame_counts
+    
+    Returns:
+        DataFrame in the wide format, ranked by total messages
+    """
+    month_labels = [month.strftime('%y-%b') for month in counts.columns]
+    totals = counts.sum(axis=1)
+    counts = counts[totals > 0]
+    totals = totals[totals > 0].sort_values(ascending=False, kind='stable')
+    counts = counts.loc[totals.index]
+    
+    wide = pd.DataFrame({'Rank': np.arange(1, len(counts) + 1), 'User ID': counts.index, 'Metric': ''})
+    for label, column in zip(month_labels, counts.columns):
+        wide[label] = [_blueflame_value(value) for value in counts[column]]
+    wide['Total'] = totals.to_numpy()
+    return wide
+
+
+def headcount_export(users):
+    """
+    Build the employee headcount CSV (Last Name, First Name, Title, Function, Status, Email).
+    
+    Args:
+        users: DataFrame from generate_users (only in_roster users are included)
+    
+    Returns:
+        DataFrame in the headcount format
+    """
+    roster = users[users['in_roster']].sort_values(['department', 'last_name', 'first_name'])
+    return pd.DataFrame({
+        'Last Name': roster['last_name'].to_numpy(),
+        'First Name': roster['first_name'].to_numpy(),
+        'Title': roster['title'].to_numpy(),
+        'Function': roster['department'].to_numpy(),
+        'Status': roster['office'].to_numpy(),
+        'Email': roster['email'].to_numpy()
+    })
+
+
+def write_scale_fixtures(output_dir, n_users=10000, months=24, start_month='2024-01', cadence='monthly',
+                         seed=42, blueflame_window=3, company='Sample Company', **user_options):
+    """
+    Write a complete set of export files for benchmarking.
+    
+    Layout mirrors the repository's auto-scan folders:
+        <output_dir>/OpenAI User Data/Monthly OpenAI User Data/*.csv
+        <output_dir>/OpenAI User Data/Weekly OpenAI User Data/*.csv
+        <output_dir>/BlueFlame User Data/*.csv
+        <output_dir>/Employee Headcount <year>_Emails.csv
+    
+    Args:
+        output_dir: Destination folder (created if missing)
+        n_users: Number of users
+        months: Number of reporting months
+        start_month: First month as 'YYYY-MM'
+        cadence: 'monthly', 'weekly' or 'both' OpenAI reports
+        seed: Seed for the random generator
+        blueflame_window: Months per BlueFlame combined export
+        company: Company name used in OpenAI report filenames
+        **user_options: Extra options passed to generate_users (dept_skew, power_user_share, ...)
+    
+    Returns:
+        dict: Summary with file paths and row counts
+    """
+    rng = np.random.default_rng(seed)
+    users = generate_users(n_users, seed=seed, start_month=start_month, months=months, **user_options)
+    monthly = month_periods(start_month, months)
+    summary = {'users': len(users), 'files': [], 'rows': 0}
+    
+    def write(df, *path_parts):
+        path = os.path.join(output_dir, *path_parts)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        df.to_csv(path, index=False)
+        summary['files'].append(path)
+        summary['rows'] += len(df)
+    
+    if cadence in ('monthly', 'both'):
+        for i, (period_start, period_end) in enumerate(monthly):
+            report = generate_openai_period(users, period_start, period_end, 'Monthly', rng,
+                                            progress=i / max(1, months - 1))
+            filename = f"Openai {company} monthly user report {period_start.strftime('%B %Y')}.csv"
+            write(report, 'OpenAI User Data', 'Monthly OpenAI User Data', filename)
+    
+    if cadence in ('weekly', 'both'):
+        weekly = week_periods(start_month, months)
+        for i, (period_start, period_end) in enumerate(weekly):
+            report = generate_openai_period(users, period_start, period_end, 'Weekly', rng,
+                                            progress=i / max(1, len(weekly) - 1))
+            filename = f"Openai {company} weekly user report {period_start.strftime('%Y-%m-%d')}.csv"
+            write(report, 'OpenAI User Data', 'Weekly OpenAI User Data', filename)
+    
+    counts = generate_blueflame_counts(users, monthly, rng)
+    for window_start in range(0, months, blueflame_window):
+        window = counts.iloc[:, window_start:window_start + blueflame_window]
+        last_month = window.columns[-1]
+        write(blueflame_combined_export(window), 'BlueFlame User Data',
+              f"blueflame_usage_combined_{last_month.strftime('%B%Y')}.csv")
+    write(blueflame_wide_export(counts), 'BlueFlame User Data',
+          f"blueflame_usage_wide_{counts.columns[-1].strftime('%B%Y')}.csv")
+    
+    write(headcount_export(users), f"Employee Headcount {monthly[-1][0].year}_Emails.csv")
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate sample data for the AI usage dashboard")
+    parser.add_argument('--output-dir', help="Write scale fixture files here instead of loading the quick sample into the database")
+    parser.add_argument('--users', type=int, default=10000, help="Number of users (default: 10000)")
+    parser.add_argument('--months', type=int, default=24, help="Number of months (default: 24)")
+    parser.add_argument('--start-month', default='2024-01', help="First month, YYYY-MM (default: 2024-01)")
+    parser.add_argument('--cadence', choices=['monthly', 'weekly', 'both'], default='monthly',
+                        help="OpenAI report cadence (default: monthly)")
+    parser.add_argument('--seed', type=int, default=42, help="Random seed (default: 42)")
+    parser.add_argument('--dept-skew', type=float, default=1.0, help="Zipf exponent for department sizes (default: 1.0)")
+    parser.add_argument('--power-user-share', type=float, default=0.05, help="Fraction of power users (default: 0.05)")
+    parser.add_argument('--power-user-multiplier', type=float, default=4.0, help="Power user activity multiplier (default: 4)")
+    parser.add_argument('--activity-sigma', type=float, default=1.0, help="Lognormal sigma of user activity (default: 1.0)")
+    parser.add_argument('--blueflame-share', type=float, default=0.3, help="Fraction of BlueFlame users (default: 0.3)")
+    parser.add_argument('--roster-share', type=float, default=0.95, help="Fraction of users in the headcount file (default: 0.95)")
+    args = parser.parse_args()
+    
+    if not args.output_dir:
+        load_sample_database()
+        return
+    
+    start = datetime.now()
+    summary = write_scale_fixtures(
+        args.output_dir,
+        n_users=args.users,
+        months=args.months,
+        start_month=args.start_month,
+        cadence=args.cadence,
+        seed=args.seed,
+        dept_skew=args.dept_skew,
+        power_user_share=args.power_user_share,
+        power_user_multiplier=args.power_user_multiplier,
+        activity_sigma=args.activity_sigma,
+        blueflame_share=args.blueflame_share,
+        roster_share=args.roster_share
+    )
+    elapsed = (datetime.now() - start).total_seconds()
+    
+    print(f"✅ Wrote {len(summary['files'])} files ({summary['rows']:,} rows) for {summary['users']:,} users "
+          f"to {args.output_dir} in {elapsed:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
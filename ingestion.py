@@ -0,0 +1,965 @@
+"""
+Headless Ingestion Pipeline
+
+Reads, normalizes and stores usage exports without Streamlit. This is the
+pipeline behind the dashboard's upload and auto-scan panels, importable from
+scripts, the watch-folder daemon and cron jobs. Importing it does not import
+streamlit or plotly.
+
+Command line (run from the dashboard's working directory, so the same
+openai_metrics.db and file tracking store are used):
+
+    python -m ingestion ingest "OpenAI User Data/march.csv"   # files or folders
+    python -m ingestion scan                    # auto-scan files and their status
+    python -m ingestion scan --ingest           # ingest new and modified files
+    python -m ingestion stats                   # database and tracking statistics
+    python -m ingestion export usage.csv --tool ChatGPT --start-date 2025-01-01
+    python -m ingestion batches                 # uploads stored as ingestion batches
+    python -m ingestion rollback 42             # undo batch 42, restoring what it superseded
+
+The exit status is 1 if any file failed to ingest.
+"""
+
+import argparse
+import io
+import os
+import sys
+from contextlib import nullcontext
+from datetime import datetime
+from typing import Dict, List, Tuple
+
+import pandas as pd
+
+from config import AUTO_SCAN_FOLDERS, FILE_TRACKING_PATH, RECURSIVE_SCAN_FOLDERS, SCAN_STAT_WORKERS
+from cost_calculator import EnterpriseCostCalculator
+from data_processor import DataProcessor
+from database import DatabaseManager
+from export_utils import write_csv_chunks
+from file_reader import read_file_from_path, read_file_robust
+from file_scanner import FileScanner, SCAN_EXTENSIONS
+from ingestion_timing import IngestionTimer, span, hash_bytes, hash_file
+from memory_profiling import profile_stage
+
+
+def detect_data_source(df):
+    """Detect which AI tool the data is from based on column structure."""
+    columns = df.columns.tolist()
+    
+    # OpenAI ChatGPT detection
+    if 'gpt_messages' in columns or 'tool_messages' in columns:
+        return 'ChatGPT'
+    
+    # BlueFlame AI detection - updated for all formats
+    # Check for month columns in both formats:
+    # - Mon-YY format (e.g., 'Sep-24', 'Oct-25')
+    # - YY-Mon format (e.g., '25-Apr', '25-Sep')
+    month_abbrevs = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 
+                     'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+    
+    has_month_cols = any(
+        col for col in columns 
+        if len(col.split('-')) == 2 and (
+            col.split('-')[0] in month_abbrevs or  # Mon-YY format
+            col.split('-')[1] in month_abbrevs     # YY-Mon format
+        )
+    )
+    
+    if ('Metric' in columns and any(col.startswith('MoM Var') for col in columns)) or \
+       ('Total Messages' in df.values if not df.empty else False) or \
+       ('User ID' in columns and has_month_cols) or \
+       ('Table' in columns and has_month_cols):
+        return 'BlueFlame AI'
+    
+    # Default or ask user
+    return 'Unknown'
+
+
+def is_weekly_file(filename):
+    """
+    Detect if a file is a weekly report based on filename.
+    Weekly files contain 'weekly' and a date (YYYY-MM-DD format).
+    
+    Args:
+        filename: Name of the file
+    
+    Returns:
+        bool: True if file is detected as weekly report
+    """
+    filename_lower = filename.lower()
+    # Check if filename contains 'weekly' and a date pattern
+    import re
+    has_weekly = 'weekly' in filename_lower
+    has_date = re.search(r'\d{4}-\d{2}-\d{2}', filename) is not None
+    return has_weekly and has_date
+
+
+def determine_record_month(period_start, period_end, first_active, last_active):
+    """
+    Determine which month a record should be assigned to based on actual usage dates.
+    For weekly files that span two months, assign to the month with more activity days.
+    
+    Args:
+        period_start: Period start date (datetime)
+        period_end: Period end date (datetime)
+        first_active: First day active in period (datetime or None)
+        last_active: Last day active in period (datetime or None)
+    
+    Returns:
+        datetime: The date to use for the record (first day of the assigned month)
+    """
+    # If we have actual activity dates, use them to determine the month
+    if pd.notna(first_active) and pd.notna(last_active):
+        first_active = pd.to_datetime(first_active, errors='coerce')
+        last_active = pd.to_datetime(last_active, errors='coerce')
+        
+        if pd.notna(first_active) and pd.notna(last_active):
+            # Calculate midpoint of actual activity
+            midpoint = first_active + (last_active - first_active) / 2
+            # Return first day of the month containing the midpoint
+            return pd.Timestamp(year=midpoint.year, month=midpoint.month, day=1)
+    
+    # If no activity dates, use period dates
+    if pd.notna(period_start) and pd.notna(period_end):
+        period_start = pd.to_datetime(period_start, errors='coerce')
+        period_end = pd.to_datetime(period_end, errors='coerce')
+        
+        if pd.notna(period_start) and pd.notna(period_end):
+            # Check if period spans two months
+            if period_start.month != period_end.month:
+                # Calculate number of days in each month
+                days_in_start_month = (pd.Timestamp(year=period_start.year, 
+                                                    month=period_start.month, 
+                                                    day=1) + pd.DateOffset(months=1) - pd.Timedelta(days=1)).day - period_start.day + 1
+                days_in_end_month = period_end.day
+                
+                # Assign to month with more days
+                if days_in_start_month >= days_in_end_month:
+                    return pd.Timestamp(year=period_start.year, month=period_start.month, day=1)
+                else:
+                    return pd.Timestamp(year=period_end.year, month=period_end.month, day=1)
+            else:
+                # Same month, use period start
+                return pd.Timestamp(year=period_start.year, month=period_start.month, day=1)
+    
+    # Fallback to period_start or current date
+    if pd.notna(period_start):
+        period_start = pd.to_datetime(period_start, errors='coerce')
+        if pd.notna(period_start):
+            return pd.Timestamp(year=period_start.year, month=period_start.month, day=1)
+    
+    # Last resort: current date
+    now = datetime.now()
+    return pd.Timestamp(year=now.year, month=now.month, day=1)
+
+
+def normalize_openai_data(df, filename, db):
+    """
+    Normalize OpenAI CSV export to standard schema with enterprise license costs.
+    
+    Args:
+        df: DataFrame read from the export
+        filename: Name of the export file (stored as file_source)
+        db: DatabaseManager used to look up employee departments
+    
+    Returns:
+        DataFrame of usage records
+    """
+    normalized_records = []
+    
+    # Get enterprise pricing
+    cost_calc = EnterpriseCostCalculator()
+    pricing_info = cost_calc.get_pricing_info('ChatGPT')
+    monthly_license_cost = pricing_info['license_cost_per_user_monthly']
+    
+    for _, row in df.iterrows():
+        # Get user email and name
+        user_email = row.get('email', '')
+        user_name = row.get('name', '')
+        
+        # Look up employee by email to get authoritative department
+        employee = None
+        try:
+            if user_email:
+                employee = db.get_employee_by_email(user_email)
+            
+            # If no match by email, try matching by name
+            if not employee and user_name:
+                # Try to parse name into first and last
+                name_parts = user_name.strip().split()
+                if len(name_parts) >= 2:
+                    first_name = name_parts[0]
+                    last_name = ' '.join(name_parts[1:])  # Handle multi-part last names
+                    employee = db.get_employee_by_name(first_name, last_name)
+        except AttributeError:
+            # Handle cache error - database object missing methods
+            employee = None
+        
+        if employee:
+            # Use employee data as source of truth
+            dept = employee['department'] if employee['department'] else 'Unknown'
+            user_name = f"{employee['first_name']} {employee['last_name']}".strip()
+            if not user_name:
+                user_name = row.get('name', '')
+        else:
+            # User not in employee roster - flag as unidentified
+            # Parse department - OpenAI exports it as a JSON array string
+            dept = 'Unknown'
+            user_name = row.get('name', '')
+        
+        # Get period dates with robust error handling
+        period_start = pd.to_datetime(row.get('period_start', row.get('first_day_active_in_period', datetime.now())), errors='coerce')
+        period_end = pd.to_datetime(row.get('period_end', row.get('last_day_active_in_period', datetime.now())), errors='coerce')
+        first_active = row.get('first_day_active_in_period')
+        last_active = row.get('last_day_active_in_period')
+        
+        # Fallback to current date if parsing fails
+        if pd.isna(period_start):
+            period_start = datetime.now()
+        if pd.isna(period_end):
+            period_end = datetime.now()
+        
+        # Determine the correct month for this record
+        # For weekly files spanning two months, this ensures data goes to the right month
+        is_weekly = is_weekly_file(filename)
+        if is_weekly:
+            record_date = determine_record_month(period_start, period_end, first_active, last_active)
+        else:
+            # For monthly files, use period_start as before
+            record_date = period_start
+        
+        # ChatGPT messages - cost is enterprise license per user per month
+        if row.get('messages', 0) > 0:
+            normalized_records.append({
+                'user_id': row.get('public_id', row.get('email', '')),
+                'user_name': user_name,
+                'email': user_email,
+                'department': dept,
+                'date': record_date,
+                'feature_used': 'ChatGPT Messages',
+                'usage_count': row.get('messages', 0),
+                'cost_usd': monthly_license_cost,  # Enterprise license cost per user per month
+                'tool_source': 'ChatGPT',
+                'file_source': filename
+            })
+        
+        # GPT-specific messages - included in license, cost is 0
+        if row.get('gpt_messages', 0) > 0:
+            normalized_records.append({
+                'user_id': row.get('public_id', row.get('email', '')),
+                'user_name': user_name,
+                'email': user_email,
+                'department': dept,
+                'date': record_date,
+                'feature_used': 'GPT Messages',
+                'usage_count': row.get('gpt_messages', 0),
+                'cost_usd': 0,  # Included in base license
+                'tool_source': 'ChatGPT',
+                'file_source': filename
+            })
+        
+        # Tool messages - included in license, cost is 0
+        if row.get('tool_messages', 0) > 0:
+            normalized_records.append({
+                'user_id': row.get('public_id', row.get('email', '')),
+                'user_name': user_name,
+                'email': user_email,
+                'department': dept,
+                'date': record_date,
+                'feature_used': 'Tool Messages',
+                'usage_count': row.get('tool_messages', 0),
+                'cost_usd': 0,  # Included in base license
+                'tool_source': 'ChatGPT',
+                'file_source': filename
+            })
+        
+        # Project messages - included in license, cost is 0
+        if row.get('project_messages', 0) > 0:
+            normalized_records.append({
+                'user_id': row.get('public_id', row.get('email', '')),
+                'user_name': user_name,
+                'email': user_email,
+                'department': dept,
+                'date': record_date,
+                'feature_used': 'Project Messages',
+                'usage_count': row.get('project_messages', 0),
+                'cost_usd': 0,  # Included in base license
+                'tool_source': 'ChatGPT',
+                'file_source': filename
+            })
+    
+    return pd.DataFrame(normalized_records)
+
+
+def normalize_blueflame_data(df, filename, db):
+    """
+    Normalize BlueFlame AI data to standard schema with enterprise license costs.
+    
+    Args:
+        df: DataFrame read from the export
+        filename: Name of the export file (stored as file_source)
+        db: DatabaseManager used to look up employee departments
+    
+    Returns:
+        DataFrame of usage records
+    """
+    normalized_records = []
+    
+    # Get enterprise pricing for BlueFlame AI
+    cost_calc = EnterpriseCostCalculator()
+    pricing_info = cost_calc.get_pricing_info('BlueFlame AI')
+    monthly_license_cost = pricing_info['license_cost_per_user_monthly']
+    
+    # Check if this is the combined format with 'Table' column
+    if 'Table' in df.columns:
+        # Split the dataframe by table type
+        monthly_trends = df[df['Table'] == 'Overall Monthly Trends']
+        user_data = df[(df['Table'] == 'Top 20 Users Total') | 
+                      (df['Table'] == 'Top 10 Increasing Users') | 
+                      (df['Table'] == 'Top 10 Decreasing Users') |
+                      (df['Table'] == 'All Users Total') |
+                      (df['Table'] == 'All Increasing Users') |
+                      (df['Table'] == 'All Decreasing Users')]
+        
+        # Note: We skip processing monthly trends/aggregate metrics in favor of real user data
+        # The user data from Top 20/Top 10 tables provides the actual usage information
+        
+        # Process user data (from Top 20 Users, Top 10 Increasing, etc.)
+        if not user_data.empty:
+            # Get month columns (excluding MoM variance columns and non-month columns)
+            month_cols = [col for col in user_data.columns if col not in ['Table', 'Rank', 'Metric', 'User ID'] 
+                         and not col.startswith('MoM Var')]
+            
+            # Deduplicate user data - same user may appear in multiple tables (e.g., Top 20 AND Top 10 Increasing)
+            # Keep first occurrence for each user
+            user_data_deduped = user_data.drop_duplicates(subset=['User ID'], keep='first')
+            
+            # Process each user
+            for _, row in user_data_deduped.iterrows():
+                user_email = row['User ID']
+                if pd.isna(user_email) or not user_email:
+                    continue
+                
+                # Look up employee by email to get authoritative department
+                employee = None
+                try:
+                    employee = db.get_employee_by_email(user_email) if user_email else None
+                    
+                    # If no match by email, try to extract name from email and match
+                    if not employee and user_email:
+                        # Try to parse name from email (e.g., john.doe@company.com -> John Doe)
+                        email_name = user_email.split('@')[0].replace('.', ' ').strip()
+                        name_parts = email_name.split()
+                        if len(name_parts) >= 2:
+                            first_name = name_parts[0]
+                            last_name = ' '.join(name_parts[1:])
+                            employee = db.get_employee_by_name(first_name, last_name)
+                except AttributeError:
+                    # Handle cache error - database object missing methods
+                    employee = None
+                
+                if employee:
+                    # Use employee data as source of truth
+                    dept = employee['department'] if employee['department'] else 'Unknown'
+                    user_name = f"{employee['first_name']} {employee['last_name']}".strip()
+                    if not user_name:
+                        user_name = user_email.split('@')[0].replace('.', ' ').title()
+                else:
+                    # User not in employee roster - flag as unidentified
+                    dept = 'Unknown'
+                    user_name = user_email.split('@')[0].replace('.', ' ').title()
+                
+                # Process each month for this user
+                for month_col in month_cols:
+                    try:
+                        # Parse month to a datetime (format like '25-Sep' or 'Sep-25')
+                        month_date = None
+                        for fmt in ['%y-%b', '%b-%y', '%Y-%b', '%b-%Y']:
+                            try:
+                                month_date = pd.to_datetime(month_col, format=fmt, errors='coerce')
+                                if not pd.isna(month_date):
+                                    break
+                            except:
+                                continue
+                        
+                        if pd.isna(month_date):
+                            continue
+                        
+                        # Get message count for this month
+                        message_count = row[month_col]
+                        
+                        # Handle dash placeholders and formatting
+                        if isinstance(message_count, str):
+                            if message_count in ['–', '-', '—', 'N/A', '']:
+                                continue
+                            message_count = int(message_count.replace(',', ''))
+                        
+                        # Skip months with no meaningful data
+                        if pd.isna(message_count) or message_count == 0:
+                            continue
+                        
+                        # Create user record for this month with enterprise license cost
+                        normalized_records.append({
+                            'user_id': user_email,
+                            'user_name': user_name,
+                            'email': user_email,
+                            'department': dept,
+                            'date': month_date,
+                            'feature_used': 'BlueFlame Messages',
+                            'usage_count': int(message_count),
+                            'cost_usd': monthly_license_cost,  # Enterprise license cost per user per month
+                            'tool_source': 'BlueFlame AI',
+                            'file_source': filename
+                        })
+                    except Exception as e:
+                        print(f"Error processing month {month_col} for user {user_email}: {str(e)}")
+    
+    # Check if this is the summary report format with 'Metric' column (but no Table column)
+    elif 'Metric' in df.columns and 'User ID' not in df.columns:
+        # This format only has aggregate metrics, no individual user data
+        # Skip processing as we prefer real user data from other formats
+        print("Skipping aggregate-only format without user data")
+    
+    # If we have the wide-format file with User ID column (new format without 'Table' column)
+    elif 'User ID' in df.columns:
+        # Get month columns (excluding MoM variance columns, Rank, Metric, and User ID)
+        month_cols = [col for col in df.columns if col not in ['User ID', 'Rank', 'Metric'] 
+                     and not col.startswith('MoM Var')]
+        
+        # Process each user record
+        for _, row in df.iterrows():
+            user_email = row['User ID']
+            if pd.isna(user_email) or not user_email:
+                continue
+            
+            # Look up employee by email to get authoritative department
+            employee = None
+            try:
+                employee = db.get_employee_by_email(user_email) if user_email else None
+                
+                # If no match by email, try to extract name from email and match
+                if not employee and user_email:
+                    # Try to parse name from email (e.g., john.doe@company.com -> John Doe)
+                    email_name = user_email.split('@')[0].replace('.', ' ').strip()
+                    name_parts = email_name.split()
+                    if len(name_parts) >= 2:
+                        first_name = name_parts[0]
+                        last_name = ' '.join(name_parts[1:])
+                        employee = db.get_employee_by_name(first_name, last_name)
+            except AttributeError:
+                # Handle cache error - database object missing methods
+                employee = None
+            
+            if employee:
+                # Use employee data as source of truth
+                dept = employee['department'] if employee['department'] else 'Unknown'
+                user_name = f"{employee['first_name']} {employee['last_name']}".strip()
+                if not user_name:
+                    user_name = user_email.split('@')[0].replace('.', ' ').title()
+            else:
+                # User not in employee roster - flag as unidentified
+                dept = 'Unknown'
+                user_name = user_email.split('@')[0].replace('.', ' ').title()
+            
+            # Process each month for this user
+            for month_col in month_cols:
+                try:
+                    # Parse month to a datetime (format like '25-Sep' or 'Sep-25')
+                    month_date = None
+                    for fmt in ['%y-%b', '%b-%y', '%Y-%b', '%b-%Y']:
+                        try:
+                            month_date = pd.to_datetime(month_col, format=fmt, errors='coerce')
+                            if not pd.isna(month_date):
+                                break
+                        except:
+                            continue
+                    
+                    if pd.isna(month_date):
+                        continue
+                    
+                    # Get message count for this month
+                    message_count = row[month_col]
+                    
+                    # Handle dash placeholders and formatting
+                    if isinstance(message_count, str):
+                        if message_count in ['–', '-', '—', 'N/A', '']:
+                            continue
+                        message_count = int(message_count.replace(',', ''))
+                    
+                    # Skip months with no meaningful data
+                    if pd.isna(message_count) or message_count == 0:
+                        continue
+                    
+                    # Create user record for this month with enterprise license cost
+                    normalized_records.append({
+                        'user_id': user_email,
+                        'user_name': user_name,
+                        'email': user_email,
+                        'department': dept,
+                        'date': month_date,
+                        'feature_used': 'BlueFlame Messages',
+                        'usage_count': int(message_count),
+                        'cost_usd': monthly_license_cost,  # Enterprise license cost per user per month
+                        'tool_source': 'BlueFlame AI',
+                        'file_source': filename
+                    })
+                
+                except Exception as e:
+                    print(f"Error processing month {month_col} for user {user_email}: {str(e)}")
+    
+    # Other formats (possibly old BlueFlame format or future formats)
+    else:
+        # Process each user record using best effort detection
+        for idx, row in df.iterrows():
+            user = row.get('User', row.get('Email', f'blueflame-user-{idx}'))
+            email = row.get('Email', f'{user.lower().replace(" ", ".")}@company.com')
+            messages = row.get('Messages', row.get('Usage', 0))
+            date_col = next((col for col in df.columns if 'Date' in col or 'Month' in col), None)
+            
+            if date_col:
+                try:
+                    date = pd.to_datetime(row[date_col], errors='coerce')
+                    if pd.isna(date):
+                        date = datetime.now()
+                except:
+                    date = datetime.now()
+            else:
+                date = datetime.now()
+            
+            if messages > 0:
+                normalized_records.append({
+                    'user_id': email,
+                    'user_name': user,
+                    'email': email,
+                    'department': row.get('Department', 'BlueFlame Users'),
+                    'date': date,
+                    'feature_used': 'BlueFlame Messages',
+                    'usage_count': messages,
+                    'cost_usd': monthly_license_cost,  # Enterprise license cost per user per month
+                    'tool_source': 'BlueFlame AI',
+                    'file_source': filename
+                })
+    
+    return pd.DataFrame(normalized_records)
+
+
+class IngestionPipeline:
+    """Reads, normalizes and stores export files, recording timings and tracking status."""
+    
+    def __init__(self, db: DatabaseManager, processor: DataProcessor = None, scanner: FileScanner = None):
+        """
+        Initialize the pipeline.
+        
+        Args:
+            db: DatabaseManager to store usage data and ingestion runs in
+            processor: DataProcessor for the database (created if not given)
+            scanner: FileScanner whose tracking store records each outcome (optional)
+        """
+        self.db = db
+        self.processor = processor or DataProcessor(db)
+        self.scanner = scanner
+    
+    def normalize_openai_data(self, df, filename):
+        """Normalize an OpenAI export (see normalize_openai_data)."""
+        return normalize_openai_data(df, filename, self.db)
+    
+    def normalize_blueflame_data(self, df, filename):
+        """Normalize a BlueFlame AI export (see normalize_blueflame_data)."""
+        return normalize_blueflame_data(df, filename, self.db)
+    
+    def record_ingestion(self, timer, filename, content_hash, file_bytes, result):
+        """
+        Store the timing spans of one ingestion in the ingestion_runs table.
+        
+        Args:
+            timer: IngestionTimer used for the run
+            filename: Name of the ingested file
+            content_hash: SHA-256 of the file content
+            file_bytes: File size in bytes
+            result: tuple (success: bool, message: str, records_count: int)
+        
+        Returns:
+            The result tuple, unchanged
+        """
+        success, message, records_count = result
+        self.db.record_ingestion_run(
+            filename,
+            content_hash,
+            timer.spans,
+            'success' if success else 'error',
+            rows=records_count,
+            file_bytes=file_bytes,
+            tool_source=timer.tool_source,
+            total_ms=timer.total_ms(),
+            message=message,
+            started_at=timer.started_at
+        )
+        return result
+    
+    def process_file(self, file_info: Dict, tool_type: str = 'Auto-Detect', progress=None,
+                     store_lock=None) -> Tuple[bool, str, int]:
+        """
+        Process one export file, recording per-stage timings.
+        
+        Args:
+            file_info: Dictionary with at least 'path' and 'filename' (e.g. from FileScanner)
+            tool_type: Type of AI tool (Auto-Detect, OpenAI ChatGPT, etc.)
+            progress: Optional callable(stage, **counts) told about each stage (see _store)
+            store_lock: Optional callable(keys) returning a context manager held while the
+                normalized rows are stored; keys are sorted (tool_source, 'YYYY-MM') pairs
+        
+        Returns:
+            tuple: (success: bool, message: str, records_count: int)
+        """
+        timer = IngestionTimer()
+        content_hash = None
+        file_bytes = None
+        try:
+            with span(timer, 'hash') as hash_span:
+                content_hash = hash_file(file_info['path'])
+                file_bytes = os.path.getsize(file_info['path'])
+                hash_span['bytes'] = file_bytes
+        except OSError:
+            pass
+        
+        result = self._process_file(file_info, tool_type, timer, content_hash, progress, store_lock)
+        return self.record_ingestion(timer, file_info['filename'], content_hash, file_bytes, result)
+    
+    def process_upload(self, filename: str, content: bytes, tool_type: str = 'Auto-Detect', progress=None,
+                       store_lock=None) -> Tuple[bool, str, int]:
+        """
+        Process an uploaded file held in memory (the dashboard's sidebar upload).
+        
+        Args:
+            filename: Name of the uploaded file (its extension selects the reader)
+            content: File content
+            tool_type: Type of AI tool (Auto-Detect, OpenAI ChatGPT, etc.)
+            progress: See process_file
+            store_lock: See process_file
+        
+        Returns:
+            tuple: (success: bool, message: str, records_count: int)
+        """
+        timer = IngestionTimer()
+        with span(timer, 'hash') as hash_span:
+            content_hash = hash_bytes(content)
+            hash_span['bytes'] = len(content)
+        
+        try:
+            _notify(progress, 'reading')
+            upload = io.BytesIO(content)
+            upload.name = filename
+            with profile_stage('read_file', file=filename):
+                df, read_error = read_file_robust(upload, timer=timer)
+            
+            if read_error:
+                result = (False, f"Error reading file: {read_error}", 0)
+            elif df is None or df.empty:
+                result = (False, "The uploaded file contains no data", 0)
+            else:
+                normalized_df, error = self._normalize(df, filename, tool_type, timer, progress)
+                if error:
+                    result = (False, error, 0)
+                else:
+                    success, message = self._store(normalized_df, filename, timer, progress, store_lock)
+                    result = (success, message, len(normalized_df) if success else 0)
+        except Exception as e:
+            result = (False, f"Error processing file: {str(e)}", 0)
+        
+        return self.record_ingestion(timer, filename, content_hash, len(content), result)
+    
+    def _mark_processed(self, file_path, **kwargs):
+        if self.scanner is not None:
+            self.scanner.mark_processed(file_path, **kwargs)
+    
+    def _process_file(self, file_info, tool_type, timer, content_hash=None, progress=None, store_lock=None):
+        """Read, normalize and store one file (see process_file)."""
+        try:
+            file_path = file_info['path']
+            
+            # Read file from filesystem
+            _notify(progress, 'reading')
+            with profile_stage('read_file', file=file_info['filename']):
+                df, read_error = read_file_from_path(file_path, timer=timer)
+            
+            if read_error:
+                return False, f"Error reading file: {read_error}", 0
+            
+            if df is None or df.empty:
+                return False, "File contains no data", 0
+            
+            normalized_df, error = self._normalize(df, file_info['filename'], tool_type, timer, progress)
+            if error:
+                return False, error, 0
+            
+            # Process the normalized data
+            success, message = self._store(normalized_df, file_info['filename'], timer, progress, store_lock)
+            
+            if success:
+                # Mark file as processed
+                self._mark_processed(
+                    file_path, 
+                    success=True, 
+                    records_count=len(normalized_df),
+                    content_hash=content_hash
+                )
+                return True, f"Successfully processed {len(normalized_df)} records", len(normalized_df)
+            else:
+                self._mark_processed(
+                    file_path, 
+                    success=False, 
+                    error=message,
+                    content_hash=content_hash
+                )
+                return False, message, 0
+        
+        except Exception as e:
+            error_msg = f"Error processing file: {str(e)}"
+            self._mark_processed(
+                file_info['path'], 
+                success=False, 
+                error=error_msg,
+                content_hash=content_hash
+            )
+            return False, error_msg, 0
+    
+    def _normalize(self, df, filename, tool_type, timer, progress=None):
+        """
+        Detect the data source of a read file and normalize it.
+        
+        Returns:
+            tuple: (normalized DataFrame or None, error message or None)
+        """
+        _notify(progress, 'normalizing', rows_read=len(df))
+        
+        # Detect data source
+        with span(timer, 'source_detection', rows=len(df)):
+            if tool_type == 'Auto-Detect':
+                detected_tool = detect_data_source(df)
+            else:
+                detected_tool = tool_type.replace('OpenAI ', '')
+        timer.tool_source = detected_tool
+        
+        # Normalize data based on detected tool
+        with profile_stage('normalize', file=filename, tool=detected_tool, input_rows=len(df)), \
+                span(timer, 'normalization', rows=len(df)):
+            if 'ChatGPT' in detected_tool:
+                normalized_df = self.normalize_openai_data(df, filename)
+            elif 'BlueFlame' in detected_tool:
+                normalized_df = self.normalize_blueflame_data(df, filename)
+            else:
+                return None, f"Unknown data format: {detected_tool}"
+        
+        if normalized_df.empty:
+            return None, "No valid data found after normalization"
+        return normalized_df, None
+    
+    def _store(self, normalized_df, filename, timer, progress=None, store_lock=None):
+        """
+        Supersede and insert normalized rows, holding store_lock for their tool/months.
+        
+        progress is called with 'waiting' (rows_normalized) before the lock is
+        taken, 'storing' once it is held, and 'stored' (rows_superseded,
+        rows_inserted) after a successful store.
+        
+        Returns:
+            tuple: (success: bool, message: str) from DataProcessor.process_monthly_data
+        """
+        _notify(progress, 'waiting', rows_normalized=len(normalized_df))
+        lock = store_lock(ingestion_keys(normalized_df)) if store_lock else nullcontext()
+        with lock:
+            _notify(progress, 'storing')
+            with profile_stage('process_monthly_data', file=filename, rows=len(normalized_df)):
+                success, message = self.processor.process_monthly_data(normalized_df, filename, timer=timer)
+        
+        if success:
+            spans = timer.spans if timer else []
+            _notify(progress, 'stored',
+                    rows_superseded=sum(s.get('deleted') or 0 for s in spans if s['stage'] == 'superseding'),
+                    rows_inserted=sum(s['rows'] or 0 for s in spans if s['stage'] == 'insert'))
+        return success, message
+
+
+def _notify(progress, stage, **counts):
+    if progress is not None:
+        progress(stage, **counts)
+
+
+def ingestion_keys(normalized_df) -> List[Tuple[str, str]]:
+    """
+    The (tool_source, 'YYYY-MM') pairs whose rows storing normalized_df supersedes.
+    
+    Args:
+        normalized_df: Normalized usage records
+    
+    Returns:
+        Sorted list of (tool_source, month) tuples
+    """
+    months = pd.to_datetime(normalized_df['date'], errors='coerce').dropna().dt.to_period('M').unique()
+    tools = normalized_df['tool_source'].dropna().unique()
+    return sorted({(str(tool), str(month)) for tool in tools for month in months})
+
+
+def collect_files(paths: List[str]) -> List[str]:
+    """
+    Expand files and folders (recursively) into a sorted list of export files.
+    
+    Args:
+        paths: File or folder paths
+    
+    Returns:
+        List of .csv/.xlsx/.xls file paths
+    """
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, names in os.walk(path):
+                dirs.sort()
+                files.extend(os.path.join(root, name) for name in sorted(names) if name.endswith(SCAN_EXTENSIONS))
+        else:
+            files.append(path)
+    return files
+
+
+def create_scanner() -> FileScanner:
+    """FileScanner on the dashboard's tracking store."""
+    return FileScanner(FILE_TRACKING_PATH, recursive_folders=RECURSIVE_SCAN_FOLDERS,
+                       stat_workers=SCAN_STAT_WORKERS, max_listing_age=0)
+
+
+def ingest_files(pipeline: IngestionPipeline, file_infos: List[Dict], tool_type: str = 'Auto-Detect') -> int:
+    """Process files one after another, printing each outcome. Returns the number of failures."""
+    failures = 0
+    for file_info in file_infos:
+        success, message, records = pipeline.process_file(file_info, tool_type)
+        if not success:
+            failures += 1
+        print(f"{'OK' if success else 'FAILED'} {file_info['path']}: {message}")
+    return failures
+
+
+def cmd_ingest(args) -> int:
+    files = collect_files(args.paths)
+    missing = [path for path in files if not os.path.isfile(path)]
+    if missing:
+        print(f"File not found: {', '.join(missing)}")
+        return 1
+    
+    db = DatabaseManager(args.db)
+    pipeline = IngestionPipeline(db, scanner=create_scanner())
+    file_infos = [{'path': path, 'filename': os.path.basename(path)} for path in files]
+    return 1 if ingest_files(pipeline, file_infos, args.tool) else 0
+
+
+def cmd_scan(args) -> int:
+    scanner = create_scanner()
+    folders = args.folders or AUTO_SCAN_FOLDERS
+    files = scanner.scan_folders(folders)
+    for file_info in files:
+        print(f"{file_info['status']:<10} {file_info['size_mb']:>8.2f} MB  {file_info['path']}")
+    
+    pending = [f for f in files if f['status'] in ('new', 'modified')]
+    print(f"{len(files)} file(s), {len(pending)} new or modified")
+    if not args.ingest or not pending:
+        return 0
+    
+    pipeline = IngestionPipeline(DatabaseManager(args.db), scanner=scanner)
+    return 1 if ingest_files(pipeline, pending, args.tool) else 0
+
+
+def cmd_stats(args) -> int:
+    stats = DatabaseManager(args.db).get_database_stats()
+    if stats is None:
+        return 1
+    print(f"Records:     {stats['total_records']:,}")
+    print(f"Users:       {stats['unique_users']:,}")
+    print(f"Departments: {stats['unique_departments']:,}")
+    print(f"Total cost:  ${stats['total_cost']:,.2f}")
+    print(f"Date range:  {stats['date_range'] or '-'}")
+    for tool, count in sorted(stats['records_by_tool'].items()):
+        print(f"  {tool}: {count:,} records")
+    
+    tracking = create_scanner().get_file_stats()
+    print(f"Tracked files: {tracking['total_tracked']} ({tracking['successful']} successful, "
+          f"{tracking['failed']} failed)")
+    return 0
+
+
+def cmd_export(args) -> int:
+    db = DatabaseManager(args.db)
+    # Written chunk by chunk, so exporting a large table does not load it all at once
+    chunks = db.iter_filtered_data(start_date=args.start_date, end_date=args.end_date, tools=args.tools,
+                                   columns=DatabaseManager.PUBLIC_COLUMNS)
+    
+    try:
+        if args.output == '-':
+            write_csv_chunks(chunks, sys.stdout)
+        else:
+            records = write_csv_chunks(chunks, args.output)
+            print(f"Exported {records:,} records to {args.output}")
+    except Exception as e:
+        print(f"Export failed: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+def cmd_batches(args) -> int:
+    batches = DatabaseManager(args.db).get_ingestion_batches(limit=args.limit)
+    if batches.empty:
+        print("No ingestion batches")
+        return 0
+    for _, batch in batches.iterrows():
+        print(f"{batch['batch_id']:>6}  {batch['status']:<11}  {batch['created_at']}  "
+              f"+{batch['rows_inserted']:,} -{batch['rows_superseded']:,}  {batch['tool_source']}  {batch['filename']}")
+    return 0
+
+
+def cmd_rollback(args) -> int:
+    success, message = DatabaseManager(args.db).rollback_batch(args.batch_id)
+    if not success:
+        print(message, file=sys.stderr)
+    return 0 if success else 1
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog='python -m ingestion',
+                                     description="Ingest and export usage data without the dashboard")
+    parser.add_argument('--db', default='openai_metrics.db', help="database file (default: openai_metrics.db)")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    tool_choices = ['Auto-Detect', 'ChatGPT', 'BlueFlame AI']
+    
+    ingest_parser = subparsers.add_parser('ingest', help="ingest export files or folders")
+    ingest_parser.add_argument('paths', nargs='+', help="export files or folders of exports")
+    ingest_parser.add_argument('--tool', default='Auto-Detect', choices=tool_choices)
+    ingest_parser.set_defaults(func=cmd_ingest)
+    
+    scan_parser = subparsers.add_parser('scan', help="list auto-scan files and their status")
+    scan_parser.add_argument('--folder', action='append', dest='folders',
+                             help="folder to scan (repeatable; default: AUTO_SCAN_FOLDERS)")
+    scan_parser.add_argument('--ingest', action='store_true', help="ingest new and modified files")
+    scan_parser.add_argument('--tool', default='Auto-Detect', choices=tool_choices)
+    scan_parser.set_defaults(func=cmd_scan)
+    
+    stats_parser = subparsers.add_parser('stats', help="print database and tracking statistics")
+    stats_parser.set_defaults(func=cmd_stats)
+    
+    export_parser = subparsers.add_parser('export', help="export usage records to CSV")
+    export_parser.add_argument('output', help="output CSV file, or - for stdout")
+    export_parser.add_argument('--tool', action='append', dest='tools', help="tool to include (repeatable)")
+    export_parser.add_argument('--start-date', help="first date (YYYY-MM-DD)")
+    export_parser.add_argument('--end-date', help="last date (YYYY-MM-DD)")
+    export_parser.set_defaults(func=cmd_export)
+    
+    batches_parser = subparsers.add_parser('batches', help="list ingestion batches, newest first")
+    batches_parser.add_argument('--limit', type=int, default=20)
+    batches_parser.set_defaults(func=cmd_batches)
+    
+    rollback_parser = subparsers.add_parser('rollback', help="undo an ingestion batch")
+    rollback_parser.add_argument('batch_id', type=int)
+    rollback_parser.set_defaults(func=cmd_rollback)
+    
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,311 @@
+"""
+Background Ingestion Jobs
+
+Uploads and auto-scanned files used to be ingested on the Streamlit script
+thread: the UI was frozen for the whole read → normalize → supersede → insert
+run, and a rerun part-way through could abort it. IngestionJobQueue runs them
+on worker threads shared by every session instead. Each submitted job gets an
+id; the dashboard keeps the ids in session state and polls job snapshots for
+status and progress (rows read, normalized, superseded and inserted).
+
+Jobs read and normalize in parallel, but storing holds a lock for every
+(tool, month) the rows belong to, so two files for the same tool and month
+are superseded and inserted one after the other.
+
+An on_success callback runs on a worker thread once the queue has no queued
+or running jobs left, with the jobs that succeeded since it last ran, e.g. to
+rebuild cached reports for the new data once rather than for every file of a
+batch.
+"""
+
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+from ingestion import IngestionPipeline
+
+# Job statuses
+QUEUED = 'queued'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+FINISHED_STATUSES = (SUCCEEDED, FAILED)
+
+# Stages reported by IngestionPipeline, with the progress fraction shown for each
+STAGE_PROGRESS = {
+    'queued': 0.0,
+    'reading': 0.1,
+    'normalizing': 0.3,
+    'waiting': 0.6,
+    'storing': 0.7,
+    'stored': 0.9,
+    'validating': 0.95,
+    'done': 1.0,
+}
+
+
+class IngestionJob:
+    """State of one submitted file; updated by a worker thread, read through snapshot()."""
+    
+    def __init__(self, job_id: str, filename: str, tool_type: str, path: Optional[str] = None):
+        self.job_id = job_id
+        self.filename = filename
+        self.tool_type = tool_type
+        self.path = path
+        self.status = QUEUED
+        self.stage = 'queued'
+        self.message = None
+        self.records = 0
+        self.rows_read = None
+        self.rows_normalized = None
+        self.rows_superseded = None
+        self.rows_inserted = None
+        self.duplicate_sets = None
+        self.submitted_at = datetime.now().isoformat()
+        self.started_at = None
+        self.finished_at = None
+        self._lock = threading.Lock()
+    
+    def update(self, stage=None, **fields):
+        """Set the current stage and any counts or status fields."""
+        with self._lock:
+            if stage is not None:
+                self.stage = stage
+            for name, value in fields.items():
+                setattr(self, name, value)
+    
+    def snapshot(self) -> Dict:
+        """
+        Return a consistent copy of the job state.
+        
+        Returns:
+            Dictionary with job_id, filename, tool_type, path, status, stage,
+            progress (0-1), message, records, rows_read, rows_normalized,
+            rows_superseded, rows_inserted, duplicate_sets and timestamps
+        """
+        with self._lock:
+            return {
+                'job_id': self.job_id,
+                'filename': self.filename,
+                'tool_type': self.tool_type,
+                'path': self.path,
+                'status': self.status,
+                'stage': self.stage,
+                'progress': STAGE_PROGRESS.get(self.stage, 0.0),
+                'message': self.message,
+                'records': self.records,
+                'rows_read': self.rows_read,
+                'rows_normalized': self.rows_normalized,
+                'rows_superseded': self.rows_superseded,
+                'rows_inserted': self.rows_inserted,
+                'duplicate_sets': self.duplicate_sets,
+                'submitted_at': self.submitted_at,
+                'started_at': self.started_at,
+                'finished_at': self.finished_at,
+            }
+
+
+class IngestionJobQueue:
+    """Runs ingestion jobs on worker threads and keeps their state for polling."""
+    
+    def __init__(self, pipeline: IngestionPipeline, workers: int = 2, history: int = 200,
+                 on_success: Optional[Callable[[List[Dict]], None]] = None):
+        """
+        Initialize the queue.
+        
+        Args:
+            pipeline: IngestionPipeline the jobs run through (shared by all workers)
+            workers: Number of files ingested at once
+            history: Finished jobs kept for polling before the oldest are dropped
+            on_success: Called on a worker thread with the snapshots of the jobs that
+                succeeded, once no job is queued or running; errors are printed
+        """
+        self.pipeline = pipeline
+        self.history = history
+        self.on_success = on_success
+        self._succeeded = []
+        self._executor = ThreadPoolExecutor(max_workers=max(int(workers), 1), thread_name_prefix='ingestion-job')
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._key_locks = {}
+    
+    def submit_file(self, file_info: Dict, tool_type: str = 'Auto-Detect') -> str:
+        """
+        Queue an auto-scanned file (see IngestionPipeline.process_file).
+        
+        A file that is already queued or running is not queued twice.
+        
+        Args:
+            file_info: Dictionary with at least 'path' and 'filename'
+            tool_type: Type of AI tool (Auto-Detect, OpenAI ChatGPT, etc.)
+        
+        Returns:
+            str: Job id
+        """
+        job, created = self._add_job(file_info['filename'], tool_type, path=file_info['path'])
+        if not created:
+            return job.job_id
+        self._executor.submit(self._run, job, lambda progress, store_lock: self.pipeline.process_file(
+            file_info, tool_type, progress=progress, store_lock=store_lock))
+        return job.job_id
+    
+    def submit_upload(self, filename: str, content: bytes, tool_type: str = 'Auto-Detect',
+                      check_duplicates: bool = True) -> str:
+        """
+        Queue an uploaded file (see IngestionPipeline.process_upload).
+        
+        Args:
+            filename: Name of the uploaded file
+            content: File content (kept in memory until the job has run)
+            tool_type: Type of AI tool (Auto-Detect, OpenAI ChatGPT, etc.)
+            check_duplicates: Count duplicate record sets after a successful upload
+        
+        Returns:
+            str: Job id
+        """
+        job, _ = self._add_job(filename, tool_type)
+        self._executor.submit(self._run, job, lambda progress, store_lock: self.pipeline.process_upload(
+            filename, content, tool_type, progress=progress, store_lock=store_lock), check_duplicates)
+        return job.job_id
+    
+    def replace_pipeline(self, pipeline: IngestionPipeline,
+                         on_success: Optional[Callable[[List[Dict]], None]] = None) -> bool:
+        """
+        Run later jobs through another pipeline (e.g. after the app recreated its database objects).
+        
+        Only done while no job is queued or running, so a batch of jobs never mixes the two.
+        
+        Args:
+            pipeline: IngestionPipeline for the next jobs
+            on_success: Callback replacing the current one (see __init__)
+        
+        Returns:
+            bool: True if replaced, False if jobs are still pending (try again later)
+        """
+        with self._lock:
+            if any(job.status not in FINISHED_STATUSES for job in self._jobs.values()):
+                return False
+            self.pipeline = pipeline
+            self.on_success = on_success
+            return True
+    
+    def _add_job(self, filename, tool_type, path=None) -> Tuple[IngestionJob, bool]:
+        """Register a job; returns (job, created), reusing an unfinished job for the same path."""
+        job = IngestionJob(uuid.uuid4().hex[:12], filename, tool_type, path=path)
+        with self._lock:
+            for existing in self._jobs.values():
+                if path and existing.path == path and existing.status not in FINISHED_STATUSES:
+                    return existing, False
+            self._jobs[job.job_id] = job
+            finished = [job_id for job_id, j in self._jobs.items() if j.status in FINISHED_STATUSES]
+            for job_id in finished[:max(len(finished) - self.history, 0)]:
+                del self._jobs[job_id]
+        return job, True
+    
+    def _run(self, job: IngestionJob, work, check_duplicates=False):
+        """Run one job on a worker thread."""
+        job.update(status=RUNNING, started_at=datetime.now().isoformat())
+        try:
+            success, message, records = work(job.update, self._store_lock)
+            if success and check_duplicates:
+                job.update('validating')
+                job.update(duplicate_sets=len(self.pipeline.db.detect_duplicates()))
+        except Exception as e:
+            success, message, records = False, f"Error processing file: {str(e)}", 0
+        job.update('done', status=SUCCEEDED if success else FAILED, message=message, records=records,
+                   finished_at=datetime.now().isoformat())
+        
+        # Successful jobs are collected until the queue is idle, so a batch of files
+        # triggers the callback once
+        with self._lock:
+            if success:
+                self._succeeded.append(job)
+            succeeded = []
+            if all(j.status in FINISHED_STATUSES for j in self._jobs.values()):
+                succeeded, self._succeeded = self._succeeded, []
+        if succeeded and self.on_success is not None:
+            try:
+                self.on_success([j.snapshot() for j in succeeded])
+            except Exception as e:
+                print(f"Error in ingestion job callback: {e}")
+    
+    @contextmanager
+    def _store_lock(self, keys):
+        """
+        Hold the lock of every (tool, month) key, taken in sorted order so jobs cannot deadlock.
+        
+        Each key's lock counts the jobs holding or waiting for it and is dropped
+        when the last one is done, so the table only holds keys in use.
+        """
+        keys = sorted(set(keys))
+        with self._lock:
+            entries = [self._key_locks.setdefault(key, [threading.Lock(), 0]) for key in keys]
+            for entry in entries:
+                entry[1] += 1
+        try:
+            for lock, _ in entries:
+                lock.acquire()
+            try:
+                yield
+            finally:
+                for lock, _ in reversed(entries):
+                    lock.release()
+        finally:
+            with self._lock:
+                for key, entry in zip(keys, entries):
+                    entry[1] -= 1
+                    if entry[1] == 0:
+                        del self._key_locks[key]
+    
+    def get(self, job_id: str) -> Optional[Dict]:
+        """Snapshot of one job, or None if the id is unknown (or dropped from history)."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        return job.snapshot() if job else None
+    
+    def list_jobs(self, job_ids: List[str] = None) -> List[Dict]:
+        """
+        Snapshots of the given jobs (or all jobs), in submission order.
+        
+        Args:
+            job_ids: Job ids to include; unknown ids are skipped
+        
+        Returns:
+            List of job snapshot dicts
+        """
+        with self._lock:
+            jobs = list(self._jobs.values()) if job_ids is None else \
+                [self._jobs[job_id] for job_id in job_ids if job_id in self._jobs]
+        return [job.snapshot() for job in jobs]
+    
+    def active_paths(self) -> Dict[str, Dict]:
+        """Snapshots of queued or running file jobs, keyed by file path."""
+        return {job['path']: job for job in self.list_jobs()
+                if job['path'] and job['status'] not in FINISHED_STATUSES}
+    
+    def wait(self, job_ids: List[str] = None, timeout: float = None) -> bool:
+        """
+        Wait until the given jobs (or all jobs) have finished.
+        
+        Args:
+            job_ids: Job ids to wait for
+            timeout: Maximum seconds to wait (None waits indefinitely)
+        
+        Returns:
+            bool: True if all finished, False on timeout
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while any(job['status'] not in FINISHED_STATUSES for job in self.list_jobs(job_ids)):
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.05)
+        return True
+    
+    def shutdown(self, wait: bool = True):
+        """Stop accepting jobs and (optionally) wait for queued ones to finish."""
+        self._executor.shutdown(wait=wait)
@@ -0,0 +1,293 @@
+"""
+Memory Profiling for Ingestion and Rendering Stages
+
+Wraps pipeline stages (file reading, normalization, database ingestion, dashboard
+data preparation) in tracemalloc snapshots and RSS sampling, and reports the
+peak memory and top allocation sites of each stage.
+
+Profiling is off by default and costs nothing when disabled. Enable it in the
+app with environment variables:
+
+    MEMORY_PROFILE=1                        # turn profiling on
+    MEMORY_PROFILE_OUTPUT=memory_profile.jsonl  # one JSON record per stage (default)
+    MEMORY_PROFILE_TOP=10                   # allocation sites per stage (default 10)
+
+or run benchmarks/memory_profile.py against fixture files.
+"""
+
+import json
+import linecache
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+
+ENABLE_ENV = 'MEMORY_PROFILE'
+OUTPUT_ENV = 'MEMORY_PROFILE_OUTPUT'
+TOP_ENV = 'MEMORY_PROFILE_TOP'
+DEFAULT_OUTPUT = 'memory_profile.jsonl'
+
+# Frames deeper than this are not recorded (tracemalloc's default is 1)
+TRACEBACK_FRAMES = 5
+
+
+def is_enabled():
+    """Return True when memory profiling is switched on by environment variable."""
+    return os.environ.get(ENABLE_ENV, '').strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+def get_rss_bytes():
+    """
+    Return the resident set size of this process in bytes.
+    
+    Uses psutil when installed, then /proc (Linux), then the peak RSS from
+    getrusage as a last resort. Returns None if none are available.
+    """
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+    
+    try:
+        with open('/proc/self/status', 'r') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in bytes on macOS and kilobytes elsewhere
+        return peak if sys.platform == 'darwin' else peak * 1024
+    except (ImportError, OSError):
+        return None
+
+
+def format_bytes(num_bytes):
+    """Format a byte count for logs (e.g. '12.3 MB')."""
+    if num_bytes is None:
+        return 'n/a'
+    value = float(num_bytes)
+    for unit in ['B', 'KB', 'MB', 'GB']:
+        if abs(value) < 1024 or unit == 'GB':
+            return f"{value:.1f} {unit}"
+        value /= 1024
+
+
+class _RSSSampler:
+    """Background thread recording the highest RSS seen while a stage runs."""
+    
+    def __init__(self, interval):
+        self.interval = interval
+        self.peak = get_rss_bytes()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='rss-sampler', daemon=True)
+    
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            rss = get_rss_bytes()
+            if rss is not None and (self.peak is None or rss > self.peak):
+                self.peak = rss
+    
+    def start(self):
+        self._thread.start()
+    
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        rss = get_rss_bytes()
+        if rss is not None and (self.peak is None or rss > self.peak):
+            self.peak = rss
+        return self.peak
+
+
+class MemoryProfiler:
+    """
+    Records peak memory and allocation sites for named stages.
+    
+    Stages may be nested; an enclosing stage's peak includes its inner stages.
+    
+    Args:
+        top_n: Number of allocation sites to keep per stage
+        sample_interval: Seconds between RSS samples
+        output_path: Optional JSON Lines file that each stage record is appended to
+    """
+    
+    def __init__(self, top_n=10, sample_interval=0.05, output_path=None):
+        self.top_n = top_n
+        self.sample_interval = sample_interval
+        self.output_path = output_path
+        self.records = []
+        self._open_stages = []
+        self._active_stages = 0
+        self._started_tracing = False
+        self._lock = threading.Lock()
+    
+    def _fold_peak(self):
+        """Fold tracemalloc's running peak into every open stage and reset it."""
+        peak = tracemalloc.get_traced_memory()[1]
+        for open_stage in self._open_stages:
+            open_stage['peak'] = max(open_stage['peak'], peak)
+        tracemalloc.reset_peak()
+    
+    @contextmanager
+    def stage(self, name, **context):
+        """
+        Profile the enclosed block as one stage.
+        
+        Args:
+            name: Stage name (e.g. 'read_file', 'normalize', 'process_monthly_data')
+            **context: Extra fields stored with the record (file name, row count, ...)
+        """
+        # Tracing stays on while any stage runs (stages on other threads included) and is
+        # stopped when the last one ends, if this profiler started it
+        with self._lock:
+            if self._active_stages == 0 and not tracemalloc.is_tracing():
+                tracemalloc.start(TRACEBACK_FRAMES)
+                self._started_tracing = True
+            self._active_stages += 1
+        
+        # Snapshot first so its own size is not counted in the stage's peak
+        before = tracemalloc.take_snapshot()
+        with self._lock:
+            self._fold_peak()
+            traced_before = tracemalloc.get_traced_memory()[0]
+            current = {'peak': traced_before}
+            self._open_stages.append(current)
+        
+        rss_before = get_rss_bytes()
+        sampler = _RSSSampler(self.sample_interval)
+        sampler.start()
+        start = time.perf_counter()
+        error = None
+        
+        try:
+            yield context
+        except BaseException as e:
+            error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            duration = time.perf_counter() - start
+            rss_peak = sampler.stop()
+            rss_after = get_rss_bytes()
+            
+            with self._lock:
+                self._fold_peak()
+                self._open_stages.remove(current)
+                traced_after = tracemalloc.get_traced_memory()[0]
+                after = tracemalloc.take_snapshot()
+                self._active_stages -= 1
+                if self._active_stages == 0 and self._started_tracing:
+                    tracemalloc.stop()
+                    self._started_tracing = False
+            
+            record = {
+                'timestamp': datetime.now().isoformat(),
+                'stage': name,
+                'duration_s': round(duration, 4),
+                'traced_peak_bytes': current['peak'] - traced_before,
+                'traced_retained_bytes': traced_after - traced_before,
+                'rss_before_bytes': rss_before,
+                'rss_after_bytes': rss_after,
+                'rss_peak_bytes': rss_peak,
+                'top_allocations': self._top_allocations(before, after),
+                'error': error
+            }
+            record.update({key: value for key, value in context.items() if key not in record})
+            self._store(record)
+    
+    def _top_allocations(self, before, after):
+        """Largest allocation growth between two snapshots, grouped by source line."""
+        ignore = [
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, linecache.__file__),
+            tracemalloc.Filter(False, __file__)
+        ]
+        stats = after.filter_traces(ignore).compare_to(before.filter_traces(ignore), 'lineno')
+        sites = []
+        for stat in stats[:self.top_n]:
+            frame = stat.traceback[0]
+            sites.append({
+                'site': f"{frame.filename}:{frame.lineno}",
+                'code': linecache.getline(frame.filename, frame.lineno).strip(),
+                'size_diff_bytes': stat.size_diff,
+                'count_diff': stat.count_diff
+            })
+        return sites
+    
+    def _store(self, record):
+        """Keep a record, log a one-line summary and append it to the output file."""
+        self.records.append(record)
+        print(f"[memory] {record['stage']}: peak {format_bytes(record['traced_peak_bytes'])} traced, "
+              f"retained {format_bytes(record['traced_retained_bytes'])}, "
+              f"RSS {format_bytes(record['rss_before_bytes'])} -> {format_bytes(record['rss_peak_bytes'])} peak "
+              f"in {record['duration_s']:.2f}s")
+        
+        if self.output_path:
+            try:
+                with open(self.output_path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(record, default=str) + '\n')
+            except OSError as e:
+                print(f"Error writing memory profile to {self.output_path}: {e}")
+    
+    def summary(self):
+        """
+        Peak memory per stage name across all recorded stages.
+        
+        Returns:
+            list: Dicts with stage, calls, traced_peak_bytes and rss_peak_bytes, highest peak first
+        """
+        stages = {}
+        for record in self.records:
+            entry = stages.setdefault(record['stage'], {
+                'stage': record['stage'], 'calls': 0, 'traced_peak_bytes': 0, 'rss_peak_bytes': 0
+            })
+            entry['calls'] += 1
+            entry['traced_peak_bytes'] = max(entry['traced_peak_bytes'], record['traced_peak_bytes'])
+            entry['rss_peak_bytes'] = max(entry['rss_peak_bytes'], record['rss_peak_bytes'] or 0)
+        return sorted(stages.values(), key=lambda entry: entry['traced_peak_bytes'], reverse=True)
+
+
+_profiler = None
+
+
+def get_profiler():
+    """
+    Return the process-wide profiler configured from the environment.
+    
+    Returns:
+        MemoryProfiler or None when profiling is disabled
+    """
+    global _profiler
+    if not is_enabled():
+        return None
+    if _profiler is None:
+        try:
+            top_n = int(os.environ.get(TOP_ENV, 10))
+        except ValueError:
+            top_n = 10
+        _profiler = MemoryProfiler(top_n=top_n, output_path=os.environ.get(OUTPUT_ENV, DEFAULT_OUTPUT))
+    return _profiler
+
+
+@contextmanager
+def profile_stage(name, **context):
+    """
+    Profile a stage when MEMORY_PROFILE is set; otherwise do nothing.
+    
+    Args:
+        name: Stage name
+        **context: Extra fields stored with the record
+    """
+    profiler = get_profiler()
+    if profiler is None:
+        yield context
+        return
+    with profiler.stage(name, **context) as stage_context:
+        yield stage_context
@@ -0,0 +1,594 @@
+"""
+Schema Migrations for the Usage Metrics Database
+
+Migrations are numbered steps keyed on SQLite's PRAGMA user_version. A database
+at LATEST_VERSION needs a single version check at startup; older databases
+(including ones created before versioning, which report version 0) are brought
+forward one step at a time, each step in its own transaction together with
+the version bump.
+
+To change the schema, append a new step to MIGRATIONS - never edit a step that
+has already shipped.
+"""
+
+import sqlite3
+from typing import Callable, List, Tuple
+
+from config import UPSERT_POLICIES, DEFAULT_UPSERT_POLICY
+
+
+def _table_columns(conn: sqlite3.Connection, table: str) -> List[str]:
+    """Return the column names of a table."""
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table})").fetchall()]
+
+
+def _migration_1_base_schema(conn: sqlite3.Connection):
+    """Usage metrics and employees tables, including columns added before versioning."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS usage_metrics (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id TEXT NOT NULL,
+            user_name TEXT,
+            email TEXT,
+            department TEXT,
+            date TEXT NOT NULL,
+            feature_used TEXT,
+            usage_count INTEGER,
+            cost_usd REAL,
+            tool_source TEXT DEFAULT 'ChatGPT',
+            file_source TEXT,
+            last_day_active TEXT,
+            first_day_active_in_period TEXT,
+            last_day_active_in_period TEXT,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS employees (
+            employee_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            first_name TEXT,
+            last_name TEXT,
+            email TEXT UNIQUE,
+            title TEXT,
+            department TEXT,
+            status TEXT,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            updated_at TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    
+    # Unversioned databases may predate the multi-tool and activity date columns
+    columns = _table_columns(conn, 'usage_metrics')
+    
+    if 'email' not in columns:
+        conn.execute("ALTER TABLE usage_metrics ADD COLUMN email TEXT")
+        # Copy user_id to email for existing records (assuming user_id is email)
+        conn.execute("UPDATE usage_metrics SET email = user_id WHERE email IS NULL")
+    
+    if 'tool_source' not in columns:
+        conn.execute("ALTER TABLE usage_metrics ADD COLUMN tool_source TEXT DEFAULT 'ChatGPT'")
+        conn.execute("UPDATE usage_metrics SET tool_source = 'ChatGPT' WHERE tool_source IS NULL")
+    
+    for column in ['last_day_active', 'first_day_active_in_period', 'last_day_active_in_period']:
+        if column not in columns:
+            conn.execute(f"ALTER TABLE usage_metrics ADD COLUMN {column} TEXT")
+    
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_user_date ON usage_metrics(user_id, date)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_tool_source ON usage_metrics(tool_source)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_date ON usage_metrics(date)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_employee_email ON employees(email)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_employee_department ON employees(department)")
+
+
+def _migration_2_user_rollup(conn: sqlite3.Connection):
+    """Data version metadata and the per-user rollup behind the User Directory."""
+    # Key/value metadata (data version counter, rollup build versions)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS db_meta (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        )
+    """)
+    conn.execute("INSERT OR IGNORE INTO db_meta (key, value) VALUES ('data_version', '0')")
+    
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS user_rollup (
+            email TEXT PRIMARY KEY,
+            user_name TEXT,
+            department TEXT,
+            tool_source TEXT,
+            chatgpt_messages INTEGER,
+            gpt_messages INTEGER,
+            project_messages INTEGER,
+            tool_messages INTEGER,
+            openai_messages INTEGER,
+            blueflame_messages INTEGER,
+            total_messages_excl_tools INTEGER,
+            total_messages_all INTEGER
+        )
+    """)
+    
+    # One index per User Directory sort order (email is the tie-breaker so keyset pagination is stable)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_rollup_total_excl ON user_rollup(total_messages_excl_tools, email)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_rollup_total_all ON user_rollup(total_messages_all, email)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_rollup_name ON user_rollup(user_name, email)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_rollup_department ON user_rollup(department, email)")
+
+
+def _migration_3_ingestion_runs(conn: sqlite3.Connection):
+    """Per-file ingestion runs with their timing spans."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS ingestion_runs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            filename TEXT NOT NULL,
+            content_hash TEXT,
+            file_bytes INTEGER,
+            tool_source TEXT,
+            status TEXT,
+            rows INTEGER,
+            total_ms REAL,
+            spans TEXT,
+            message TEXT,
+            started_at TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_ingestion_runs_file ON ingestion_runs(filename, content_hash)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_ingestion_runs_hash ON ingestion_runs(content_hash)")
+
+
+def _migration_4_ingestion_batches(conn: sqlite3.Connection):
+    """Ingestion batches, a batch_id on every usage row and the history of superseded rows."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS ingestion_batches (
+            batch_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            filename TEXT,
+            tool_source TEXT,
+            rows_inserted INTEGER DEFAULT 0,
+            rows_superseded INTEGER DEFAULT 0,
+            status TEXT DEFAULT 'active',
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            rolled_back_at TEXT
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_batches_filename ON ingestion_batches(filename)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_batches_tool ON ingestion_batches(tool_source)")
+    
+    if 'batch_id' not in _table_columns(conn, 'usage_metrics'):
+        conn.execute("ALTER TABLE usage_metrics ADD COLUMN batch_id INTEGER REFERENCES ingestion_batches(batch_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_usage_batch ON usage_metrics(batch_id)")
+    
+    # Rows removed by superseding, keyed by the batch that superseded them so a
+    # rollback restores them with one range scan. id is the original usage_metrics id.
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS usage_metrics_history (
+            superseded_by INTEGER NOT NULL,
+            id INTEGER NOT NULL,
+            batch_id INTEGER,
+            user_id TEXT NOT NULL,
+            user_name TEXT,
+            email TEXT,
+            department TEXT,
+            date TEXT NOT NULL,
+            feature_used TEXT,
+            usage_count INTEGER,
+            cost_usd REAL,
+            tool_source TEXT,
+            file_source TEXT,
+            last_day_active TEXT,
+            first_day_active_in_period TEXT,
+            last_day_active_in_period TEXT,
+            created_at TEXT,
+            PRIMARY KEY (superseded_by, id)
+        ) WITHOUT ROWID
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_history_batch ON usage_metrics_history(batch_id)")
+    
+    # Existing rows get one batch per (file, tool) they were loaded from
+    conn.execute("""
+        INSERT INTO ingestion_batches (filename, tool_source, rows_inserted, created_at)
+        SELECT file_source, tool_source, COUNT(*), MIN(created_at)
+        FROM usage_metrics
+        WHERE batch_id IS NULL
+        GROUP BY file_source, tool_source
+        ORDER BY MIN(id)
+    """)
+    conn.execute("""
+        UPDATE usage_metrics SET batch_id = (
+            SELECT b.batch_id FROM ingestion_batches b
+            WHERE b.filename IS usage_metrics.file_source AND b.tool_source IS usage_metrics.tool_source
+        )
+        WHERE batch_id IS NULL
+    """)
+
+
+def _merge_duplicates(conn: sqlite3.Connection, table: str, key: List[str]) -> int:
+    """
+    Merge rows of a table that share a key into the newest row (highest id).
+    
+    The newest row keeps its values; for tools with the 'sum' upsert policy its
+    usage_count becomes the total of the group, as if the rows had been upserted
+    in order. The other rows are moved to {table}_duplicates (created on first use).
+    Rows without a feature or tool are not part of the natural key and are left alone.
+    
+    Args:
+        conn: Connection of the migration's transaction (with upsert_policy registered)
+        table: usage_metrics or usage_metrics_history
+        key: Columns identifying a duplicate group
+    
+    Returns:
+        int: Number of rows moved to the backup table
+    """
+    conn.execute("DROP TABLE IF EXISTS temp.duplicate_groups")
+    conn.execute(f"""
+        CREATE TEMP TABLE duplicate_groups AS
+        SELECT {', '.join(key)}, MAX(id) AS keep_id, SUM(COALESCE(usage_count, 0)) AS total_usage
+        FROM {table}
+        WHERE feature_used IS NOT NULL AND tool_source IS NOT NULL
+        GROUP BY {', '.join(key)}
+        HAVING COUNT(*) > 1
+    """)
+    if conn.execute("SELECT COUNT(*) FROM duplicate_groups").fetchone()[0] == 0:
+        conn.execute("DROP TABLE duplicate_groups")
+        return 0
+    
+    group = ' AND '.join(f"g.{col} = t.{col}" for col in key)
+    conn.execute(f"CREATE TABLE IF NOT EXISTS {table}_duplicates AS SELECT * FROM {table} WHERE 0")
+    moved = conn.execute(f"""
+        INSERT INTO {table}_duplicates
+        SELECT t.* FROM {table} t
+        WHERE EXISTS (SELECT 1 FROM duplicate_groups g WHERE {group} AND t.id != g.keep_id)
+    """).rowcount
+    conn.execute(f"""
+        UPDATE {table} AS t
+        SET usage_count = (SELECT g.total_usage FROM duplicate_groups g WHERE {group} AND t.id = g.keep_id)
+        WHERE upsert_policy(t.tool_source) = 'sum'
+        AND EXISTS (SELECT 1 FROM duplicate_groups g WHERE {group} AND t.id = g.keep_id)
+    """)
+    conn.execute(f"""
+        DELETE FROM {table} AS t
+        WHERE EXISTS (SELECT 1 FROM duplicate_groups g WHERE {group} AND t.id != g.keep_id)
+    """)
+    conn.execute("DROP TABLE duplicate_groups")
+    return moved
+
+
+def _migration_5_natural_key(conn: sqlite3.Connection):
+    """Day-normalized dates and a unique index on the natural key of a usage row."""
+    # Dates were stored as 'YYYY-MM-DD HH:MM:SS' (or with the time of day); keep the day
+    for table in ('usage_metrics', 'usage_metrics_history'):
+        conn.execute(f"UPDATE {table} SET date = date(date) WHERE date(date) IS NOT NULL AND date(date) != date")
+    
+    # Existing duplicates (re-uploads that were not superseded) are merged per the tool's
+    # upsert policy; the rows merged away are kept in a backup table
+    conn.create_function('upsert_policy', 1, lambda tool: UPSERT_POLICIES.get(tool, DEFAULT_UPSERT_POLICY),
+                         deterministic=True)
+    merged = _merge_duplicates(conn, 'usage_metrics', ['user_id', 'date', 'feature_used', 'tool_source'])
+    if merged:
+        print(f"Merged {merged} duplicate usage record(s); originals kept in usage_metrics_duplicates")
+    # Likewise in the history, so rolling a batch back never restores two rows with one key
+    _merge_duplicates(conn, 'usage_metrics_history',
+                      ['superseded_by', 'user_id', 'date', 'feature_used', 'tool_source'])
+    
+    conn.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_usage_natural_key
+        ON usage_metrics(user_id, date, feature_used, tool_source)
+    """)
+    # (user_id, date) lookups use the leading columns of the natural key
+    conn.execute("DROP INDEX IF EXISTS idx_user_date")
+
+
+def _migration_6_date_keys(conn: sqlite3.Connection):
+    """Integer day and month keys derived from the date, for range filters."""
+    # Generated from date, so every writer (including DataFrame.to_sql) keeps them in step.
+    # day_key counts days since 1970-01-01; month_key is yyyymm. Unparseable dates give NULL.
+    # (table_info does not list generated columns; table_xinfo does)
+    columns = [row[1] for row in conn.execute("PRAGMA table_xinfo(usage_metrics)").fetchall()]
+    if 'day_key' not in columns:
+        conn.execute("""
+            ALTER TABLE usage_metrics ADD COLUMN day_key INTEGER
+            GENERATED ALWAYS AS (CAST(julianday(date, 'start of day') - 2440587.5 AS INTEGER)) VIRTUAL
+        """)
+    if 'month_key' not in columns:
+        conn.execute("""
+            ALTER TABLE usage_metrics ADD COLUMN month_key INTEGER
+            GENERATED ALWAYS AS (CAST(strftime('%Y%m', date) AS INTEGER)) VIRTUAL
+        """)
+    
+    # Superseding and monthly filters: tool, then a month range, then users
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_usage_tool_month_user ON usage_metrics(tool_source, month_key, user_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_usage_day ON usage_metrics(day_key)")
+    # Replaced by the key indexes above (idx_tool_source is a prefix of the composite)
+    conn.execute("DROP INDEX IF EXISTS idx_date")
+    conn.execute("DROP INDEX IF EXISTS idx_tool_source")
+
+
+# Columns of fact_usage and (after superseded_by) usage_metrics_history
+_FACT_COLUMNS = """id, batch_id, user_key, department_key, date, feature_key, usage_count, cost_usd,
+    tool_key, file_key, last_day_active, first_day_active_in_period, last_day_active_in_period, created_at"""
+
+# The same columns selected from a usage_metrics-shaped table aliased "um"
+_FACT_SELECT = """um.id, um.batch_id, u.user_key, d.department_key, um.date, fe.feature_key,
+    um.usage_count, um.cost_usd, t.tool_key, fi.file_key, um.last_day_active,
+    um.first_day_active_in_period, um.last_day_active_in_period,
+    CAST(strftime('%s', um.created_at) AS INTEGER)"""
+
+_DIMENSION_JOINS = """
+    JOIN dim_user u ON u.user_id = um.user_id
+    LEFT JOIN dim_department d ON d.department = um.department
+    LEFT JOIN dim_feature fe ON fe.feature_used = um.feature_used
+    LEFT JOIN dim_tool t ON t.tool_source = um.tool_source
+    LEFT JOIN dim_file fi ON fi.file_source = um.file_source
+"""
+
+# (table, key column, value column) of the single-value dimensions
+_DIMENSIONS = [
+    ('dim_department', 'department_key', 'department'),
+    ('dim_feature', 'feature_key', 'feature_used'),
+    ('dim_tool', 'tool_key', 'tool_source'),
+    ('dim_file', 'file_key', 'file_source'),
+]
+
+
+def _migration_7_star_schema(conn: sqlite3.Connection):
+    """Dimension tables, an integer-keyed fact_usage table and a usage_metrics view over them."""
+    # A user's name and email are stored once, from their most recent row
+    conn.execute("""
+        CREATE TABLE dim_user (
+            user_key INTEGER PRIMARY KEY,
+            user_id TEXT NOT NULL UNIQUE,
+            user_name TEXT,
+            email TEXT
+        )
+    """)
+    conn.execute("CREATE INDEX idx_dim_user_email ON dim_user(email)")
+    for table, key, column in _DIMENSIONS:
+        conn.execute(f"CREATE TABLE {table} ({key} INTEGER PRIMARY KEY, {column} TEXT NOT NULL UNIQUE)")
+    
+    conn.execute("""
+        CREATE TABLE fact_usage (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            batch_id INTEGER REFERENCES ingestion_batches(batch_id),
+            user_key INTEGER NOT NULL REFERENCES dim_user(user_key),
+            department_key INTEGER REFERENCES dim_department(department_key),
+            date TEXT NOT NULL,
+            feature_key INTEGER REFERENCES dim_feature(feature_key),
+            usage_count INTEGER,
+            cost_usd REAL,
+            tool_key INTEGER REFERENCES dim_tool(tool_key),
+            file_key INTEGER REFERENCES dim_file(file_key),
+            last_day_active TEXT,
+            first_day_active_in_period TEXT,
+            last_day_active_in_period TEXT,
+            created_at INTEGER DEFAULT (CAST(strftime('%s', 'now') AS INTEGER)),
+            day_key INTEGER GENERATED ALWAYS AS (CAST(julianday(date, 'start of day') - 2440587.5 AS INTEGER)) VIRTUAL,
+            month_key INTEGER GENERATED ALWAYS AS (CAST(strftime('%Y%m', date) AS INTEGER)) VIRTUAL
+        )
+    """)
+    # Superseded rows move to the history in the fact layout
+    conn.execute("""
+        CREATE TABLE history_usage (
+            superseded_by INTEGER NOT NULL,
+            id INTEGER NOT NULL,
+            batch_id INTEGER,
+            user_key INTEGER NOT NULL,
+            department_key INTEGER,
+            date TEXT NOT NULL,
+            feature_key INTEGER,
+            usage_count INTEGER,
+            cost_usd REAL,
+            tool_key INTEGER,
+            file_key INTEGER,
+            last_day_active TEXT,
+            first_day_active_in_period TEXT,
+            last_day_active_in_period TEXT,
+            created_at INTEGER,
+            PRIMARY KEY (superseded_by, id)
+        ) WITHOUT ROWID
+    """)
+    
+    # Fill the dimensions from live and superseded rows, then copy the rows over
+    conn.execute("""
+        INSERT INTO dim_user (user_id, user_name, email)
+        SELECT user_id, user_name, email FROM usage_metrics
+        WHERE id IN (SELECT MAX(id) FROM usage_metrics GROUP BY user_id)
+    """)
+    conn.execute("""
+        INSERT OR IGNORE INTO dim_user (user_id, user_name, email)
+        SELECT user_id, user_name, email FROM usage_metrics_history
+        WHERE (superseded_by, id) IN (
+            SELECT superseded_by, MAX(id) FROM usage_metrics_history GROUP BY user_id
+        )
+    """)
+    for table, _, column in _DIMENSIONS:
+        conn.execute(f"""
+            INSERT OR IGNORE INTO {table} ({column})
+            SELECT {column} FROM usage_metrics WHERE {column} IS NOT NULL
+            UNION SELECT {column} FROM usage_metrics_history WHERE {column} IS NOT NULL
+        """)
+    
+    conn.execute(f"INSERT INTO fact_usage ({_FACT_COLUMNS}) SELECT {_FACT_SELECT} FROM usage_metrics um {_DIMENSION_JOINS}")
+    conn.execute(f"""
+        INSERT INTO history_usage (superseded_by, {_FACT_COLUMNS})
+        SELECT um.superseded_by, {_FACT_SELECT} FROM usage_metrics_history um {_DIMENSION_JOINS}
+    """)
+    # Ids of deleted (and superseded) rows are not handed out again
+    last_id = conn.execute("""
+        SELECT MAX(COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'usage_metrics'), 0),
+                   COALESCE((SELECT MAX(id) FROM fact_usage), 0))
+    """).fetchone()[0]
+    conn.execute("DELETE FROM sqlite_sequence WHERE name = 'fact_usage'")
+    conn.execute("INSERT INTO sqlite_sequence (name, seq) VALUES ('fact_usage', ?)", (last_id,))
+    
+    conn.execute("DROP TABLE usage_metrics")
+    conn.execute("DROP TABLE usage_metrics_history")
+    conn.execute("ALTER TABLE history_usage RENAME TO usage_metrics_history")
+    
+    conn.execute("CREATE UNIQUE INDEX idx_usage_natural_key ON fact_usage(user_key, date, feature_key, tool_key)")
+    conn.execute("CREATE INDEX idx_usage_tool_month_user ON fact_usage(tool_key, month_key, user_key)")
+    conn.execute("CREATE INDEX idx_usage_day ON fact_usage(day_key)")
+    conn.execute("CREATE INDEX idx_usage_batch ON fact_usage(batch_id)")
+    conn.execute("CREATE INDEX idx_history_batch ON usage_metrics_history(batch_id)")
+    
+    # usage_metrics keeps its columns (in their old order) as a view for readers,
+    # and accepts inserts, updates and deletes for scripts that write to it directly
+    conn.execute("""
+        CREATE VIEW usage_metrics AS
+        SELECT
+            f.id, u.user_id, u.user_name, u.email, d.department, f.date, fe.feature_used,
+            f.usage_count, f.cost_usd, t.tool_source, fi.file_source, f.last_day_active,
+            f.first_day_active_in_period, f.last_day_active_in_period,
+            datetime(f.created_at, 'unixepoch') AS created_at, f.batch_id, f.day_key, f.month_key
+        FROM fact_usage f
+        JOIN dim_user u ON u.user_key = f.user_key
+        LEFT JOIN dim_department d ON d.department_key = f.department_key
+        LEFT JOIN dim_feature fe ON fe.feature_key = f.feature_key
+        LEFT JOIN dim_tool t ON t.tool_key = f.tool_key
+        LEFT JOIN dim_file fi ON fi.file_key = f.file_key
+    """)
+    
+    dimension_upserts = """
+        INSERT INTO dim_user (user_id, user_name, email) VALUES (NEW.user_id, NEW.user_name, NEW.email)
+        ON CONFLICT(user_id) DO UPDATE SET
+            user_name = COALESCE(excluded.user_name, user_name),
+            email = COALESCE(excluded.email, email);
+        INSERT OR IGNORE INTO dim_department (department) SELECT NEW.department WHERE NEW.department IS NOT NULL;
+        INSERT OR IGNORE INTO dim_feature (feature_used) SELECT NEW.feature_used WHERE NEW.feature_used IS NOT NULL;
+        INSERT OR IGNORE INTO dim_tool (tool_source) SELECT COALESCE(NEW.tool_source, 'ChatGPT');
+        INSERT OR IGNORE INTO dim_file (file_source) SELECT NEW.file_source WHERE NEW.file_source IS NOT NULL;
+    """
+    # (tool_source keeps its old column default of 'ChatGPT')
+    fact_values = """
+        NEW.batch_id,
+        (SELECT user_key FROM dim_user WHERE user_id = NEW.user_id),
+        (SELECT department_key FROM dim_department WHERE department = NEW.department),
+        NEW.date,
+        (SELECT feature_key FROM dim_feature WHERE feature_used = NEW.feature_used),
+        NEW.usage_count,
+        NEW.cost_usd,
+        (SELECT tool_key FROM dim_tool WHERE tool_source = COALESCE(NEW.tool_source, 'ChatGPT')),
+        (SELECT file_key FROM dim_file WHERE file_source = NEW.file_source),
+        NEW.last_day_active,
+        NEW.first_day_active_in_period,
+        NEW.last_day_active_in_period,
+        COALESCE(CAST(strftime('%s', NEW.created_at) AS INTEGER), CAST(strftime('%s', 'now') AS INTEGER))
+    """
+    conn.execute(f"""
+        CREATE TRIGGER usage_metrics_insert INSTEAD OF INSERT ON usage_metrics
+        BEGIN
+            {dimension_upserts}
+            INSERT INTO fact_usage ({_FACT_COLUMNS}) VALUES (NEW.id, {fact_values});
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER usage_metrics_update INSTEAD OF UPDATE ON usage_metrics
+        BEGIN
+            {dimension_upserts}
+            UPDATE fact_usage SET ({_FACT_COLUMNS}) = (NEW.id, {fact_values}) WHERE id = OLD.id;
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER usage_metrics_delete INSTEAD OF DELETE ON usage_metrics
+        BEGIN
+            DELETE FROM fact_usage WHERE id = OLD.id;
+        END
+    """)
+
+
+def _migration_8_query_indexes(conn: sqlite3.Connection):
+    """Indexes for the dashboard's filter, delete and lookup queries (see tests/test_query_plans.py)."""
+    # Department filters (optionally with a date range) and distinct-department lookups
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_usage_department_day ON fact_usage(department_key, day_key)")
+    # Per-file counts, and deletes of rows stored before batches (batch_id IS NULL)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_usage_file_batch ON fact_usage(file_key, batch_id)")
+    # User filters go from the name to user_key, then the natural key index
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_dim_user_name ON dim_user(user_name)")
+    
+    # Email lookups compare LOWER(email), which a plain index on email cannot serve
+    conn.execute("DROP INDEX IF EXISTS idx_dim_user_email")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_dim_user_email_lower ON dim_user(LOWER(email))")
+    # (idx_employee_email duplicated the UNIQUE constraint's index)
+    conn.execute("DROP INDEX IF EXISTS idx_employee_email")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_employee_email_lower ON employees(LOWER(email))")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_employee_name_lower ON employees(LOWER(first_name), LOWER(last_name))")
+    
+    # Runs are listed per file, newest first; nothing looks them up by content hash
+    conn.execute("DROP INDEX IF EXISTS idx_ingestion_runs_file")
+    conn.execute("DROP INDEX IF EXISTS idx_ingestion_runs_hash")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_ingestion_runs_file ON ingestion_runs(filename, started_at)")
+
+
+def _migration_9_history_user_index(conn: sqlite3.Connection):
+    """Index superseded rows by user, so deleting an employee's usage also finds their history."""
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_history_user ON usage_metrics_history(user_key)")
+
+
+# (version, description, step) - versions are consecutive starting at 1
+MIGRATIONS: List[Tuple[int, str, Callable[[sqlite3.Connection], None]]] = [
+    (1, "base usage_metrics and employees schema", _migration_1_base_schema),
+    (2, "db_meta and user_rollup tables", _migration_2_user_rollup),
+    (3, "ingestion_runs timing table", _migration_3_ingestion_runs),
+    (4, "ingestion batches and superseded row history", _migration_4_ingestion_batches),
+    (5, "normalized dates and unique natural key", _migration_5_natural_key),
+    (6, "integer day and month keys", _migration_6_date_keys),
+    (7, "dimension tables and integer-keyed fact_usage", _migration_7_star_schema),
+    (8, "indexes for filter, delete and lookup queries", _migration_8_query_indexes),
+    (9, "superseded row history index by user", _migration_9_history_user_index),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def get_schema_version(conn: sqlite3.Connection) -> int:
+    """Return the schema version recorded in the database header."""
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(db_path: str) -> int:
+    """
+    Bring a database up to LATEST_VERSION.
+    
+    Each pending step runs in its own IMMEDIATE transaction with the user_version
+    bump, so a failed step is rolled back and leaves the database at the previous
+    version. The version is re-read inside the transaction, so concurrent startups
+    do not apply a step twice.
+    
+    Args:
+        db_path: Path to the SQLite database file
+    
+    Returns:
+        int: Number of migration steps applied (0 when already up to date)
+    
+    Raises:
+        RuntimeError: If the database was written by a newer schema version
+        sqlite3.Error: If a migration step fails (after rolling it back)
+    """
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    try:
+        version = get_schema_version(conn)
+        if version == LATEST_VERSION:
+            return 0
+        if version > LATEST_VERSION:
+            raise RuntimeError(
+                f"Database schema version {version} is newer than this application supports ({LATEST_VERSION})"
+            )
+        
+        applied = 0
+        for step_version, description, step in MIGRATIONS:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                if get_schema_version(conn) >= step_version:
+                    conn.execute("ROLLBACK")
+                    continue
+                print(f"Migrating database to schema version {step_version}: {description}")
+                step(conn)
+                conn.execute(f"PRAGMA user_version = {step_version}")
+                conn.execute("COMMIT")
+                applied += 1
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        
+        return applied
+    finally:
+        conn.close()
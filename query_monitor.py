@@ -0,0 +1,339 @@
+"""
+SQL Statement Monitoring
+
+DatabaseManager.connect() returns a MonitoredConnection: a sqlite3 connection
+whose cursors time every statement they execute, including the time spent
+fetching its rows. Each finished statement is passed as a record dict to the
+observers registered on the current thread (Streamlit runs each session's
+reruns on its own thread, so one session's profiler never sees another's
+queries).
+
+Every finished statement is also offered to the process-wide slow query log,
+which keeps the slowest N statements across all sessions and, for those over
+a configurable threshold, their EXPLAIN QUERY PLAN output. This makes full
+scans visible in the Database Management tab.
+
+Record fields: sql, duration_ms, rows (rows fetched, or rowcount for writes),
+caller (the DatabaseManager/DataProcessor method that issued the statement).
+
+The slow query log can be configured with environment variables:
+
+    SLOW_QUERY_LOG_SIZE=50        # statements kept
+    SLOW_QUERY_EXPLAIN_MS=100     # capture query plans above this duration (off if unset)
+"""
+
+import heapq
+import itertools
+import os
+import sqlite3
+import sys
+import threading
+import time
+import weakref
+from datetime import datetime
+
+_local = threading.local()
+
+# Source files whose methods are reported as the caller of a statement
+CALLER_MODULES = ('database.py', 'data_processor.py')
+
+# Frames searched for the caller (pandas adds several between the method and the cursor)
+MAX_CALLER_DEPTH = 25
+
+# Statements that have no query plan worth capturing
+_NO_PLAN_PREFIXES = ('PRAGMA', 'BEGIN', 'COMMIT', 'ROLLBACK', 'EXPLAIN', 'CREATE', 'DROP', 'ALTER',
+                     'SAVEPOINT', 'RELEASE', 'VACUUM', 'ANALYZE')
+
+
+def _observers():
+    observers = getattr(_local, 'observers', None)
+    if observers is None:
+        observers = []
+        _local.observers = observers
+    return observers
+
+
+def add_observer(callback):
+    """
+    Register a callback that receives a record dict for every statement run on this thread.
+    
+    Args:
+        callback: Callable taking one record dict
+    """
+    _observers().append(callback)
+
+
+def remove_observer(callback):
+    """Unregister a callback added with add_observer (no error if absent)."""
+    observers = _observers()
+    if callback in observers:
+        observers.remove(callback)
+
+
+def find_caller():
+    """
+    Return the qualified name of the innermost DatabaseManager/DataProcessor method on the stack.
+    
+    Returns:
+        str: e.g. 'DatabaseManager.get_all_data', or None if not called from those modules
+    """
+    frame = sys._getframe(1)
+    depth = 0
+    while frame is not None and depth < MAX_CALLER_DEPTH:
+        code = frame.f_code
+        if os.path.basename(code.co_filename) in CALLER_MODULES and code.co_name != 'connect':
+            return getattr(code, 'co_qualname', code.co_name)
+        frame = frame.f_back
+        depth += 1
+    return None
+
+
+class SlowQueryLog:
+    """
+    Keeps the slowest N statements seen by monitored connections.
+    
+    Statements are held in a min-heap so a new statement only displaces the
+    fastest one kept. Query plans are captured for statements that both enter
+    the log and exceed explain_threshold_ms, so the EXPLAIN cost is bounded.
+    """
+    
+    def __init__(self, capacity=50, explain_threshold_ms=None):
+        self.capacity = capacity
+        self.explain_threshold_ms = explain_threshold_ms
+        self.statements_seen = 0
+        self._heap = []
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+    
+    def configure(self, capacity=None, explain_threshold_ms=None):
+        """
+        Change the log size and/or plan capture threshold.
+        
+        Args:
+            capacity: Statements kept (the log is trimmed if it shrinks)
+            explain_threshold_ms: Capture plans above this duration; a negative value turns capture off
+        """
+        with self._lock:
+            if capacity is not None:
+                self.capacity = max(int(capacity), 1)
+                while len(self._heap) > self.capacity:
+                    heapq.heappop(self._heap)
+            if explain_threshold_ms is not None:
+                self.explain_threshold_ms = explain_threshold_ms if explain_threshold_ms >= 0 else None
+    
+    def _would_keep(self, duration_ms):
+        return len(self._heap) < self.capacity or duration_ms > self._heap[0][0]
+    
+    def observe(self, record, explain=None):
+        """
+        Offer a finished statement to the log.
+        
+        Args:
+            record: Statement record dict (sql, duration_ms, rows, caller)
+            explain: Optional callable returning the statement's query plan lines
+        """
+        duration_ms = record['duration_ms']
+        with self._lock:
+            self.statements_seen += 1
+            if not self._would_keep(duration_ms):
+                return
+            threshold = self.explain_threshold_ms
+        
+        plan = None
+        if explain is not None and threshold is not None and duration_ms >= threshold:
+            plan = explain()
+        
+        entry = dict(record, plan=plan, recorded_at=datetime.now().isoformat(timespec='seconds'))
+        with self._lock:
+            item = (duration_ms, next(self._counter), entry)
+            if len(self._heap) < self.capacity:
+                heapq.heappush(self._heap, item)
+            elif duration_ms > self._heap[0][0]:
+                heapq.heapreplace(self._heap, item)
+    
+    def entries(self):
+        """Logged statements, slowest first."""
+        with self._lock:
+            items = sorted(self._heap, key=lambda item: (-item[0], item[1]))
+        return [dict(item[2]) for item in items]
+    
+    def clear(self):
+        """Drop all logged statements."""
+        with self._lock:
+            self._heap = []
+            self.statements_seen = 0
+
+
+def _env_float(name):
+    try:
+        return float(os.environ[name])
+    except (KeyError, ValueError):
+        return None
+
+
+slow_query_log = SlowQueryLog(
+    capacity=int(_env_float('SLOW_QUERY_LOG_SIZE') or 50),
+    explain_threshold_ms=_env_float('SLOW_QUERY_EXPLAIN_MS')
+)
+
+
+class MonitoredCursor(sqlite3.Cursor):
+    """Cursor that times statements and the fetches of their result rows."""
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._record = None
+        self._parameters = None
+    
+    def _begin(self, sql, parameters=None):
+        self._finish()
+        self._record = {'sql': sql, 'duration_ms': 0.0, 'rows': 0, 'caller': find_caller()}
+        self._parameters = parameters
+        return time.perf_counter()
+    
+    def _add_time(self, start):
+        if self._record is not None:
+            self._record['duration_ms'] += (time.perf_counter() - start) * 1000
+    
+    def _finish(self):
+        """Report the current statement to this thread's observers."""
+        record = self._record
+        parameters = self._parameters
+        self._record = None
+        self._parameters = None
+        if record is None:
+            return
+        try:
+            if record['rows'] == 0 and self.rowcount > 0:
+                record['rows'] = self.rowcount
+        except sqlite3.ProgrammingError:
+            pass
+        record['duration_ms'] = round(record['duration_ms'], 3)
+        for callback in list(_observers()):
+            try:
+                callback(record)
+            except Exception as e:
+                print(f"Error in query observer: {e}")
+        
+        explain = None
+        if parameters is not None:
+            explain = lambda: self._explain(record['sql'], parameters)
+        slow_query_log.observe(record, explain)
+    
+    def _explain(self, sql, parameters):
+        """Return EXPLAIN QUERY PLAN lines for a statement, or None if unavailable."""
+        if sql.lstrip().upper().startswith(_NO_PLAN_PREFIXES):
+            return None
+        try:
+            # A plain cursor, so the EXPLAIN itself is not monitored
+            cursor = sqlite3.Cursor(self.connection)
+            rows = cursor.execute(f"EXPLAIN QUERY PLAN {sql}", parameters).fetchall()
+            cursor.close()
+            return [row[-1] for row in rows]
+        except sqlite3.ProgrammingError:
+            # Connection already closed
+            return None
+        except Exception as e:
+            print(f"Error capturing query plan: {e}")
+            return None
+    
+    def execute(self, sql, parameters=()):
+        start = self._begin(sql, parameters)
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._add_time(start)
+    
+    def executemany(self, sql, seq_of_parameters):
+        start = self._begin(sql)
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self._add_time(start)
+            self._finish()
+    
+    def executescript(self, sql_script):
+        start = self._begin(sql_script)
+        try:
+            return super().executescript(sql_script)
+        finally:
+            self._add_time(start)
+            self._finish()
+    
+    def _fetch(self, fetch, *args):
+        start = time.perf_counter()
+        rows = fetch(*args)
+        self._add_time(start)
+        if self._record is not None:
+            if isinstance(rows, list):
+                self._record['rows'] += len(rows)
+            elif rows is not None:
+                self._record['rows'] += 1
+        return rows
+    
+    def fetchone(self):
+        return self._fetch(super().fetchone)
+    
+    def fetchmany(self, size=None):
+        if size is None:
+            return self._fetch(super().fetchmany)
+        return self._fetch(super().fetchmany, size)
+    
+    def fetchall(self):
+        rows = self._fetch(super().fetchall)
+        self._finish()
+        return rows
+    
+    def close(self):
+        self._finish()
+        super().close()
+    
+    def __del__(self):
+        self._finish()
+
+
+class MonitoredConnection(sqlite3.Connection):
+    """Connection whose cursors (including conn.execute shortcuts) are MonitoredCursors."""
+    
+    def cursor(self, factory=MonitoredCursor):
+        cursor = super().cursor(factory)
+        if isinstance(cursor, MonitoredCursor):
+            self._open_cursors().add(cursor)
+        return cursor
+    
+    def _open_cursors(self):
+        cursors = self.__dict__.get('_cursors')
+        if cursors is None:
+            cursors = weakref.WeakSet()
+            self._cursors = cursors
+        return cursors
+    
+    def close(self):
+        # Report statements whose cursors are still open (e.g. after fetchone)
+        # while the connection can still explain them
+        for cursor in list(self._open_cursors()):
+            cursor._finish()
+        super().close()
+    
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+    
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+    
+    def executescript(self, sql_script):
+        return self.cursor().executescript(sql_script)
+
+
+def connect(db_path, **kwargs):
+    """
+    Open a monitored SQLite connection.
+    
+    Args:
+        db_path: Path to the SQLite database file
+        **kwargs: Passed through to sqlite3.connect
+    
+    Returns:
+        MonitoredConnection
+    """
+    return sqlite3.connect(db_path, factory=MonitoredConnection, **kwargs)
@@ -0,0 +1,251 @@
+"""
+Cached Executive Reports
+
+The Executive Overview export menu used to build its HTML report and its Excel
+workbook (raw data plus pivot sheets, written with openpyxl) on every rerun,
+so any widget change paid for both exports. ReportCache builds a report only
+when it is requested and keeps the bytes keyed by database, data version,
+filter signature and format. A rerun with the same data and filters reuses
+them; a write to the data (which bumps the data version) or a different filter
+selection gets a new key.
+
+Reports can also be built on a background thread (prebuild). The cache
+remembers the filter selections whose reports were prepared (the "views"), so
+after an upload prebuild_views can rebuild them for the new data version before
+anyone asks. A request for a report that is being built waits for that build
+instead of starting another.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from export_utils import generate_excel_export, generate_pdf_report_html
+
+REPORT_TITLE = "AI Usage Executive Report"
+
+# format -> button label, file extension, MIME type and help text
+REPORT_FORMATS = {
+    'html': {'label': 'PDF Report', 'extension': 'html', 'mime': 'text/html',
+             'help': 'Download as HTML (print to PDF from browser)'},
+    'xlsx': {'label': 'Excel Report', 'extension': 'xlsx',
+             'mime': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+             'help': 'Excel with pivot tables and summaries'},
+}
+
+
+def filter_signature(**filters) -> str:
+    """
+    Short hash identifying a filter selection.
+    
+    Args:
+        **filters: Filter values (dates, lists, strings, mapping dicts); lists are
+            compared as sets, so selection order does not change the signature
+    
+    Returns:
+        str: Hex digest of the normalized filters
+    """
+    normalized = {name: sorted(value, key=str) if isinstance(value, (list, tuple, set)) else value
+                  for name, value in filters.items()}
+    encoded = json.dumps(normalized, sort_keys=True, default=str)
+    return hashlib.sha1(encoded.encode('utf-8')).hexdigest()[:16]
+
+
+def render_report(fmt: str, data) -> bytes:
+    """
+    Build one report of the given data.
+    
+    Args:
+        fmt: Key of REPORT_FORMATS
+        data: DataFrame with usage metrics
+    
+    Returns:
+        bytes: Report content
+    """
+    if fmt == 'html':
+        return generate_pdf_report_html(data, REPORT_TITLE).encode('utf-8')
+    if fmt == 'xlsx':
+        return generate_excel_export(data, include_pivots=True).getvalue()
+    raise ValueError(f"Unknown report format: {fmt}")
+
+
+class ReportCache:
+    """Builds executive reports on request or in the background and keeps the most recent ones."""
+    
+    def __init__(self, capacity: int = 8, workers: int = 1):
+        """
+        Initialize the cache.
+        
+        Args:
+            capacity: Reports kept before the least recently used are dropped
+            workers: Background threads building prebuilt reports
+        """
+        self.capacity = max(int(capacity), 1)
+        self._executor = ThreadPoolExecutor(max_workers=max(int(workers), 1), thread_name_prefix='report-build')
+        self._reports = OrderedDict()
+        self._views = OrderedDict()
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def key(db, data_version: int, signature: str, fmt: str) -> Tuple:
+        """Cache key of a report: (database path, data version, filter signature, format)."""
+        return (os.path.abspath(db.db_path), data_version, signature, fmt)
+    
+    def get(self, key: Tuple) -> Optional[bytes]:
+        """Return a finished report, or None if it has not been built (or is still building)."""
+        with self._lock:
+            future = self._reports.get(key)
+            if future is None or not future.done() or future.exception() is not None:
+                return None
+            self._reports.move_to_end(key)
+        return future.result()
+    
+    def is_building(self, key: Tuple) -> bool:
+        """True while a report is being built."""
+        with self._lock:
+            future = self._reports.get(key)
+        return future is not None and not future.done()
+    
+    def build(self, key: Tuple, data) -> bytes:
+        """
+        Return a report, building it on the calling thread if needed.
+        
+        Args:
+            key: Cache key from ReportCache.key
+            data: DataFrame the report is built from
+        
+        Returns:
+            bytes: Report content
+        
+        Raises:
+            Exception: If building the report fails (the failure is not cached)
+        """
+        future, created = self._claim(key)
+        if created:
+            self._run(key, future, data)
+        return future.result()
+    
+    def prebuild(self, key: Tuple, data) -> bool:
+        """
+        Build a report on a background thread unless it is cached or already building.
+        
+        Args:
+            key: Cache key from ReportCache.key
+            data: DataFrame the report is built from; it must not be changed
+                afterwards (pass a copy)
+        
+        Returns:
+            bool: True if a build was started
+        """
+        future, created = self._claim(key)
+        if created:
+            self._executor.submit(self._run, key, future, data)
+        return created
+    
+    def remember_view(self, signature: str, filters: Dict, fmt: str):
+        """
+        Record that a report of a filter selection was prepared, so prebuild_views rebuilds it.
+        
+        Args:
+            signature: filter_signature of the filters
+            filters: The filter values, as passed to the loader of prebuild_views
+            fmt: Key of REPORT_FORMATS
+        """
+        with self._lock:
+            _, formats = self._views.pop(signature, (None, set()))
+            self._views[signature] = (filters, formats | {fmt})
+            while len(self._views) > self.capacity:
+                self._views.popitem(last=False)
+    
+    def remembered_formats(self, signature: str) -> Set[str]:
+        """Formats prepared for a filter selection (empty if it is not remembered)."""
+        with self._lock:
+            view = self._views.get(signature)
+        return set(view[1]) if view else set()
+    
+    def prebuild_views(self, db, load: Callable) -> int:
+        """
+        Build the reports of every remembered view for the current data version, in the background.
+        
+        The data version is read before the data is loaded, so a report is never
+        cached under a newer version than its rows.
+        
+        Args:
+            db: DatabaseManager
+            load: Called with a view's filters as keyword arguments on the background
+                thread; returns the DataFrame its reports are built from
+        
+        Returns:
+            int: Number of report builds started
+        """
+        version = db.get_data_version()
+        with self._lock:
+            views = [(signature, filters, set(formats)) for signature, (filters, formats) in self._views.items()]
+        
+        started = 0
+        for signature, filters, formats in views:
+            claimed = []
+            for fmt in sorted(formats):
+                key = self.key(db, version, signature, fmt)
+                future, created = self._claim(key)
+                if created:
+                    claimed.append((key, future))
+            if claimed:
+                self._executor.submit(self._run_view, claimed, load, filters)
+                started += len(claimed)
+        return started
+    
+    def _claim(self, key) -> Tuple[Future, bool]:
+        """Return (future, created) for a key, adding an unfinished future if there is none."""
+        with self._lock:
+            future = self._reports.get(key)
+            if future is not None:
+                self._reports.move_to_end(key)
+                return future, False
+            future = Future()
+            self._reports[key] = future
+            self._evict(key)
+        return future, True
+    
+    def _evict(self, added):
+        """Drop reports of older data versions of the same database, then the least recently used."""
+        path, version = added[0], added[1]
+        for key in [key for key in self._reports if key[0] == path and key[1] < version]:
+            del self._reports[key]
+        while len(self._reports) > self.capacity:
+            self._reports.popitem(last=False)
+    
+    def _run(self, key, future, data):
+        """Build a claimed report and resolve its future; failures are removed so they can be retried."""
+        try:
+            future.set_result(render_report(key[3], data))
+        except Exception as e:
+            print(f"Error building {key[3]} report: {e}")
+            self._fail(key, future, e)
+    
+    def _run_view(self, claimed: List[Tuple], load, filters):
+        """Load a view's data once and build each of its claimed reports."""
+        try:
+            data = load(**filters)
+        except Exception as e:
+            print(f"Error loading report data: {e}")
+            for key, future in claimed:
+                self._fail(key, future, e)
+            return
+        for key, future in claimed:
+            self._run(key, future, data)
+    
+    def _fail(self, key, future, error):
+        """Resolve a claimed report with an error and forget it."""
+        with self._lock:
+            if self._reports.get(key) is future:
+                del self._reports[key]
+        future.set_exception(error)
+    
+    def shutdown(self, wait: bool = True):
+        """Stop the background threads."""
+        self._executor.shutdown(wait=wait)
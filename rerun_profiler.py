@@ -0,0 +1,245 @@
+"""
+Rerun Profiler for the Streamlit Dashboard
+
+Opt-in profiling of one script rerun: wall time of named sections of main()
+and of each tab body, every SQL statement issued through DatabaseManager (see
+query_monitor), and optionally a cProfile capture. Results are shown in a
+sidebar panel with JSON (and .prof) downloads.
+
+Enable with the `profile` query parameter or an environment variable:
+
+    http://localhost:8501/?profile=1          # sections and SQL
+    http://localhost:8501/?profile=cprofile   # ... plus cProfile
+    RERUN_PROFILE=1 streamlit run app.py
+    RERUN_PROFILE=cprofile streamlit run app.py
+"""
+
+import cProfile
+import io
+import json
+import os
+import pstats
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+import streamlit as st
+
+import query_monitor
+
+ENABLE_ENV = 'RERUN_PROFILE'
+QUERY_PARAM = 'profile'
+
+# Statements kept in the JSON report, slowest first
+MAX_REPORTED_QUERIES = 200
+
+_local = threading.local()
+
+
+def requested_mode():
+    """
+    Return the requested profiling mode for this rerun.
+    
+    Returns:
+        str: 'cprofile', 'basic', or None when profiling is off
+    """
+    value = os.environ.get(ENABLE_ENV, '')
+    try:
+        value = st.query_params.get(QUERY_PARAM, value)
+    except Exception:
+        pass
+    
+    value = str(value).strip().lower()
+    if value == 'cprofile':
+        return 'cprofile'
+    if value in ('1', 'true', 'yes', 'on'):
+        return 'basic'
+    return None
+
+
+class RerunProfiler:
+    """Collects section timings, SQL statements and an optional cProfile for one rerun."""
+    
+    def __init__(self, use_cprofile=False):
+        self.started_at = datetime.now().isoformat()
+        self.sections = []
+        self.queries = []
+        self.total_ms = None
+        self._origin = time.perf_counter()
+        self._stack = []
+        self._cprofile = cProfile.Profile() if use_cprofile else None
+    
+    def start(self):
+        query_monitor.add_observer(self._on_query)
+        if self._cprofile is not None:
+            self._cprofile.enable()
+    
+    def stop(self):
+        if self._cprofile is not None:
+            self._cprofile.disable()
+        query_monitor.remove_observer(self._on_query)
+        self.total_ms = round((time.perf_counter() - self._origin) * 1000, 3)
+    
+    def _on_query(self, record):
+        self.queries.append(dict(record, section=self._stack[-1] if self._stack else None))
+    
+    @contextmanager
+    def section(self, name):
+        """
+        Time a named section; sections may nest.
+        
+        Args:
+            name: Section name (nested sections are shown as 'outer / inner')
+        """
+        full_name = ' / '.join(self._stack + [name])
+        start = time.perf_counter()
+        self._stack.append(full_name)
+        query_count = len(self.queries)
+        try:
+            yield
+        finally:
+            self._stack.pop()
+            section_queries = self.queries[query_count:]
+            self.sections.append({
+                'section': full_name,
+                'start_ms': round((start - self._origin) * 1000, 3),
+                'duration_ms': round((time.perf_counter() - start) * 1000, 3),
+                'queries': len(section_queries),
+                'query_ms': round(sum(query['duration_ms'] for query in section_queries), 3)
+            })
+    
+    def cprofile_text(self, top=30):
+        """Top functions by cumulative time, as printed by pstats."""
+        if self._cprofile is None:
+            return None
+        buffer = io.StringIO()
+        pstats.Stats(self._cprofile, stream=buffer).sort_stats('cumulative').print_stats(top)
+        return buffer.getvalue()
+    
+    def cprofile_dump(self):
+        """Raw cProfile data (loadable with pstats or snakeviz), or None."""
+        if self._cprofile is None:
+            return None
+        with tempfile.NamedTemporaryFile(suffix='.prof', delete=False) as f:
+            path = f.name
+        try:
+            self._cprofile.dump_stats(path)
+            with open(path, 'rb') as f:
+                return f.read()
+        finally:
+            os.unlink(path)
+    
+    def to_dict(self):
+        """Report for the JSON download."""
+        queries = sorted(self.queries, key=lambda query: query['duration_ms'], reverse=True)
+        return {
+            'started_at': self.started_at,
+            'total_ms': self.total_ms,
+            'sections': sorted(self.sections, key=lambda section: section['start_ms']),
+            'sql': {
+                'count': len(self.queries),
+                'total_ms': round(sum(query['duration_ms'] for query in self.queries), 3),
+                'rows': sum(query['rows'] for query in self.queries),
+                'slowest': queries[:MAX_REPORTED_QUERIES]
+            },
+            'cprofile': self.cprofile_text()
+        }
+
+
+def get_active_profiler():
+    """Return the profiler of the rerun running on this thread, or None."""
+    return getattr(_local, 'profiler', None)
+
+
+@contextmanager
+def section(name):
+    """Time a named section of the current rerun; does nothing when profiling is off."""
+    profiler = get_active_profiler()
+    if profiler is None:
+        yield
+        return
+    with profiler.section(name):
+        yield
+
+
+@contextmanager
+def profile_rerun():
+    """
+    Profile the enclosed rerun when requested and show the results in the sidebar.
+    
+    The panel is only rendered when the rerun completes normally (not on
+    st.rerun()/st.stop(), which end the script with an exception).
+    """
+    mode = requested_mode()
+    if mode is None:
+        yield None
+        return
+    
+    profiler = RerunProfiler(use_cprofile=(mode == 'cprofile'))
+    _local.profiler = profiler
+    profiler.start()
+    try:
+        yield profiler
+    finally:
+        profiler.stop()
+        _local.profiler = None
+    render_profiler_panel(profiler)
+
+
+def render_profiler_panel(profiler):
+    """Show a rerun profile in the sidebar with downloads."""
+    import pandas as pd
+    
+    report = profiler.to_dict()
+    with st.sidebar.expander("⏱️ Rerun Profile", expanded=True):
+        col1, col2 = st.columns(2)
+        col1.metric("Rerun", f"{report['total_ms'] / 1000:.2f}s")
+        col2.metric("SQL", f"{report['sql']['count']} queries",
+                    f"{report['sql']['total_ms']:.0f} ms", delta_color="off")
+        
+        if report['sections']:
+            sections = pd.DataFrame(report['sections'])
+            sections = sections.sort_values('duration_ms', ascending=False)
+            st.dataframe(
+                sections[['section', 'duration_ms', 'queries', 'query_ms']].rename(columns={
+                    'section': 'Section', 'duration_ms': 'ms', 'queries': 'SQL', 'query_ms': 'SQL ms'
+                }),
+                use_container_width=True,
+                hide_index=True
+            )
+        
+        if report['sql']['slowest']:
+            st.caption("Slowest SQL statements")
+            slowest = pd.DataFrame(report['sql']['slowest'][:10])
+            slowest['sql'] = slowest['sql'].str.split().str.join(' ').str.slice(0, 80)
+            st.dataframe(
+                slowest[['duration_ms', 'rows', 'section', 'caller', 'sql']].rename(columns={
+                    'duration_ms': 'ms', 'rows': 'Rows', 'section': 'Section', 'caller': 'Caller', 'sql': 'SQL'
+                }),
+                use_container_width=True,
+                hide_index=True
+            )
+        
+        if report['cprofile']:
+            with st.expander("cProfile (top 30 by cumulative time)"):
+                st.code(report['cprofile'], language=None)
+        
+        stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        st.download_button(
+            "📥 Download profile (JSON)",
+            json.dumps(report, indent=2, default=str),
+            f"rerun_profile_{stamp}.json",
+            "application/json",
+            use_container_width=True
+        )
+        dump = profiler.cprofile_dump()
+        if dump:
+            st.download_button(
+                "📥 Download cProfile (.prof)",
+                dump,
+                f"rerun_profile_{stamp}.prof",
+                "application/octet-stream",
+                use_container_width=True
+            )
@@ -0,0 +1,128 @@
+"""
+In-Process Search Index for Users and Employees
+
+Builds a token -> id inverted index over names, emails and departments with a
+sorted token array for prefix lookups. Indexes are built once per data version
+(see DatabaseManager.get_search_index) and answer every keystroke rerun without
+rescanning DataFrames.
+"""
+
+import re
+from bisect import bisect_left
+from typing import Dict, Hashable, Iterable, List, Tuple
+
+
+# Anything that is not a letter or digit separates tokens ("john.smith@company.com" -> john, smith, company, com)
+TOKEN_PATTERN = re.compile(r"[^\W_]+", re.UNICODE)
+
+
+def tokenize(text) -> List[str]:
+    """
+    Split text into lowercase alphanumeric tokens.
+    
+    Args:
+        text: Value to tokenize (None/NaN yield no tokens)
+    
+    Returns:
+        List of tokens in order of appearance
+    """
+    if text is None or not isinstance(text, str):
+        return []
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class SearchIndex:
+    """Token/prefix search over a fixed set of records."""
+    
+    # Relative weight of a match in each field; exact token matches count double
+    DEFAULT_FIELD_WEIGHTS = {
+        'name': 3,
+        'email': 2,
+        'department': 1
+    }
+    
+    def __init__(self, records: Iterable[Tuple[Hashable, Dict[str, str]]], field_weights: Dict[str, int] = None):
+        """
+        Build the index.
+        
+        Args:
+            records: Iterable of (record_id, {field_name: text}) pairs. Record order is
+                    used to break ties between equally ranked results.
+            field_weights: Optional weights per field name (defaults to name > email > department)
+        """
+        self.field_weights = field_weights or self.DEFAULT_FIELD_WEIGHTS
+        self._postings: Dict[str, Dict[Hashable, int]] = {}
+        self._order: Dict[Hashable, int] = {}
+        
+        for record_id, fields in records:
+            if record_id in self._order:
+                continue
+            self._order[record_id] = len(self._order)
+            
+            for field, text in fields.items():
+                weight = self.field_weights.get(field, 1)
+                for token in tokenize(text):
+                    postings = self._postings.setdefault(token, {})
+                    # Keep the strongest field a token appears in for this record
+                    if postings.get(record_id, 0) < weight:
+                        postings[record_id] = weight
+        
+        self._tokens = sorted(self._postings)
+    
+    def __len__(self) -> int:
+        return len(self._order)
+    
+    def _prefix_matches(self, prefix: str) -> Dict[Hashable, int]:
+        """
+        Score every record with a token starting with prefix.
+        
+        Args:
+            prefix: Lowercase query token
+        
+        Returns:
+            Dictionary of record_id -> best score for this query token
+        """
+        scores = {}
+        start = bisect_left(self._tokens, prefix)
+        for i in range(start, len(self._tokens)):
+            token = self._tokens[i]
+            if not token.startswith(prefix):
+                break
+            exact = 2 if token == prefix else 1
+            for record_id, weight in self._postings[token].items():
+                score = weight * exact
+                if scores.get(record_id, 0) < score:
+                    scores[record_id] = score
+        return scores
+    
+    def search(self, query: str, limit: int = None) -> List[Hashable]:
+        """
+        Find records matching every token of the query as a prefix.
+        
+        Args:
+            query: Free-text query, e.g. "john fin" or "smith@comp"
+            limit: Optional maximum number of ids to return
+        
+        Returns:
+            Record ids ranked by score (exact and name matches first), ties in record order.
+            An empty list when the query has no searchable tokens.
+        """
+        query_tokens = list(dict.fromkeys(tokenize(query)))
+        if not query_tokens:
+            return []
+        
+        # Evaluate the most selective token first so the candidate set shrinks quickly
+        token_scores = sorted((self._prefix_matches(token) for token in query_tokens), key=len)
+        
+        totals = dict(token_scores[0])
+        for scores in token_scores[1:]:
+            totals = {
+                record_id: total + scores[record_id]
+                for record_id, total in totals.items()
+                if record_id in scores
+            }
+            if not totals:
+                return []
+        
+        ranked = sorted(totals, key=lambda record_id: (-totals[record_id], self._order[record_id]))
+        return ranked[:limit] if limit is not None else ranked
@@ -0,0 +1,137 @@
+"""
+Shared usage data and database helpers for the storage tests.
+
+usage_rows and usage_frame build processed usage DataFrames (the input of
+DataProcessor.process_monthly_data); UsageDatabaseTestCase gives each test a
+fresh database in a temporary directory; MigrationTestCase gives each test an
+empty database file to step through the migrations by hand.
+"""
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import unittest
+
+import pandas as pd
+
+# Add the repository root to the path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+import migrations  # noqa: E402
+from database import DatabaseManager  # noqa: E402
+from data_processor import DataProcessor  # noqa: E402
+
+
+def usage_rows(rows, tool='ChatGPT', filename='usage.csv', department='Sales'):
+    """
+    Usage rows for given users, dates and counts.
+    
+    Args:
+        rows: (user_id, date, usage_count) tuples; user_name is the part of user_id before '@'
+        tool: tool_source
+        filename: file_source
+        department: Department of every row
+    
+    Returns:
+        DataFrame: One row per tuple
+    """
+    return pd.DataFrame({
+        'user_id': [user for user, _, _ in rows],
+        'user_name': [user.split('@')[0] for user, _, _ in rows],
+        'email': [user for user, _, _ in rows],
+        'department': department,
+        'date': [day for _, day, _ in rows],
+        'feature_used': 'ChatGPT Messages',
+        'usage_count': [count for _, _, count in rows],
+        'cost_usd': 60.0,
+        'tool_source': tool,
+        'file_source': filename,
+    })
+
+
+def usage_frame(users=3, month='2025-03', usage=10, tool='ChatGPT', filename=None, department='Sales',
+                user_name='User', dates=None, spread_days=False):
+    """
+    Usage rows for user0@company.com, user1@company.com, ... in one month.
+    
+    Args:
+        users: Number of users (one row each)
+        month: 'YYYY-MM' of the rows; dated the 1st unless spread_days or dates
+        usage: usage_count of the first user; each following user has one more
+        tool: tool_source
+        filename: file_source (defaults to '<tool>_<month>.csv')
+        department: Department of every user, or a function of the user's index
+        user_name: Name prefix ('User 0', 'User 1', ...)
+        dates: Explicit date per user (overrides users and month)
+        spread_days: Date the users over the days of the month (1st to 28th)
+    
+    Returns:
+        DataFrame: One row per user
+    """
+    if dates is not None:
+        users = len(dates)
+    elif spread_days:
+        dates = [f'{month}-{1 + i % 28:02d}' for i in range(users)]
+    else:
+        dates = [f'{month}-01'] * users
+    df = usage_rows([(f'user{i}@company.com', dates[i], usage + i) for i in range(users)],
+                    tool=tool, filename=filename or f'{tool.lower()}_{month}.csv')
+    df['user_name'] = [f'{user_name} {i}' for i in range(users)]
+    df['department'] = [department(i) for i in range(users)] if callable(department) else department
+    return df
+
+
+class UsageDatabaseTestCase(unittest.TestCase):
+    """TestCase with a DatabaseManager and DataProcessor on a database in a temporary directory."""
+    
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.temp_dir, 'test.db')
+        self.db = DatabaseManager(self.db_path)
+        self.processor = DataProcessor(self.db)
+    
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+    
+    def fetch(self, sql, params=()):
+        """Rows of a query, read on a plain sqlite3 connection."""
+        conn = sqlite3.connect(self.db_path)
+        try:
+            return conn.execute(sql, params).fetchall()
+        finally:
+            conn.close()
+    
+    def ingest(self, df, filename=None):
+        """Process a usage DataFrame (as filename, default its file_source) and assert it succeeded."""
+        success, message = self.processor.process_monthly_data(df, filename or df['file_source'].iloc[0])
+        self.assertTrue(success, message)
+
+
+class MigrationTestCase(unittest.TestCase):
+    """TestCase with an empty database file, for databases created by older schema versions."""
+    
+    def setUp(self):
+        self.temp_db = tempfile.NamedTemporaryFile(delete=False, suffix='.db')
+        self.temp_db.close()
+    
+    def tearDown(self):
+        if os.path.exists(self.temp_db.name):
+            os.unlink(self.temp_db.name)
+    
+    def migrate_to(self, target):
+        """
+        Apply the migration steps up to a schema version, as an older release would have.
+        
+        Args:
+            target: Schema version to stop at
+        
+        Returns:
+            sqlite3.Connection: Open connection to the database (the caller commits and closes it)
+        """
+        conn = sqlite3.connect(self.temp_db.name)
+        for version, _, step in migrations.MIGRATIONS:
+            if version <= target:
+                step(conn)
+        conn.execute(f"PRAGMA user_version = {target}")
+        return conn
@@ -0,0 +1,98 @@
+"""
+Test suite for atomic ingestion in DataProcessor.process_monthly_data.
+
+Tests that superseding and inserting happen in one transaction (a failed
+ingest leaves the database and data version untouched), that rows are stored
+in the same format as before, and that a large upload is stored quickly.
+"""
+import unittest
+import time
+
+import numpy as np
+import pandas as pd
+
+from fixtures.usage_db import UsageDatabaseTestCase, usage_frame
+
+
+class TestAtomicIngest(UsageDatabaseTestCase):
+    """Test the single-transaction supersede and insert."""
+    
+    def test_stored_format(self):
+        """Dates are stored as 'YYYY-MM-DD' text, counts as integers and NaN as NULL."""
+        df = usage_frame()
+        df.loc[0, 'cost_usd'] = np.nan
+        success, message = self.processor.process_monthly_data(df, 'march.csv')
+        self.assertTrue(success, message)
+        
+        rows = self.fetch("""
+            SELECT date, typeof(usage_count), cost_usd, created_at
+            FROM usage_metrics ORDER BY user_id
+        """)
+        self.assertEqual([row[0] for row in rows], ['2025-03-01'] * 3)
+        self.assertEqual([row[1] for row in rows], ['integer'] * 3)
+        self.assertEqual([row[2] for row in rows], [None, 60.0, 60.0])
+        self.assertTrue(all(row[3] for row in rows))
+    
+    def test_reupload_supersedes(self):
+        """A re-upload replaces the covered users and months and keeps everything else."""
+        self.processor.process_monthly_data(pd.concat([usage_frame(), usage_frame(month='2025-04')], ignore_index=True), 'march.csv')
+        success, _ = self.processor.process_monthly_data(usage_frame(users=2, usage=100), 'march_v2.csv')
+        self.assertTrue(success)
+        
+        rows = self.fetch("""
+            SELECT substr(date, 1, 7), user_id, usage_count FROM usage_metrics
+            ORDER BY date, user_id
+        """)
+        self.assertEqual(rows, [
+            ('2025-03', 'user0@company.com', 100),
+            ('2025-03', 'user1@company.com', 101),
+            ('2025-03', 'user2@company.com', 12),
+            ('2025-04', 'user0@company.com', 10),
+            ('2025-04', 'user1@company.com', 11),
+            ('2025-04', 'user2@company.com', 12),
+        ])
+    
+    def test_failed_ingest_leaves_database_untouched(self):
+        """An error part-way through the insert rolls back the superseding deletes too."""
+        self.processor.process_monthly_data(usage_frame(), 'march.csv')
+        version = self.db.get_data_version()
+        before = self.fetch("SELECT * FROM usage_metrics ORDER BY id")
+        
+        # The last row cannot be bound, so the insert fails after the deletes
+        # and the first rows have been written
+        df = usage_frame(usage=100)
+        df['user_name'] = df['user_name'].astype(object)
+        df.at[len(df) - 1, 'user_name'] = object()
+        success, message = self.processor.process_monthly_data(df, 'march_v2.csv')
+        
+        self.assertFalse(success)
+        self.assertIn('Error processing data', message)
+        self.assertEqual(self.fetch("SELECT * FROM usage_metrics ORDER BY id"), before)
+        self.assertEqual(self.db.get_data_version(), version)
+    
+    def test_large_upload(self):
+        """100k rows are stored (and re-uploaded over themselves) in a few seconds."""
+        users = 25000
+        df = pd.DataFrame({
+            'user_id': [f'user{i % users}@company.com' for i in range(100000)],
+            'user_name': [f'User {i % users}' for i in range(100000)],
+            'date': [f'2025-{i // users + 1:02d}-01' for i in range(100000)],
+            'feature_used': 'ChatGPT Messages',
+            'usage_count': np.arange(100000),
+            'tool_source': 'ChatGPT',
+            'file_source': 'bulk.csv',
+        })
+        
+        for _ in range(2):
+            start = time.perf_counter()
+            success, message = self.processor.process_monthly_data(df.copy(), 'bulk.csv')
+            elapsed = time.perf_counter() - start
+            self.assertTrue(success, message)
+            # Generous bound; this takes about a second on a laptop
+            self.assertLess(elapsed, 10)
+        
+        self.assertEqual(self.fetch("SELECT COUNT(*) FROM usage_metrics"), [(100000,)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,142 @@
+"""
+Test suite for the full dataset export.
+
+Tests that the CSV, gzip-compressed CSV and Parquet exports hold every usage
+row with the public columns only, that an export is built once per data
+version and rebuilt (replacing the old file) after the data changes, that an
+export holds the rows of the version it is named after even when an upload
+commits during the build, that a failed build leaves no partial file, and that
+Parquet is only offered when pyarrow is installed.
+"""
+import unittest
+import os
+import sys
+from unittest import mock
+
+import pandas as pd
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import data_export
+from database import DatabaseManager
+from fixtures.usage_db import UsageDatabaseTestCase, usage_frame
+
+
+def usage_upload(tool='ChatGPT', month='2025-03'):
+    """40 users over the days of the month; every fifth user has no department."""
+    return usage_frame(users=40, tool=tool, month=month, usage=1, spread_days=True,
+                       department=lambda i: f'Department {i % 4}' if i % 5 else None)
+
+
+class TestDataExport(UsageDatabaseTestCase):
+    """Test building and caching exports of the usage data."""
+    
+    def setUp(self):
+        super().setUp()
+        self.ingest(usage_upload())
+        
+        patcher = mock.patch.object(data_export, 'EXPORT_ROOT', os.path.join(self.temp_dir, 'exports'))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+    
+    def export_files(self):
+        return sorted(os.listdir(data_export.export_directory(self.db)))
+    
+    def test_formats_hold_every_row(self):
+        """Each format reads back as the rows of get_all_data."""
+        expected = self.db.get_all_data()
+        readers = {'csv': pd.read_csv, 'csv.gz': pd.read_csv, 'parquet': pd.read_parquet}
+        for fmt in data_export.available_formats():
+            with self.subTest(fmt=fmt):
+                path = data_export.build_export(self.db, fmt, chunksize=15)
+                self.assertTrue(path.endswith('.' + data_export.EXPORT_FORMATS[fmt]['extension']))
+                
+                exported = readers[fmt](path)
+                self.assertEqual(list(exported.columns), DatabaseManager.PUBLIC_COLUMNS)
+                self.assertEqual(len(exported), len(expected))
+                self.assertEqual(exported['usage_count'].sum(), expected['usage_count'].sum())
+                self.assertEqual(exported['department'].isna().sum(), expected['department'].isna().sum())
+    
+    def test_internal_columns_are_not_exported(self):
+        """The CSV header holds the public columns only, as the CLI export."""
+        with open(data_export.build_export(self.db, 'csv'), encoding='utf-8') as f:
+            header = f.readline().strip().split(',')
+        self.assertEqual(header, DatabaseManager.PUBLIC_COLUMNS)
+        for internal in ('batch_id', 'day_key', 'month_key'):
+            self.assertNotIn(internal, header)
+    
+    def test_parquet_types_follow_columns(self):
+        """Parquet columns keep their declared types in every chunk."""
+        if not data_export.parquet_available():
+            self.skipTest("pyarrow is not installed")
+        
+        import pyarrow.parquet as pq
+        
+        path = data_export.build_export(self.db, 'parquet', chunksize=15)
+        schema = pq.read_schema(path)
+        self.assertEqual(schema.names, DatabaseManager.PUBLIC_COLUMNS)
+        self.assertEqual(str(schema.field('usage_count').type), 'int64')
+        self.assertEqual(str(schema.field('cost_usd').type), 'double')
+        self.assertEqual(str(schema.field('department').type), 'string')
+        self.assertEqual(pq.ParquetFile(path).num_row_groups, 3)
+    
+    def test_export_is_cached_per_data_version(self):
+        """An export is reused until the data changes, then replaced."""
+        self.assertIsNone(data_export.get_cached_export(self.db, 'csv'))
+        path = data_export.build_export(self.db, 'csv')
+        self.assertEqual(data_export.get_cached_export(self.db, 'csv'), path)
+        
+        with mock.patch.object(self.db, 'iter_filtered_data') as iter_data:
+            self.assertEqual(data_export.build_export(self.db, 'csv'), path)
+            iter_data.assert_not_called()
+        
+        self.ingest(usage_upload(tool='BlueFlame AI', month='2025-04'))
+        self.assertIsNone(data_export.get_cached_export(self.db, 'csv'))
+        new_path = data_export.build_export(self.db, 'csv')
+        
+        self.assertNotEqual(new_path, path)
+        self.assertEqual(self.export_files(), [os.path.basename(new_path)])
+        self.assertEqual(len(pd.read_csv(new_path)), 80)
+    
+    def test_export_matches_its_version(self):
+        """An upload committed while an export is being built is not in it (nor waits for it)."""
+        read_rows = self.db.iter_filtered_data
+        
+        def upload_then_read(**kwargs):
+            self.ingest(usage_upload(tool='BlueFlame AI', month='2025-04'))
+            yield from read_rows(**kwargs)
+        
+        version = self.db.get_data_version()
+        with mock.patch.object(self.db, 'iter_filtered_data', side_effect=upload_then_read):
+            path = data_export.build_export(self.db, 'csv', chunksize=15)
+        
+        self.assertEqual(path, data_export.export_path(self.db, 'csv', version))
+        self.assertEqual(len(pd.read_csv(path)), 40)
+        self.assertGreater(self.db.get_data_version(), version)
+        self.assertEqual(len(pd.read_csv(data_export.build_export(self.db, 'csv'))), 80)
+    
+    def test_failed_build_leaves_no_file(self):
+        def failing_chunks(**kwargs):
+            yield self.db.get_all_data()
+            raise RuntimeError("read failed")
+        
+        with mock.patch.object(self.db, 'iter_filtered_data', side_effect=failing_chunks):
+            with self.assertRaises(RuntimeError):
+                data_export.build_export(self.db, 'csv.gz')
+        
+        self.assertEqual(self.export_files(), [])
+        self.assertIsNone(data_export.get_cached_export(self.db, 'csv.gz'))
+    
+    def test_unavailable_formats(self):
+        with self.assertRaises(ValueError):
+            data_export.build_export(self.db, 'xlsx')
+        
+        with mock.patch.object(data_export, 'parquet_available', return_value=False):
+            self.assertEqual(data_export.available_formats(), ['csv', 'csv.gz'])
+            with self.assertRaises(ValueError):
+                data_export.build_export(self.db, 'parquet')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,113 @@
+"""
+Test suite for the integer day and month keys of usage_metrics.
+
+Tests that day_key and month_key follow the stored date, that date filters
+take date objects and are range scans on the keys, that month superseding
+uses the (tool_source, month_key, user_id) index, and that rows stored before
+the keys existed get them from the migration.
+"""
+import unittest
+import sqlite3
+import os
+import sys
+from datetime import date, datetime
+
+import pandas as pd
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from database import DatabaseManager, to_day_key, to_month_key, from_day_key
+from fixtures.usage_db import MigrationTestCase, UsageDatabaseTestCase, usage_frame
+
+
+class TestKeyConversion(unittest.TestCase):
+    """Test the Python side of the key encoding."""
+    
+    def test_day_key(self):
+        self.assertEqual(to_day_key('1970-01-01'), 0)
+        self.assertEqual(to_day_key(date(1969, 12, 31)), -1)
+        self.assertEqual(to_day_key(datetime(2025, 3, 15, 23, 59)), to_day_key('2025-03-15'))
+        self.assertEqual(from_day_key(to_day_key(pd.Timestamp('2025-03-15'))), date(2025, 3, 15))
+        with self.assertRaises(ValueError):
+            to_day_key(None)
+    
+    def test_month_key(self):
+        self.assertEqual(to_month_key('2025-03-15'), 202503)
+        self.assertEqual(to_month_key(pd.Period('2024-12', 'M')), 202412)
+
+
+class TestDateKeys(UsageDatabaseTestCase):
+    """Test the stored keys and the date-typed query APIs."""
+    
+    def setUp(self):
+        super().setUp()
+        self.ingest(usage_frame(dates=['2025-01-31', '2025-02-01', '2025-02-28', '2025-03-01'], filename='usage.csv'))
+    
+    def test_keys_follow_date(self):
+        """Keys are derived from the date by SQLite and match the Python conversion."""
+        rows = self.fetch("SELECT date, day_key, month_key FROM usage_metrics ORDER BY day_key")
+        self.assertEqual([(day, to_day_key(day), to_month_key(day)) for day, _, _ in rows], rows)
+        
+        # Rows written directly (not through DataProcessor) get keys too; bad dates get none
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("INSERT INTO usage_metrics (user_id, date, tool_source) VALUES ('x', '2025-04-02', 'ChatGPT')")
+        conn.execute("INSERT INTO usage_metrics (user_id, date, tool_source) VALUES ('y', 'n/a', 'ChatGPT')")
+        conn.commit()
+        conn.close()
+        self.assertEqual(self.fetch("SELECT day_key, month_key FROM usage_metrics WHERE user_id IN ('x', 'y') ORDER BY user_id"),
+                         [(to_day_key('2025-04-02'), 202504), (None, None)])
+        self.assertEqual(self.db.get_date_range(), (date(2025, 1, 31), date(2025, 4, 30)))
+    
+    def test_filters_take_dates(self):
+        """Date filters accept date objects, datetimes and strings, and include the end day."""
+        def days(**kwargs):
+            return sorted(self.db.get_filtered_data(**kwargs)['date'].tolist())
+        
+        self.assertEqual(days(start_date=date(2025, 2, 1), end_date=date(2025, 2, 28)),
+                         ['2025-02-01', '2025-02-28'])
+        self.assertEqual(days(start_date=datetime(2025, 2, 28, 12), end_date=pd.Timestamp('2025-03-01 08:00')),
+                         ['2025-02-28', '2025-03-01'])
+        # Open-ended ranges
+        self.assertEqual(days(start_date='2025-02-28'), ['2025-02-28', '2025-03-01'])
+        self.assertEqual(days(end_date='2025-01-31'), ['2025-01-31'])
+    
+    def test_available_months_are_dates(self):
+        self.assertEqual(self.db.get_available_months(),
+                         [date(2025, 1, 31), date(2025, 2, 1), date(2025, 2, 28), date(2025, 3, 1)])
+    
+    def test_monthly_filters_use_month_key(self):
+        """Superseding a month is a search on idx_usage_tool_month_user."""
+        plan = self.fetch("""
+            EXPLAIN QUERY PLAN SELECT id FROM usage_metrics
+            WHERE tool_source = ? AND month_key = ? AND user_id IN ('user1@company.com')
+        """, ('ChatGPT', 202502))
+        self.assertIn('idx_usage_tool_month_user', ' '.join(row[-1] for row in plan))
+        
+        preview = self.db.get_superseding_preview('ChatGPT', ['2025-02'], ['user1@company.com', 'user2@company.com'])
+        self.assertEqual(preview['total_records'], 2)
+
+
+class TestDateKeyMigration(MigrationTestCase):
+    """Test that existing rows get keys and the replaced indexes are dropped."""
+    
+    def test_existing_rows_get_keys(self):
+        conn = self.migrate_to(5)
+        conn.execute("INSERT INTO usage_metrics (user_id, date, tool_source) VALUES ('a', '2025-03-15', 'ChatGPT')")
+        conn.commit()
+        conn.close()
+        
+        db = DatabaseManager(self.temp_db.name)
+        
+        conn = sqlite3.connect(self.temp_db.name)
+        keys = conn.execute("SELECT day_key, month_key FROM usage_metrics").fetchall()
+        indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        conn.close()
+        self.assertEqual(keys, [(to_day_key('2025-03-15'), 202503)])
+        self.assertIn('idx_usage_tool_month_user', indexes)
+        self.assertNotIn('idx_date', indexes)
+        self.assertEqual(len(db.get_filtered_data(start_date=date(2025, 3, 15), end_date=date(2025, 3, 15))), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,123 @@
+"""
+Test suite for os.scandir-based folder scanning with cached directory listings.
+
+Tests that flat and recursive scans report the same files and folder names
+as before, that unchanged directories are not re-listed, that added files
+and cache expiry are picked up, and that parallel stat gives the same result.
+"""
+import unittest
+from unittest import mock
+import tempfile
+import shutil
+import os
+import sys
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import file_scanner
+from file_scanner import FileScanner
+
+
+class TestDirectoryScan(unittest.TestCase):
+    """Test scanning with the directory listing cache."""
+    
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.root = os.path.join(self.temp_dir, 'OpenAI User Data')
+        for sub in ('Monthly', os.path.join('Monthly', '2025'), 'Weekly'):
+            os.makedirs(os.path.join(self.root, sub))
+        self.write('top.csv')
+        self.write(os.path.join('Monthly', 'march.csv'))
+        self.write(os.path.join('Monthly', '2025', 'april.xlsx'))
+        self.write(os.path.join('Weekly', 'week1.csv'))
+        self.write(os.path.join('Weekly', 'notes.txt'))
+        self.scanner = FileScanner(os.path.join(self.temp_dir, 'file_tracking.db'),
+                                   recursive_folders=[self.root])
+    
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+    
+    def write(self, rel_path, content='email,messages\na@company.com,1\n'):
+        path = os.path.join(self.root, rel_path)
+        with open(path, 'w') as f:
+            f.write(content)
+        return path
+    
+    def scan(self):
+        files = self.scanner.scan_folders([self.root])
+        return sorted((f['folder'], f['filename']) for f in files)
+    
+    def count_scandir_calls(self):
+        calls = []
+        real_scandir = os.scandir
+        
+        def counting_scandir(path):
+            calls.append(path)
+            return real_scandir(path)
+        
+        return calls, mock.patch.object(file_scanner.os, 'scandir', side_effect=counting_scandir)
+    
+    def test_recursive_and_flat_results(self):
+        """Recursive scans report subfolders relative to the scan root; flat scans stay at the top."""
+        self.assertEqual(self.scan(), [
+            ('OpenAI User Data', 'top.csv'),
+            ('OpenAI User Data/Monthly', 'march.csv'),
+            ('OpenAI User Data/Monthly/2025', 'april.xlsx'),
+            ('OpenAI User Data/Weekly', 'week1.csv'),
+        ])
+        
+        flat = FileScanner(os.path.join(self.temp_dir, 'flat.db'))
+        self.assertEqual([f['filename'] for f in flat.scan_folders([self.root])], ['top.csv'])
+    
+    def test_unchanged_directories_are_not_relisted(self):
+        """A warm scan only stats directories."""
+        first = self.scan()
+        calls, patcher = self.count_scandir_calls()
+        with patcher:
+            self.assertEqual(self.scan(), first)
+        self.assertEqual(calls, [])
+    
+    def test_added_file_is_picked_up(self):
+        """Adding a file changes its directory's mtime, so only that directory is re-listed."""
+        self.scan()
+        weekly = os.path.join(self.root, 'Weekly')
+        self.write(os.path.join('Weekly', 'week2.csv'))
+        stat = os.stat(weekly)
+        os.utime(weekly, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+        
+        calls, patcher = self.count_scandir_calls()
+        with patcher:
+            files = self.scan()
+        self.assertIn(('OpenAI User Data/Weekly', 'week2.csv'), files)
+        self.assertEqual(calls, [weekly])
+    
+    def test_clear_and_disabled_cache(self):
+        """Clearing the cache, or max_listing_age=0, lists every directory again."""
+        self.scan()
+        self.scanner.clear_directory_cache()
+        calls, patcher = self.count_scandir_calls()
+        with patcher:
+            self.scan()
+        self.assertEqual(len(calls), 4)
+        
+        uncached = FileScanner(os.path.join(self.temp_dir, 'uncached.db'),
+                               recursive_folders=[self.root], max_listing_age=0)
+        uncached.scan_folders([self.root])
+        calls, patcher = self.count_scandir_calls()
+        with patcher:
+            uncached.scan_folders([self.root])
+        self.assertEqual(len(calls), 4)
+    
+    def test_parallel_stat(self):
+        """Stat'ing on a thread pool gives the same sizes as serial stat."""
+        serial = {f['filename']: f['size_mb'] for f in self.scanner.scan_folders([self.root])}
+        parallel_scanner = FileScanner(os.path.join(self.temp_dir, 'parallel.db'),
+                                       recursive_folders=[self.root], stat_workers=4)
+        with mock.patch.object(file_scanner, 'PARALLEL_STAT_THRESHOLD', 1):
+            parallel = {f['filename']: f['size_mb'] for f in parallel_scanner.scan_folders([self.root])}
+        self.assertEqual(parallel, serial)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,132 @@
+"""
+Test suite for content-hash change detection in FileScanner.
+
+Tests that touched files stay processed, changed content is reported as
+modified, identical content under another path is a duplicate, and that
+unchanged files are not re-hashed.
+"""
+import unittest
+from unittest import mock
+import tempfile
+import shutil
+import sqlite3
+import os
+import sys
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import file_scanner
+from file_scanner import FileScanner
+
+
+class TestContentHashStatus(unittest.TestCase):
+    """Test file status decisions based on content hashes."""
+    
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.folder = os.path.join(self.temp_dir, 'uploads')
+        self.other_folder = os.path.join(self.temp_dir, 'archive')
+        os.makedirs(self.folder)
+        os.makedirs(self.other_folder)
+        self.tracking_file = os.path.join(self.temp_dir, 'file_tracking.json')
+        self.scanner = FileScanner(self.tracking_file)
+        self.path = self.write(self.folder, 'report.csv', 'email,messages\na@company.com,3\n')
+    
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+    
+    def write(self, folder, name, content):
+        path = os.path.join(folder, name)
+        with open(path, 'w') as f:
+            f.write(content)
+        return path
+    
+    def statuses(self):
+        files = self.scanner.scan_folders([self.folder, self.other_folder])
+        return {f['filename']: f for f in files}
+    
+    def test_touch_keeps_processed(self):
+        """A new mtime with unchanged content is still processed."""
+        self.scanner.mark_processed(self.path, records_count=1)
+        stat = os.stat(self.path)
+        os.utime(self.path, (stat.st_atime, stat.st_mtime + 60))
+        
+        self.assertEqual(self.statuses()['report.csv']['status'], 'processed')
+    
+    def test_changed_content_is_modified(self):
+        """Different content at a tracked path is modified."""
+        self.scanner.mark_processed(self.path, records_count=1)
+        self.write(self.folder, 'report.csv', 'email,messages\na@company.com,4\n')
+        
+        self.assertEqual(self.statuses()['report.csv']['status'], 'modified')
+    
+    def test_copy_elsewhere_is_duplicate(self):
+        """Identical content under another name and folder is a duplicate and not offered for ingestion."""
+        self.scanner.mark_processed(self.path, records_count=1)
+        shutil.copy(self.path, os.path.join(self.other_folder, 'report (1).csv'))
+        
+        copy = self.statuses()['report (1).csv']
+        self.assertEqual(copy['status'], 'duplicate')
+        self.assertEqual(copy['duplicate_of'], os.path.abspath(self.path))
+        self.assertEqual(self.scanner.get_new_files([self.folder, self.other_folder]), [])
+    
+    def test_identical_new_files_offered_once(self):
+        """Two unprocessed copies of the same content are offered for ingestion once."""
+        shutil.copy(self.path, os.path.join(self.other_folder, 'copy.csv'))
+        
+        new_files = self.scanner.get_new_files([self.folder, self.other_folder])
+        self.assertEqual([f['filename'] for f in new_files], ['report.csv'])
+        self.assertEqual(self.statuses()['copy.csv']['status'], 'duplicate')
+    
+    def test_failed_file_is_not_a_dedup_source(self):
+        """Copies of content whose processing failed are still new."""
+        self.scanner.mark_processed(self.path, success=False, error='bad format')
+        shutil.copy(self.path, os.path.join(self.other_folder, 'copy.csv'))
+        
+        self.assertEqual(self.statuses()['copy.csv']['status'], 'new')
+    
+    def test_unchanged_files_are_not_hashed(self):
+        """Matching size and mtime skip hashing entirely."""
+        self.scanner.mark_processed(self.path, records_count=1)
+        with mock.patch.object(file_scanner, 'hash_file', side_effect=AssertionError('hashed')):
+            self.assertEqual(self.statuses()['report.csv']['status'], 'processed')
+    
+    def test_touched_file_is_hashed_once(self):
+        """After a touch the new mtime is recorded, so the next scan skips hashing."""
+        self.scanner.mark_processed(self.path, records_count=1)
+        stat = os.stat(self.path)
+        os.utime(self.path, (stat.st_atime, stat.st_mtime + 60))
+        self.statuses()
+        
+        reloaded = FileScanner(self.tracking_file)
+        with mock.patch.object(file_scanner, 'hash_file', side_effect=AssertionError('hashed')):
+            files = reloaded.scan_folders([self.folder])
+        self.assertEqual(files[0]['status'], 'processed')
+    
+    def test_legacy_entries_are_backfilled(self):
+        """Tracking entries without a hash still match on mtime and get a hash for dedup."""
+        self.scanner.mark_processed(self.path, records_count=1)
+        conn = sqlite3.connect(self.scanner.tracking_file)
+        conn.execute("UPDATE file_tracking SET content_hash = NULL, size = NULL, mtime = NULL")
+        conn.commit()
+        conn.close()
+        
+        shutil.copy(self.path, os.path.join(self.other_folder, 'copy.csv'))
+        statuses = self.statuses()
+        
+        self.assertEqual(statuses['report.csv']['status'], 'processed')
+        self.assertEqual(statuses['copy.csv']['status'], 'duplicate')
+    
+    def test_reset_clears_duplicate_source(self):
+        """Resetting the original file offers its content for ingestion again."""
+        self.scanner.mark_processed(self.path, records_count=1)
+        shutil.copy(self.path, os.path.join(self.other_folder, 'copy.csv'))
+        self.scanner.reset_file_status(self.path)
+        
+        new_files = self.scanner.get_new_files([self.folder, self.other_folder])
+        self.assertEqual(len(new_files), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
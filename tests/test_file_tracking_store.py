@@ -0,0 +1,176 @@
+"""
+Test suite for the SQLite file tracking store.
+
+Tests the one-time import of file_tracking.json (and that an unreadable file
+is kept), lookups by path and hash, folder resets, batches, and that a folder
+scan leaves the store writable while it hashes files.
+"""
+import unittest
+import tempfile
+import shutil
+import json
+import sqlite3
+import os
+import sys
+from unittest import mock
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import file_scanner
+from file_tracking_store import FileTrackingStore
+from file_scanner import FileScanner
+
+
+def entry(filename, content_hash=None, success=True, records_count=10):
+    return {
+        'filename': filename,
+        'processed_at': '2025-01-01T00:00:00',
+        'modified': '2025-01-01T00:00:00',
+        'content_hash': content_hash,
+        'success': success,
+        'records_count': records_count,
+        'error': None if success else 'failed'
+    }
+
+
+class TestFileTrackingStore(unittest.TestCase):
+    """Test store operations."""
+    
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.store = FileTrackingStore(os.path.join(self.temp_dir, 'file_tracking.db'))
+    
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+    
+    def test_round_trip_and_hash_lookup(self):
+        """Entries are returned by path, and only successful entries are found by hash."""
+        self.store.upsert('/data/a.csv', entry('a.csv', 'hash1'))
+        self.store.upsert('/data/b.csv', entry('b.csv', 'hash2', success=False))
+        
+        self.assertEqual(self.store.get('/data/a.csv')['content_hash'], 'hash1')
+        self.assertIs(self.store.get('/data/a.csv')['success'], True)
+        self.assertIsNone(self.store.get('/data/missing.csv'))
+        self.assertEqual(self.store.find_processed_by_hash('hash1'), '/data/a.csv')
+        self.assertIsNone(self.store.find_processed_by_hash('hash2'))
+    
+    def test_delete_under_folder(self):
+        """Folder resets remove only entries below that folder, treating % and _ literally."""
+        self.store.upsert('/data/100%_done/a.csv', entry('a.csv'))
+        self.store.upsert('/data/100x_done/b.csv', entry('b.csv'))
+        self.store.upsert('/other/c.csv', entry('c.csv'))
+        
+        self.assertEqual(self.store.delete_under(['/data/100%_done']), 1)
+        self.assertEqual(sorted(self.store.all()), ['/data/100x_done/b.csv', '/other/c.csv'])
+    
+    def test_stats(self):
+        """Stats are aggregated in SQL."""
+        self.store.upsert('/a.csv', entry('a.csv', records_count=5))
+        self.store.upsert('/b.csv', entry('b.csv', success=False, records_count=0))
+        self.assertEqual(self.store.stats(), {
+            'total_tracked': 2, 'successful': 1, 'failed': 1, 'total_records_processed': 5
+        })
+    
+    def test_batch_rolls_back_on_error(self):
+        """Writes inside a failed batch are discarded."""
+        with self.assertRaises(RuntimeError):
+            with self.store.batch():
+                self.store.upsert('/a.csv', entry('a.csv'))
+                raise RuntimeError("scan failed")
+        self.assertEqual(self.store.all(), {})
+
+
+class TestScanLocking(unittest.TestCase):
+    """Test that a folder scan does not hold a write lock on the store while it hashes files."""
+    
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.folder = os.path.join(self.temp_dir, 'data')
+        os.makedirs(self.folder)
+        self.scanner = FileScanner(os.path.join(self.temp_dir, 'file_tracking.db'), max_listing_age=0)
+    
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+    
+    def write_file(self, name, content):
+        path = os.path.join(self.folder, name)
+        with open(path, 'w') as f:
+            f.write(content)
+        return path
+    
+    def test_writes_allowed_while_hashing(self):
+        """Other writers are not blocked during a scan; refreshed fingerprints are saved at the end."""
+        touched = self.write_file('touched.csv', 'a,b\n1,2\n')
+        self.scanner.mark_processed(touched, records_count=1)
+        os.utime(touched, (1700000000, 1700000000))
+        self.write_file('new.csv', 'a,b\n3,4\n')
+        
+        write_errors = []
+        
+        def hash_and_write(path):
+            conn = sqlite3.connect(self.scanner.tracking_file, timeout=0)
+            try:
+                conn.execute("INSERT OR REPLACE INTO file_tracking (file_key, filename) VALUES (?, 'other.csv')",
+                             ('/elsewhere/other.csv',))
+                conn.commit()
+            except sqlite3.OperationalError as e:
+                write_errors.append(e)
+            finally:
+                conn.close()
+            return original_hash(path)
+        
+        original_hash = file_scanner.hash_file
+        with mock.patch.object(file_scanner, 'hash_file', side_effect=hash_and_write):
+            files = {info['filename']: info for info in self.scanner.scan_folders([self.folder])}
+        
+        self.assertEqual(write_errors, [])
+        self.assertEqual((files['touched.csv']['status'], files['new.csv']['status']), ('processed', 'new'))
+        self.assertEqual(self.scanner.store.get(touched)['mtime'], 1700000000)
+        self.assertIsNotNone(self.scanner.store.get('/elsewhere/other.csv'))
+
+
+class TestJsonImport(unittest.TestCase):
+    """Test the one-time import of the previous JSON tracking file."""
+    
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.json_path = os.path.join(self.temp_dir, 'file_tracking.json')
+        with open(self.json_path, 'w') as f:
+            json.dump({
+                '/data/a.csv': entry('a.csv'),
+                '/data/b.csv': entry('b.csv', success=False),
+                'garbage': 'not an entry'
+            }, f, indent=2)
+    
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+    
+    def test_import_once(self):
+        """JSON entries are imported into the store next to it and the JSON is renamed."""
+        scanner = FileScanner(self.json_path)
+        
+        self.assertEqual(scanner.tracking_file, os.path.join(self.temp_dir, 'file_tracking.db'))
+        self.assertEqual(sorted(scanner.processed_files), ['/data/a.csv', '/data/b.csv'])
+        self.assertFalse(os.path.exists(self.json_path))
+        self.assertTrue(os.path.exists(self.json_path + '.imported'))
+        
+        # A reset is not undone by reopening
+        scanner.reset_file_status('/data/a.csv')
+        reopened = FileScanner(os.path.join(self.temp_dir, 'file_tracking.db'))
+        self.assertEqual(sorted(reopened.processed_files), ['/data/b.csv'])
+        self.assertEqual(reopened.get_file_stats()['failed'], 1)
+    
+    def test_unreadable_json_is_kept(self):
+        """A corrupt or partly written JSON file is left in place instead of being renamed away."""
+        with open(self.json_path, 'w') as f:
+            f.write('{"/data/a.csv": {"filename": "a.c')
+        
+        scanner = FileScanner(self.json_path)
+        self.assertEqual(scanner.processed_files, {})
+        self.assertTrue(os.path.exists(self.json_path))
+        self.assertFalse(os.path.exists(self.json_path + '.imported'))
+
+
+if __name__ == '__main__':
+    unittest.main()
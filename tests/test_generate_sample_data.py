@@ -0,0 +1,141 @@
+"""
+Test suite for the scale fixture generator.
+
+Tests that generated OpenAI, BlueFlame and headcount exports use the real
+column layouts, are reproducible from the seed, honour the distribution
+options, and can be ingested by DataProcessor.
+"""
+import unittest
+import ast
+import pandas as pd
+import tempfile
+import shutil
+import os
+import sys
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from generate_sample_data import (
+    OPENAI_COLUMNS, generate_users, write_scale_fixtures, month_periods, week_periods
+)
+from database import DatabaseManager
+from data_processor import DataProcessor
+
+
+class TestScaleFixtures(unittest.TestCase):
+    """Test generated export files."""
+    
+    @classmethod
+    def setUpClass(cls):
+        cls.output_dir = tempfile.mkdtemp()
+        cls.summary = write_scale_fixtures(cls.output_dir, n_users=200, months=3, start_month='2025-01',
+                                           cadence='both', seed=7)
+    
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.output_dir, ignore_errors=True)
+    
+    def _files(self, *folder):
+        path = os.path.join(self.output_dir, *folder)
+        return sorted(os.path.join(path, name) for name in os.listdir(path))
+    
+    def test_openai_reports_use_real_columns(self):
+        """Monthly and weekly reports match the OpenAI export column set."""
+        monthly = self._files('OpenAI User Data', 'Monthly OpenAI User Data')
+        weekly = self._files('OpenAI User Data', 'Weekly OpenAI User Data')
+        self.assertEqual(len(monthly), 3)
+        self.assertEqual(len(weekly), len(week_periods('2025-01', 3)))
+        
+        sample = pd.read_csv(os.path.join(os.path.dirname(__file__), '..', 'sample_weekly_data.csv'))
+        for path in [monthly[0], weekly[0]]:
+            report = pd.read_csv(path)
+            self.assertEqual(list(report.columns), list(sample.columns))
+            self.assertEqual(list(report.columns), OPENAI_COLUMNS)
+        
+        self.assertIn('weekly', os.path.basename(weekly[0]))
+        self.assertRegex(os.path.basename(weekly[0]), r'\d{4}-\d{2}-\d{2}')
+    
+    def test_message_breakdowns_are_consistent(self):
+        """Per-model counts add up to messages; inactive users have no activity dates."""
+        report = pd.read_csv(self._files('OpenAI User Data', 'Monthly OpenAI User Data')[0])
+        for _, row in report.head(50).iterrows():
+            model_counts = ast.literal_eval(row['model_to_messages'])
+            self.assertEqual(sum(model_counts.values()), row['messages'])
+            if row['tool_messages'] > 0:
+                self.assertEqual(sum(ast.literal_eval(row['tool_to_messages']).values()), row['tool_messages'])
+        
+        inactive = report[report['is_active'] == 0]
+        self.assertTrue((inactive['messages'] == 0).all())
+        self.assertTrue(inactive['first_day_active_in_period'].isna().all())
+    
+    def test_blueflame_and_headcount_exports(self):
+        """BlueFlame combined/wide files and the headcount CSV have their expected headers."""
+        blueflame = self._files('BlueFlame User Data')
+        combined = pd.read_csv([path for path in blueflame if 'combined' in path][0])
+        wide = pd.read_csv([path for path in blueflame if 'wide' in path][0])
+        
+        self.assertEqual(list(combined.columns[:6]), ['Table', 'Metric', 'User ID', 'Jan-25', 'Feb-25', 'Mar-25'])
+        self.assertTrue(any(col.startswith('MoM Var') for col in combined.columns))
+        self.assertEqual(list(wide.columns), ['Rank', 'User ID', 'Metric', '25-Jan', '25-Feb', '25-Mar', 'Total'])
+        self.assertTrue(wide['Total'].is_monotonic_decreasing)
+        
+        headcount = pd.read_csv(os.path.join(self.output_dir, 'Employee Headcount 2025_Emails.csv'))
+        self.assertEqual(list(headcount.columns), ['Last Name', 'First Name', 'Title', 'Function', 'Status', 'Email'])
+        self.assertGreater(len(headcount), 150)
+        self.assertTrue(headcount['Email'].is_unique)
+    
+    def test_monthly_report_can_be_ingested(self):
+        """A generated monthly report loads through DataProcessor."""
+        temp_db = tempfile.NamedTemporaryFile(delete=False, suffix='.db')
+        temp_db.close()
+        try:
+            db = DatabaseManager(temp_db.name)
+            report = pd.read_csv(self._files('OpenAI User Data', 'Monthly OpenAI User Data')[0])
+            success, message = DataProcessor(db).process_monthly_data(report, 'generated.csv')
+            self.assertTrue(success, message)
+            self.assertGreater(len(db.get_all_data()), 0)
+        finally:
+            os.unlink(temp_db.name)
+
+
+class TestGenerateUsers(unittest.TestCase):
+    """Test the synthetic user population."""
+    
+    def test_seed_is_reproducible(self):
+        """The same seed produces the same users; a different seed does not."""
+        first = generate_users(500, seed=1, months=3)
+        second = generate_users(500, seed=1, months=3)
+        other = generate_users(500, seed=2, months=3)
+        pd.testing.assert_frame_equal(first, second)
+        self.assertFalse(first['email'].equals(other['email']))
+    
+    def test_emails_unique(self):
+        """Duplicate names get distinct email addresses."""
+        users = generate_users(3000, seed=3, months=3)
+        self.assertTrue(users['email'].is_unique)
+    
+    def test_distribution_options(self):
+        """Department skew and power-user share shape the population."""
+        uniform = generate_users(4000, seed=4, months=3, dept_skew=0.0)
+        skewed = generate_users(4000, seed=4, months=3, dept_skew=2.0)
+        self.assertGreater(skewed['department'].value_counts().iloc[0], uniform['department'].value_counts().iloc[0] * 2)
+        
+        users = generate_users(4000, seed=4, months=3, power_user_share=0.1)
+        self.assertAlmostEqual(users['is_power_user'].mean(), 0.1, delta=0.01)
+        self.assertGreater(users[users['is_power_user']]['activity_weight'].median(),
+                           users[~users['is_power_user']]['activity_weight'].median() * 4)
+    
+    def test_periods(self):
+        """Monthly periods are calendar months; weekly periods cover the same range."""
+        months = month_periods('2024-11', 3)
+        self.assertEqual(months[0], (pd.Timestamp('2024-11-01'), pd.Timestamp('2024-11-30')))
+        self.assertEqual(months[-1][1], pd.Timestamp('2025-01-31'))
+        weeks = week_periods('2024-11', 3)
+        self.assertEqual(weeks[0][0], pd.Timestamp('2024-11-01'))
+        self.assertTrue(all((end - start).days == 6 for start, end in weeks))
+        self.assertLessEqual(weeks[-1][0], months[-1][1])
+
+
+if __name__ == '__main__':
+    unittest.main()
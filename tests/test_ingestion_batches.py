@@ -0,0 +1,148 @@
+"""
+Test suite for ingestion batch lineage and rollback.
+
+Tests that every upload is recorded as a batch whose id is stored on its rows,
+that superseded rows are kept in usage_metrics_history, that rolling back a
+batch restores exactly what it replaced (but not the usage of a deleted
+user), and that existing rows are assigned
+batches by the migration.
+"""
+import unittest
+import sqlite3
+import os
+import sys
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from database import DatabaseManager
+from fixtures.usage_db import MigrationTestCase, UsageDatabaseTestCase, usage_frame
+
+
+class TestIngestionBatches(UsageDatabaseTestCase):
+    """Test batch recording, history and rollback."""
+    
+    def upload(self, filename, **kwargs):
+        self.ingest(usage_frame(filename=filename, **kwargs))
+        return int(self.db.get_ingestion_batches(limit=1)['batch_id'].iloc[0])
+    
+    def test_batch_is_recorded(self):
+        """Each upload gets a batch with its counts, and its rows carry the batch id."""
+        first = self.upload('march.csv')
+        second = self.upload('march_v2.csv', users=2, usage=100)
+        
+        batches = self.db.get_ingestion_batches().set_index('batch_id')
+        self.assertEqual(batches.loc[second, 'filename'], 'march_v2.csv')
+        self.assertEqual(batches.loc[second, 'rows_inserted'], 2)
+        self.assertEqual(batches.loc[second, 'rows_superseded'], 2)
+        self.assertEqual(batches.loc[first, 'status'], 'active')
+        
+        self.assertEqual(self.fetch("SELECT batch_id, COUNT(*) FROM usage_metrics GROUP BY batch_id"),
+                         [(first, 1), (second, 2)])
+        self.assertEqual(self.fetch("SELECT superseded_by, batch_id, COUNT(*) FROM usage_metrics_history "
+                                    "GROUP BY superseded_by, batch_id"), [(second, first, 2)])
+    
+    def test_rollback_restores_superseded_rows(self):
+        """Rolling back a re-upload brings back exactly the rows it replaced."""
+        self.upload('march.csv')
+        before = self.fetch("SELECT * FROM usage_metrics ORDER BY id")
+        second = self.upload('march_v2.csv', users=2, usage=100)
+        version = self.db.get_data_version()
+        
+        success, message = self.db.rollback_batch(second)
+        
+        self.assertTrue(success, message)
+        self.assertIn('removed 2 records, restored 2', message)
+        self.assertEqual(self.fetch("SELECT * FROM usage_metrics ORDER BY id"), before)
+        self.assertEqual(self.fetch("SELECT COUNT(*) FROM usage_metrics_history"), [(0,)])
+        self.assertGreater(self.db.get_data_version(), version)
+        
+        batches = self.db.get_ingestion_batches().set_index('batch_id')
+        self.assertEqual(batches.loc[second, 'status'], 'rolled_back')
+        self.assertIsNotNone(batches.loc[second, 'rolled_back_at'])
+        
+        # A batch is only rolled back once
+        success, message = self.db.rollback_batch(second)
+        self.assertFalse(success)
+        self.assertIn('rolled back', message)
+    
+    def test_superseded_batch_is_rolled_back_last(self):
+        """A batch whose rows were superseded can only be rolled back after the later batch."""
+        first = self.upload('march.csv')
+        second = self.upload('march_v2.csv')
+        
+        success, message = self.db.rollback_batch(first)
+        self.assertFalse(success)
+        self.assertIn(f'roll back batch {second} first', message)
+        self.assertEqual(self.fetch("SELECT COUNT(*) FROM usage_metrics WHERE batch_id = ?", (second,)), [(3,)])
+        
+        self.assertTrue(self.db.rollback_batch(second)[0])
+        self.assertTrue(self.db.rollback_batch(first)[0])
+        self.assertEqual(self.fetch("SELECT COUNT(*) FROM usage_metrics"), [(0,)])
+    
+    def test_unknown_batch(self):
+        """Rolling back a batch that does not exist fails without changes."""
+        success, message = self.db.rollback_batch(999)
+        self.assertFalse(success)
+        self.assertIn('not found', message)
+    
+    def test_delete_by_file_forgets_batches(self):
+        """Deleting a file's rows marks its batches deleted and drops what they superseded."""
+        self.upload('march.csv')
+        second = self.upload('march_v2.csv')
+        
+        self.assertTrue(self.db.delete_by_file('march_v2.csv'))
+        
+        self.assertEqual(self.fetch("SELECT COUNT(*) FROM usage_metrics"), [(0,)])
+        self.assertEqual(self.fetch("SELECT COUNT(*) FROM usage_metrics_history"), [(0,)])
+        success, message = self.db.rollback_batch(second)
+        self.assertFalse(success)
+        self.assertIn('deleted', message)
+    
+    def test_deleted_user_is_not_restored_by_rollback(self):
+        """Deleting a user's usage also drops their superseded rows, so a rollback cannot bring them back."""
+        self.upload('march.csv')
+        second = self.upload('march_v2.csv', usage=100)
+        
+        success, _, count = self.db.delete_employee_usage('USER1@company.com')
+        self.assertTrue(success)
+        self.assertEqual(count, 1)
+        self.assertEqual(self.fetch("SELECT COUNT(*) FROM usage_metrics_history"), [(2,)])
+        
+        success, message = self.db.rollback_batch(second)
+        self.assertTrue(success, message)
+        self.assertEqual(self.fetch("SELECT user_id, usage_count FROM usage_metrics ORDER BY user_id"),
+                         [('user0@company.com', 10), ('user2@company.com', 12)])
+
+
+class TestBatchMigration(MigrationTestCase):
+    """Test that rows loaded before batches existed get one batch per file."""
+    
+    def test_existing_rows_are_backfilled(self):
+        conn = self.migrate_to(3)
+        conn.executemany(
+            "INSERT INTO usage_metrics (user_id, date, usage_count, tool_source, file_source) VALUES (?, ?, ?, ?, ?)",
+            [('a@company.com', '2025-03-01', 1, 'ChatGPT', 'march.csv'),
+             ('b@company.com', '2025-03-01', 2, 'ChatGPT', 'march.csv'),
+             ('a@company.com', '2025-03-01', 3, 'BlueFlame AI', 'blueflame.csv')]
+        )
+        conn.commit()
+        conn.close()
+        
+        db = DatabaseManager(self.temp_db.name)
+        
+        batches = db.get_ingestion_batches().sort_values('batch_id')
+        self.assertEqual(batches[['filename', 'rows_inserted']].values.tolist(),
+                         [['march.csv', 2], ['blueflame.csv', 1]])
+        conn = sqlite3.connect(self.temp_db.name)
+        unbatched = conn.execute("SELECT COUNT(*) FROM usage_metrics WHERE batch_id IS NULL").fetchone()[0]
+        conn.close()
+        self.assertEqual(unbatched, 0)
+        
+        # Legacy rows are deleted through their batch
+        self.assertTrue(db.delete_by_file('march.csv'))
+        self.assertEqual(len(db.get_all_data()), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
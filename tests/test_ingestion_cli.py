@@ -0,0 +1,164 @@
+"""
+Test suite for the headless ingestion pipeline and its command line.
+
+Tests that the module imports without Streamlit or Plotly, that files are
+ingested with their tracking status and timings recorded, and that the
+ingest, scan, stats and export commands work against a temporary database.
+"""
+import unittest
+import subprocess
+import tempfile
+import shutil
+import io
+import os
+import sys
+from contextlib import redirect_stdout
+
+import pandas as pd
+
+# Add parent directory to path for imports
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, REPO_ROOT)
+
+import ingestion
+from database import DatabaseManager
+from file_scanner import FileScanner
+from ingestion import IngestionPipeline
+
+
+def write_chatgpt_export(path, users=3):
+    pd.DataFrame({
+        'email': [f'user{i}@company.com' for i in range(users)],
+        'name': [f'User {i}' for i in range(users)],
+        'messages': [10 * (i + 1) for i in range(users)],
+        'gpt_messages': [i for i in range(users)],
+        'period_start': ['2025-03-01'] * users,
+        'period_end': ['2025-03-31'] * users,
+    }).to_csv(path, index=False)
+
+
+class TestIngestionModule(unittest.TestCase):
+    """Test the importable pipeline."""
+    
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.db = DatabaseManager(os.path.join(self.temp_dir, 'test.db'))
+        self.scanner = FileScanner(os.path.join(self.temp_dir, 'file_tracking.db'))
+        self.export = os.path.join(self.temp_dir, 'march.csv')
+        write_chatgpt_export(self.export)
+    
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+    
+    def test_import_is_light(self):
+        """Importing the module does not import streamlit or plotly."""
+        result = subprocess.run(
+            [sys.executable, '-c',
+             "import sys, ingestion; "
+             "print(sorted({m.split('.')[0] for m in sys.modules} & {'streamlit', 'plotly'}))"],
+            cwd=REPO_ROOT, capture_output=True, text=True
+        )
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(result.stdout.strip(), '[]')
+    
+    def test_process_file(self):
+        """A file is stored, marked processed and its timings recorded."""
+        pipeline = IngestionPipeline(self.db, scanner=self.scanner)
+        success, message, records = pipeline.process_file({'path': self.export, 'filename': 'march.csv'})
+        
+        self.assertTrue(success, message)
+        # 3 users with messages, 2 of them with GPT messages
+        self.assertEqual(records, 5)
+        self.assertEqual(len(self.db.get_all_data()), 5)
+        self.assertTrue(self.scanner.processed_files[self.export]['success'])
+        runs = self.db.get_ingestion_runs()
+        self.assertEqual(runs.iloc[0]['status'], 'success')
+    
+    def test_unknown_format(self):
+        """Files that are not a known export are rejected without a scanner."""
+        path = os.path.join(self.temp_dir, 'other.csv')
+        pd.DataFrame({'a': [1], 'b': [2]}).to_csv(path, index=False)
+        success, message, records = IngestionPipeline(self.db).process_file({'path': path, 'filename': 'other.csv'})
+        self.assertFalse(success)
+        self.assertIn('Unknown data format', message)
+
+
+class TestIngestionCommandLine(unittest.TestCase):
+    """Test the python -m ingestion commands."""
+    
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.previous_cwd = os.getcwd()
+        # The commands use the tracking store in the working directory
+        os.chdir(self.temp_dir)
+        self.folder = os.path.join(self.temp_dir, 'exports')
+        os.makedirs(os.path.join(self.folder, 'march'))
+        write_chatgpt_export(os.path.join(self.folder, 'march', 'march.csv'))
+        self.db_path = os.path.join(self.temp_dir, 'cli.db')
+    
+    def tearDown(self):
+        os.chdir(self.previous_cwd)
+        shutil.rmtree(self.temp_dir)
+    
+    def run_main(self, *argv):
+        output = io.StringIO()
+        with redirect_stdout(output):
+            status = ingestion.main(['--db', self.db_path, *argv])
+        return status, output.getvalue()
+    
+    def test_ingest_and_export(self):
+        """Folders are ingested recursively and the records can be exported."""
+        status, output = self.run_main('ingest', self.folder)
+        self.assertEqual(status, 0, output)
+        
+        export_path = os.path.join(self.temp_dir, 'usage.csv')
+        status, output = self.run_main('export', export_path, '--tool', 'ChatGPT', '--start-date', '2025-03-01')
+        self.assertEqual(status, 0)
+        exported = pd.read_csv(export_path)
+        self.assertEqual(len(exported), 5)
+        self.assertEqual(list(exported.columns), DatabaseManager.PUBLIC_COLUMNS)
+        
+        status, output = self.run_main('stats')
+        self.assertIn('Records:     5', output)
+    
+    def test_scan_ingests_only_new_files(self):
+        """scan --ingest processes new files once."""
+        # Only RECURSIVE_SCAN_FOLDERS are scanned below the top level
+        write_chatgpt_export(os.path.join(self.folder, 'april.csv'))
+        status, output = self.run_main('scan', '--folder', self.folder, '--ingest')
+        self.assertEqual(status, 0)
+        self.assertIn('1 new or modified', output)
+        
+        status, output = self.run_main('scan', '--folder', self.folder, '--ingest')
+        self.assertIn('0 new or modified', output)
+    
+    def test_batches_and_rollback(self):
+        """Ingested files are listed as batches and can be rolled back."""
+        self.run_main('ingest', self.folder)
+        status, output = self.run_main('batches')
+        self.assertEqual(status, 0)
+        self.assertIn('march.csv', output)
+        
+        status, output = self.run_main('rollback', '1')
+        self.assertEqual(status, 0)
+        self.assertIn('removed 5 records', output)
+        status, output = self.run_main('stats')
+        self.assertIn('Records:     0', output)
+        
+        status, output = self.run_main('rollback', '1')
+        self.assertEqual(status, 1)
+    
+    def test_failures_set_exit_status(self):
+        """Missing or unreadable files make the command fail."""
+        status, output = self.run_main('ingest', os.path.join(self.temp_dir, 'missing.csv'))
+        self.assertEqual(status, 1)
+        
+        other = os.path.join(self.temp_dir, 'other.csv')
+        pd.DataFrame({'a': [1]}).to_csv(other, index=False)
+        status, output = self.run_main('ingest', other)
+        self.assertEqual(status, 1)
+        self.assertIn('FAILED', output)
+
+
+if __name__ == '__main__':
+    unittest.main()
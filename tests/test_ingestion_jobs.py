@@ -0,0 +1,199 @@
+"""
+Test suite for the background ingestion job queue.
+
+Tests that uploads run as jobs with status and row counts, that failures are
+reported, that the on_success callback runs once per idle queue with the
+successful jobs, that a file is not queued twice, that jobs for the same tool
+and month are stored one after the other while other months run in parallel
+(dropping their locks afterwards), and that the pipeline is only replaced
+while no job is pending.
+"""
+import unittest
+import tempfile
+import threading
+import shutil
+import time
+import io
+import os
+import sys
+
+import pandas as pd
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from database import DatabaseManager
+from ingestion import IngestionPipeline
+from ingestion_jobs import IngestionJobQueue, SUCCEEDED, FAILED
+
+
+def chatgpt_export(month='2025-03', users=3):
+    output = io.StringIO()
+    pd.DataFrame({
+        'email': [f'user{i}@company.com' for i in range(users)],
+        'name': [f'User {i}' for i in range(users)],
+        'messages': [10 * (i + 1) for i in range(users)],
+        'gpt_messages': [i for i in range(users)],
+        'period_start': [f'{month}-01'] * users,
+        'period_end': [f'{month}-28'] * users,
+    }).to_csv(output, index=False)
+    return output.getvalue().encode('utf-8')
+
+
+class ConcurrencyRecordingProcessor:
+    """Stand-in for DataProcessor that records how many stores overlap."""
+    
+    def __init__(self, delay=0.1, barrier=None):
+        self.delay = delay
+        self.barrier = barrier
+        self.lock = threading.Lock()
+        self.running = 0
+        self.peak = 0
+    
+    def process_monthly_data(self, df, filename, timer=None):
+        with self.lock:
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+        try:
+            if self.barrier is not None:
+                self.barrier.wait(timeout=5)
+            time.sleep(self.delay)
+        finally:
+            with self.lock:
+                self.running -= 1
+        return True, f"Successfully processed {len(df)} records"
+
+
+class TestIngestionJobQueue(unittest.TestCase):
+    """Test job submission, status and serialization."""
+    
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.db = DatabaseManager(os.path.join(self.temp_dir, 'test.db'))
+        self.queues = []
+    
+    def tearDown(self):
+        for queue in self.queues:
+            queue.shutdown()
+        shutil.rmtree(self.temp_dir)
+    
+    def make_queue(self, processor=None, **kwargs):
+        queue = IngestionJobQueue(IngestionPipeline(self.db, processor=processor), **kwargs)
+        self.queues.append(queue)
+        return queue
+    
+    def test_upload_job_reports_counts(self):
+        """A finished upload job reports rows read, normalized, superseded and inserted."""
+        queue = self.make_queue()
+        first = queue.submit_upload('march.csv', chatgpt_export())
+        self.assertTrue(queue.wait([first], timeout=30))
+        
+        second = queue.submit_upload('march_v2.csv', chatgpt_export())
+        self.assertTrue(queue.wait([second], timeout=30))
+        job = queue.get(second)
+        
+        self.assertEqual(job['status'], SUCCEEDED, job['message'])
+        self.assertEqual(job['progress'], 1.0)
+        self.assertEqual(job['rows_read'], 3)
+        # 3 users with messages, 2 of them with GPT messages
+        self.assertEqual(job['rows_normalized'], 5)
+        self.assertEqual(job['rows_inserted'], 5)
+        self.assertEqual(job['rows_superseded'], 5)
+        self.assertEqual(job['duplicate_sets'], 0)
+        self.assertEqual(len(self.db.get_all_data()), 5)
+    
+    def test_failed_job(self):
+        """Files that cannot be ingested finish as failed with the pipeline's message."""
+        queue = self.make_queue()
+        job_id = queue.submit_upload('other.csv', b'a,b\n1,2\n')
+        queue.wait([job_id], timeout=30)
+        job = queue.get(job_id)
+        self.assertEqual(job['status'], FAILED)
+        self.assertIn('Unknown data format', job['message'])
+    
+    def test_on_success_callback(self):
+        """The callback runs once the queue is idle, with the successful jobs; its errors do not fail them."""
+        calls = []
+        
+        def on_success(jobs):
+            calls.append([(job['filename'], job['status']) for job in jobs])
+            raise RuntimeError("callback failed")
+        
+        queue = self.make_queue(workers=1, on_success=on_success)
+        first = queue.submit_upload('march.csv', chatgpt_export())
+        second = queue.submit_upload('april.csv', chatgpt_export(month='2025-04'))
+        failed = queue.submit_upload('other.csv', b'a,b\n1,2\n')
+        queue.shutdown(wait=True)
+        
+        self.assertEqual(calls, [[('march.csv', SUCCEEDED), ('april.csv', SUCCEEDED)]])
+        self.assertEqual(queue.get(first)['status'], SUCCEEDED)
+        self.assertEqual(queue.get(second)['status'], SUCCEEDED)
+        self.assertEqual(queue.get(failed)['status'], FAILED)
+    
+    def test_file_is_not_queued_twice(self):
+        """Submitting a file that is still queued or running returns its existing job."""
+        path = os.path.join(self.temp_dir, 'march.csv')
+        with open(path, 'wb') as f:
+            f.write(chatgpt_export())
+        processor = ConcurrencyRecordingProcessor(delay=0.3)
+        queue = self.make_queue(processor=processor)
+        file_info = {'path': path, 'filename': 'march.csv'}
+        
+        first = queue.submit_file(file_info)
+        self.assertEqual(queue.submit_file(file_info), first)
+        self.assertIn(path, queue.active_paths())
+        queue.wait(timeout=30)
+        self.assertNotEqual(queue.submit_file(file_info), first)
+    
+    def test_same_month_is_serialized(self):
+        """Two uploads for the same tool and month are never stored at the same time."""
+        processor = ConcurrencyRecordingProcessor()
+        queue = self.make_queue(processor=processor, workers=4)
+        job_ids = [queue.submit_upload(f'march_{i}.csv', chatgpt_export('2025-03')) for i in range(3)]
+        self.assertTrue(queue.wait(job_ids, timeout=30))
+        self.assertEqual(processor.peak, 1)
+        # Locks are dropped once no job holds or waits for them
+        self.assertEqual(queue._key_locks, {})
+    
+    def test_other_months_run_in_parallel(self):
+        """Uploads for different months are stored concurrently."""
+        processor = ConcurrencyRecordingProcessor(delay=0, barrier=threading.Barrier(2))
+        queue = self.make_queue(processor=processor, workers=2)
+        job_ids = [queue.submit_upload('march.csv', chatgpt_export('2025-03')),
+                   queue.submit_upload('april.csv', chatgpt_export('2025-04'))]
+        self.assertTrue(queue.wait(job_ids, timeout=30))
+        self.assertEqual(processor.peak, 2)
+        self.assertEqual([job['status'] for job in queue.list_jobs(job_ids)], [SUCCEEDED, SUCCEEDED])
+    
+    def test_pipeline_is_replaced_when_idle(self):
+        """A new pipeline (e.g. after the app's objects are recreated) is used once pending jobs are done."""
+        queue = self.make_queue(processor=ConcurrencyRecordingProcessor(delay=0.3))
+        first = queue.submit_upload('march.csv', chatgpt_export())
+        other_db = DatabaseManager(os.path.join(self.temp_dir, 'other.db'))
+        self.assertFalse(queue.replace_pipeline(IngestionPipeline(other_db)))
+        
+        queue.wait([first], timeout=30)
+        self.assertTrue(queue.replace_pipeline(IngestionPipeline(other_db)))
+        second = queue.submit_upload('april.csv', chatgpt_export('2025-04'))
+        queue.wait([second], timeout=30)
+        
+        self.assertEqual(queue.get(second)['status'], SUCCEEDED, queue.get(second)['message'])
+        self.assertEqual(len(other_db.get_all_data()), 5)
+        self.assertTrue(self.db.get_all_data().empty)
+    
+    def test_history_is_bounded(self):
+        """Only the most recent finished jobs are kept."""
+        queue = self.make_queue(processor=ConcurrencyRecordingProcessor(delay=0), history=1)
+        first = queue.submit_upload('march.csv', chatgpt_export())
+        queue.wait([first], timeout=30)
+        second = queue.submit_upload('april.csv', chatgpt_export('2025-04'))
+        queue.wait([second], timeout=30)
+        third = queue.submit_upload('may.csv', chatgpt_export('2025-05'))
+        queue.wait([third], timeout=30)
+        
+        self.assertIsNone(queue.get(first))
+        self.assertIsNotNone(queue.get(third))
+
+
+if __name__ == '__main__':
+    unittest.main()
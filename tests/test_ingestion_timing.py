@@ -0,0 +1,137 @@
+"""
+Test suite for per-stage ingestion timing.
+
+Tests the IngestionTimer spans, the spans emitted by file reading and
+DataProcessor.process_monthly_data, and storage of runs in ingestion_runs.
+"""
+import unittest
+import pandas as pd
+import tempfile
+import os
+import sys
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from ingestion_timing import IngestionTimer, span, hash_bytes, hash_file
+from file_reader import read_file_from_path
+from database import DatabaseManager
+from data_processor import DataProcessor
+
+
+def normalized_rows(n, month='2025-01-01'):
+    """Pre-normalized ChatGPT rows as produced by normalize_openai_data."""
+    return pd.DataFrame({
+        'user_id': [f'user{i}@company.com' for i in range(n)],
+        'user_name': [f'User {i}' for i in range(n)],
+        'email': [f'user{i}@company.com' for i in range(n)],
+        'department': ['Finance'] * n,
+        'date': [month] * n,
+        'feature_used': ['ChatGPT Messages'] * n,
+        'usage_count': [10] * n,
+        'cost_usd': [60.0] * n,
+        'tool_source': ['ChatGPT'] * n,
+        'file_source': ['report.csv'] * n
+    })
+
+
+class TestIngestionTimer(unittest.TestCase):
+    """Test span recording."""
+    
+    def test_spans_are_ordered_with_offsets(self):
+        """Spans record their start offset, duration, rows and bytes."""
+        timer = IngestionTimer()
+        with timer.span('read', num_bytes=100):
+            pass
+        with timer.span('parse') as entry:
+            entry['rows'] = 5
+        
+        self.assertEqual([entry['stage'] for entry in timer.spans], ['read', 'parse'])
+        self.assertEqual(timer.spans[0]['bytes'], 100)
+        self.assertEqual(timer.spans[1]['rows'], 5)
+        self.assertLessEqual(timer.spans[0]['start_ms'], timer.spans[1]['start_ms'])
+        self.assertGreaterEqual(timer.total_ms(), timer.spans[1]['start_ms'])
+    
+    def test_failed_span_keeps_error(self):
+        """A span that raises is still recorded, with the error."""
+        timer = IngestionTimer()
+        with self.assertRaises(ValueError):
+            with timer.span('normalization'):
+                raise ValueError("bad column")
+        self.assertEqual(timer.spans[0]['error'], 'ValueError: bad column')
+        self.assertIsNotNone(timer.spans[0]['duration_ms'])
+    
+    def test_span_without_timer(self):
+        """The helper is a no-op without a timer."""
+        with span(None, 'read') as entry:
+            entry['rows'] = 1
+    
+    def test_hashes_match(self):
+        """Chunked file hashing matches hashing the bytes in memory."""
+        with tempfile.NamedTemporaryFile(delete=False) as f:
+            f.write(b'x' * 3000)
+        try:
+            self.assertEqual(hash_file(f.name, chunk_size=1024), hash_bytes(b'x' * 3000))
+        finally:
+            os.unlink(f.name)
+
+
+class TestIngestionSpans(unittest.TestCase):
+    """Test spans emitted by the ingestion pipeline and their storage."""
+    
+    def setUp(self):
+        self.temp_db = tempfile.NamedTemporaryFile(delete=False, suffix='.db')
+        self.temp_db.close()
+        self.db = DatabaseManager(self.temp_db.name)
+        self.processor = DataProcessor(self.db)
+    
+    def tearDown(self):
+        if os.path.exists(self.temp_db.name):
+            os.unlink(self.temp_db.name)
+    
+    def test_read_file_spans(self):
+        """Reading a CSV records read, encoding and parse spans."""
+        with tempfile.NamedTemporaryFile('w', delete=False, suffix='.csv') as f:
+            f.write("email,messages\na@company.com,3\nb@company.com,4\n")
+        try:
+            timer = IngestionTimer()
+            df, error = read_file_from_path(f.name, timer=timer)
+        finally:
+            os.unlink(f.name)
+        
+        self.assertIsNone(error)
+        self.assertEqual([entry['stage'] for entry in timer.spans], ['read', 'encoding', 'parse'])
+        self.assertGreater(timer.spans[0]['bytes'], 0)
+        self.assertEqual(timer.spans[2]['rows'], 2)
+    
+    def test_process_monthly_data_spans(self):
+        """Ingestion records superseding, insert and commit spans; superseding counts deletions."""
+        self.processor.process_monthly_data(normalized_rows(3), 'report.csv')
+        
+        timer = IngestionTimer()
+        success, message = self.processor.process_monthly_data(normalized_rows(3), 'report.csv', timer=timer)
+        
+        self.assertTrue(success, message)
+        self.assertEqual([entry['stage'] for entry in timer.spans], ['superseding', 'insert', 'commit'])
+        self.assertEqual(timer.spans[0]['deleted'], 3)
+        self.assertEqual(timer.spans[1]['rows'], 3)
+    
+    def test_runs_round_trip(self):
+        """Runs are stored per file and content hash and returned newest first with parsed spans."""
+        timer = IngestionTimer()
+        with timer.span('insert', rows=3):
+            pass
+        self.db.record_ingestion_run('a.csv', 'hash1', timer.spans, 'success', rows=3, file_bytes=10,
+                                     tool_source='ChatGPT', total_ms=timer.total_ms(), started_at='2025-01-01T00:00:00')
+        self.db.record_ingestion_run('a.csv', 'hash2', [], 'error', message='boom', started_at='2025-01-02T00:00:00')
+        self.db.record_ingestion_run('b.csv', 'hash3', [], 'success', started_at='2025-01-03T00:00:00')
+        
+        runs = self.db.get_ingestion_runs(filename='a.csv')
+        self.assertEqual(runs['content_hash'].tolist(), ['hash2', 'hash1'])
+        self.assertEqual(runs.iloc[1]['spans'][0]['stage'], 'insert')
+        self.assertEqual(runs.iloc[0]['message'], 'boom')
+        self.assertEqual(len(self.db.get_ingestion_runs()), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
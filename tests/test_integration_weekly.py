@@ -123,8 +123,9 @@ def test_end_to_end_integration():
     print("\n🧹 Cleaning up test files...")
     if os.path.exists("test_integration.db"):
         os.remove("test_integration.db")
-    if os.path.exists("test_file_tracking.json"):
-        os.remove("test_file_tracking.json")
+    for tracking_file in ("test_file_tracking.json", "test_file_tracking.db"):
+        if os.path.exists(tracking_file):
+            os.remove(tracking_file)
     print("   ✅ Cleanup complete")
     
     print("\n" + "=" * 80)
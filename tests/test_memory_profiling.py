@@ -0,0 +1,150 @@
+"""
+Test suite for the memory profiling harness.
+
+Tests that stages record traced peaks and allocation sites, that nested stages
+roll their peaks up, that stages overlapping on threads keep tracing on until
+the last one ends, that records are appended to the JSON Lines output, and
+that profile_stage does nothing unless MEMORY_PROFILE is set.
+"""
+import unittest
+from unittest import mock
+import json
+import tempfile
+import tracemalloc
+import threading
+import time
+import os
+import sys
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import memory_profiling
+from memory_profiling import MemoryProfiler, profile_stage, get_rss_bytes
+
+
+class TestMemoryProfiler(unittest.TestCase):
+    """Test per-stage memory records."""
+    
+    def setUp(self):
+        self.profiler = MemoryProfiler(top_n=5)
+    
+    def test_stage_records_peak_and_sites(self):
+        """A transient 5 MB allocation shows up as the stage peak but is not retained."""
+        with self.profiler.stage('allocate', file='example.csv') as context:
+            buffer = bytearray(5 * 1024 * 1024)
+            context['rows'] = 10
+            del buffer
+        
+        record = self.profiler.records[0]
+        self.assertEqual(record['stage'], 'allocate')
+        self.assertEqual(record['file'], 'example.csv')
+        self.assertEqual(record['rows'], 10)
+        self.assertGreaterEqual(record['traced_peak_bytes'], 5 * 1024 * 1024)
+        self.assertLess(record['traced_retained_bytes'], 1024 * 1024)
+        self.assertIsNone(record['error'])
+        self.assertFalse(tracemalloc.is_tracing())
+    
+    def test_retained_allocation_site(self):
+        """Memory kept after the stage is attributed to the allocating line."""
+        with self.profiler.stage('retain'):
+            kept = [bytearray(1024) for _ in range(2000)]
+        
+        record = self.profiler.records[0]
+        self.assertGreaterEqual(record['traced_retained_bytes'], 2000 * 1024)
+        self.assertIn(__file__.rstrip('c'), record['top_allocations'][0]['site'])
+        self.assertEqual(len(kept), 2000)
+    
+    def test_nested_stage_peak_rolls_up(self):
+        """An enclosing stage's peak includes the peak of its inner stage."""
+        with self.profiler.stage('outer'):
+            with self.profiler.stage('inner'):
+                buffer = bytearray(4 * 1024 * 1024)
+                del buffer
+        
+        inner, outer = self.profiler.records
+        self.assertEqual((inner['stage'], outer['stage']), ('inner', 'outer'))
+        self.assertGreaterEqual(outer['traced_peak_bytes'], 4 * 1024 * 1024)
+        self.assertEqual(self.profiler.summary()[0]['calls'], 1)
+    
+    def test_overlapping_stages_on_threads(self):
+        """A stage that ends while another thread's stage runs leaves tracing on for it."""
+        first_started, first_done = threading.Event(), threading.Event()
+        errors = []
+        
+        def second_stage():
+            try:
+                first_started.wait(5)
+                with self.profiler.stage('second'):
+                    first_done.wait(5)
+                    buffer = bytearray(1024 * 1024)
+                    del buffer
+            except Exception as e:
+                errors.append(e)
+        
+        worker = threading.Thread(target=second_stage)
+        worker.start()
+        with self.profiler.stage('first'):
+            first_started.set()
+            time.sleep(0.1)
+        self.assertTrue(tracemalloc.is_tracing())
+        first_done.set()
+        worker.join(5)
+        
+        self.assertEqual(errors, [])
+        self.assertEqual([record['stage'] for record in self.profiler.records], ['first', 'second'])
+        self.assertGreaterEqual(self.profiler.records[1]['traced_peak_bytes'], 1024 * 1024)
+        self.assertFalse(tracemalloc.is_tracing())
+    
+    def test_failed_stage_is_recorded(self):
+        """Exceptions propagate and the record keeps the error."""
+        with self.assertRaises(ValueError):
+            with self.profiler.stage('broken'):
+                raise ValueError("bad file")
+        self.assertEqual(self.profiler.records[0]['error'], 'ValueError: bad file')
+    
+    def test_rss_available(self):
+        """RSS can be read on this platform."""
+        self.assertGreater(get_rss_bytes(), 0)
+
+
+class TestProfileStage(unittest.TestCase):
+    """Test the environment-controlled app hook."""
+    
+    def setUp(self):
+        self.output = tempfile.NamedTemporaryFile(delete=False, suffix='.jsonl')
+        self.output.close()
+        os.unlink(self.output.name)
+        memory_profiling._profiler = None
+    
+    def tearDown(self):
+        memory_profiling._profiler = None
+        if os.path.exists(self.output.name):
+            os.unlink(self.output.name)
+    
+    def test_disabled_by_default(self):
+        """Without MEMORY_PROFILE the block runs untraced and nothing is written."""
+        with mock.patch.dict(os.environ, {'MEMORY_PROFILE_OUTPUT': self.output.name}, clear=False):
+            os.environ.pop('MEMORY_PROFILE', None)
+            with profile_stage('read_file') as context:
+                self.assertFalse(tracemalloc.is_tracing())
+                context['rows'] = 1
+        self.assertFalse(os.path.exists(self.output.name))
+    
+    def test_enabled_writes_json_lines(self):
+        """With MEMORY_PROFILE=1 every stage is appended to the output file."""
+        env = {'MEMORY_PROFILE': '1', 'MEMORY_PROFILE_OUTPUT': self.output.name}
+        with mock.patch.dict(os.environ, env):
+            with profile_stage('read_file', file='a.csv'):
+                pass
+            with profile_stage('normalize', file='a.csv'):
+                pass
+        
+        with open(self.output.name) as f:
+            records = [json.loads(line) for line in f]
+        self.assertEqual([record['stage'] for record in records], ['read_file', 'normalize'])
+        self.assertIn('rss_peak_bytes', records[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+"""
+Test suite for versioned schema migrations.
+
+Tests that new and unversioned databases migrate to the latest schema version,
+that an up-to-date database is left alone, and that a failing step is rolled back.
+"""
+import unittest
+from unittest import mock
+import sqlite3
+import tempfile
+import os
+import sys
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import migrations
+from migrations import migrate, get_schema_version, LATEST_VERSION
+from database import DatabaseManager
+
+
+class TestMigrations(unittest.TestCase):
+    """Test PRAGMA user_version based migrations."""
+    
+    def setUp(self):
+        self.temp_db = tempfile.NamedTemporaryFile(delete=False, suffix='.db')
+        self.temp_db.close()
+    
+    def tearDown(self):
+        if os.path.exists(self.temp_db.name):
+            os.unlink(self.temp_db.name)
+    
+    def _version(self):
+        conn = sqlite3.connect(self.temp_db.name)
+        version = get_schema_version(conn)
+        conn.close()
+        return version
+    
+    def test_new_database_reaches_latest_version(self):
+        """A fresh database gets every table and the latest version."""
+        DatabaseManager(self.temp_db.name)
+        self.assertEqual(self._version(), LATEST_VERSION)
+        
+        conn = sqlite3.connect(self.temp_db.name)
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'view')")}
+        conn.close()
+        self.assertTrue({'usage_metrics', 'fact_usage', 'employees', 'db_meta', 'user_rollup'} <= tables)
+    
+    def test_up_to_date_database_is_not_migrated(self):
+        """Startup on a current database applies no steps."""
+        self.assertEqual(migrate(self.temp_db.name), LATEST_VERSION)
+        self.assertEqual(migrate(self.temp_db.name), 0)
+    
+    def test_unversioned_legacy_database(self):
+        """A pre-versioning database keeps its rows and gains the missing columns."""
+        conn = sqlite3.connect(self.temp_db.name)
+        conn.execute("""
+            CREATE TABLE usage_metrics (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id TEXT NOT NULL,
+                user_name TEXT,
+                department TEXT,
+                date TEXT NOT NULL,
+                feature_used TEXT,
+                usage_count INTEGER,
+                cost_usd REAL,
+                file_source TEXT,
+                created_at TEXT DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        conn.execute("""
+            INSERT INTO usage_metrics (user_id, user_name, department, date, feature_used, usage_count, cost_usd)
+            VALUES ('old@company.com', 'Old User', 'Legal', '2024-01-01', 'ChatGPT Messages', 7, 0)
+        """)
+        conn.commit()
+        conn.close()
+        
+        db = DatabaseManager(self.temp_db.name)
+        self.assertEqual(self._version(), LATEST_VERSION)
+        
+        data = db.get_all_data()
+        self.assertEqual(len(data), 1)
+        self.assertEqual(data.iloc[0]['email'], 'old@company.com')
+        self.assertEqual(data.iloc[0]['tool_source'], 'ChatGPT')
+        self.assertIn('first_day_active_in_period', data.columns)
+    
+    def test_failed_step_is_rolled_back(self):
+        """A failing step leaves the database at the previous version with no partial changes."""
+        migrate(self.temp_db.name)
+        
+        def broken_step(conn):
+            conn.execute("CREATE TABLE half_done (id INTEGER)")
+            raise sqlite3.OperationalError("simulated failure")
+        
+        steps = migrations.MIGRATIONS + [(LATEST_VERSION + 1, "broken step", broken_step)]
+        with mock.patch.object(migrations, 'MIGRATIONS', steps), \
+                mock.patch.object(migrations, 'LATEST_VERSION', LATEST_VERSION + 1):
+            with self.assertRaises(sqlite3.OperationalError):
+                migrate(self.temp_db.name)
+        
+        self.assertEqual(self._version(), LATEST_VERSION)
+        conn = sqlite3.connect(self.temp_db.name)
+        half_done = conn.execute("SELECT name FROM sqlite_master WHERE name = 'half_done'").fetchone()
+        conn.close()
+        self.assertIsNone(half_done)
+    
+    def test_newer_database_is_rejected(self):
+        """A database from a newer release is not silently downgraded."""
+        conn = sqlite3.connect(self.temp_db.name)
+        conn.execute(f"PRAGMA user_version = {LATEST_VERSION + 1}")
+        conn.close()
+        
+        with self.assertRaises(RuntimeError):
+            migrate(self.temp_db.name)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,133 @@
+"""
+Test suite for the usage_metrics natural key.
+
+Tests that rows are unique on (user_id, date, feature_used, tool_source), that
+dates are stored as the day, that rows for an existing key are merged with
+the tool's replace or sum policy (and restored by a batch rollback), and that
+the migration merges existing duplicates per policy and backs up the
+rows it merges away.
+"""
+import unittest
+from unittest import mock
+import sqlite3
+import os
+import sys
+
+import pandas as pd
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import migrations
+from database import DatabaseManager
+from fixtures.usage_db import MigrationTestCase, UsageDatabaseTestCase, usage_rows
+
+
+class TestNaturalKey(UsageDatabaseTestCase):
+    """Test upserts on the natural key."""
+    
+    def ingest(self, rows, tool='Other Tool'):
+        super().ingest(usage_rows(rows, tool=tool))
+    
+    def test_dates_are_stored_as_days(self):
+        """Timestamps and other date formats are stored as 'YYYY-MM-DD'."""
+        self.ingest([('a@company.com', '2025-03-15 14:30:00', 1),
+                     ('b@company.com', '03/16/2025', 2),
+                     ('c@company.com', pd.Timestamp('2025-03-17 08:00'), 3)])
+        self.assertEqual(self.fetch("SELECT date FROM usage_metrics ORDER BY user_id"),
+                         [('2025-03-15',), ('2025-03-16',), ('2025-03-17',)])
+    
+    def test_reupload_replaces(self):
+        """A re-upload of a tool without month superseding overwrites instead of duplicating."""
+        self.ingest([('a@company.com', '2025-03-15', 5), ('b@company.com', '2025-03-15', 7)])
+        self.ingest([('a@company.com', '2025-03-15 09:00', 50)])
+        
+        self.assertEqual(self.fetch("SELECT user_id, usage_count FROM usage_metrics ORDER BY user_id"),
+                         [('a@company.com', 50), ('b@company.com', 7)])
+        self.assertTrue(self.db.detect_duplicates().empty)
+        # The overwritten row was archived, so the re-upload counts it as superseded
+        self.assertEqual(self.db.get_ingestion_batches()['rows_superseded'].tolist(), [1, 0])
+    
+    def test_duplicates_within_upload(self):
+        """Rows repeated in one upload are merged; the batch counts the stored rows."""
+        self.ingest([('a@company.com', '2025-03-15', 5), ('a@company.com', '2025-03-15', 6)])
+        self.assertEqual(self.fetch("SELECT usage_count FROM usage_metrics"), [(6,)])
+        self.assertEqual(self.db.get_ingestion_batches()['rows_inserted'].tolist(), [1])
+    
+    def test_sum_policy(self):
+        """Tools configured with 'sum' add usage_count up."""
+        with mock.patch.dict('data_processor.UPSERT_POLICIES', {'Other Tool': 'sum'}):
+            self.ingest([('a@company.com', '2025-03-15', 5), ('a@company.com', '2025-03-15', 6)])
+            self.ingest([('a@company.com', '2025-03-15', 10)])
+        self.assertEqual(self.fetch("SELECT usage_count FROM usage_metrics"), [(21,)])
+    
+    def test_rollback_restores_overwritten_row(self):
+        """Rolling back an upsert restores the row it overwrote."""
+        self.ingest([('a@company.com', '2025-03-15', 5)])
+        before = self.fetch("SELECT * FROM usage_metrics")
+        self.ingest([('a@company.com', '2025-03-15', 50), ('b@company.com', '2025-03-15', 7)])
+        second = int(self.db.get_ingestion_batches()['batch_id'].iloc[0])
+        
+        success, message = self.db.rollback_batch(second)
+        
+        self.assertTrue(success, message)
+        self.assertIn('removed 2 records, restored 1', message)
+        self.assertEqual(self.fetch("SELECT * FROM usage_metrics"), before)
+    
+    def test_end_date_is_inclusive(self):
+        """Records on the end date of a filter are included."""
+        self.ingest([('a@company.com', '2025-03-31', 5)])
+        self.assertEqual(len(self.db.get_filtered_data(start_date='2025-03-01', end_date='2025-03-31')), 1)
+
+
+class TestNaturalKeyMigration(MigrationTestCase):
+    """Test that the migration normalizes dates and removes duplicates."""
+    
+    def test_duplicates_are_merged_per_policy(self):
+        """Duplicates keep their newest row (summed for 'sum' tools); the others are backed up."""
+        conn = self.migrate_to(4)
+        conn.executemany(
+            "INSERT INTO usage_metrics (user_id, date, feature_used, usage_count, tool_source) VALUES (?, ?, ?, ?, ?)",
+            [('a@company.com', '2025-03-01 00:00:00', 'Messages', 1, 'ChatGPT'),
+             ('a@company.com', '2025-03-01', 'Messages', 2, 'ChatGPT'),
+             ('a@company.com', '2025-03-01 00:00:00', 'GPT Messages', 3, 'ChatGPT'),
+             ('b@company.com', '2025-03-01 00:00:00', None, 4, 'ChatGPT'),
+             ('b@company.com', '2025-03-01 00:00:00', None, 5, 'ChatGPT'),
+             ('c@company.com', '2025-03-01 00:00:00', 'Messages', 6, 'Sum Tool'),
+             ('c@company.com', '2025-03-01', 'Messages', 7, 'Sum Tool')]
+        )
+        conn.executemany(
+            "INSERT INTO usage_metrics_history (superseded_by, id, user_id, date, feature_used, usage_count, tool_source) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [(1, 10, 'a@company.com', '2025-02-01 00:00:00', 'Messages', 8, 'ChatGPT'),
+             (1, 11, 'a@company.com', '2025-02-01', 'Messages', 9, 'ChatGPT'),
+             (1, 12, 'c@company.com', '2025-02-01 00:00:00', 'Messages', 10, 'Sum Tool'),
+             (1, 13, 'c@company.com', '2025-02-01', 'Messages', 11, 'Sum Tool')]
+        )
+        conn.commit()
+        conn.close()
+        
+        with mock.patch.dict(migrations.UPSERT_POLICIES, {'Sum Tool': 'sum'}):
+            db = DatabaseManager(self.temp_db.name)
+        
+        conn = sqlite3.connect(self.temp_db.name)
+        rows = conn.execute("SELECT user_id, date, feature_used, usage_count FROM usage_metrics ORDER BY id").fetchall()
+        history = conn.execute("SELECT id, usage_count FROM usage_metrics_history ORDER BY id").fetchall()
+        backup = conn.execute("SELECT id, usage_count FROM usage_metrics_duplicates ORDER BY id").fetchall()
+        history_backup = conn.execute("SELECT id, usage_count FROM usage_metrics_history_duplicates ORDER BY id").fetchall()
+        conn.close()
+        # Rows without a feature are not part of the unique key and are kept
+        self.assertEqual(rows, [
+            ('a@company.com', '2025-03-01', 'Messages', 2),
+            ('a@company.com', '2025-03-01', 'GPT Messages', 3),
+            ('b@company.com', '2025-03-01', None, 4),
+            ('b@company.com', '2025-03-01', None, 5),
+            ('c@company.com', '2025-03-01', 'Messages', 13),
+        ])
+        self.assertEqual(history, [(11, 9), (13, 21)])
+        self.assertEqual(backup, [(1, 1), (6, 6)])
+        self.assertEqual(history_backup, [(10, 8), (12, 10)])
+        self.assertTrue(db.detect_duplicates().empty)
+
+if __name__ == '__main__':
+    unittest.main()
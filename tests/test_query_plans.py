@@ -0,0 +1,266 @@
+"""
+Query workload test for the usage database indexes.
+
+Runs each DatabaseManager query against a fixture of several thousand usage
+rows with the slow query log capturing the EXPLAIN QUERY PLAN of every
+statement, and checks that none of them reads every row of fact_usage,
+dim_user or employees. An index-only pass (SCAN ... USING COVERING INDEX) is
+allowed; a SCAN that reads table rows is not. Methods that aggregate every
+row (get_all_data, get_tool_comparison_data, get_user_tool_overlap,
+refresh_user_rollup, get_unidentified_users) are not part of the workload;
+get_database_stats may read the table for its total cost. Also checks that the rewritten filters return the
+same rows as filtering the full table, and that the migration drops the
+indexes it replaces.
+"""
+import unittest
+import tempfile
+import shutil
+import sqlite3
+import os
+import re
+import sys
+from datetime import date
+
+import pandas as pd
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import migrations
+import query_monitor
+from database import DatabaseManager
+from data_processor import DataProcessor
+
+
+USERS = 1500
+MONTHS = ['2025-01', '2025-02', '2025-03']
+TOOLS = [('ChatGPT', 'chatgpt_q1.csv'), ('BlueFlame AI', 'blueflame_q1.csv')]
+
+# Tables that grow with the data (the other dimensions hold a few dozen rows).
+# Plans name tables by their alias, f and u in the usage_metrics view.
+LARGE_TABLES = {'fact_usage', 'f', 'dim_user', 'u', 'employees'}
+
+# A plan line that reads every row of a table (an index-only pass is fine)
+TABLE_SCAN = re.compile(r'^SCAN (\w+)\b(?! USING COVERING INDEX)')
+
+
+def usage_frame(tool, filename):
+    rows = []
+    for month in MONTHS:
+        for i in range(USERS):
+            rows.append({
+                'user_id': f'user{i}@company.com',
+                'user_name': f'User {i}',
+                'email': f'User{i}@Company.com',
+                'department': f'Department {i % 25}',
+                'date': f'{month}-{1 + i % 28:02d}',
+                'feature_used': 'ChatGPT Messages',
+                'usage_count': 1 + i % 50,
+                'cost_usd': 2.0,
+                'tool_source': tool,
+                'file_source': filename,
+            })
+    return pd.DataFrame(rows)
+
+
+class TestQueryPlans(unittest.TestCase):
+    """Run the DatabaseManager workload and check each statement's query plan."""
+    
+    @classmethod
+    def setUpClass(cls):
+        cls.fixture_dir = tempfile.mkdtemp()
+        cls.fixture_path = os.path.join(cls.fixture_dir, 'fixture.db')
+        db = DatabaseManager(cls.fixture_path)
+        processor = DataProcessor(db)
+        for tool, filename in TOOLS:
+            success, message = processor.process_monthly_data(usage_frame(tool, filename), filename)
+            assert success, message
+        
+        # A row stored before ingestion batches existed (no batch_id)
+        conn = sqlite3.connect(cls.fixture_path)
+        conn.execute("""
+            INSERT INTO usage_metrics (user_id, user_name, email, department, date, feature_used,
+                                       usage_count, tool_source, file_source)
+            VALUES ('legacy@company.com', 'Legacy User', 'legacy@company.com', 'Department 1',
+                    '2024-12-01', 'ChatGPT Messages', 3, 'ChatGPT', 'legacy.csv')
+        """)
+        conn.commit()
+        conn.close()
+        
+        db.load_employees(pd.DataFrame({
+            'first_name': ['User', 'Jane'],
+            'last_name': ['1', 'Smith'],
+            'email': ['user1@company.com', 'jane.smith@company.com'],
+            'title': ['Engineer', 'Manager'],
+            'department': ['Department 1', 'Finance'],
+            'status': ['Active', 'Active']
+        }))
+        db.record_ingestion_run('chatgpt_q1.csv', 'abc123', [], 'success', rows=USERS * len(MONTHS))
+        
+        cls.saved_log_settings = db.get_slow_query_settings()
+    
+    @classmethod
+    def tearDownClass(cls):
+        settings = cls.saved_log_settings
+        threshold = settings['explain_threshold_ms']
+        query_monitor.slow_query_log.configure(capacity=settings['capacity'],
+                                               explain_threshold_ms=-1 if threshold is None else threshold)
+        shutil.rmtree(cls.fixture_dir)
+    
+    def setUp(self):
+        # Each test works on its own copy, so deletes do not affect the others
+        self.temp_dir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.temp_dir, 'test.db')
+        shutil.copy(self.fixture_path, self.db_path)
+        self.db = DatabaseManager(self.db_path)
+        self.db.configure_slow_query_log(capacity=10000, explain_threshold_ms=0)
+        self.db.clear_slow_queries()
+    
+    def tearDown(self):
+        self.db.clear_slow_queries()
+        shutil.rmtree(self.temp_dir)
+    
+    def run_method(self, name, *args, **kwargs):
+        """Call a DatabaseManager method and return (result, logged statements with plans)."""
+        self.db.clear_slow_queries()
+        result = getattr(self.db, name)(*args, **kwargs)
+        statements = self.db.get_slow_queries()
+        statements = statements[(statements['caller'] == f'DatabaseManager.{name}') & statements['plan'].notna()]
+        self.assertFalse(statements.empty, f"{name} issued no statements with a query plan")
+        return result, statements
+    
+    def table_scans(self, statements):
+        """(sql, plan line) pairs that read every row of a table."""
+        scans = []
+        for sql, plan in zip(statements['sql'], statements['plan']):
+            for line in plan:
+                match = TABLE_SCAN.match(line)
+                if match and match.group(1) in LARGE_TABLES:
+                    scans.append((sql, line))
+        return scans
+    
+    def assert_no_table_scans(self, name, *args, **kwargs):
+        result, statements = self.run_method(name, *args, **kwargs)
+        self.assertEqual(self.table_scans(statements), [], name)
+        return result, statements
+    
+    def assert_uses_index(self, statements, index):
+        plans = ' | '.join(line for plan in statements['plan'] for line in plan)
+        self.assertIn(index, plans)
+    
+    def test_reads_use_indexes(self):
+        """Dashboard reads are index searches or index-only passes."""
+        self.assertIn(date(2025, 3, 28), self.assert_no_table_scans('get_available_months')[0])
+        self.assertEqual(self.assert_no_table_scans('get_date_range')[0], (date(2024, 12, 1), date(2025, 3, 31)))
+        self.assertEqual(len(self.assert_no_table_scans('get_unique_users')[0]), USERS + 1)
+        self.assertEqual(len(self.assert_no_table_scans('get_unique_departments')[0]), 25)
+        self.assertEqual(self.assert_no_table_scans('get_unique_tools')[0], ['BlueFlame AI', 'ChatGPT'])
+        
+        preview, statements = self.assert_no_table_scans('get_superseding_preview', 'ChatGPT', ['2025-02'],
+                                                         ['user1@company.com', 'user2@company.com'])
+        self.assertEqual(preview['total_records'], 2)
+        self.assert_uses_index(statements, 'idx_usage_tool_month_user')
+        
+        employee, statements = self.assert_no_table_scans('get_employee_by_email', 'USER1@company.com')
+        self.assertEqual(employee['email'], 'user1@company.com')
+        self.assert_uses_index(statements, 'idx_employee_email_lower')
+        employee, statements = self.assert_no_table_scans('get_employee_by_name', 'user', '1')
+        self.assertIsNotNone(employee)
+        self.assert_uses_index(statements, 'idx_employee_name_lower')
+        
+        runs, _ = self.assert_no_table_scans('get_ingestion_runs', filename='chatgpt_q1.csv')
+        self.assertEqual(len(runs), 1)
+        self.assert_no_table_scans('detect_duplicates')
+    
+    def test_filters_use_indexes(self):
+        """Each filter combination is a range or key search on fact_usage."""
+        all_data = self.db.get_all_data()
+        cases = [
+            ({'start_date': date(2025, 2, 1), 'end_date': date(2025, 2, 28)}, 'idx_usage_day'),
+            ({'departments': ['Department 3', 'Department 4']}, 'idx_usage_department_day'),
+            ({'start_date': date(2025, 2, 1), 'end_date': date(2025, 2, 10), 'departments': ['Department 3']},
+             'idx_usage_department_day'),
+            ({'start_date': date(2025, 2, 1), 'end_date': date(2025, 3, 15), 'tools': ['ChatGPT']},
+             'idx_usage_tool_month_user'),
+            ({'tools': ['ChatGPT', 'BlueFlame AI']}, 'idx_usage_tool_month_user'),
+            ({'users': ['User 7', 'User 8']}, 'idx_dim_user_name'),
+        ]
+        for filters, index in cases:
+            with self.subTest(filters=filters):
+                data, statements = self.assert_no_table_scans('get_filtered_data', **filters)
+                self.assert_uses_index(statements, index)
+                
+                expected = all_data
+                if 'start_date' in filters:
+                    expected = expected[pd.to_datetime(expected['date']).dt.date >= filters['start_date']]
+                if 'end_date' in filters:
+                    expected = expected[pd.to_datetime(expected['date']).dt.date <= filters['end_date']]
+                for column, key in [('department', 'departments'), ('tool_source', 'tools'), ('user_name', 'users')]:
+                    if key in filters:
+                        expected = expected[expected[column].isin(filters[key])]
+                self.assertGreater(len(data), 0)
+                self.assertEqual(sorted(data['id']), sorted(expected['id']))
+        
+        # No filters is every row
+        self.assertEqual(len(self.db.get_filtered_data()), len(all_data))
+    
+    def test_stats_only_scan_for_totals(self):
+        """Database statistics read the table only for the total cost."""
+        stats, statements = self.run_method('get_database_stats')
+        self.assertEqual([sql for sql, _ in self.table_scans(statements)], ["SELECT SUM(cost_usd) FROM fact_usage"])
+        self.assertEqual(stats['unique_users'], USERS + 1)
+        self.assertEqual(stats['unique_departments'], 25)
+        self.assertEqual(stats['unique_tools'], 2)
+        self.assertEqual(stats['date_range'], '2024-12-01 to 2025-03-28')
+        self.assertEqual(stats['records_by_file']['legacy.csv'], 1)
+        self.assert_uses_index(statements, 'idx_usage_file_batch')
+    
+    def test_deletes_use_indexes(self):
+        """Deletes by email, file and tool find their rows through indexes."""
+        result, statements = self.assert_no_table_scans('delete_employee_usage', 'USER5@company.com')
+        self.assertEqual(result[2], len(MONTHS) * len(TOOLS))
+        self.assert_uses_index(statements, 'idx_dim_user_email_lower')
+        self.assert_uses_index(statements, 'idx_history_user')
+        
+        _, statements = self.assert_no_table_scans('delete_by_file', 'legacy.csv')
+        self.assert_uses_index(statements, 'idx_usage_file_batch')
+        self.assert_no_table_scans('delete_by_file', 'chatgpt_q1.csv')
+        self.assert_no_table_scans('delete_by_tool', 'BlueFlame AI')
+        self.assertEqual(self.db.get_database_stats()['total_records'], 0)
+
+
+class TestQueryIndexMigration(unittest.TestCase):
+    """Test that the migration adds the workload indexes and drops the ones they replace."""
+    
+    def setUp(self):
+        self.temp_db = tempfile.NamedTemporaryFile(delete=False, suffix='.db')
+        self.temp_db.close()
+    
+    def tearDown(self):
+        if os.path.exists(self.temp_db.name):
+            os.unlink(self.temp_db.name)
+    
+    def test_indexes_replaced(self):
+        conn = sqlite3.connect(self.temp_db.name)
+        for version, _, step in migrations.MIGRATIONS:
+            if version <= 7:
+                step(conn)
+        conn.execute("PRAGMA user_version = 7")
+        conn.commit()
+        conn.close()
+        
+        DatabaseManager(self.temp_db.name)
+        
+        conn = sqlite3.connect(self.temp_db.name)
+        indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        conn.close()
+        for added in ['idx_usage_department_day', 'idx_usage_file_batch', 'idx_dim_user_name',
+                      'idx_dim_user_email_lower', 'idx_employee_email_lower', 'idx_employee_name_lower',
+                      'idx_ingestion_runs_file']:
+            self.assertIn(added, indexes)
+        for dropped in ['idx_dim_user_email', 'idx_employee_email', 'idx_ingestion_runs_hash']:
+            self.assertNotIn(dropped, indexes)
+
+
+if __name__ == '__main__':
+    unittest.main()
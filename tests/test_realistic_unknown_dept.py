@@ -111,8 +111,10 @@ def test_realistic_scenario():
     usage_df = pd.DataFrame(usage_records)
     
     # Insert usage data into database
+    # (usage_metrics is a view, so it is emptied rather than replaced)
     conn = sqlite3.connect(db.db_path)
-    usage_df.to_sql('usage_metrics', conn, if_exists='replace', index=False)
+    conn.execute("DELETE FROM usage_metrics")
+    usage_df.to_sql('usage_metrics', conn, if_exists='append', index=False)
     conn.close()
     
     print(f"✓ Loaded {len(usage_records)} usage records")
@@ -0,0 +1,173 @@
+"""
+Test suite for the executive report cache.
+
+Tests that reports are built once per (database, data version, filter
+signature, format), that background prebuilds are reused by requests instead
+of built twice, that remembered filter selections are prebuilt for new data,
+that older data versions and least recently used reports are dropped, and that
+a failed build is not cached.
+"""
+import unittest
+import threading
+import time
+import os
+import sys
+from datetime import date
+from io import BytesIO
+from unittest import mock
+
+import pandas as pd
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import report_cache
+from report_cache import ReportCache, filter_signature
+from fixtures.usage_db import UsageDatabaseTestCase, usage_frame
+
+
+def usage_upload(tool='ChatGPT'):
+    """10 users in three departments."""
+    return usage_frame(users=10, tool=tool, usage=1, department=lambda i: f'Department {i % 3}')
+
+
+class TestFilterSignature(unittest.TestCase):
+    """Test identifying filter selections."""
+    
+    def test_signature(self):
+        base = filter_signature(date_range=(date(2025, 1, 1), date(2025, 3, 31)),
+                                departments=['Sales', 'Legal'], tool='All Tools')
+        self.assertEqual(base, filter_signature(tool='All Tools', departments=['Legal', 'Sales'],
+                                                date_range=(date(2025, 1, 1), date(2025, 3, 31))))
+        self.assertNotEqual(base, filter_signature(date_range=(date(2025, 1, 1), date(2025, 3, 31)),
+                                                   departments=['Sales'], tool='All Tools'))
+        self.assertNotEqual(base, filter_signature(date_range=(date(2025, 1, 1), date(2025, 3, 31)),
+                                                   departments=['Sales', 'Legal'], tool='ChatGPT'))
+
+
+class TestReportCache(UsageDatabaseTestCase):
+    """Test building, reusing and dropping cached reports."""
+    
+    def setUp(self):
+        super().setUp()
+        self.ingest(usage_upload())
+        self.data = self.db.get_all_data()
+        self.cache = ReportCache(capacity=4)
+    
+    def tearDown(self):
+        self.cache.shutdown()
+        super().tearDown()
+    
+    def key(self, fmt='xlsx', signature='all'):
+        return ReportCache.key(self.db, self.db.get_data_version(), signature, fmt)
+    
+    def test_reports_are_built_once(self):
+        """A report is built on the first request and served from the cache after that."""
+        html_key, xlsx_key = self.key('html'), self.key('xlsx')
+        self.assertIsNone(self.cache.get(xlsx_key))
+        
+        with mock.patch.object(report_cache, 'render_report', wraps=report_cache.render_report) as render:
+            html = self.cache.build(html_key, self.data)
+            workbook = self.cache.build(xlsx_key, self.data)
+            self.assertEqual(self.cache.build(xlsx_key, self.data), workbook)
+            self.assertEqual(render.call_count, 2)
+        
+        self.assertIn('AI Usage Executive Report', html.decode('utf-8'))
+        sheets = pd.read_excel(BytesIO(workbook), sheet_name=None)
+        self.assertEqual(len(sheets['Raw Data']), len(self.data))
+        self.assertIn('User Summary', sheets)
+        self.assertEqual(self.cache.get(xlsx_key), workbook)
+    
+    def test_prebuild_is_reused(self):
+        """A request for a report being built in the background waits for that build."""
+        started, release = threading.Event(), threading.Event()
+        
+        def slow_render(fmt, data):
+            started.set()
+            release.wait(5)
+            return b'report'
+        
+        with mock.patch.object(report_cache, 'render_report', side_effect=slow_render) as render:
+            key = self.key()
+            self.assertTrue(self.cache.prebuild(key, self.data.copy()))
+            self.assertTrue(started.wait(5))
+            self.assertTrue(self.cache.is_building(key))
+            self.assertIsNone(self.cache.get(key))
+            self.assertFalse(self.cache.prebuild(key, self.data.copy()))
+            
+            threading.Timer(0.1, release.set).start()
+            self.assertEqual(self.cache.build(key, self.data), b'report')
+            self.assertEqual(render.call_count, 1)
+        self.assertFalse(self.cache.is_building(key))
+    
+    def test_views_are_prebuilt_for_new_data(self):
+        """Remembered filter selections get their prepared formats rebuilt, loading the data once per view."""
+        self.cache.remember_view('all', {'tool': None}, 'xlsx')
+        self.cache.remember_view('all', {'tool': None}, 'html')
+        self.cache.remember_view('chatgpt', {'tool': 'ChatGPT'}, 'xlsx')
+        self.assertEqual(self.cache.remembered_formats('all'), {'html', 'xlsx'})
+        self.assertEqual(self.cache.remembered_formats('other'), set())
+        self.ingest(usage_upload(tool='BlueFlame AI'))
+        
+        loads = []
+        
+        def load(tool):
+            loads.append(tool)
+            data = self.db.get_all_data()
+            return data[data['tool_source'] == tool] if tool else data
+        
+        with mock.patch.object(report_cache, 'render_report', side_effect=lambda fmt, data: f'{fmt}:{len(data)}'.encode()):
+            self.assertEqual(self.cache.prebuild_views(self.db, load), 3)
+            self.assertEqual(self.cache.build(self.key('html'), None), b'html:20')
+            self.assertEqual(self.cache.build(self.key('xlsx'), None), b'xlsx:20')
+            self.assertEqual(self.cache.build(self.key('xlsx', 'chatgpt'), None), b'xlsx:10')
+            # Nothing to rebuild until the data changes again
+            self.assertEqual(self.cache.prebuild_views(self.db, load), 0)
+        self.assertEqual(sorted(loads, key=str), ['ChatGPT', None])
+    
+    def test_failed_view_load_is_not_cached(self):
+        self.cache.remember_view('all', {}, 'xlsx')
+        with mock.patch.object(report_cache, 'render_report', return_value=b'report'):
+            self.assertEqual(self.cache.prebuild_views(self.db, mock.Mock(side_effect=RuntimeError("locked"))), 1)
+            for _ in range(100):
+                if not self.cache.is_building(self.key()):
+                    break
+                time.sleep(0.05)
+            self.assertIsNone(self.cache.get(self.key()))
+            self.assertEqual(self.cache.build(self.key(), self.data), b'report')
+    
+    def test_new_data_version_replaces_reports(self):
+        """Reports of older data versions are dropped; other filter selections are kept up to capacity."""
+        with mock.patch.object(report_cache, 'render_report', return_value=b'report'):
+            old_key = self.key()
+            self.cache.build(old_key, self.data)
+            self.ingest(usage_upload(tool='BlueFlame AI'))
+            new_key = self.key()
+            self.assertNotEqual(new_key, old_key)
+            self.assertIsNone(self.cache.get(new_key))
+            
+            self.cache.build(new_key, self.data)
+            self.assertIsNone(self.cache.get(old_key))
+            
+            for signature in ['a', 'b', 'c', 'd']:
+                self.cache.build(self.key(signature=signature), self.data)
+            self.assertIsNone(self.cache.get(new_key))
+            self.assertEqual(self.cache.get(self.key(signature='d')), b'report')
+    
+    def test_failed_build_is_not_cached(self):
+        key = self.key()
+        with mock.patch.object(report_cache, 'render_report', side_effect=RuntimeError("openpyxl failed")):
+            with self.assertRaises(RuntimeError):
+                self.cache.build(key, self.data)
+        self.assertFalse(self.cache.is_building(key))
+        self.assertIsNone(self.cache.get(key))
+        
+        with mock.patch.object(report_cache, 'render_report', return_value=b'report'):
+            self.assertEqual(self.cache.build(key, self.data), b'report')
+        
+        with self.assertRaises(ValueError):
+            report_cache.render_report('pdf', self.data)
+
+
+if __name__ == '__main__':
+    unittest.main()
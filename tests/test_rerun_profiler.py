@@ -0,0 +1,146 @@
+"""
+Test suite for the rerun profiler and SQL statement monitoring.
+
+Tests that DatabaseManager statements reach query_monitor observers with
+durations and row counts, that observers are per thread, and that
+RerunProfiler attributes sections and queries correctly.
+"""
+import unittest
+from unittest import mock
+import threading
+import pandas as pd
+import tempfile
+import os
+import sys
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import query_monitor
+import rerun_profiler
+from rerun_profiler import RerunProfiler
+from database import DatabaseManager
+from data_processor import DataProcessor
+
+
+def usage_rows(n):
+    """Pre-normalized ChatGPT rows."""
+    return pd.DataFrame({
+        'user_id': [f'user{i}@company.com' for i in range(n)],
+        'user_name': [f'User {i}' for i in range(n)],
+        'email': [f'user{i}@company.com' for i in range(n)],
+        'department': ['Finance'] * n,
+        'date': ['2025-01-01'] * n,
+        'feature_used': ['ChatGPT Messages'] * n,
+        'usage_count': [10] * n,
+        'cost_usd': [60.0] * n,
+        'tool_source': ['ChatGPT'] * n,
+        'file_source': ['report.csv'] * n
+    })
+
+
+class TestQueryMonitor(unittest.TestCase):
+    """Test statement records from monitored connections."""
+    
+    def setUp(self):
+        self.temp_db = tempfile.NamedTemporaryFile(delete=False, suffix='.db')
+        self.temp_db.close()
+        self.db = DatabaseManager(self.temp_db.name)
+        DataProcessor(self.db).process_monthly_data(usage_rows(5), 'report.csv')
+        self.records = []
+        query_monitor.add_observer(self.records.append)
+    
+    def tearDown(self):
+        query_monitor.remove_observer(self.records.append)
+        if os.path.exists(self.temp_db.name):
+            os.unlink(self.temp_db.name)
+    
+    def test_database_manager_queries_are_reported(self):
+        """pandas reads through DatabaseManager report the SQL, rows fetched and a duration."""
+        data = self.db.get_all_data()
+        self.assertEqual(len(data), 5)
+        
+        select = [record for record in self.records if 'FROM usage_metrics' in record['sql']]
+        self.assertEqual(len(select), 1)
+        self.assertEqual(select[0]['rows'], 5)
+        self.assertGreaterEqual(select[0]['duration_ms'], 0)
+    
+    def test_writes_report_rowcount(self):
+        """Inserts made by DataProcessor report the number of rows written."""
+        DataProcessor(self.db).process_monthly_data(usage_rows(3), 'other.csv')
+        inserts = [record for record in self.records if record['sql'].startswith('INSERT INTO fact_usage')]
+        self.assertEqual(sum(record['rows'] for record in inserts), 3)
+    
+    def test_observers_are_per_thread(self):
+        """Queries on another thread are not reported to this thread's observers."""
+        thread = threading.Thread(target=self.db.get_all_data)
+        thread.start()
+        thread.join()
+        self.assertEqual(self.records, [])
+
+
+class TestRerunProfiler(unittest.TestCase):
+    """Test section timing and query attribution."""
+    
+    def setUp(self):
+        self.temp_db = tempfile.NamedTemporaryFile(delete=False, suffix='.db')
+        self.temp_db.close()
+        self.db = DatabaseManager(self.temp_db.name)
+    
+    def tearDown(self):
+        if os.path.exists(self.temp_db.name):
+            os.unlink(self.temp_db.name)
+    
+    def test_sections_and_queries(self):
+        """Queries are attributed to the innermost section and counted on every enclosing one."""
+        profiler = RerunProfiler()
+        profiler.start()
+        with profiler.section('data prep'):
+            with profiler.section('data load'):
+                self.db.get_all_data()
+            self.db.get_data_version()
+        self.db.get_employee_count()
+        profiler.stop()
+        
+        report = profiler.to_dict()
+        sections = {section['section']: section for section in report['sections']}
+        self.assertEqual(set(sections), {'data prep', 'data prep / data load'})
+        self.assertEqual(sections['data prep / data load']['queries'], 1)
+        self.assertEqual(sections['data prep']['queries'], 2)
+        self.assertEqual(report['sql']['count'], 3)
+        outside = [query for query in report['sql']['slowest'] if 'FROM employees' in query['sql']]
+        self.assertIsNone(outside[0]['section'])
+        self.assertIsNone(report['cprofile'])
+        
+        # Observers are removed when the profiler stops
+        self.db.get_all_data()
+        self.assertEqual(report['sql']['count'], len(profiler.queries))
+    
+    def test_cprofile_capture(self):
+        """With cProfile enabled the report includes stats and a loadable dump."""
+        profiler = RerunProfiler(use_cprofile=True)
+        profiler.start()
+        self.db.get_all_data()
+        profiler.stop()
+        
+        self.assertIn('cumulative', profiler.cprofile_text())
+        self.assertGreater(len(profiler.cprofile_dump()), 0)
+    
+    def test_section_helper_without_profiler(self):
+        """Module-level section() is a no-op outside a profiled rerun."""
+        with rerun_profiler.section('tab: Executive Overview'):
+            pass
+        self.assertIsNone(rerun_profiler.get_active_profiler())
+    
+    def test_requested_mode_from_environment(self):
+        """RERUN_PROFILE switches profiling on, optionally with cProfile."""
+        with mock.patch.dict(os.environ, {'RERUN_PROFILE': '1'}):
+            self.assertEqual(rerun_profiler.requested_mode(), 'basic')
+        with mock.patch.dict(os.environ, {'RERUN_PROFILE': 'cprofile'}):
+            self.assertEqual(rerun_profiler.requested_mode(), 'cprofile')
+        with mock.patch.dict(os.environ, {'RERUN_PROFILE': ''}):
+            self.assertIsNone(rerun_profiler.requested_mode())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -60,8 +60,9 @@ def test_reset_file_status():
         
     finally:
         # Cleanup
-        if os.path.exists(tracking_file):
-            os.remove(tracking_file)
+        for path in (tracking_file, tracking_file + '.imported', tracking_file[:-len('.json')] + '.db'):
+            if os.path.exists(path):
+                os.remove(path)
         if os.path.exists(test_file.name):
             os.remove(test_file.name)
 
@@ -104,8 +105,9 @@ def test_reset_all_files_status():
         
     finally:
         # Cleanup
-        if os.path.exists(tracking_file):
-            os.remove(tracking_file)
+        for path in (tracking_file, tracking_file + '.imported', tracking_file[:-len('.json')] + '.db'):
+            if os.path.exists(path):
+                os.remove(path)
         for tmp_file in temp_files:
             if os.path.exists(tmp_file):
                 os.remove(tmp_file)
@@ -159,8 +161,9 @@ def test_reset_all_files_status_filtered():
         
     finally:
         # Cleanup
-        if os.path.exists(tracking_file):
-            os.remove(tracking_file)
+        for path in (tracking_file, tracking_file + '.imported', tracking_file[:-len('.json')] + '.db'):
+            if os.path.exists(path):
+                os.remove(path)
         if os.path.exists(temp_dir):
             shutil.rmtree(temp_dir)
 
@@ -203,8 +206,9 @@ def test_reset_all_tracking():
         
     finally:
         # Cleanup (in case test failed)
-        if os.path.exists(tracking_file):
-            os.remove(tracking_file)
+        for path in (tracking_file, tracking_file + '.imported', tracking_file[:-len('.json')] + '.db'):
+            if os.path.exists(path):
+                os.remove(path)
         if os.path.exists(test_file.name):
             os.remove(test_file.name)
 
@@ -297,8 +301,9 @@ def test_file_modification_detection():
         # Cleanup
         if os.path.exists(temp_file.name):
             os.remove(temp_file.name)
-        if os.path.exists(tracking_file):
-            os.remove(tracking_file)
+        for path in (tracking_file, tracking_file + '.imported', tracking_file[:-len('.json')] + '.db'):
+            if os.path.exists(path):
+                os.remove(path)
 
 
 def run_all_tests():
@@ -0,0 +1,133 @@
+"""
+Test suite for the user/employee search index.
+
+Tests tokenization, prefix and multi-token queries, ranking, and that
+DatabaseManager rebuilds its indexes only when the data version changes.
+"""
+import unittest
+import pandas as pd
+import tempfile
+import os
+import sys
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from search_index import SearchIndex, tokenize
+from database import DatabaseManager
+from data_processor import DataProcessor
+
+
+class TestSearchIndex(unittest.TestCase):
+    """Test SearchIndex lookups and ranking."""
+    
+    def setUp(self):
+        self.index = SearchIndex([
+            ('john.smith@company.com', {'name': 'John Smith', 'email': 'john.smith@company.com', 'department': 'Finance'}),
+            ('jane.doe@company.com', {'name': 'Jane Doe', 'email': 'jane.doe@company.com', 'department': 'Johnson Fund'}),
+            ('bob@company.com', {'name': 'Bob Finley', 'email': 'bob@company.com', 'department': 'Legal'}),
+            ('nan@company.com', {'name': None, 'email': 'nan@company.com', 'department': float('nan')}),
+        ])
+    
+    def test_tokenize(self):
+        """Tokens are lowercase alphanumeric runs."""
+        self.assertEqual(tokenize('John.Smith@Company.com'), ['john', 'smith', 'company', 'com'])
+        self.assertEqual(tokenize('Real Estate - Debt'), ['real', 'estate', 'debt'])
+        self.assertEqual(tokenize(None), [])
+        self.assertEqual(tokenize(float('nan')), [])
+    
+    def test_prefix_query(self):
+        """A single token matches any field token it prefixes."""
+        self.assertEqual(set(self.index.search('jo')), {'john.smith@company.com', 'jane.doe@company.com'})
+        self.assertEqual(self.index.search('fin'), ['bob@company.com', 'john.smith@company.com'])
+        self.assertEqual(len(self.index.search('company')), 4)
+        self.assertEqual(self.index.search('zzz'), [])
+    
+    def test_multi_token_query(self):
+        """Every query token must match; order and punctuation do not matter."""
+        self.assertEqual(self.index.search('smith john'), ['john.smith@company.com'])
+        self.assertEqual(self.index.search('john.smith@comp'), ['john.smith@company.com'])
+        self.assertEqual(self.index.search('jane legal'), [])
+    
+    def test_ranking(self):
+        """Name matches outrank department matches; exact tokens outrank prefixes."""
+        # "John Smith" (name) ranks above "Johnson Fund" (department)
+        self.assertEqual(self.index.search('john')[0], 'john.smith@company.com')
+        self.assertEqual(self.index.search('john', limit=1), ['john.smith@company.com'])
+    
+    def test_empty_query(self):
+        """Queries without searchable tokens match nothing."""
+        self.assertEqual(self.index.search(''), [])
+        self.assertEqual(self.index.search('%'), [])
+
+
+class TestDatabaseSearchIndex(unittest.TestCase):
+    """Test search indexes built from the database."""
+    
+    def setUp(self):
+        self.temp_db = tempfile.NamedTemporaryFile(delete=False, suffix='.db')
+        self.temp_db.close()
+        
+        self.db = DatabaseManager(self.temp_db.name)
+        records = [
+            {'user_id': email, 'user_name': name, 'email': email, 'department': dept,
+             'date': '2025-01-01', 'feature_used': 'ChatGPT Messages', 'usage_count': count,
+             'cost_usd': 0.0, 'tool_source': 'ChatGPT', 'file_source': 'test.csv'}
+            for email, name, dept, count in [
+                ('alice@company.com', 'Alice Adams', 'Finance', 100),
+                ('alan@company.com', 'Alan Archer', 'Legal', 300),
+                ('bob@company.com', 'Bob Brown', 'Finance', 50),
+            ]
+        ]
+        success, _ = DataProcessor(self.db).process_monthly_data(pd.DataFrame(records), 'test.csv')
+        self.assertTrue(success)
+    
+    def tearDown(self):
+        if os.path.exists(self.temp_db.name):
+            os.unlink(self.temp_db.name)
+    
+    def test_index_cached_per_data_version(self):
+        """The same index is reused until the data changes."""
+        index = self.db.get_search_index('users')
+        self.assertIs(self.db.get_search_index('users'), index)
+        
+        self.db.delete_employee_usage('bob@company.com')
+        rebuilt = self.db.get_search_index('users')
+        self.assertIsNot(rebuilt, index)
+        self.assertEqual(rebuilt.search('bob'), [])
+    
+    def test_employee_index(self):
+        """Employee ids are employee_id values; names combine first and last name."""
+        employees = pd.DataFrame([
+            {'first_name': 'Carol', 'last_name': 'Clark', 'email': 'carol@company.com',
+             'title': 'Analyst', 'department': 'Technology', 'status': 'Active'},
+            {'first_name': 'Dan', 'last_name': 'Carlson', 'email': 'dan@company.com',
+             'title': 'Counsel', 'department': 'Legal', 'status': 'Active'},
+        ])
+        self.db.load_employees(employees)
+        employees_df = self.db.get_all_employees().set_index('employee_id')
+        
+        ranked = self.db.get_search_index('employees').search('car')
+        self.assertEqual(len(ranked), 2)
+        self.assertEqual(employees_df.loc[self.db.get_search_index('employees').search('carol clark')[0], 'email'],
+                         'carol@company.com')
+        self.assertEqual(len(self.db.get_search_index('employees').search('tech')), 1)
+    
+    def test_query_user_stats_best_match(self):
+        """User Directory search uses the index and can sort by search rank."""
+        result = self.db.query_user_stats(search='al')
+        self.assertEqual(result['total_count'], 2)
+        self.assertEqual(list(result['users']['email']), ['alan@company.com', 'alice@company.com'])
+        
+        result = self.db.query_user_stats(search='adams', sort_by='Best Match', per_page=1)
+        self.assertEqual(list(result['users']['email']), ['alice@company.com'])
+        
+        first = self.db.query_user_stats(search='a', sort_by='Best Match', per_page=1)
+        second = self.db.query_user_stats(search='a', sort_by='Best Match', page=2, per_page=1,
+                                          cursor=first['next_cursor'])
+        offset = self.db.query_user_stats(search='a', sort_by='Best Match', page=2, per_page=1)
+        self.assertEqual(list(second['users']['email']), list(offset['users']['email']))
+
+
+if __name__ == '__main__':
+    unittest.main()
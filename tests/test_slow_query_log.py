@@ -0,0 +1,131 @@
+"""
+Test suite for the slow query log.
+
+Tests that statements are attributed to the DatabaseManager/DataProcessor
+method that issued them, that the log keeps only the slowest N, and that
+query plans are captured above the threshold (and flag full scans).
+"""
+import unittest
+import pandas as pd
+import tempfile
+import os
+import sys
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import query_monitor
+from query_monitor import SlowQueryLog
+from database import DatabaseManager
+from data_processor import DataProcessor
+
+
+def usage_rows(n):
+    """Pre-normalized ChatGPT rows."""
+    return pd.DataFrame({
+        'user_id': [f'user{i}@company.com' for i in range(n)],
+        'user_name': [f'User {i}' for i in range(n)],
+        'email': [f'user{i}@company.com' for i in range(n)],
+        'department': ['Finance'] * n,
+        'date': ['2025-01-01'] * n,
+        'feature_used': ['ChatGPT Messages'] * n,
+        'usage_count': [10] * n,
+        'cost_usd': [60.0] * n,
+        'tool_source': ['ChatGPT'] * n,
+        'file_source': ['report.csv'] * n
+    })
+
+
+class TestSlowQueryLog(unittest.TestCase):
+    """Test the ring buffer of slowest statements."""
+    
+    def test_keeps_slowest(self):
+        """Only the N slowest statements are kept, slowest first."""
+        log = SlowQueryLog(capacity=3)
+        for duration in [5, 1, 9, 3, 7, 2]:
+            log.observe({'sql': f'SELECT {duration}', 'duration_ms': duration, 'rows': 0, 'caller': None})
+        
+        self.assertEqual([entry['duration_ms'] for entry in log.entries()], [9, 7, 5])
+        self.assertEqual(log.statements_seen, 6)
+    
+    def test_explain_only_above_threshold(self):
+        """Plans are captured for kept statements over the threshold only."""
+        log = SlowQueryLog(capacity=10, explain_threshold_ms=5)
+        calls = []
+        
+        def explain():
+            calls.append(1)
+            return ['SCAN t']
+        
+        log.observe({'sql': 'SELECT 1', 'duration_ms': 2, 'rows': 0, 'caller': None}, explain)
+        log.observe({'sql': 'SELECT 2', 'duration_ms': 8, 'rows': 0, 'caller': None}, explain)
+        
+        plans = {entry['sql']: entry['plan'] for entry in log.entries()}
+        self.assertIsNone(plans['SELECT 1'])
+        self.assertEqual(plans['SELECT 2'], ['SCAN t'])
+        self.assertEqual(len(calls), 1)
+    
+    def test_shrinking_capacity_trims(self):
+        """Reducing the capacity drops the fastest entries."""
+        log = SlowQueryLog(capacity=5)
+        for duration in range(5):
+            log.observe({'sql': 'SELECT 1', 'duration_ms': duration, 'rows': 0, 'caller': None})
+        log.configure(capacity=2)
+        self.assertEqual([entry['duration_ms'] for entry in log.entries()], [4, 3])
+
+
+class TestDatabaseSlowQueries(unittest.TestCase):
+    """Test slow query capture through DatabaseManager."""
+    
+    def setUp(self):
+        self.temp_db = tempfile.NamedTemporaryFile(delete=False, suffix='.db')
+        self.temp_db.close()
+        self.db = DatabaseManager(self.temp_db.name)
+        self.settings = self.db.get_slow_query_settings()
+        self.db.configure_slow_query_log(capacity=500, explain_threshold_ms=0)
+        self.db.clear_slow_queries()
+    
+    def tearDown(self):
+        self.db.configure_slow_query_log(
+            capacity=self.settings['capacity'],
+            explain_threshold_ms=self.settings['explain_threshold_ms'] if self.settings['explain_threshold_ms'] is not None else -1
+        )
+        self.db.clear_slow_queries()
+        if os.path.exists(self.temp_db.name):
+            os.unlink(self.temp_db.name)
+    
+    def test_records_caller_and_plan(self):
+        """Statements carry the calling method and their query plan."""
+        DataProcessor(self.db).process_monthly_data(usage_rows(3), 'report.csv')
+        self.db.get_all_data()
+        
+        slow = self.db.get_slow_queries()
+        select = slow[slow['sql'].str.contains('FROM usage_metrics ORDER BY')].iloc[0]
+        self.assertEqual(select['caller'], 'DatabaseManager.get_all_data')
+        self.assertEqual(select['rows'], 3)
+        self.assertTrue(select['plan'])
+        
+        callers = set(slow['caller'].dropna())
+        self.assertIn('DataProcessor.process_monthly_data', callers)
+    
+    def test_lower_email_lookup_is_explained(self):
+        """Statements finished by closing the connection (fetchone) are explained too."""
+        self.db.get_employee_by_email('someone@company.com')
+        
+        slow = self.db.get_slow_queries()
+        lookup = slow[slow['caller'] == 'DatabaseManager.get_employee_by_email'].iloc[0]
+        self.assertIn('LOWER(email)', lookup['sql'])
+        # A search on the LOWER(email) expression index, not a scan of employees
+        self.assertTrue(lookup['plan'])
+        self.assertFalse(lookup['full_scan'])
+    
+    def test_clear(self):
+        """Clearing empties the log."""
+        self.db.get_all_data()
+        self.db.clear_slow_queries()
+        self.assertTrue(self.db.get_slow_queries().empty)
+        self.assertEqual(self.db.get_slow_query_settings()['statements_seen'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
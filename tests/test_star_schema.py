@@ -0,0 +1,178 @@
+"""
+Test suite for the fact_usage table, its dimension tables and the usage_metrics view.
+
+Tests that ingested rows are stored with integer keys and one dimension row
+per distinct value, that the usage_metrics view keeps its columns and accepts
+direct writes, that the SQL usage totals match the rows, and that the
+migration moves existing (and superseded) rows over without changing what
+readers see.
+"""
+import unittest
+import sqlite3
+import os
+import sys
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from database import DatabaseManager
+from data_processor import DataProcessor
+from fixtures.usage_db import MigrationTestCase, UsageDatabaseTestCase, usage_frame
+
+
+VIEW_COLUMNS = ['id', 'user_id', 'user_name', 'email', 'department', 'date', 'feature_used',
+                'usage_count', 'cost_usd', 'tool_source', 'file_source', 'last_day_active',
+                'first_day_active_in_period', 'last_day_active_in_period', 'created_at',
+                'batch_id', 'day_key', 'month_key']
+
+
+def usage_upload(filename, **kwargs):
+    """Usage rows from filename; users 0-2 are in Sales, Legal and no department, the rest in Sales."""
+    departments = ['Sales', 'Legal', None]
+    return usage_frame(filename=filename, department=lambda i: departments[i] if i < 3 else 'Sales', **kwargs)
+
+
+class TestStarSchema(UsageDatabaseTestCase):
+    """Test storage in fact_usage and the usage_metrics view."""
+    
+    def test_rows_are_stored_with_keys(self):
+        """Each distinct value is stored once; fact rows hold integer keys."""
+        self.ingest(usage_upload('march.csv'))
+        self.ingest(usage_upload('april.csv', month='2025-04'))
+        
+        self.assertEqual(self.fetch("SELECT COUNT(*) FROM dim_user"), [(3,)])
+        self.assertEqual(self.fetch("SELECT department FROM dim_department ORDER BY department"),
+                         [('Legal',), ('Sales',)])
+        self.assertEqual(self.fetch("SELECT COUNT(*) FROM dim_tool"), [(1,)])
+        self.assertEqual(self.fetch("SELECT COUNT(*) FROM dim_file"), [(2,)])
+        self.assertEqual(self.fetch("""
+            SELECT DISTINCT typeof(user_key), typeof(feature_key), typeof(tool_key),
+                            typeof(file_key), typeof(created_at)
+            FROM fact_usage
+        """), [('integer',) * 5])
+        # A missing department has no key
+        self.assertEqual(self.fetch("SELECT COUNT(*) FROM fact_usage WHERE department_key IS NULL"), [(2,)])
+    
+    def test_view_columns(self):
+        """usage_metrics keeps its columns and values."""
+        self.ingest(usage_upload('march.csv'))
+        data = self.db.get_all_data()
+        
+        self.assertEqual(list(data.columns), VIEW_COLUMNS)
+        row = data.sort_values('user_id').iloc[1]
+        self.assertEqual((row['user_id'], row['user_name'], row['department'], row['date'],
+                          row['feature_used'], row['usage_count'], row['tool_source'], row['file_source']),
+                         ('user1@company.com', 'User 1', 'Legal', '2025-03-01', 'ChatGPT Messages', 11,
+                          'ChatGPT', 'march.csv'))
+        self.assertRegex(row['created_at'], r'^\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}$')
+    
+    def test_latest_user_name_wins(self):
+        """A user's name and email come from their most recent upload."""
+        self.ingest(usage_upload('march.csv'))
+        self.ingest(usage_upload('april.csv', month='2025-04', user_name='Renamed'))
+        
+        names = self.fetch("SELECT DISTINCT user_name FROM usage_metrics WHERE user_id = 'user0@company.com'")
+        self.assertEqual(names, [('Renamed 0',)])
+        self.assertEqual(self.db.get_unique_users(), ['Renamed 0', 'Renamed 1', 'Renamed 2'])
+    
+    def test_usage_summary_matches_rows(self):
+        """The SQL totals and distinct users match the usage rows."""
+        self.ingest(usage_upload('march.csv'))
+        self.ingest(usage_upload('april.csv', users=2, month='2025-04'))
+        data = self.db.get_all_data()
+        
+        summary = self.db.get_usage_summary()
+        self.assertEqual(summary['total_records'], len(data))
+        self.assertAlmostEqual(summary['total_cost'], data['cost_usd'].sum())
+        self.assertEqual(summary['total_users'], data['email'].str.lower().nunique())
+        self.assertEqual((str(summary['min_date']), str(summary['max_date'])), ('2025-03-01', '2025-04-01'))
+        self.assertEqual(summary['files'], [('april.csv', '2025-04-01', '2025-04-01', 2),
+                                            ('march.csv', '2025-03-01', '2025-03-01', 3)])
+        self.assertEqual(self.db.get_usage_summary(tools=['BlueFlame AI'])['total_records'], 0)
+        
+        users = self.db.get_usage_users()
+        expected = data[['email', 'user_name', 'department', 'tool_source']].drop_duplicates()
+        self.assertEqual(sorted(map(tuple, users.fillna('').values.tolist())),
+                         sorted(map(tuple, expected.fillna('').values.tolist())))
+    
+    def test_writes_through_view(self):
+        """Inserts, updates and deletes on usage_metrics reach fact_usage."""
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("""
+            INSERT INTO usage_metrics (user_id, user_name, email, department, date, feature_used, usage_count)
+            VALUES ('a@company.com', 'A', 'a@company.com', 'Sales', '2025-03-01', 'ChatGPT Messages', 5)
+        """)
+        conn.execute("UPDATE usage_metrics SET department = 'Legal', usage_count = 6 WHERE user_id = 'a@company.com'")
+        conn.commit()
+        conn.close()
+        
+        # tool_source keeps its 'ChatGPT' default
+        self.assertEqual(self.fetch("SELECT department, usage_count, tool_source FROM usage_metrics"),
+                         [('Legal', 6, 'ChatGPT')])
+        self.assertEqual(self.db.get_tool_comparison_data()['unique_users'].tolist(), [1])
+        
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("DELETE FROM usage_metrics WHERE user_id = 'a@company.com'")
+        conn.commit()
+        conn.close()
+        self.assertEqual(self.fetch("SELECT COUNT(*) FROM fact_usage"), [(0,)])
+    
+    def test_deletes_by_dimension(self):
+        """Deleting by tool and by email finds rows through their keys."""
+        self.ingest(usage_upload('march.csv'))
+        
+        success, _, count = self.db.delete_employee_usage('USER1@company.com')
+        self.assertTrue(success)
+        self.assertEqual(count, 1)
+        self.assertTrue(self.db.delete_by_tool('ChatGPT'))
+        self.assertEqual(self.fetch("SELECT COUNT(*) FROM fact_usage"), [(0,)])
+
+
+class TestStarSchemaMigration(MigrationTestCase):
+    """Test that existing usage and history rows move to fact_usage."""
+    
+    def test_existing_rows_are_moved(self):
+        conn = self.migrate_to(6)
+        conn.commit()
+        conn.close()
+        
+        # Two uploads, the second superseding part of the first, in the old schema
+        db_v6 = sqlite3.connect(self.temp_db.name)
+        db_v6.execute("INSERT INTO ingestion_batches (filename, tool_source) VALUES ('march.csv', 'ChatGPT')")
+        db_v6.execute("INSERT INTO ingestion_batches (filename, tool_source) VALUES ('march_v2.csv', 'ChatGPT')")
+        db_v6.executemany("""
+            INSERT INTO usage_metrics (id, batch_id, user_id, user_name, email, department, date,
+                                       feature_used, usage_count, tool_source, file_source, created_at)
+            VALUES (?, ?, ?, ?, ?, 'Sales', '2025-03-01', 'ChatGPT Messages', ?, 'ChatGPT', ?, '2025-04-01 10:00:00')
+        """, [(1, 1, 'a@company.com', 'A', 'a@company.com', 1, 'march.csv'),
+              (4, 2, 'b@company.com', 'B', 'b@company.com', 20, 'march_v2.csv')])
+        db_v6.execute("""
+            INSERT INTO usage_metrics_history (superseded_by, id, batch_id, user_id, user_name, email, department,
+                                               date, feature_used, usage_count, tool_source, file_source, created_at)
+            VALUES (2, 2, 1, 'b@company.com', 'B', 'b@company.com', 'Sales', '2025-03-01',
+                    'ChatGPT Messages', 2, 'ChatGPT', 'march.csv', '2025-04-01 10:00:00')
+        """)
+        db_v6.execute("UPDATE sqlite_sequence SET seq = 5 WHERE name = 'usage_metrics'")
+        db_v6.commit()
+        before = db_v6.execute("SELECT * FROM usage_metrics ORDER BY id").fetchall()
+        db_v6.close()
+        
+        db = DatabaseManager(self.temp_db.name)
+        
+        conn = sqlite3.connect(self.temp_db.name)
+        self.assertEqual(conn.execute("SELECT * FROM usage_metrics ORDER BY id").fetchall(), before)
+        self.assertEqual(conn.execute("SELECT type FROM sqlite_master WHERE name = 'usage_metrics'").fetchone(),
+                         ('view',))
+        conn.close()
+        
+        # The superseded row comes back with its id; new rows do not reuse deleted ids
+        self.assertTrue(db.rollback_batch(2)[0])
+        data = db.get_all_data().sort_values('id')
+        self.assertEqual(data[['id', 'user_id', 'usage_count']].values.tolist(),
+                         [[1, 'a@company.com', 1], [2, 'b@company.com', 2]])
+        DataProcessor(db).process_monthly_data(usage_upload('may.csv', users=1, month='2025-05'), 'may.csv')
+        self.assertEqual(db.get_all_data()['id'].max(), 6)
+
+
+if __name__ == '__main__':
+    unittest.main()
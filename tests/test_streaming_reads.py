@@ -0,0 +1,106 @@
+"""
+Test suite for chunked reads of usage data.
+
+Tests that DatabaseManager.iter_filtered_data yields the same rows as
+get_filtered_data in chunks of the requested size, keeps the columns when
+nothing matches, does not block writers while it is read, releases its connection when a consumer stops early and
+reports read errors instead of ending quietly, and that write_csv_chunks
+writes chunks out as one CSV.
+"""
+import unittest
+import sqlite3
+import io
+import os
+import sys
+from datetime import date
+
+import pandas as pd
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from export_utils import write_csv_chunks
+from fixtures.usage_db import UsageDatabaseTestCase, usage_frame
+
+
+class TestIterFilteredData(UsageDatabaseTestCase):
+    """Test reading usage rows chunk by chunk."""
+    
+    def setUp(self):
+        super().setUp()
+        for tool, month in [('ChatGPT', '2025-03'), ('BlueFlame AI', '2025-04')]:
+            self.ingest(usage_frame(users=120, tool=tool, month=month, usage=1, spread_days=True,
+                                    department=lambda i: f'Department {i % 4}'))
+    
+    def test_chunks_match_filtered_data(self):
+        """Concatenated chunks are the rows (and order) of get_filtered_data."""
+        for filters in [{}, {'tools': ['ChatGPT'], 'departments': ['Department 1']},
+                        {'start_date': date(2025, 3, 10), 'end_date': date(2025, 4, 5)}]:
+            with self.subTest(filters=filters):
+                chunks = list(self.db.iter_filtered_data(chunksize=50, **filters))
+                expected = self.db.get_filtered_data(**filters)
+                
+                self.assertTrue(all(len(chunk) <= 50 for chunk in chunks))
+                self.assertEqual(len(chunks), -(-len(expected) // 50))
+                pd.testing.assert_frame_equal(pd.concat(chunks, ignore_index=True), expected)
+        
+        self.assertEqual(sum(len(chunk) for chunk in self.db.iter_filtered_data()), len(self.db.get_all_data()))
+    
+    def test_no_matches_keeps_columns(self):
+        chunks = list(self.db.iter_filtered_data(tools=['Unknown Tool']))
+        self.assertEqual(len(chunks), 1)
+        self.assertTrue(chunks[0].empty)
+        self.assertEqual(list(chunks[0].columns), list(self.db.get_all_data().columns))
+    
+    def test_connection_released_when_consumer_stops(self):
+        """Closing the generator early closes its connection (and read lock)."""
+        chunks = self.db.iter_filtered_data(chunksize=10)
+        next(chunks)
+        chunks.close()
+        
+        conn = sqlite3.connect(self.db_path, timeout=0)
+        try:
+            conn.execute("BEGIN EXCLUSIVE")
+            conn.execute("ROLLBACK")
+        finally:
+            conn.close()
+    
+    def test_writes_commit_while_chunks_are_read(self):
+        """A write does not wait for an open chunked read, which keeps reading its snapshot."""
+        expected = self.db.get_all_data()['usage_count'].sum()
+        chunks = self.db.iter_filtered_data(chunksize=10)
+        total = next(chunks)['usage_count'].sum()
+        
+        conn = sqlite3.connect(self.db_path, timeout=0)
+        try:
+            conn.execute("UPDATE fact_usage SET usage_count = usage_count + 1")
+            conn.commit()
+        finally:
+            conn.close()
+        
+        total += sum(chunk['usage_count'].sum() for chunk in chunks)
+        self.assertEqual(total, expected)
+        self.assertEqual(self.db.get_all_data()['usage_count'].sum(), expected + 240)
+    
+    def test_read_errors_are_raised(self):
+        with self.assertRaises(ValueError):
+            list(self.db.iter_filtered_data(start_date='not a date'))
+        # get_filtered_data keeps returning an empty DataFrame
+        self.assertTrue(self.db.get_filtered_data(start_date='not a date').empty)
+    
+    def test_write_csv_chunks(self):
+        """Chunks are written as one CSV with a single header row."""
+        output = io.StringIO()
+        rows = write_csv_chunks(self.db.iter_filtered_data(chunksize=7), output)
+        
+        expected = self.db.get_all_data()
+        self.assertEqual(rows, len(expected))
+        self.assertEqual(output.getvalue(), expected.to_csv(index=False))
+        
+        path = os.path.join(self.temp_dir, 'export.csv')
+        self.assertEqual(write_csv_chunks(self.db.iter_filtered_data(tools=['ChatGPT']), path), 120)
+        self.assertEqual(len(pd.read_csv(path)), 120)
+
+
+if __name__ == '__main__':
+    unittest.main()
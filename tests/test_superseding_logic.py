@@ -475,6 +475,13 @@ class TestDuplicateDetection(unittest.TestCase):
                 'file_source': 'test.csv'
             }
         ])
+        # The natural key index rejects exact duplicates at write time
+        with self.assertRaises(pd.errors.DatabaseError):
+            test_data.to_sql('usage_metrics', conn, if_exists='append', index=False)
+        self.assertTrue(self.db.detect_duplicates().empty)
+        
+        # Without the index (a database that has not been migrated) they are reported
+        conn.execute("DROP INDEX idx_usage_natural_key")
         test_data.to_sql('usage_metrics', conn, if_exists='append', index=False)
         conn.close()
         
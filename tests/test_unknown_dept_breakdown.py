@@ -38,8 +38,10 @@ def test_unknown_department_breakdown():
     ])
     
     # Insert usage data into database
+    # (usage_metrics is a view, so it is emptied rather than replaced)
     conn = sqlite3.connect(db.db_path)
-    usage_data.to_sql('usage_metrics', conn, if_exists='replace', index=False)
+    conn.execute("DELETE FROM usage_metrics")
+    usage_data.to_sql('usage_metrics', conn, if_exists='append', index=False)
     conn.close()
     
     print("✓ Loaded usage data into database")
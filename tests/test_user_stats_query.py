@@ -0,0 +1,158 @@
+"""
+Test suite for server-side User Directory queries.
+
+Tests DatabaseManager.query_user_stats(): SQL aggregation, search, sorting,
+OFFSET and keyset pagination, department filtering, and rollup refresh after
+data changes.
+"""
+import unittest
+import pandas as pd
+import tempfile
+import os
+import sys
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from database import DatabaseManager
+from data_processor import DataProcessor
+
+
+def make_record(email, name, dept, feature, count, date='2025-01-01', tool='ChatGPT'):
+    return {
+        'user_id': email,
+        'user_name': name,
+        'email': email,
+        'department': dept,
+        'date': date,
+        'feature_used': feature,
+        'usage_count': count,
+        'cost_usd': 0.0,
+        'tool_source': tool,
+        'file_source': 'test.csv'
+    }
+
+
+class TestQueryUserStats(unittest.TestCase):
+    """Test SQL-backed user statistics for the User Directory."""
+    
+    def setUp(self):
+        """Create a temporary database with a handful of users."""
+        self.temp_db = tempfile.NamedTemporaryFile(delete=False, suffix='.db')
+        self.temp_db.close()
+        
+        self.db = DatabaseManager(self.temp_db.name)
+        self.processor = DataProcessor(self.db)
+        
+        records = [
+            make_record('alice@company.com', 'Alice Adams', 'Finance', 'ChatGPT Messages', 100),
+            make_record('alice@company.com', 'Alice Adams', 'Finance', 'Tool Messages', 500),
+            make_record('alice@company.com', 'Alice Adams', 'Finance', 'BlueFlame Messages', 20, tool='BlueFlame AI'),
+            make_record('bob@company.com', 'Bob Brown', 'Legal', 'ChatGPT Messages', 300),
+            make_record('bob@company.com', 'Bob Brown', 'Legal', 'GPT Messages', 10),
+            make_record('carol@company.com', 'Carol Clark', 'Technology', 'Project Messages', 50),
+            make_record('dave@company.com', 'Dave Davis', 'Finance', 'ChatGPT Messages', 5, date='2025-02-01'),
+        ]
+        success, _ = self.processor.process_monthly_data(pd.DataFrame(records), 'test.csv')
+        self.assertTrue(success)
+    
+    def tearDown(self):
+        """Clean up test database."""
+        if os.path.exists(self.temp_db.name):
+            os.unlink(self.temp_db.name)
+    
+    def test_aggregates_match_message_breakdown(self):
+        """Per-user totals exclude Tool Messages by default."""
+        result = self.db.query_user_stats(per_page=10)
+        users = result['users'].set_index('email')
+        
+        self.assertEqual(result['total_count'], 4)
+        self.assertEqual(users.loc['alice@company.com', 'openai_messages'], 100)
+        self.assertEqual(users.loc['alice@company.com', 'tool_messages'], 500)
+        self.assertEqual(users.loc['alice@company.com', 'blueflame_messages'], 20)
+        self.assertEqual(users.loc['alice@company.com', 'total_messages'], 120)
+        self.assertEqual(users.loc['bob@company.com', 'total_messages'], 310)
+        self.assertEqual(users.loc['alice@company.com', 'tool_source'].count(','), 1)
+        
+        result = self.db.query_user_stats(per_page=10, exclude_tool_messages=False)
+        users = result['users'].set_index('email')
+        self.assertEqual(users.loc['alice@company.com', 'total_messages'], 620)
+    
+    def test_sorting(self):
+        """Each sort option orders users correctly."""
+        high_to_low = self.db.query_user_stats(sort_by="Total Messages (High to Low)")['users']
+        self.assertEqual(list(high_to_low['email']),
+                         ['bob@company.com', 'alice@company.com', 'carol@company.com', 'dave@company.com'])
+        
+        low_to_high = self.db.query_user_stats(sort_by="Total Messages (Low to High)")['users']
+        self.assertEqual(low_to_high.iloc[0]['email'], 'dave@company.com')
+        
+        by_name = self.db.query_user_stats(sort_by="Name (A-Z)")['users']
+        self.assertEqual(list(by_name['user_name']), ['Alice Adams', 'Bob Brown', 'Carol Clark', 'Dave Davis'])
+        
+        by_dept = self.db.query_user_stats(sort_by="Department (A-Z)")['users']
+        self.assertEqual(by_dept.iloc[-1]['department'], 'Technology')
+    
+    def test_search(self):
+        """Search matches name, email and department case-insensitively."""
+        self.assertEqual(self.db.query_user_stats(search='ALICE')['total_count'], 1)
+        self.assertEqual(self.db.query_user_stats(search='finance')['total_count'], 2)
+        self.assertEqual(self.db.query_user_stats(search='@company.com')['total_count'], 4)
+        self.assertEqual(self.db.query_user_stats(search='%')['total_count'], 0)
+    
+    def test_keyset_pagination_matches_offset(self):
+        """Walking pages with cursors returns the same rows as OFFSET pagination."""
+        for sort_by in ["Total Messages (High to Low)", "Total Messages (Low to High)", "Name (A-Z)", "Department (A-Z)"]:
+            first = self.db.query_user_stats(sort_by=sort_by, page=1, per_page=3)
+            self.assertEqual(first['total_pages'], 2)
+            self.assertIsNotNone(first['next_cursor'])
+            
+            keyset = self.db.query_user_stats(sort_by=sort_by, page=2, per_page=3, cursor=first['next_cursor'])
+            offset = self.db.query_user_stats(sort_by=sort_by, page=2, per_page=3)
+            self.assertEqual(list(keyset['users']['email']), list(offset['users']['email']))
+            self.assertIsNone(keyset['next_cursor'])
+    
+    def test_filters_bypass_rollup(self):
+        """Date and tool filters aggregate only the matching slice."""
+        result = self.db.query_user_stats(start_date='2025-02-01', end_date='2025-02-28')
+        self.assertEqual(list(result['users']['email']), ['dave@company.com'])
+        
+        result = self.db.query_user_stats(tools=['BlueFlame AI'])
+        self.assertEqual(result['total_count'], 1)
+        self.assertEqual(result['users'].iloc[0]['total_messages'], 20)
+    
+    def test_rollup_refreshes_after_changes(self):
+        """The rollup is rebuilt after uploads, deletions and roster changes."""
+        self.assertEqual(self.db.query_user_stats()['total_count'], 4)
+        self.assertFalse(self.db.refresh_user_rollup())
+        
+        self.db.delete_employee_usage('carol@company.com')
+        self.assertEqual(self.db.query_user_stats()['total_count'], 3)
+        
+        employees = pd.DataFrame([{
+            'first_name': 'Bob', 'last_name': 'Brown', 'email': 'bob@company.com',
+            'title': 'Counsel', 'department': 'Compliance', 'status': 'Active'
+        }])
+        self.db.load_employees(employees)
+        users = self.db.query_user_stats()['users'].set_index('email')
+        self.assertEqual(users.loc['bob@company.com', 'department'], 'Compliance')
+    
+    def test_department_filter_uses_displayed_department(self):
+        """The department filter matches the roster department users are shown under."""
+        self.db.load_employees(pd.DataFrame([{
+            'first_name': 'Bob', 'last_name': 'Brown', 'email': 'bob@company.com',
+            'title': 'Counsel', 'department': 'Compliance', 'status': 'Active'
+        }]))
+        
+        for filters in [{}, {'start_date': '2025-01-01', 'end_date': '2025-01-31'}]:
+            with self.subTest(filters=filters):
+                compliance = self.db.query_user_stats(departments=['Compliance'], **filters)
+                self.assertEqual(list(compliance['users']['email']), ['bob@company.com'])
+                self.assertEqual(self.db.query_user_stats(departments=['Legal'], **filters)['total_count'], 0)
+                
+                finance = self.db.query_user_stats(departments=['Finance', 'Compliance'], search='alice', **filters)
+                self.assertEqual(list(finance['users']['email']), ['alice@company.com'])
+
+
+if __name__ == '__main__':
+    unittest.main()
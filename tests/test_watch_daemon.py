@@ -0,0 +1,143 @@
+"""
+Test suite for the polling watch-folder daemon.
+
+Tests that files are only ingested after their size and mtime have been
+stable for several polls, that ingested and failed files are not submitted
+again, and that no more than the configured number of files are ingested at
+once.
+"""
+import unittest
+import tempfile
+import threading
+import shutil
+import time
+import os
+import sys
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from file_scanner import FileScanner
+from watch_daemon import WatchDaemon
+
+
+class TestWatchDaemon(unittest.TestCase):
+    """Test polling, debouncing and ingestion."""
+    
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.folder = os.path.join(self.temp_dir, 'OpenAI User Data')
+        os.makedirs(self.folder)
+        self.scanner = FileScanner(os.path.join(self.temp_dir, 'file_tracking.db'), max_listing_age=0)
+        self.ingested = []
+        self.daemons = []
+    
+    def tearDown(self):
+        for daemon in self.daemons:
+            daemon._executor.shutdown(wait=True)
+        shutil.rmtree(self.temp_dir)
+    
+    def write(self, filename, rows=1, mtime_offset=0):
+        path = os.path.join(self.folder, filename)
+        with open(path, 'w') as f:
+            f.write('email,messages\n')
+            for i in range(rows):
+                f.write(f'user{i}@company.com,{i}\n')
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + mtime_offset))
+        return path
+    
+    def ingest(self, file_info):
+        """Stand-in for IngestionPipeline.process_file: records the file as processed."""
+        self.ingested.append(file_info['filename'])
+        self.scanner.mark_processed(file_info['path'], success=True, records_count=1,
+                                    content_hash=file_info.get('content_hash'))
+        return True, "Processed 1 records", 1
+    
+    def make_daemon(self, ingest=None, **kwargs):
+        daemon = WatchDaemon(self.scanner, ingest or self.ingest, [self.folder], **kwargs)
+        self.daemons.append(daemon)
+        return daemon
+    
+    def poll(self, daemon):
+        submitted = daemon.poll()
+        self.assertTrue(daemon.wait_idle(timeout=10))
+        return submitted
+    
+    def test_ingested_after_stable_polls(self):
+        """A file is submitted once it is unchanged for stable_polls polls, and only once."""
+        self.write('march.csv')
+        daemon = self.make_daemon(stable_polls=2)
+        
+        self.assertEqual(self.poll(daemon), [])
+        self.assertEqual(len(self.poll(daemon)), 1)
+        self.assertEqual(self.poll(daemon), [])
+        self.assertEqual(self.ingested, ['march.csv'])
+        self.assertEqual(daemon.stats['ingested'], 1)
+    
+    def test_growing_file_is_not_ingested(self):
+        """A file whose size changes between polls waits until it stops growing."""
+        self.write('export.csv', rows=1)
+        daemon = self.make_daemon(stable_polls=2)
+        
+        self.poll(daemon)
+        self.write('export.csv', rows=50, mtime_offset=1_000_000_000)
+        self.assertEqual(self.poll(daemon), [])
+        self.assertEqual(self.ingested, [])
+        self.assertEqual(len(self.poll(daemon)), 1)
+    
+    def test_failures_are_recorded_and_not_retried(self):
+        """A failed file is recorded in the tracking store and not resubmitted until it changes."""
+        path = self.write('broken.csv')
+        daemon = self.make_daemon(ingest=lambda file_info: (False, "Unknown file format", 0), stable_polls=1)
+        
+        self.assertEqual(len(self.poll(daemon)), 1)
+        self.assertEqual(self.poll(daemon), [])
+        entry = self.scanner.processed_files[path]
+        self.assertFalse(entry['success'])
+        self.assertEqual(entry['error'], "Unknown file format")
+        self.assertEqual(daemon.stats['failed'], 1)
+    
+    def test_ingest_exceptions_are_failures(self):
+        """An exception from the ingest function counts as a failure."""
+        def raising_ingest(file_info):
+            raise ValueError("bad data")
+        
+        path = self.write('march.csv')
+        daemon = self.make_daemon(ingest=raising_ingest, stable_polls=1)
+        self.poll(daemon)
+        self.assertIn("bad data", self.scanner.processed_files[path]['error'])
+    
+    def test_bounded_concurrency(self):
+        """No more than `workers` files are ingested at the same time."""
+        for i in range(6):
+            self.write(f'file{i}.csv', rows=i + 1)
+        lock = threading.Lock()
+        running = [0]
+        peak = [0]
+        
+        def slow_ingest(file_info):
+            with lock:
+                running[0] += 1
+                peak[0] = max(peak[0], running[0])
+            time.sleep(0.05)
+            with lock:
+                running[0] -= 1
+            return self.ingest(file_info)
+        
+        daemon = self.make_daemon(ingest=slow_ingest, stable_polls=1, workers=2)
+        self.assertEqual(len(self.poll(daemon)), 6)
+        self.assertEqual(len(self.ingested), 6)
+        self.assertLessEqual(peak[0], 2)
+    
+    def test_run_once(self):
+        """run() with max_polls polls, waits for ingestion and stops."""
+        self.write('march.csv')
+        daemon = self.make_daemon(stable_polls=2)
+        daemon.run(interval=0, max_polls=2)
+        self.assertEqual(self.ingested, ['march.csv'])
+        self.assertEqual(daemon.stats['polls'], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
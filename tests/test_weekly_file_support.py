@@ -64,9 +64,10 @@ def test_file_scanner_recursive():
     assert len(weekly_files) >= 2, "Should find at least 2 weekly test files"
     assert len(monthly_files) >= 6, "Should find at least 6 monthly files"
     
-    # Clean up test tracking file
-    if os.path.exists("file_tracking_test.json"):
-        os.remove("file_tracking_test.json")
+    # Clean up test tracking files
+    for tracking_file in ("file_tracking_test.json", "file_tracking_test.db"):
+        if os.path.exists(tracking_file):
+            os.remove(tracking_file)
     
     print("\n✅ TEST 1 PASSED: Recursive scanning works correctly\n")
 
@@ -0,0 +1,242 @@
+"""
+Watch-Folder Daemon for Continuous Ingestion
+
+A headless, long-running ingester: polls AUTO_SCAN_FOLDERS with FileScanner,
+waits until new or modified files have stopped changing, and ingests them in
+the background with the ingestion pipeline (ingestion.py). Outcomes (success or failure) are
+recorded in the file tracking store, so failed files are not retried until
+their content changes. With the daemon running, the dashboard's auto-scan
+panel only shows what has already been ingested.
+
+A file is ingested once its size and mtime are the same for --stable-polls
+consecutive polls, which skips exports that are still being copied or written.
+At most --workers files are ingested at once.
+
+Runs on plain Linux with no external services:
+
+    python watch_daemon.py                        # poll every 10s, 2 workers
+    python watch_daemon.py --interval 30 --stable-polls 3 --workers 4
+    python watch_daemon.py --once                 # ingest what is ready, then exit
+
+Run it from the dashboard's working directory (it uses the same
+openai_metrics.db and file tracking store). Stop it with Ctrl+C or SIGTERM;
+files being ingested are finished first.
+"""
+
+import argparse
+import signal
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, List, Tuple
+
+from config import AUTO_SCAN_FOLDERS, FILE_TRACKING_PATH, RECURSIVE_SCAN_FOLDERS, SCAN_STAT_WORKERS
+from file_scanner import FileScanner
+
+DEFAULT_INTERVAL = 10
+DEFAULT_STABLE_POLLS = 2
+DEFAULT_WORKERS = 2
+
+
+def log(message):
+    print(f"[{datetime.now().isoformat(timespec='seconds')}] {message}", flush=True)
+
+
+class WatchDaemon:
+    """Polls folders and ingests files once they have stopped changing."""
+    
+    def __init__(self, scanner: FileScanner, ingest: Callable[[Dict], Tuple[bool, str, int]],
+                 folders: List[str], stable_polls: int = DEFAULT_STABLE_POLLS, workers: int = DEFAULT_WORKERS):
+        """
+        Initialize the daemon.
+        
+        Args:
+            scanner: FileScanner used for polling and recording outcomes; it should not
+                cache directory listings (max_listing_age=0) so growing files are seen
+            ingest: Callable taking a file info dict and returning (success, message, records),
+                e.g. IngestionPipeline.process_file
+            folders: Folders to watch
+            stable_polls: Consecutive polls a file's size and mtime must be unchanged
+            workers: Maximum number of files ingested at once
+        """
+        self.scanner = scanner
+        self.ingest = ingest
+        self.folders = folders
+        self.stable_polls = max(int(stable_polls), 1)
+        self.workers = max(int(workers), 1)
+        self.stats = {'polls': 0, 'ingested': 0, 'failed': 0, 'records': 0}
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='ingest')
+        self._observed = {}
+        self._in_flight = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+    
+    def poll(self) -> List[str]:
+        """
+        Scan the folders once and submit every file that has become stable.
+        
+        Returns:
+            List of paths submitted for ingestion by this poll
+        """
+        with self._lock:
+            self.stats['polls'] += 1
+        candidates = {
+            f['path']: f for f in self.scanner.scan_folders(self.folders)
+            if f['status'] in ('new', 'modified')
+        }
+        
+        submitted = []
+        observed = {}
+        for path, file_info in candidates.items():
+            fingerprint = (file_info['size_bytes'], file_info['modified'])
+            previous, count = self._observed.get(path, (None, 0))
+            count = count + 1 if fingerprint == previous else 1
+            observed[path] = (fingerprint, count)
+            
+            with self._lock:
+                busy = path in self._in_flight
+            if busy or count < self.stable_polls:
+                continue
+            
+            with self._lock:
+                self._in_flight.add(path)
+            self._executor.submit(self._ingest_file, file_info)
+            submitted.append(path)
+        
+        # Forget files that disappeared or were ingested
+        self._observed = observed
+        return submitted
+    
+    def _ingest_file(self, file_info: Dict):
+        """Ingest one file and record the outcome in the tracking store."""
+        path = file_info['path']
+        try:
+            log(f"Ingesting {path}")
+            try:
+                success, message, records = self.ingest(file_info)
+            except Exception as e:
+                success, message, records = False, f"Error processing file: {e}", 0
+            
+            if success:
+                with self._lock:
+                    self.stats['ingested'] += 1
+                    self.stats['records'] += records
+                log(f"Ingested {path}: {message}")
+            else:
+                # Failures that happen before the file is read (or in the ingest function
+                # itself) are not tracked by the pipeline; record them so the file is
+                # not retried on every poll
+                self.scanner.mark_processed(path, success=False, error=message,
+                                            content_hash=file_info.get('content_hash'))
+                with self._lock:
+                    self.stats['failed'] += 1
+                log(f"Failed {path}: {message}")
+        finally:
+            with self._lock:
+                self._in_flight.discard(path)
+    
+    def pending(self) -> int:
+        """Number of files currently being ingested or queued."""
+        with self._lock:
+            return len(self._in_flight)
+    
+    def wait_idle(self, timeout: float = None) -> bool:
+        """
+        Wait until no files are being ingested.
+        
+        Args:
+            timeout: Maximum seconds to wait (None waits indefinitely)
+        
+        Returns:
+            bool: True if idle, False on timeout
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.pending():
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.05)
+        return True
+    
+    def run(self, interval: float = DEFAULT_INTERVAL, max_polls: int = None):
+        """
+        Poll until stop() is called (or max_polls polls have run), then finish in-flight files.
+        
+        Args:
+            interval: Seconds between polls
+            max_polls: Optional number of polls after which to stop
+        """
+        log(f"Watching {', '.join(self.folders)} every {interval}s "
+            f"({self.stable_polls} stable poll(s), {self.workers} worker(s))")
+        while not self._stop.is_set():
+            try:
+                self.poll()
+            except Exception as e:
+                log(f"Error during poll: {e}")
+            if max_polls is not None and self.stats['polls'] >= max_polls:
+                break
+            self._stop.wait(interval)
+        
+        self.shutdown()
+    
+    def stop(self):
+        """Ask run() to stop after the current poll."""
+        self._stop.set()
+    
+    def shutdown(self):
+        """Finish in-flight files and release the worker threads."""
+        if self.pending():
+            log(f"Waiting for {self.pending()} file(s) being ingested...")
+        self._executor.shutdown(wait=True)
+        log(f"Stopped: {self.stats['ingested']} file(s) ingested ({self.stats['records']:,} records), "
+            f"{self.stats['failed']} failed, {self.stats['polls']} poll(s)")
+
+
+def load_ingest_function(scanner: FileScanner):
+    """
+    Return the ingestion function, recording outcomes through the given scanner.
+    
+    Args:
+        scanner: FileScanner whose tracking store records each ingested file
+    
+    Returns:
+        IngestionPipeline.process_file bound to the dashboard's database
+    """
+    from database import DatabaseManager
+    from ingestion import IngestionPipeline
+    return IngestionPipeline(DatabaseManager(), scanner=scanner).process_file
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Watch the auto-scan folders and ingest new files")
+    parser.add_argument('--interval', type=float, default=DEFAULT_INTERVAL, help="seconds between polls")
+    parser.add_argument('--stable-polls', type=int, default=DEFAULT_STABLE_POLLS,
+                        help="polls a file must be unchanged before it is ingested")
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help="files ingested at once")
+    parser.add_argument('--once', action='store_true',
+                        help="poll until files present at start are stable, ingest them, then exit")
+    parser.add_argument('--folder', action='append', dest='folders',
+                        help="folder to watch (repeatable; default: AUTO_SCAN_FOLDERS)")
+    args = parser.parse_args(argv)
+    
+    folders = args.folders or AUTO_SCAN_FOLDERS
+    scanner = FileScanner(FILE_TRACKING_PATH, recursive_folders=RECURSIVE_SCAN_FOLDERS,
+                          stat_workers=SCAN_STAT_WORKERS, max_listing_age=0)
+    daemon = WatchDaemon(scanner, load_ingest_function(scanner), folders,
+                         stable_polls=args.stable_polls, workers=args.workers)
+    
+    signal.signal(signal.SIGTERM, lambda signum, frame: daemon.stop())
+    try:
+        if args.once:
+            daemon.run(interval=args.interval, max_polls=args.stable_polls)
+        else:
+            daemon.run(interval=args.interval)
+    except KeyboardInterrupt:
+        daemon.stop()
+        daemon.shutdown()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())